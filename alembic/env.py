@@ -12,6 +12,16 @@ from app.models import (
     transaction_event,
     payment_schedule,
     audit_log,
+    webhook,
+    installment,
+    ledger,
+    shard_directory,
+    reconciliation,
+    payment_retry,
+    payout,
+    delinquency,
+    rent_roll,
+    idempotency_key,
 )
 
 config = context.config
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
-from app.database import get_db
+from decimal import Decimal
+from app.database import get_db, get_read_db
 from app.models.bank_account import BankAccount
+from app.models.ledger import AccountBalance
 from app.schemas.bank_account import BankAccountCreate, BankAccountResponse
+from app.schemas.ledger import AccountBalanceResponse, AccountStatementResponse
+from app.services.ledger_service import LedgerService
+from app.sharding import ShardRouter, each_shard
 
 router = APIRouter(tags=["bank_accounts"])
 
@@ -14,10 +19,11 @@ def create_bank_account(account: BankAccountCreate, db: Session = Depends(get_db
     db.add(db_account)
     db.commit()
     db.refresh(db_account)
+    ShardRouter.replicate(BankAccount, [db_account.id], db)  # payments on every shard reference it
     return db_account
 
 @router.get("/user/{user_id}", response_model=List[BankAccountResponse])
-def list_user_accounts(user_id: str, db: Session = Depends(get_db)):
+def list_user_accounts(user_id: str, db: Session = Depends(get_read_db)):
     accounts = db.query(BankAccount).filter(BankAccount.user_id == user_id).all()
     return accounts
 
@@ -37,4 +43,49 @@ def set_primary_account(account_id: str, db: Session = Depends(get_db)):
     account.is_primary = True
     db.commit()
     db.refresh(account)
-    return account
\ No newline at end of file
+    ShardRouter.replicate(
+        BankAccount, [account_id for (account_id,) in db.query(BankAccount.id).filter(BankAccount.user_id == account.user_id)], db
+    )
+    return account
+
+@router.get("/{account_id}/balance", response_model=AccountBalanceResponse)
+def get_account_balance(account_id: str, db: Session = Depends(get_read_db)):
+    """
+    Current balance, read from the running totals maintained on every posting:
+    a single primary-key lookup, no matter how many entries the account has.
+    """
+    if not db.query(BankAccount.id).filter(BankAccount.id == account_id).first():
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    # Each shard keeps running totals for the postings it holds: one primary-key lookup per shard
+    balances = [
+        balance for _, shard_db in each_shard(db)
+        for balance in shard_db.query(AccountBalance).filter(AccountBalance.account_id == account_id)
+    ]
+    total_debits = sum((balance.total_debits for balance in balances), Decimal(0))
+    total_credits = sum((balance.total_credits for balance in balances), Decimal(0))
+
+    return AccountBalanceResponse(
+        account_id=account_id,
+        total_debits=total_debits,
+        total_credits=total_credits,
+        balance=total_credits - total_debits,
+        entry_count=sum(balance.entry_count for balance in balances),
+        updated_at=max((balance.updated_at for balance in balances), default=None),
+    )
+
+@router.get("/{account_id}/statement", response_model=AccountStatementResponse)
+def get_account_statement(
+    account_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """Ledger entries since the latest balance checkpoint, with the checkpoint as opening balance"""
+    if not db.query(BankAccount.id).filter(BankAccount.id == account_id).first():
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    statements = {
+        shard_id: LedgerService.get_statement(shard_db, account_id, limit)
+        for shard_id, shard_db in each_shard(db)
+    }
+    return LedgerService.merge_statements(account_id, statements, limit)
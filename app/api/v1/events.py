@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime, timezone
+from app.database import get_read_db, open_read_session
+from app.schemas.transaction_event import EventFeedPage
+from app.services.event_feed_service import EventFeedService
+from app.config import settings
+
+router = APIRouter()  # no prefix here, main.py handles it
+
+def _utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+@router.get("", response_model=EventFeedPage)
+def event_feed(
+    after: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=settings.EVENT_FEED_MAX_LIMIT),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Change feed of every transaction event. Start without `after`, then pass back next_cursor;
+    when has_more is false the consumer is caught up and should poll again later.
+    """
+    try:
+        return EventFeedService.page(after, limit, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/export")
+def export_events(start: datetime, end: datetime, request: Request):
+    """Every event with start <= timestamp < end as NDJSON, streamed"""
+    start, end = _utc(start), _utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    db = open_read_session(request)  # closed by the stream when it finishes
+    return StreamingResponse(
+        EventFeedService.export(start, end, db, settings.EVENT_EXPORT_FETCH_SIZE),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="events-{start:%Y%m%dT%H%M%S}-{end:%Y%m%dT%H%M%S}.ndjson"'},
+    )
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+from uuid import UUID
+from app.database import get_db
+from app.models.property import Property
+from app.services.statement_export_service import StatementExportService, StatementScope, ExportFormat, MEDIA_TYPES
+from app.sharding import ShardRouter, open_shard_read_session
+from app.config import settings
+
+router = APIRouter()  # no prefix here, main.py handles it
+
+# Statements of every transaction for a landlord / property / lease / renter, streamed as CSV or NDJSON.
+# start and end are inclusive dates: ?start=2025-01-01&end=2025-12-31 is the 2025 statement.
+# ?gzip=true sends a .gz file instead (about a tenth of the size for CSV).
+
+def _statement(
+    scope: StatementScope, scope_id: UUID, shard_ids: list[int], start: date, end: date,
+    format: ExportFormat, gzip: bool, request: Request,
+):
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    sessions = [open_shard_read_session(shard_id, request) for shard_id in shard_ids]  # closed by the stream
+    filename = f"{scope.value}-{scope_id}-{start}-{end}.{format.value}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        StatementExportService.export(
+            sessions, scope, scope_id,
+            datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min),
+            format, gzip, settings.STATEMENT_EXPORT_FETCH_SIZE,
+        ),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/landlords/{landlord_id}/transactions")
+def export_landlord_statement(
+    landlord_id: UUID, start: date, end: date, request: Request,
+    format: ExportFormat = ExportFormat.CSV, gzip: bool = False, db: Session = Depends(get_db),
+):
+    shard_id = ShardRouter.landlord_shard(landlord_id, db)
+    return _statement(StatementScope.LANDLORD, landlord_id, [shard_id], start, end, format, gzip, request)
+
+@router.get("/properties/{property_id}/transactions")
+def export_property_statement(
+    property_id: UUID, start: date, end: date, request: Request,
+    format: ExportFormat = ExportFormat.CSV, gzip: bool = False, db: Session = Depends(get_db),
+):
+    landlord_id = db.query(Property.landlord_id).filter(Property.id == property_id).scalar()
+    if landlord_id is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+    shard_id = ShardRouter.landlord_shard(landlord_id, db)
+    return _statement(StatementScope.PROPERTY, property_id, [shard_id], start, end, format, gzip, request)
+
+@router.get("/leases/{lease_id}/transactions")
+def export_lease_statement(
+    lease_id: UUID, start: date, end: date, request: Request,
+    format: ExportFormat = ExportFormat.CSV, gzip: bool = False, db: Session = Depends(get_db),
+):
+    shard_id = ShardRouter.lease_shard(lease_id, db)
+    return _statement(StatementScope.LEASE, lease_id, [shard_id], start, end, format, gzip, request)
+
+@router.get("/renters/{renter_id}/transactions")
+def export_renter_statement(
+    renter_id: UUID, start: date, end: date, request: Request,
+    format: ExportFormat = ExportFormat.CSV, gzip: bool = False,
+):
+    # A renter's leases can belong to landlords on any shard
+    shard_ids = list(range(ShardRouter.count()))
+    return _statement(StatementScope.RENTER, renter_id, shard_ids, start, end, format, gzip, request)
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Iterator, Optional
+from uuid import UUID
+from app.database import get_db
+from app.schemas.portfolio_import import PortfolioImportResult
+from app.services.import_service import PortfolioImportService, PortfolioImportError, PortfolioImportIncomplete
+import anyio.from_thread
+import codecs
+
+router = APIRouter(tags=["imports"])
+
+# Content-Type -> import format, when ?format= isn't given
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+}
+
+def body_lines(request: Request) -> Iterator[str]:
+    """
+    The request body as text lines (newline kept, like a file), read from the ASGI stream as
+    the parser asks for them, so the upload is never held in memory whole.
+    Runs in the worker thread: each chunk is awaited on the event loop.
+    """
+    chunks = request.stream()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(chunks.__anext__)
+        except StopAsyncIteration:
+            break
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+@router.post("/portfolio/{landlord_id}", response_model=PortfolioImportResult, status_code=201)
+async def import_portfolio(
+    landlord_id: UUID,
+    request: Request,
+    format: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk onboard a landlord portfolio: properties, bank accounts and leases
+    (with their payment schedules) from one CSV or NDJSON body.
+
+    Every row has a "record_type" of property, bank_account or lease.
+    The whole file is validated first; if any row is invalid nothing is written
+    and the response lists the bad lines (422).
+
+    Rows are then written in chunks, one commit each. If a chunk fails, the chunks
+    before it stay committed and the response is a 500 whose detail.committed has
+    the counts written so far. Send the same file again to finish the import:
+    rows already imported are skipped (counted in already_imported), nothing is duplicated.
+    """
+    fmt = format or CONTENT_TYPES.get(request.headers.get("content-type", "").split(";")[0].strip())
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson (or pass ?format=)")
+
+    try:
+        # Parsing pulls the body as it goes; DB work is blocking - keep it off the event loop
+        return await run_in_threadpool(
+            PortfolioImportService.import_portfolio, landlord_id, body_lines(request), fmt, db
+        )
+    except PortfolioImportError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except PortfolioImportIncomplete as e:
+        committed = {**e.progress, "landlord_id": str(e.progress["landlord_id"])}
+        raise HTTPException(status_code=500, detail={"message": str(e), "committed": committed})
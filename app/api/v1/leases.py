@@ -1,55 +1,125 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from sqlalchemy import exists, insert, select
+from typing import List, Optional
+from datetime import datetime
+from uuid import UUID
+from app.database import get_db, get_read_db
 from app.models.lease import Lease
-from app.models.payment_schedule import PaymentSchedule
-from app.schemas.lease import LeaseCreate, LeaseResponse
+from app.models.installment import Installment
+from app.models.delinquency import DelinquencySnapshot
+from app.schemas.lease import LeaseCreate, LeaseResponse, DelinquencySnapshotResponse
+from app.schemas.installment import InstallmentResponse, RenterBalanceResponse
 from app.models.property import Property
-from app.models.user import User
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from app.models.user import User, UserRole
+from app.services.installment_service import InstallmentService
+from app.services.property_search_service import PropertySearchService
+from app.services.lease_service import LeaseService, calculate_first_payment_date  # noqa: F401 (kept importable from here)
+from app.sharding import (
+    ShardRouter, ShardMovingError, shard_unavailable, shard_session, each_shard, get_lease_shard_read_db,
+)
 
 router = APIRouter()  # no prefix here, main.py handles it
 
 @router.post("/", response_model=LeaseResponse, status_code=201)
 def create_lease(lease: LeaseCreate, db: Session = Depends(get_db)):
-    # Validate property exists
-    property_obj = db.query(Property).filter(Property.id == lease.property_id).first()
-    if not property_obj:
+    # Validate property and renter exist - both checks in one round trip
+    landlord_id, renter_exists = db.query(
+        select(Property.landlord_id).where(Property.id == lease.property_id).scalar_subquery(),
+        exists().where(User.id == lease.renter_id, User.role == UserRole.RENTER),
+    ).one()
+
+    if landlord_id is None:
         raise HTTPException(status_code=404, detail="Property not found")
-    
-    # Validate renter exists
-    renter_obj = db.query(User).filter(User.id == lease.renter_id, User.role == "renter").first()
-    if not renter_obj:
+    if not renter_exists:
         raise HTTPException(status_code=404, detail="Renter not found")
     
-    # Create lease
-    db_lease = Lease(**lease.model_dump())
-    db.add(db_lease)
-    db.commit()
-    db.refresh(db_lease)
+    try:
+        shard_id = ShardRouter.assign_landlord(landlord_id, db)
+    except ShardMovingError as e:
+        raise shard_unavailable(e)
     
-    # Create payment schedule
-    first_payment_date = calculate_first_payment_date(lease.start_date, lease.due_day_of_month)
-    payment_schedule = PaymentSchedule(
-        lease_id=db_lease.id,
-        next_due_date=first_payment_date,
-        amount=lease.rent_amount
-    )
-    db.add(payment_schedule)
-    db.commit()
+    with shard_session(shard_id, db) as shard_db:
+        # Create lease and its payment schedule in ONE transaction:
+        # a lease without a schedule would never be billed
+        db_lease = Lease(**lease.model_dump())
+        shard_db.add(db_lease)
+        shard_db.flush()  # assigns db_lease.id without committing
+        
+        payment_schedule = LeaseService.new_payment_schedule(
+            db_lease.id, lease.start_date, lease.due_day_of_month, lease.rent_amount
+        )
+        shard_db.add(payment_schedule)
+        
+        # Precompute every installment of the term (one multi-row INSERT)
+        installments = LeaseService.build_installments(
+            db_lease.id, lease.start_date, lease.end_date, lease.due_day_of_month, lease.rent_amount
+        )
+        if installments:
+            shard_db.execute(insert(Installment), installments)
+        
+        # Directory entry first: a lease the directory doesn't know would be looked up on shard 0
+        ShardRouter.register_leases([db_lease.id], landlord_id, db)
+        if shard_db is not db:
+            db.commit()
+        shard_db.commit()
+        shard_db.refresh(db_lease)
     
+    PropertySearchService.invalidate()  # the property is no longer vacant
     return db_lease
 
-def calculate_first_payment_date(start_date: datetime, due_day: int) -> datetime:
-    if start_date.day <= due_day:
-        return start_date.replace(day=due_day)
-    else:
-        next_month = start_date + relativedelta(months=1)
-        return next_month.replace(day=due_day)
-
 @router.get("/renter/{renter_id}", response_model=List[LeaseResponse])
-def list_renter_leases(renter_id: str, db: Session = Depends(get_db)):
-    leases = db.query(Lease).filter(Lease.renter_id == renter_id).all()
+def list_renter_leases(renter_id: str, db: Session = Depends(get_read_db)):
+    # A renter can rent from landlords on different shards
+    leases = [
+        lease for _, shard_db in each_shard(db)
+        for lease in shard_db.query(Lease).filter(Lease.renter_id == renter_id)
+    ]
     return leases
+
+@router.get("/overdue", response_model=List[InstallmentResponse])
+def list_overdue_installments(
+    landlord_id: Optional[UUID] = None,
+    as_of: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """Unpaid installments past their due date, portfolio-wide or for one landlord"""
+    as_of = as_of or datetime.utcnow()
+    if landlord_id is not None:
+        with shard_session(ShardRouter.landlord_shard(landlord_id, db), db) as shard_db:
+            return InstallmentService.list_overdue(shard_db, as_of, landlord_id, skip, limit)
+    
+    # Portfolio-wide: the first skip + limit rows of every shard, merged in the same order
+    rows = [
+        installment for _, shard_db in each_shard(db)
+        for installment in InstallmentService.list_overdue(shard_db, as_of, None, 0, skip + limit)
+    ]
+    rows.sort(key=lambda installment: (installment.due_date, installment.id))
+    return rows[skip:skip + limit]
+
+@router.get("/renter/{renter_id}/balance", response_model=RenterBalanceResponse)
+def get_renter_balance(renter_id: UUID, as_of: Optional[datetime] = None, db: Session = Depends(get_read_db)):
+    """What this renter owes, summed from unpaid installments"""
+    as_of = as_of or datetime.utcnow()
+    balances = [InstallmentService.renter_balance(shard_db, renter_id, as_of) for _, shard_db in each_shard(db)]
+    return {
+        **balances[0],
+        "amount_overdue": sum(balance["amount_overdue"] for balance in balances),
+        "amount_remaining_on_leases": sum(balance["amount_remaining_on_leases"] for balance in balances),
+    }
+
+@router.get("/{lease_id}/installments", response_model=List[InstallmentResponse])
+def list_lease_installments(lease_id: UUID, db: Session = Depends(get_lease_shard_read_db)):
+    installments = db.query(Installment).filter(
+        Installment.lease_id == lease_id
+    ).order_by(Installment.sequence_number).all()
+    return installments
+
+@router.get("/{lease_id}/delinquency", response_model=List[DelinquencySnapshotResponse])
+def list_lease_delinquency(lease_id: UUID, limit: int = 30, db: Session = Depends(get_lease_shard_read_db)):
+    """Nightly delinquency snapshots of this lease, newest first (no row for a day = nothing overdue)"""
+    return db.query(DelinquencySnapshot).filter(
+        DelinquencySnapshot.lease_id == lease_id
+    ).order_by(DelinquencySnapshot.snapshot_date.desc()).limit(limit).all()
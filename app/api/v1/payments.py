@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
-from app.models.transaction import Transaction, TransactionStatus
+from contextlib import contextmanager
+from app.database import get_db, SessionLocal
+from app.models.transaction import Transaction, TransactionStatus, is_fraud_declined
 from app.schemas.transaction import TransactionCreate, TransactionResponse
-from app.services.payment_service import PaymentService
-from uuid import uuid4
+from app.services.payment_service import PaymentService, TransitionConflict
+from app.services.retry_service import RetryService
+from app.services.idempotency_service import IdempotencyKeyReused
+from app.services.transaction_cache_service import TransactionCacheService, etag_matches
+from app.services.event_stream_service import EventStreamService, transaction_channel, lease_channel
+from app.sharding import (
+    ShardRouter, ShardMovingError, shard_unavailable, shard_session,
+    get_transaction_shard_db, get_lease_shard_read_db,
+)
+from app.config import settings
+from uuid import UUID
 
 router = APIRouter()
 
@@ -25,7 +36,8 @@ def initiate_payment(
             Why both? It provides flexibility for different types of clients (web vs. mobile) while ensuring that some key is always provided (the code throws a 400 error if both are missing).
 
     If the same idempotency key is used twice, returns the original transaction
-    without creating a duplicate.
+    without creating a duplicate. Keys are held for IDEMPOTENCY_KEY_TTL_HOURS; reusing one
+    with a different request body is rejected with 422.
     """
     
     # Use header if provided, otherwise use body value
@@ -42,55 +54,86 @@ def initiate_payment(
     try:
         result = PaymentService.initiate_payment(transaction, db)
         return result
+    except ShardMovingError as e:
+        raise shard_unavailable(e)
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Payment initiation failed")
 
+@contextmanager
+def _transaction_shard_db(transaction_id: str):
+    # Cache misses read the primary, not a replica: a lagging replica would put an old state back in the cache
+    with SessionLocal() as db:
+        with shard_session(ShardRouter.transaction_shard(transaction_id, db), db) as shard_db:
+            yield shard_db
+
+def _cached_response(entry: dict, if_none_match: str | None) -> Response:
+    # no-cache: clients may keep it, but must revalidate (If-None-Match -> 304 while nothing changed)
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
 @router.get("/{transaction_id}", response_model=TransactionResponse)
-def get_transaction(transaction_id: str, db: Session = Depends(get_db)):
-    """Get transaction details"""
-    transaction = db.query(Transaction).filter(
-        Transaction.id == transaction_id
-    ).first()
-    
-    if not transaction:
+def get_transaction(transaction_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Get transaction details.
+    Served from the Redis cache when possible; send the ETag back in If-None-Match to get
+    304 Not Modified (no body, no database) while the transaction hasn't changed.
+    """
+    entry = TransactionCacheService.get_transaction(transaction_id, lambda: _transaction_shard_db(transaction_id))
+    if entry is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    return transaction
+    return _cached_response(entry, if_none_match)
+
+# SSE responses must not be buffered or cached by proxies
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@router.get("/{transaction_id}/stream")
+async def stream_transaction(transaction_id: UUID, request: Request):
+    """
+    Server-sent events stream of status changes for one transaction.
+    Use instead of polling GET /payments/{id} while a payment is processing:
+    the first event is a snapshot of the current state, the stream then waits
+    on Redis pub/sub (no DB queries) and closes after a final status.
+    """
+    return StreamingResponse(
+        EventStreamService.stream(request, transaction_channel(transaction_id), transaction_id=transaction_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@router.get("/lease/{lease_id}/stream")
+async def stream_lease_transactions(lease_id: UUID, request: Request):
+    """Server-sent events stream of status changes for every transaction on a lease"""
+    return StreamingResponse(
+        EventStreamService.stream(request, lease_channel(lease_id)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 @router.get("/{transaction_id}/history")
-def get_transaction_history(transaction_id: str, db: Session = Depends(get_db)):
+def get_transaction_history(transaction_id: str, if_none_match: Optional[str] = Header(None)):
     """
     Get full event history for a transaction
     Demonstrates event sourcing pattern
+    Cached like GET /payments/{id}, with an ETag over its content
     """
     try:
-        events = PaymentService.get_transaction_history(transaction_id, db)
-        return {
-            "transaction_id": transaction_id,
-            "event_count": len(events),
-            "events": [
-                {
-                    "id": str(event.id),
-                    "event_type": event.event_type,
-                    "previous_status": event.previous_status,
-                    "new_status": event.new_status,
-                    "timestamp": event.timestamp.isoformat(),
-                    "metadata": event.metadata
-                }
-                for event in events
-            ]
-        }
+        entry = TransactionCacheService.get_history(transaction_id, lambda: _transaction_shard_db(transaction_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return _cached_response(entry, if_none_match)
 
 @router.get("/lease/{lease_id}", response_model=List[TransactionResponse])
 def list_lease_transactions(
     lease_id: str, 
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_lease_shard_read_db)
 ):
     """Get all transactions for a lease"""
     transactions = db.query(Transaction).filter(
@@ -100,10 +143,11 @@ def list_lease_transactions(
     return transactions
 
 @router.post("/{transaction_id}/retry")
-def retry_failed_payment(transaction_id: str, db: Session = Depends(get_db)):
+def retry_failed_payment(transaction_id: str, db: Session = Depends(get_transaction_shard_db)):
     """
     Retry a failed payment
-    Demonstrates retry logic with exponential backoff consideration
+    Goes through the same durable retry schedule as automatic retries, due immediately:
+    the retry poller resets it to PENDING and dispatches it within RETRY_POLL_INTERVAL_SECONDS
     """
     transaction = db.query(Transaction).filter(
         Transaction.id == transaction_id
@@ -118,38 +162,59 @@ def retry_failed_payment(transaction_id: str, db: Session = Depends(get_db)):
             detail="Can only retry failed transactions"
         )
     
-    MAX_RETRIES = 3
-    if transaction.retry_count >= MAX_RETRIES:
+    if is_fraud_declined(transaction.failure_reason):
+        # Retrying would send it to the rail without the velocity checks it failed
         raise HTTPException(
-            status_code=400, 
-            detail=f"Maximum retry attempts ({MAX_RETRIES}) exceeded"
+            status_code=400,
+            detail="Payment was declined by fraud detection and cannot be retried"
         )
     
-    # Increment retry count
-    transaction.retry_count += 1
-    transaction.status = TransactionStatus.PENDING
-    transaction.failed_at = None
-    transaction.failure_reason = None
-    
-    # Log retry event
-    from app.models.transaction_event import TransactionEvent
-    event = TransactionEvent(
-        transaction_id=transaction.id,
-        event_type="retry_attempted",
-        previous_status=TransactionStatus.FAILED.value,
-        new_status=TransactionStatus.PENDING.value,
-        metadata={"retry_count": transaction.retry_count}
-    )
-    db.add(event)
+    if transaction.retry_count >= settings.PAYMENT_MAX_RETRIES:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Maximum retry attempts ({settings.PAYMENT_MAX_RETRIES}) exceeded"
+        )
     
+    scheduled = RetryService.schedule(transaction.id, transaction.retry_count, None, db, manual=True)
+    if scheduled is None:
+        # That attempt was already dispatched: the payment is on its way back to PENDING
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Retry attempt {transaction.retry_count + 1} is already in progress"
+        )
     db.commit()
-    db.refresh(transaction)
-    
-    # Trigger async processing
-    # process_payment_async.delay(str(transaction.id))
     
     return {
-        "message": "Payment retry initiated",
-        "transaction_id": str(transaction.id),
-        "retry_count": transaction.retry_count
-    }
\ No newline at end of file
+        "message": "Payment retry scheduled",
+        "transaction_id": transaction_id,
+        "retry_count": scheduled.attempt,
+        "due_at": scheduled.due_at
+    }
+
+@router.post("/{transaction_id}/refund", response_model=TransactionResponse)
+def refund_payment(transaction_id: str, db: Session = Depends(get_transaction_shard_db)):
+    """
+    Refund a completed payment.
+    The status change posts the reversing ledger entries (payee -> payer) and takes the payment
+    back off the lease's installments (next_due_date moves back) in the same DB transaction.
+    """
+    transaction = db.query(Transaction).filter(
+        Transaction.id == transaction_id
+    ).first()
+
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    if transaction.status != TransactionStatus.COMPLETED:
+        raise HTTPException(
+            status_code=400,
+            detail="Can only refund completed transactions"
+        )
+
+    try:
+        return PaymentService.update_transaction_status(
+            transaction_id, TransactionStatus.REFUNDED, db, expected_version=transaction.version
+        )
+    except TransitionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
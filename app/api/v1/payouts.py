@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from typing import List
+from uuid import UUID
+from app.database import get_db
+from app.models.bank_account import BankAccount
+from app.models.payout import Payout, PayoutItem
+from app.schemas.payout import PayoutResponse, PayoutDetailResponse
+from app.sharding import ShardRouter, each_shard, get_transaction_shard_read_db, open_shard_read_session
+
+router = APIRouter()  # no prefix here, main.py handles it
+
+# Payouts are created by the payout task (app/tasks/payout_tasks.py); these endpoints only read them
+
+def _detail(payout: Payout, session: Session) -> dict:
+    items = session.query(PayoutItem).filter(PayoutItem.payout_id == payout.id).all()
+    return {**PayoutResponse.model_validate(payout).model_dump(), "items": items}
+
+@router.get("", response_model=List[PayoutResponse])
+def list_payouts(
+    payee_account_id: UUID,
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Payouts to a bank account, newest first"""
+    account = db.query(BankAccount).filter(BankAccount.id == payee_account_id).first()
+    if not account:
+        raise HTTPException(status_code=404, detail="Bank account not found")
+
+    # Payouts live on the shard of the landlord that owns the account
+    session = open_shard_read_session(ShardRouter.landlord_shard(account.user_id, db), request)
+    try:
+        return session.query(Payout).filter(
+            Payout.payee_account_id == payee_account_id
+        ).order_by(Payout.created_at.desc()).limit(limit).all()
+    finally:
+        session.close()
+
+@router.get("/transactions/{transaction_id}", response_model=List[PayoutDetailResponse])
+def transaction_payouts(transaction_id: UUID, db: Session = Depends(get_transaction_shard_read_db)):
+    """The payout that paid a transaction out, and the one that netted its refund (if any)"""
+    payouts = db.query(Payout).join(PayoutItem, PayoutItem.payout_id == Payout.id).filter(
+        PayoutItem.transaction_id == transaction_id
+    ).order_by(Payout.created_at).all()
+    return [_detail(payout, db) for payout in payouts]
+
+@router.get("/{payout_id}", response_model=PayoutDetailResponse)
+def get_payout(payout_id: UUID, db: Session = Depends(get_db)):
+    """A payout with every transaction it pays (or nets a refund of)"""
+    # No directory entry for payouts: look on each shard
+    for _, session in each_shard(db):
+        payout = session.query(Payout).filter(Payout.id == payout_id).first()
+        if payout:
+            return _detail(payout, session)
+    raise HTTPException(status_code=404, detail="Payout not found")
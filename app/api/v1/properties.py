@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from typing import List, Optional
+from decimal import Decimal
+from uuid import UUID
+from app.database import get_db, get_read_db
 from app.models.property import Property
 from app.models.user import User, UserRole
-from app.schemas.property import PropertyCreate, PropertyResponse
+from app.schemas.property import PropertyCreate, PropertyResponse, PropertySearchPage
+from app.services.property_search_service import PropertySearchService
+from app.services.rent_roll_service import RentRollService, parse_month
+from app.sharding import ShardRouter, shard_session
+from app.config import settings
 
 #APIRouter for manaing the properties, code acts as validation and persistence layer
 router = APIRouter(tags=["properties"])
@@ -28,9 +34,53 @@ def create_property(property: PropertyCreate, db: Session = Depends(get_db)):
     db.add(db_property)
     db.commit()
     db.refresh(db_property)
+    ShardRouter.replicate(Property, [db_property.id], db)  # leases on every shard reference it
+    PropertySearchService.invalidate()
     return db_property
 
+@router.get("/search", response_model=PropertySearchPage)
+def search_properties(
+    q: Optional[str] = Query(None, description="Fuzzy match on the address"),
+    city: Optional[str] = Query(None, description="Fuzzy match on the city"),
+    state: Optional[str] = None,
+    zip_code: Optional[str] = None,
+    min_rent: Optional[Decimal] = None,
+    max_rent: Optional[Decimal] = None,
+    vacant: Optional[bool] = Query(None, description="true: no active lease, false: leased"),
+    limit: int = Query(25, ge=1, le=settings.PROPERTY_SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db),
+):
+    # Ordered by rent, then id; keyset pages so deep pages cost the same as the first
+    filters = {
+        "q": q, "city": city, "state": state, "zip_code": zip_code,
+        "min_rent": min_rent, "max_rent": max_rent, "vacant": vacant,
+    }
+    try:
+        return PropertySearchService.search(db, filters, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/landlord/{landlord_id}", response_model=List[PropertyResponse])
-def list_landlord_properties(landlord_id: str, db: Session = Depends(get_db)):
+def list_landlord_properties(landlord_id: str, db: Session = Depends(get_read_db)):
     properties = db.query(Property).filter(Property.landlord_id == landlord_id).all()
-    return properties
\ No newline at end of file
+    return properties
+
+@router.get("/landlord/{landlord_id}/rent-roll")
+def landlord_rent_roll(
+    landlord_id: UUID,
+    month: str = Query(..., description="YYYY-MM"),
+    db: Session = Depends(get_db),
+):
+    """
+    Expected rent vs. money received, per unit, for one month. Sent as the cached JSON text
+    (no response_model: re-validating tens of thousands of units would cost more than the query).
+    """
+    try:
+        month_start = parse_month(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Primary, not replica: closed months are frozen into rent_roll_months on first read
+    with shard_session(ShardRouter.landlord_shard(landlord_id, db), db) as shard_db:
+        report = RentRollService.get(shard_db, landlord_id, month_start)
+    return Response(content=report, media_type="application/json")
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_read_db
+from app.models.reconciliation import ReconciliationResult, Discrepancy, ReconciliationState
+from app.schemas.reconciliation import ReconciliationSummaryResponse, ReconciliationResultResponse
+from app.services.reconciliation_service import ReconciliationService
+
+router = APIRouter()  # no prefix here, main.py handles it
+
+# Results are written by the reconciliation task (app/tasks/reconciliation_tasks.py);
+# these endpoints only read reconciliation_results
+
+@router.get("/summary", response_model=ReconciliationSummaryResponse)
+def reconciliation_summary(db: Session = Depends(get_read_db)):
+    """Open discrepancies by type, and the last run's watermark"""
+    return ReconciliationService.summary(db)
+
+@router.get("/discrepancies", response_model=List[ReconciliationResultResponse])
+def list_discrepancies(
+    discrepancy: Optional[Discrepancy] = None,
+    state: ReconciliationState = ReconciliationState.OPEN,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+):
+    query = db.query(ReconciliationResult).filter(ReconciliationResult.state == state)
+    if discrepancy is not None:
+        query = query.filter(ReconciliationResult.discrepancy == discrepancy)
+    return query.order_by(ReconciliationResult.first_detected_at).limit(limit).all()
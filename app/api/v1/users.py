@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse
+from app.sharding import ShardRouter
 
 # Creates a group of endpoints related to users.
 router = APIRouter(tags=["users"])
@@ -31,6 +32,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)     # Stage the new user for insertion
     db.commit()         # Execute the INSERT
     db.refresh(db_user) # Load any DB-generated values (e.g. id, created_at)
+    ShardRouter.replicate(User, [db_user.id], db)  # every shard needs it for its foreign keys
 
     # So before commit() → object exists only in memory
     # After commit() → object also exists as a real row in the database
@@ -38,7 +40,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[UserResponse])
-def list_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def list_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     Retrieve a paginated list of users.
     Useful for admin interfaces or user management screens.
@@ -49,7 +51,7 @@ def list_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: str, db: Session = Depends(get_db)):
+def get_user(user_id: str, db: Session = Depends(get_read_db)):
     """
     Retrieve a single user by their ID.
     Returns 404 if the user does not exist.
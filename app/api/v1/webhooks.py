@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from typing import List
+from app.database import get_db, get_read_db
+from app.models.user import User
+from app.models.webhook import WebhookSubscription, WebhookDelivery, DeliveryStatus
+from app.schemas.webhook import WebhookSubscriptionCreate, WebhookSubscriptionResponse, WebhookSubscriptionCreated
+from app.sharding import ShardRouter, each_shard
+import secrets
+
+router = APIRouter(tags=["webhooks"])
+
+@router.post("/", response_model=WebhookSubscriptionCreated, status_code=201)
+def create_subscription(subscription: WebhookSubscriptionCreate, db: Session = Depends(get_db)):
+    """
+    Register an endpoint that receives signed, batched transaction events
+    for every payment touching this user's bank accounts.
+    """
+    user = db.query(User).filter(User.id == subscription.user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    db_subscription = WebhookSubscription(
+        user_id=subscription.user_id,
+        url=str(subscription.url),
+        secret=secrets.token_hex(32),
+    )
+    db.add(db_subscription)
+    db.commit()
+    db.refresh(db_subscription)
+    ShardRouter.replicate(WebhookSubscription, [db_subscription.id], db)  # deliveries are queued on every shard
+    return db_subscription
+
+@router.get("/user/{user_id}", response_model=List[WebhookSubscriptionResponse])
+def list_user_subscriptions(user_id: str, db: Session = Depends(get_read_db)):
+    subscriptions = db.query(WebhookSubscription).filter(WebhookSubscription.user_id == user_id).all()
+    return subscriptions
+
+@router.delete("/{subscription_id}", status_code=204)
+def deactivate_subscription(subscription_id: str, db: Session = Depends(get_db)):
+    subscription = db.query(WebhookSubscription).filter(WebhookSubscription.id == subscription_id).first()
+    if not subscription:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+
+    subscription.is_active = False
+    db.commit()
+    ShardRouter.replicate(WebhookSubscription, [subscription.id], db)
+
+    # Nobody is listening anymore - stop the worker from retrying queued events (on every shard)
+    for _, shard_db in each_shard(db):
+        shard_db.query(WebhookDelivery).filter(
+            WebhookDelivery.subscription_id == subscription_id,
+            WebhookDelivery.status == DeliveryStatus.PENDING
+        ).update({"status": DeliveryStatus.FAILED, "last_error": "Subscription deactivated"})
+        shard_db.commit()
+
+    return Response(status_code=204)
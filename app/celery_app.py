@@ -1,5 +1,8 @@
 from celery import Celery
+from celery.schedules import crontab
 from app.config import settings
+from app.tracing import install_celery_tracing
+from app.profiling import install_celery_profiling
 
 # Create a Celery application instance
 # "rental_payment" is the name of the Celery app
@@ -10,7 +13,8 @@ celery_app = Celery(
     "rental_payment",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["app.tasks.payment_tasks"]
+    include=["app.tasks.payment_tasks", "app.tasks.webhook_tasks", "app.tasks.ledger_tasks",
+             "app.tasks.reconciliation_tasks", "app.tasks.payout_tasks", "app.tasks.lease_tasks"]
 )
 
 # Configure Celery behavior
@@ -29,5 +33,55 @@ celery_app.conf.update(
 
     # Enable UTC time handling (recommended for distributed systems)
     enable_utc=True,
+
+    # Periodic jobs, run by `celery -A app.celery_app beat`
+    beat_schedule={
+        "deliver-webhooks": {
+            "task": "app.tasks.webhook_tasks.deliver_webhooks",
+            "schedule": settings.WEBHOOK_FLUSH_INTERVAL_SECONDS,
+        },
+        "checkpoint-ledger-balances": {
+            "task": "app.tasks.ledger_tasks.checkpoint_balances",
+            "schedule": settings.LEDGER_CHECKPOINT_INTERVAL_SECONDS,
+        },
+        "verify-ledger-balances": {
+            "task": "app.tasks.ledger_tasks.verify_ledger_balances",
+            "schedule": crontab(hour=3, minute=0),
+        },
+        "dispatch-payment-retries": {
+            "task": "app.tasks.payment_tasks.dispatch_due_retries",
+            "schedule": settings.RETRY_POLL_INTERVAL_SECONDS,
+        },
+        "sweep-stuck-transactions": {
+            "task": "app.tasks.payment_tasks.sweep_stuck_transactions",
+            "schedule": settings.STUCK_SWEEP_INTERVAL_SECONDS,
+        },
+        "maintain-idempotency-keys": {
+            "task": "app.tasks.payment_tasks.maintain_idempotency_keys",
+            "schedule": crontab(minute=15),  # hourly: partitions are created days ahead, expired ones dropped within the hour
+        },
+        "reconcile-bank-statements": {
+            "task": "app.tasks.reconciliation_tasks.reconcile_bank_statements",
+            "schedule": crontab(hour=4, minute=0),
+        },
+        "run-lease-lifecycle": {
+            "task": "app.tasks.lease_tasks.run_lease_lifecycle",
+            "schedule": crontab(hour=1, minute=0),
+        },
+        "freeze-rent-roll": {
+            "task": "app.tasks.lease_tasks.freeze_rent_roll",
+            "schedule": crontab(day_of_month=settings.RENT_ROLL_FREEZE_LAG_DAYS + 1, hour=1, minute=30),
+        },
+        "create-payouts": {
+            "task": "app.tasks.payout_tasks.create_payouts",
+            "schedule": crontab(hour=0, minute=30),  # after the daily window (+ settle lag) has closed
+        },
+    },
 )
-celery_app.autodiscover_tasks(["app.tasks"])
\ No newline at end of file
+celery_app.autodiscover_tasks(["app.tasks"])
+
+# Carry the caller's trace context in task headers, one span per task run (app/tracing.py)
+install_celery_tracing()
+
+# Profile the next runs of armed tasks (python -m app.cli.profiles arm <task>)
+install_celery_profiling()
\ No newline at end of file
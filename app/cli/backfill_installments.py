@@ -0,0 +1,97 @@
+"""
+Generate installments for leases created before the installment ledger existed,
+and allocate their completed payment history to them.
+
+Usage:
+    python -m app.cli.backfill_installments [--chunk-size 1000]
+
+Safe to re-run: only leases that have no installments yet are touched.
+"""
+from sqlalchemy import exists, insert, update
+from app.sharding import each_shard
+from app.models.lease import Lease
+from app.models.installment import Installment, InstallmentAllocation, InstallmentStatus
+from app.models.payment_schedule import PaymentSchedule, ScheduleStatus
+from app.models.transaction import Transaction, TransactionStatus
+from app.services.lease_service import LeaseService
+from app.services.installment_service import InstallmentService
+from collections import defaultdict
+import argparse
+
+
+def backfill_chunk(db, leases) -> tuple[int, int]:
+    lease_ids = [lease.id for lease in leases]
+
+    # Whole payment history for the chunk in one query
+    payments = defaultdict(list)
+    for transaction_id, lease_id, amount, completed_at in db.query(
+        Transaction.id, Transaction.lease_id, Transaction.amount, Transaction.completed_at
+    ).filter(
+        Transaction.lease_id.in_(lease_ids),
+        Transaction.status == TransactionStatus.COMPLETED
+    ).order_by(Transaction.completed_at):
+        payments[lease_id].append((transaction_id, amount, completed_at))
+
+    installments, allocations, schedule_updates = [], [], {}
+    for lease in leases:
+        rows = LeaseService.build_installments(
+            lease.id, lease.start_date, lease.end_date, lease.due_day_of_month, lease.rent_amount
+        )
+        allocations += InstallmentService.allocate_in_memory(rows, payments[lease.id])
+        installments += rows
+
+        unpaid = [row["due_date"] for row in rows if row["status"] != InstallmentStatus.PAID]
+        if rows:
+            schedule_updates[lease.id] = min(unpaid) if unpaid else None
+
+    if installments:
+        db.execute(insert(Installment), installments)
+    if allocations:
+        db.execute(insert(InstallmentAllocation), allocations)
+
+    # Re-point each schedule at its first unpaid installment (bulk UPDATE by primary key)
+    schedules = db.query(PaymentSchedule.id, PaymentSchedule.lease_id).filter(
+        PaymentSchedule.lease_id.in_(schedule_updates)
+    ).all()
+    schedule_rows = [
+        {"id": schedule_id, "next_due_date": schedule_updates[lease_id]}
+        if schedule_updates[lease_id] is not None
+        else {"id": schedule_id, "status": ScheduleStatus.COMPLETED}
+        for schedule_id, lease_id in schedules
+    ]
+    if schedule_rows:
+        db.execute(update(PaymentSchedule), schedule_rows)
+
+    db.commit()
+    return len(installments), len(allocations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill installments for existing leases")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="leases per transaction")
+    args = parser.parse_args()
+
+    total_leases = total_installments = total_allocations = 0
+    for shard_id, db in each_shard():
+        last_id = None
+        while True:
+            # Keyset paging over leases that still have no installments
+            query = db.query(Lease).filter(~exists().where(Installment.lease_id == Lease.id))
+            if last_id is not None:
+                query = query.filter(Lease.id > last_id)
+            leases = query.order_by(Lease.id).limit(args.chunk_size).all()
+            if not leases:
+                break
+
+            last_id = leases[-1].id
+            installments, allocations = backfill_chunk(db, leases)
+            total_leases += len(leases)
+            total_installments += installments
+            total_allocations += allocations
+            print(f"shard {shard_id}: {total_leases} leases, {total_installments} installments, {total_allocations} allocations")
+
+    print("Backfill complete")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""
+Synthetic data at production scale, for load tests and index / partitioning / reconciliation benchmarks.
+
+Usage:
+    python -m app.cli.generate_data --landlords 200                       # ~12k transactions
+    python -m app.cli.generate_data --landlords 85000 --months 24 --workers 8   # ~10M transactions, ~30M events
+    python -m app.cli.generate_data --landlords 500 --rail-mix instant=0.3,standard_ach=0.7 \\
+        --failure-rate 0.1 --discrepancy-rate 0.02 --truncate
+
+Transactions ~= landlords x properties-per-landlord x occupancy x months, with ~3 events each.
+
+Landlords are generated in slices; each worker process builds a slice (landlords, renters, bank accounts,
+properties, leases, schedules, the payment history with its events and ledger postings, and the bank
+statement lines) and streams it into Postgres with COPY, one DB transaction per slice.
+Values go through each column's SQLAlchemy type, so enums are written exactly as the ORM writes them.
+
+Everything lands on the main database. Afterwards:
+    python -m app.cli.shards backfill-directory      # register it as living on shard 0
+    python -m app.cli.backfill_installments          # installments for the generated leases
+"""
+from sqlalchemy import create_engine, text, Numeric
+from sqlalchemy.pool import NullPool
+from app.database import SQLALCHEMY_DATABASE_URL
+from app.models.user import User, UserRole
+from app.models.bank_account import BankAccount
+from app.models.property import Property
+from app.models.lease import Lease, LeaseStatus
+from app.models.payment_schedule import PaymentSchedule, ScheduleStatus
+from app.models.transaction import Transaction, TransactionStatus, PaymentRailType
+from app.models.transaction_event import TransactionEvent
+from app.models.ledger import LedgerEntry, LedgerEntryType, EntryDirection, AccountBalance
+from app.models.reconciliation import BankStatement
+from app.services.ledger_service import LedgerService
+from app.ids import uuid7_from
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from types import SimpleNamespace
+import argparse
+import calendar
+import io
+import json
+import os
+import random
+import time
+import uuid
+
+CITIES = [
+    ("Austin", "TX", "78701"), ("Dallas", "TX", "75201"), ("Houston", "TX", "77002"),
+    ("New York", "NY", "10001"), ("Brooklyn", "NY", "11201"), ("Chicago", "IL", "60601"),
+    ("Denver", "CO", "80202"), ("Seattle", "WA", "98101"), ("Portland", "OR", "97201"),
+    ("Atlanta", "GA", "30303"), ("Miami", "FL", "33101"), ("Phoenix", "AZ", "85004"),
+]
+STREETS = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Elm St", "Pine St", "Lakeview Rd", "Park Ave", "2nd St", "Hill Rd"]
+BANKS = ["Bank of America", "Wells Fargo", "Chase Bank", "US Bank", "Capital One"]
+FAILURE_REASONS = ["Insufficient funds", "Account closed", "Invalid routing number"]
+
+# Time from initiation to PROCESSING and from PROCESSING to settled, in seconds, per rail
+RAIL_TIMINGS = {
+    PaymentRailType.INSTANT: (2, 5),
+    PaymentRailType.SAME_DAY_ACH: (60, 6 * 3600),
+    PaymentRailType.STANDARD_ACH: (300, 2 * 86400),
+    PaymentRailType.WIRE: (60, 3 * 3600),
+}
+RETRIED_SHARE = 0.6    # failures for insufficient funds that a later retry recovers
+REFUND_RATE = 0.002
+FLUSH_BYTES = 8 << 20  # COPY the payment history in ~8 MB batches
+
+# COPY order: parents first
+TABLES = [
+    User.__table__, BankAccount.__table__, Property.__table__, Lease.__table__, PaymentSchedule.__table__,
+    Transaction.__table__, TransactionEvent.__table__, LedgerEntry.__table__, AccountBalance.__table__,
+    BankStatement.__table__,
+]
+
+
+@dataclass(frozen=True)
+class GeneratorConfig:
+    seed: int
+    now: datetime
+    months: int
+    properties_per_landlord: int
+    occupancy: float
+    rail_mix: dict[PaymentRailType, float]
+    failure_rate: float
+    discrepancy_rate: float
+
+
+def parse_rail_mix(value: str) -> dict[PaymentRailType, float]:
+    """'instant=0.2,standard_ach=0.8' -> normalized weights"""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        weights[PaymentRailType(name.strip())] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("rail mix weights must add up to more than 0")
+    return {rail: weight / total for rail, weight in weights.items()}
+
+
+def copy_value(value) -> str:
+    """Python value (already through the column's bind processor) -> COPY text format field"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class CopyBuffer:
+    """Rows of one table in COPY text format, encoded by the columns' own SQLAlchemy types"""
+
+    def __init__(self, table, dialect):
+        self.table = table
+        self.dialect = dialect
+        self.columns = None
+        self.processors = None
+        self.buffer = io.StringIO()
+        self.rows = 0
+
+    def add(self, row: dict) -> None:
+        if self.columns is None:
+            self.columns = list(row)
+            self.processors = [
+                # Decimals are written as they are: Numeric's processor would go through float
+                None if isinstance(self.table.c[name].type, Numeric) else self.table.c[name].type.bind_processor(self.dialect)
+                for name in self.columns
+            ]
+        fields = []
+        for name, processor in zip(self.columns, self.processors):
+            value = row[name]
+            fields.append(copy_value(processor(value) if processor else value))
+        self.buffer.write("\t".join(fields))
+        self.buffer.write("\n")
+        self.rows += 1
+
+    def size(self) -> int:
+        return self.buffer.tell()
+
+    def copy_to(self, cursor) -> int:
+        """COPY the buffered rows and empty the buffer"""
+        if not self.rows:
+            return 0
+        quote = self.dialect.identifier_preparer.quote
+        self.buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {quote(self.table.name)} ({', '.join(quote(name) for name in self.columns)}) FROM STDIN",
+            self.buffer,
+        )
+        copied, self.rows = self.rows, 0
+        self.buffer = io.StringIO()
+        return copied
+
+
+def new_id(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def time_id(rng: random.Random, at: datetime) -> uuid.UUID:
+    """
+    UUIDv7 as production writes it (app.ids) for transactions, events and ledger entries,
+    stamped with the row's own time so the keys are as ordered as real ones; random bits from rng.
+    """
+    ms = calendar.timegm(at.timetuple()) * 1000 + at.microsecond // 1000
+    return uuid7_from(ms, rng.getrandbits(12), rng.getrandbits(62))
+
+
+def payment_history(rng: random.Random, config: GeneratorConfig, due: datetime, amount: Decimal, ids) -> dict:
+    """
+    One rent payment: the transaction row, its events, and its ledger postings (as LedgerEntryTypes).
+    Follows ALLOWED_TRANSITIONS; timestamps stop at config.now (recent payments are still in flight).
+    ids: SimpleNamespace(lease_id, payer_account_id, payee_account_id)
+    """
+    rail = rng.choices(list(config.rail_mix), weights=list(config.rail_mix.values()))[0]
+    to_processing, to_settled = RAIL_TIMINGS[rail]
+    initiated = min(due + timedelta(days=rng.uniform(-3, 3)), config.now - timedelta(seconds=1))
+    transaction_id = time_id(rng, initiated)
+
+    events, postings = [], []
+    row = {
+        "id": transaction_id,
+        "idempotency_key": f"seed-{transaction_id}",
+        "lease_id": ids.lease_id,
+        "payer_account_id": ids.payer_account_id,
+        "payee_account_id": ids.payee_account_id,
+        "amount": amount,
+        "status": TransactionStatus.PENDING,
+        "payment_rail_type": rail,
+        "initiated_at": initiated,
+        "processing_at": None,
+        "completed_at": None,
+        "failed_at": None,
+        "failure_reason": None,
+        "retry_count": 0,
+        "details": None,
+        "version": 1,
+        "created_at": initiated,
+        "updated_at": initiated,
+    }
+
+    def event(event_type, new_status, at, details=None):
+        events.append({
+            "id": time_id(rng, at),
+            "transaction_id": transaction_id,
+            "event_type": event_type,
+            "previous_status": row["status"].value if events else None,
+            "new_status": new_status.value,
+            "details": details,
+            "timestamp": at,
+        })
+        row["version"] = len(events)  # one version per status change after the first
+        row["status"] = new_status
+        row["updated_at"] = at
+
+    event("payment_initiated", TransactionStatus.PENDING, initiated,
+          {"amount": str(amount), "rail": rail.value, "velocity_violations": []})
+
+    at = initiated
+    while True:
+        at += timedelta(seconds=rng.uniform(1, to_processing))
+        if at > config.now:
+            return {"transaction": row, "events": events, "postings": postings}
+        event("status_change", TransactionStatus.PROCESSING, at)
+        row["processing_at"] = at
+
+        at += timedelta(seconds=rng.uniform(to_processing, to_settled))
+        if at > config.now:
+            return {"transaction": row, "events": events, "postings": postings}
+
+        if rng.random() < config.failure_rate and row["retry_count"] == 0:
+            reason = rng.choice(FAILURE_REASONS)
+            event("status_change", TransactionStatus.FAILED, at, {"failure_reason": reason})
+            row["failed_at"], row["failure_reason"] = at, reason
+            if reason != "Insufficient funds" or rng.random() >= RETRIED_SHARE:
+                return {"transaction": row, "events": events, "postings": postings}
+            at += timedelta(hours=rng.uniform(1, 48))  # RetryService backoff
+            if at > config.now:
+                return {"transaction": row, "events": events, "postings": postings}
+            event("retry_attempted", TransactionStatus.PENDING, at,
+                  {"retry_count": 1, "reason": reason, "failure_reason": reason})
+            row["retry_count"], row["failed_at"], row["failure_reason"] = 1, None, None
+            continue
+
+        event("status_change", TransactionStatus.COMPLETED, at)
+        row["completed_at"] = at
+        postings.append(LedgerEntryType.PAYMENT)
+
+        refund_at = at + timedelta(days=rng.uniform(1, 20))
+        if rng.random() < REFUND_RATE and refund_at <= config.now:
+            event("status_change", TransactionStatus.REFUNDED, refund_at)
+            postings.append(LedgerEntryType.REFUND)
+        return {"transaction": row, "events": events, "postings": postings}
+
+
+def statement_line(rng: random.Random, config: GeneratorConfig, transaction: dict) -> dict | None:
+    """What the bank reports for a transaction (None = not on the statement), with injected discrepancies"""
+    if transaction["status"] != TransactionStatus.COMPLETED:
+        return None
+    line = {
+        "id": new_id(rng),
+        "transaction_ref": str(transaction["id"]),  # the bank reference is our transaction id
+        "amount": transaction["amount"],
+        "status": "completed",
+        "processed_at": transaction["completed_at"],
+        "created_at": transaction["completed_at"] + timedelta(days=1),
+    }
+    if line["created_at"] > config.now:
+        return None  # float: completed on our side, not reported by the bank yet
+    if rng.random() < config.discrepancy_rate:
+        kind = rng.randrange(3)
+        if kind == 0:
+            return None  # MISSING_IN_BANK
+        if kind == 1:
+            line["amount"] -= Decimal("0.01")  # AMOUNT_MISMATCH
+        else:
+            line["status"] = "failed"  # STATUS_MISMATCH
+    return line
+
+
+def generate_slice(database_url: str, config: GeneratorConfig, slice_index: int, landlords: int) -> dict:
+    """Build one slice of landlords and everything they own, COPY it in one DB transaction"""
+    rng = random.Random(config.seed * 1_000_003 + slice_index)
+    engine = create_engine(database_url, poolclass=NullPool)  # fresh connection in this worker process
+    buffers = {table.name: CopyBuffer(table, engine.dialect) for table in TABLES}
+    copied = {table.name: 0 for table in TABLES}
+    balances = {}
+    history_start = config.now - relativedelta(months=config.months)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+
+        def flush(tables):
+            for table in tables:
+                copied[table.name] += buffers[table.name].copy_to(cursor)
+
+        def add_user(role, number):
+            user_id, created = new_id(rng), history_start - timedelta(days=rng.uniform(30, 730))
+            buffers["users"].add({
+                "id": user_id,
+                "email": f"{role.value}.{config.seed}.{slice_index}.{number}@example.com",
+                "full_name": f"{role.value.title()} {slice_index}-{number}",
+                "role": role,
+                "created_at": created,
+                "updated_at": created,
+            })
+            account_id = new_id(rng)
+            buffers["bank_accounts"].add({
+                "id": account_id,
+                "user_id": user_id,
+                "account_number_token": f"{rng.randrange(10000):04d}",
+                "routing_number": f"{rng.randrange(10 ** 9):09d}",
+                "bank_name": rng.choice(BANKS),
+                "is_verified": True,
+                "is_primary": True,
+                "created_at": created,
+            })
+            balances[account_id] = [Decimal(0), Decimal(0), 0]
+            return user_id, account_id
+
+        leases = []
+        renters = 0
+        for landlord_number in range(landlords):
+            landlord_id, landlord_account = add_user(UserRole.LANDLORD, landlord_number)
+            for _ in range(max(1, round(rng.gauss(config.properties_per_landlord, config.properties_per_landlord / 4)))):
+                city, state, zip_code = rng.choice(CITIES)
+                property_id = new_id(rng)
+                rent = Decimal(rng.randrange(800, 4500, 25))
+                buffers["properties"].add({
+                    "id": property_id,
+                    "landlord_id": landlord_id,
+                    "address": f"{rng.randrange(1, 9999)} {rng.choice(STREETS)}, Apt {rng.randrange(1, 40)}",
+                    "city": city,
+                    "state": state,
+                    "zip_code": zip_code,
+                    "monthly_rent": rent,
+                    "created_at": history_start - timedelta(days=rng.uniform(30, 365)),
+                })
+                if rng.random() >= config.occupancy:
+                    continue  # vacant
+
+                renter_id, renter_account = add_user(UserRole.RENTER, renters)
+                renters += 1
+                start = (history_start - relativedelta(months=rng.randrange(0, 12))).replace(
+                    hour=0, minute=0, second=0, microsecond=0
+                )
+                end = max(start + relativedelta(months=12), config.now + relativedelta(months=rng.randrange(1, 12)))
+                lease = SimpleNamespace(
+                    lease_id=new_id(rng), payer_account_id=renter_account, payee_account_id=landlord_account,
+                    start=start, end=end, rent=rent, due_day=rng.randrange(1, 29),
+                )
+                buffers["leases"].add({
+                    "id": lease.lease_id,
+                    "property_id": property_id,
+                    "renter_id": renter_id,
+                    "start_date": start,
+                    "end_date": end,
+                    "rent_amount": rent,
+                    "due_day_of_month": lease.due_day,
+                    "status": LeaseStatus.ACTIVE,
+                    "created_at": start,
+                    "updated_at": start,
+                })
+                next_due = config.now.replace(day=lease.due_day, hour=0, minute=0, second=0, microsecond=0)
+                buffers["payment_schedules"].add({
+                    "id": new_id(rng),
+                    "lease_id": lease.lease_id,
+                    "next_due_date": next_due if next_due > config.now else next_due + relativedelta(months=1),
+                    "amount": rent,
+                    "status": ScheduleStatus.ACTIVE,
+                    "created_at": start,
+                    "updated_at": start,
+                })
+                leases.append(lease)
+
+        flush(TABLES[:5])
+
+        # Payment history, COPY'd in batches to keep memory flat
+        history = TABLES[5:8] + TABLES[9:]
+        for lease in leases:
+            due = max(lease.start, history_start).replace(day=lease.due_day)
+            while due <= config.now:
+                payment = payment_history(rng, config, due, lease.rent, lease)
+                transaction = payment["transaction"]
+                buffers["transactions"].add(transaction)
+                for event in payment["events"]:
+                    buffers["transaction_events"].add(event)
+                for entry_type in payment["postings"]:
+                    for posting in LedgerService.build_postings(SimpleNamespace(**transaction), entry_type):
+                        buffers["ledger_entries"].add({
+                            "id": time_id(rng, transaction["updated_at"]),
+                            "transaction_id": transaction["id"],
+                            "account_id": posting["account_id"],
+                            "direction": posting["direction"],
+                            "entry_type": entry_type,
+                            "amount": transaction["amount"],
+                            "created_at": transaction["updated_at"],
+                        })
+                        balance = balances[posting["account_id"]]
+                        balance[0 if posting["direction"] == EntryDirection.DEBIT else 1] += transaction["amount"]
+                        balance[2] += 1
+                line = statement_line(rng, config, transaction)
+                if line is not None:
+                    buffers["bank_statements"].add(line)
+                due += relativedelta(months=1)
+
+            if sum(buffers[table.name].size() for table in history) > FLUSH_BYTES:
+                flush(history)
+
+        # The bank also reports charges we never made (UNEXPECTED_BANK_CHARGE)
+        for _ in range(round(len(leases) * config.discrepancy_rate)):
+            at = config.now - timedelta(days=rng.uniform(2, 30 * config.months))
+            buffers["bank_statements"].add({
+                "id": new_id(rng),
+                "transaction_ref": f"bank-{new_id(rng)}",
+                "amount": Decimal(rng.randrange(800, 4500, 25)),
+                "status": "completed",
+                "processed_at": at,
+                "created_at": at + timedelta(days=1),
+            })
+
+        for account_id, (debits, credits, count) in balances.items():
+            if count:
+                buffers["account_balances"].add({
+                    "account_id": account_id,
+                    "total_debits": debits,
+                    "total_credits": credits,
+                    "entry_count": count,
+                    "updated_at": config.now,
+                })
+        flush(history + [AccountBalance.__table__])
+
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+        engine.dispose()
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic rental payment data with COPY")
+    parser.add_argument("--landlords", type=int, default=200)
+    parser.add_argument("--properties-per-landlord", type=int, default=5, help="average")
+    parser.add_argument("--occupancy", type=float, default=0.95, help="share of properties with a lease")
+    parser.add_argument("--months", type=int, default=12, help="months of payment history")
+    parser.add_argument("--rail-mix", type=parse_rail_mix,
+                        default="standard_ach=0.6,same_day_ach=0.2,instant=0.15,wire=0.05")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--discrepancy-rate", type=float, default=0.01,
+                        help="share of bank statement lines that disagree with us (reconciliation)")
+    parser.add_argument("--slice-size", type=int, default=250, help="landlords per worker task / DB transaction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--truncate", action="store_true", help="empty the generated tables first")
+    args = parser.parse_args()
+
+    config = GeneratorConfig(
+        seed=args.seed,
+        now=datetime.utcnow().replace(microsecond=0),
+        months=args.months,
+        properties_per_landlord=args.properties_per_landlord,
+        occupancy=args.occupancy,
+        rail_mix=args.rail_mix,
+        failure_rate=args.failure_rate,
+        discrepancy_rate=args.discrepancy_rate,
+    )
+
+    if args.truncate:
+        engine = create_engine(args.database_url, poolclass=NullPool)
+        with engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE {', '.join(table.name for table in TABLES)} CASCADE"))
+        engine.dispose()
+
+    slices = [
+        (index, min(args.slice_size, args.landlords - start))
+        for index, start in enumerate(range(0, args.landlords, args.slice_size))
+    ]
+    totals = {table.name: 0 for table in TABLES}
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(generate_slice, args.database_url, config, index, landlords) for index, landlords in slices]
+        for done, future in enumerate(as_completed(futures), 1):
+            for table, rows in future.result().items():
+                totals[table] += rows
+            elapsed = time.monotonic() - started
+            print(f"{done}/{len(slices)} slices, {totals['transactions']} transactions, "
+                  f"{totals['transaction_events']} events ({totals['transaction_events'] / elapsed:,.0f} events/s)")
+
+    print(json.dumps(totals, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Bulk onboard a landlord portfolio from a CSV or NDJSON file.
+
+Usage:
+    python -m app.cli.import_portfolio <landlord_id> portfolio.csv
+    python -m app.cli.import_portfolio <landlord_id> portfolio.ndjson --chunk-size 5000
+"""
+from app.database import SessionLocal
+from app.services.import_service import PortfolioImportService, PortfolioImportError, PortfolioImportIncomplete
+from app.config import settings
+import argparse
+import json
+import sys
+import uuid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import properties, bank accounts and leases for a landlord")
+    parser.add_argument("landlord_id", type=uuid.UUID)
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    with open(args.path, newline="", encoding="utf-8-sig") as f, SessionLocal() as db:
+        try:
+            records = PortfolioImportService.parse_records(f, fmt)
+            plan = PortfolioImportService.validate(args.landlord_id, records, db)
+            result = PortfolioImportService.write(plan, db, args.chunk_size)
+        except PortfolioImportError as e:
+            print(str(e), file=sys.stderr)
+            for error in e.errors:
+                print(f"  line {error['line']}: {error['error']}", file=sys.stderr)
+            sys.exit(1)
+        except PortfolioImportIncomplete as e:
+            print(f"{e}: {e.__cause__}", file=sys.stderr)
+            print(json.dumps(e.progress, default=str, indent=2), file=sys.stderr)
+            sys.exit(1)
+
+    print(json.dumps(result, default=str, indent=2))
+
+
+if __name__ == "__main__":
+    main()
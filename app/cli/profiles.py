@@ -0,0 +1,77 @@
+"""
+On-demand profiles of API requests and Celery tasks (see app/profiling.py).
+
+Usage:
+    python -m app.cli.profiles arm <task> [--count 5]     # e.g. process_payment_async, on every worker
+    python -m app.cli.profiles disarm <task>
+    python -m app.cli.profiles armed
+    python -m app.cli.profiles list [--limit 20]
+    python -m app.cli.profiles show <profile_id>          # folded stacks: | flamegraph.pl > out.svg, or load in speedscope
+    python -m app.cli.profiles top <profile_id> [--limit 25]
+
+Requests are profiled by sending X-Profile: <PROFILING_TOKEN>; the response's X-Profile-Id is the profile id.
+"""
+from app import profiling
+from collections import Counter
+import argparse
+import json
+
+
+def top_functions(folded: str) -> list[tuple[str, int, int]]:
+    """(frame, self samples, total samples) per frame, most self time first"""
+    own, total = Counter(), Counter()
+    for line in folded.splitlines():
+        stack, _, count = line.rpartition(" ")
+        frames = stack.split(";")
+        own[frames[-1]] += int(count)
+        for frame in set(frames):  # recursion counts once per sample
+            total[frame] += int(count)
+    return [(frame, samples, total[frame]) for frame, samples in own.most_common()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile requests and tasks on demand")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    arm = commands.add_parser("arm", help="profile the next runs of a task on any worker")
+    arm.add_argument("task", help="task function name, e.g. process_payment_async")
+    arm.add_argument("--count", type=int, default=5)
+
+    disarm = commands.add_parser("disarm", help="stop profiling a task")
+    disarm.add_argument("task")
+
+    commands.add_parser("armed", help="tasks still armed and runs left")
+
+    listing = commands.add_parser("list", help="stored profiles, newest first")
+    listing.add_argument("--limit", type=int, default=20)
+
+    show = commands.add_parser("show", help="a profile's folded stacks")
+    show.add_argument("profile_id")
+
+    top = commands.add_parser("top", help="a profile's frames by self time")
+    top.add_argument("profile_id")
+    top.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args()
+
+    if args.command == "arm":
+        profiling.arm(args.task, args.count)
+        print(f"Profiling the next {args.count} runs of {args.task}")
+    elif args.command == "disarm":
+        profiling.disarm(args.task)
+    elif args.command == "armed":
+        print(json.dumps(profiling.armed(), indent=2))
+    elif args.command == "list":
+        for meta in profiling.list_profiles()[:args.limit]:
+            print(json.dumps(meta, default=str))
+    elif args.command == "show":
+        print(profiling.load_folded(args.profile_id), end="")
+    else:
+        rows = top_functions(profiling.load_folded(args.profile_id))
+        samples = sum(own for _, own, _ in rows) or 1
+        print(f"{'self':>7} {'total':>7}  frame")
+        for frame, own, total in rows[:args.limit]:
+            print(f"{own / samples:>7.1%} {total / samples:>7.1%}  {frame}")
+
+
+if __name__ == "__main__":
+    main()
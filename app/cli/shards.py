@@ -0,0 +1,52 @@
+"""
+Shard maintenance.
+
+Usage:
+    python -m app.cli.shards backfill-directory
+    python -m app.cli.shards sync-reference [--batch-size 1000]
+    python -m app.cli.shards move <landlord_id> <to_shard> [--batch-size 1000] [--freeze-grace 2.0]
+
+Adding a shard: append its URL to SHARD_DATABASE_URLS, start the API once (creates the schema),
+run sync-reference, then move landlords onto it. Every command is safe to re-run.
+"""
+from app.database import SessionLocal
+from app.services.reshard_service import ReshardService
+from app.config import settings
+import argparse
+import json
+import uuid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard directory and resharding tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("backfill-directory", help="register data created before sharding as living on shard 0")
+
+    sync = commands.add_parser("sync-reference", help="copy users, properties, bank accounts and webhook subscriptions to every shard")
+    sync.add_argument("--batch-size", type=int, default=settings.RESHARD_BATCH_SIZE)
+
+    move = commands.add_parser("move", help="move a landlord and all of its payment data to another shard")
+    move.add_argument("landlord_id", type=uuid.UUID)
+    move.add_argument("to_shard", type=int)
+    move.add_argument("--batch-size", type=int, default=settings.RESHARD_BATCH_SIZE)
+    move.add_argument("--freeze-grace", type=float, default=settings.RESHARD_FREEZE_GRACE_SECONDS,
+                      help="seconds to let in-flight writes finish once the landlord is frozen")
+    args = parser.parse_args()
+
+    if args.command == "backfill-directory":
+        with SessionLocal() as db:
+            result = ReshardService.backfill_directory(db)
+    elif args.command == "sync-reference":
+        result = ReshardService.sync_reference(args.batch_size)
+    else:
+        with SessionLocal() as db:
+            result = ReshardService.move_landlord(
+                args.landlord_id, args.to_shard, db, args.batch_size, args.freeze_grace
+            )
+
+    print(json.dumps(result, default=str, indent=2))
+
+
+if __name__ == "__main__":
+    main()
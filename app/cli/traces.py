@@ -0,0 +1,120 @@
+"""
+Per-stage latency breakdown of traced payments, from the span file (TRACE_EXPORTER=file).
+
+Usage:
+    python -m app.cli.traces show <trace_id | transaction_id> [--file traces.jsonl]
+    python -m app.cli.traces slowest [--limit 10] [--file traces.jsonl]
+
+show prints every trace the id belongs to as a tree (API request -> queue wait -> task -> SQL),
+with each span's start offset and duration; slowest lists the longest payment traces.
+"""
+from app.config import settings
+from collections import defaultdict
+import argparse
+import json
+
+
+def load_spans(path: str) -> list[dict]:
+    """Every span in an OTLP/JSON lines file, attributes flattened into a dict"""
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    for span in scope["spans"]:
+                        span["attributes"] = {
+                            attribute["key"]: next(iter(attribute["value"].values()))
+                            for attribute in span.get("attributes", [])
+                        }
+                        span["start"] = int(span["startTimeUnixNano"])
+                        span["end"] = int(span["endTimeUnixNano"])
+                        spans.append(span)
+    return spans
+
+
+def group_traces(spans: list[dict]) -> dict[str, list[dict]]:
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["traceId"]].append(span)
+    return traces
+
+
+def find_traces(traces: dict[str, list[dict]], ident: str) -> list[str]:
+    """Trace ids matching a trace id, or every trace that touched a transaction (initiation, retries ...)"""
+    if ident in traces:
+        return [ident]
+    return [
+        trace_id for trace_id, spans in traces.items()
+        if any(span["attributes"].get("transaction_id") == ident for span in spans)
+    ]
+
+
+def render_tree(spans: list[dict]) -> list[str]:
+    """One line per span, children indented under their parent, in start order"""
+    children = defaultdict(list)
+    ids = {span["spanId"] for span in spans}
+    for span in spans:
+        parent = span.get("parentSpanId")
+        children[parent if parent in ids else None].append(span)
+    start = min(span["start"] for span in spans)
+
+    lines = []
+
+    def walk(parent_id, depth):
+        for span in sorted(children[parent_id], key=lambda s: s["start"]):
+            label = span["name"]
+            if span["name"] == "db.query":
+                label = f"db.query {span['attributes'].get('db.statement', '')[:60]!r}"
+            failed = " ERROR" if span.get("status", {}).get("code") == 2 else ""
+            lines.append(
+                f"{(span['start'] - start) / 1e6:>10.1f}ms {(span['end'] - span['start']) / 1e6:>10.1f}ms  "
+                f"{'  ' * depth}{label}{failed}"
+            )
+            walk(span["spanId"], depth + 1)
+
+    walk(None, 0)
+    return lines
+
+
+def duration_ms(spans: list[dict]) -> float:
+    return (max(span["end"] for span in spans) - min(span["start"] for span in spans)) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace breakdowns from the span file")
+    parser.add_argument("--file", default=settings.TRACE_FILE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    show = commands.add_parser("show", help="span tree of a trace, or of every trace of a transaction")
+    show.add_argument("ident", help="trace id or transaction id")
+
+    slowest = commands.add_parser("slowest", help="longest traces that touched a transaction")
+    slowest.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    traces = group_traces(load_spans(args.file))
+
+    if args.command == "show":
+        trace_ids = find_traces(traces, args.ident)
+        if not trace_ids:
+            raise SystemExit(f"No spans for {args.ident} in {args.file}")
+        for trace_id in sorted(trace_ids, key=lambda t: min(span["start"] for span in traces[t])):
+            print(f"trace {trace_id}  {duration_ms(traces[trace_id]):.1f}ms")
+            print(f"{'start':>12} {'duration':>12}")
+            print("\n".join(render_tree(traces[trace_id])))
+            print()
+    else:
+        payments = [
+            (duration_ms(spans), trace_id, next(span["attributes"]["transaction_id"] for span in spans
+                                                if "transaction_id" in span["attributes"]))
+            for trace_id, spans in traces.items()
+            if any("transaction_id" in span["attributes"] for span in spans)
+        ]
+        for duration, trace_id, transaction_id in sorted(payments, reverse=True)[:args.limit]:
+            print(f"{duration:>12.1f}ms  trace {trace_id}  transaction {transaction_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+UUIDv4 vs UUIDv7 primary keys: insert throughput, index size and WAL volume on PostgreSQL.
+
+Usage:
+    python -m app.cli.uuid_benchmark [--rows 10000000] [--batch-size 100000] [--database-url postgresql://...]
+
+Loads the same rows, shaped like transaction_events, into two scratch tables that differ only
+in how their primary key is generated (uuid.uuid4 vs app.ids.uuid7), batch by batch, alternating
+between the two so both see the same machine state. Reports rows/s overall and over the last 10%
+(random keys slow down once the index no longer fits in shared_buffers), the primary key index
+size, and the WAL written. The scratch tables are dropped afterwards unless --keep is given.
+Point it at a scratch database sized like production; 10M rows take a few minutes per variant.
+"""
+from sqlalchemy import create_engine, text
+from app.ids import uuid7
+from app.database import SQLALCHEMY_DATABASE_URL
+from datetime import datetime, timedelta
+import argparse
+import io
+import json
+import time
+import uuid
+
+VARIANTS = {"v4": uuid.uuid4, "v7": uuid7}
+
+
+def table_name(variant: str) -> str:
+    return f"uuid_benchmark_{variant}"
+
+
+def batch_csv(generate, size: int, start: datetime) -> io.StringIO:
+    """One COPY batch: id, transaction_id, event_type, timestamp, details"""
+    out = io.StringIO()
+    for i in range(size):
+        out.write(f"{generate()}\t{uuid.uuid4()}\tstatus_change\t{start + timedelta(microseconds=i)}\t{{}}\n")
+    out.seek(0)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare UUIDv4 and UUIDv7 primary keys under bulk inserts")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL, help="default: the main database")
+    parser.add_argument("--keep", action="store_true", help="leave the scratch tables for inspection")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    with engine.begin() as conn:
+        for variant in VARIANTS:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table_name(variant)}"))
+            conn.execute(text(
+                f"CREATE TABLE {table_name(variant)} ("
+                "id uuid PRIMARY KEY, transaction_id uuid NOT NULL, event_type varchar NOT NULL, "
+                "timestamp timestamp NOT NULL, details json)"
+            ))
+
+    elapsed = {variant: [] for variant in VARIANTS}  # seconds per batch
+    wal = {variant: 0 for variant in VARIANTS}
+    start = datetime.utcnow()
+    batches = -(-args.rows // args.batch_size)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for number in range(batches):
+            size = min(args.batch_size, args.rows - number * args.batch_size)
+            for variant, generate in VARIANTS.items():
+                data = batch_csv(generate, size, start + timedelta(seconds=number))
+                cursor.execute("SELECT pg_current_wal_lsn()")
+                lsn_before = cursor.fetchone()[0]
+                began = time.perf_counter()
+                cursor.copy_expert(
+                    f"COPY {table_name(variant)} (id, transaction_id, event_type, timestamp, details) FROM STDIN", data
+                )
+                raw.commit()
+                elapsed[variant].append(time.perf_counter() - began)
+                cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (lsn_before,))
+                wal[variant] += int(cursor.fetchone()[0])
+                raw.commit()
+            if (number + 1) % 10 == 0 or number + 1 == batches:
+                print(f"{min((number + 1) * args.batch_size, args.rows):>12,} rows  "
+                      + "  ".join(f"{v}: {size / elapsed[v][-1]:>9,.0f} rows/s" for v in VARIANTS), flush=True)
+
+        results = {}
+        tail = max(batches // 10, 1)
+        for variant in VARIANTS:
+            cursor.execute(
+                "SELECT pg_relation_size(%s), pg_relation_size(%s)",
+                (f"{table_name(variant)}_pkey", table_name(variant)),
+            )
+            index_bytes, table_bytes = cursor.fetchone()
+            results[variant] = {
+                "rows": args.rows,
+                "rows_per_second": round(args.rows / sum(elapsed[variant])),
+                "last_10pct_rows_per_second": round(
+                    (args.rows - (batches - tail) * args.batch_size) / sum(elapsed[variant][-tail:])
+                ),
+                "pkey_index_mb": round(index_bytes / 2**20, 1),
+                "table_mb": round(table_bytes / 2**20, 1),
+                "wal_mb": round(wal[variant] / 2**20, 1),
+            }
+        raw.commit()
+    finally:
+        raw.close()
+
+    if not args.keep:
+        with engine.begin() as conn:
+            for variant in VARIANTS:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table_name(variant)}"))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
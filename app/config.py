@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from decimal import Decimal
 
 class Settings(BaseSettings):
     DB_USER: str = "nishti"   # change from "postgres"
@@ -7,7 +8,154 @@ class Settings(BaseSettings):
     DB_PORT: int = 5432
     DB_NAME: str = "rental_payment_system"
 
+    # Read replica for GET endpoints (get_read_db); unset = all reads on the primary
+    REPLICA_DB_HOST: str | None = None
+    REPLICA_DB_PORT: int = 5432
+    REPLICA_CONNECT_TIMEOUT_SECONDS: int = 2
+    REPLICA_RETRY_SECONDS: float = 30.0          # after a failed connect, reads go to the primary this long
+    READ_YOUR_WRITES_SECONDS: int = 60           # lifetime of the LSN cookie handed out after a write
+
+    # Sharding by landlord (app/sharding.py); shard 0 is the database above
+    SHARD_DATABASE_URLS: list[str] = []          # extra shards, JSON list of SQLAlchemy URLs
+    SHARD_DEDICATED_QUEUES: bool = False         # route payment tasks to one Celery queue per shard ("shard-N")
+    SHARD_MOVING_RETRY_SECONDS: int = 5          # Retry-After for writes to a landlord being resharded
+    RESHARD_BATCH_SIZE: int = 1000               # rows per INSERT when copying a landlord between shards
+    RESHARD_FREEZE_GRACE_SECONDS: float = 2.0    # let in-flight writes finish before the final copy
+
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.5
+
+    # Server-sent events (live transaction status streams)
+    SSE_HEARTBEAT_SECONDS: float = 15.0  # keeps proxies from closing idle streams
+
+    # Webhook delivery (push notifications for transaction status changes)
+    WEBHOOK_FLUSH_INTERVAL_SECONDS: float = 5.0  # how often celery beat runs the delivery worker
+    WEBHOOK_CLAIM_LIMIT: int = 1000              # deliveries claimed per worker run
+    WEBHOOK_MAX_EVENTS_PER_REQUEST: int = 100    # events batched into one POST per subscriber
+    WEBHOOK_CONCURRENCY: int = 20                # parallel POSTs per worker run
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_MAX_ATTEMPTS: int = 8
+    WEBHOOK_BACKOFF_BASE_SECONDS: int = 30       # 30s, 60s, 120s ... with jitter
+    WEBHOOK_BACKOFF_MAX_SECONDS: int = 3600
+
+    # Property search (GET /api/v1/properties/search)
+    PROPERTY_SEARCH_CACHE_TTL_SECONDS: int = 30  # results cached this long, dropped early on property / lease writes
+    PROPERTY_SEARCH_MAX_LIMIT: int = 100
+
+    # Transaction read cache (GET /api/v1/payments/{id} and /history, see TransactionCacheService)
+    TRANSACTION_CACHE_TTL_SECONDS: int = 300     # dropped early by every write to the transaction
+
+    # Idempotency keys (idempotency_keys, see IdempotencyService): daily partitions, dropped once expired
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 72          # a retry with the same key returns the same payment for this long
+    IDEMPOTENCY_PARTITIONS_AHEAD: int = 7        # days of partitions created in advance
+
+    # Payment retries (RetryService): durable, polled from payment_retries
+    PAYMENT_MAX_RETRIES: int = 3                 # manual + automatic
+    RETRY_BACKOFF_BASE_SECONDS: dict[str, int] = {  # automatically retried failure reasons; others need a manual retry
+        "Insufficient funds": 60,                # 1min, 2min, 4min ... with jitter
+    }
+    RETRY_BACKOFF_MAX_SECONDS: int = 3600
+    RETRY_POLL_INTERVAL_SECONDS: float = 10.0
+    RETRY_DISPATCH_BATCH_SIZE: int = 200         # retries dispatched per poll and shard: caps the rate after an outage
+
+    # Stuck-transaction sweeper (StuckTransactionService): older than its rail's SLA in a state = stuck
+    STUCK_PENDING_SLA_SECONDS: dict[str, int] = {       # never picked up by a worker (lost dispatch)
+        "instant": 60, "wire": 120, "same_day_ach": 300, "standard_ach": 600,
+    }
+    STUCK_PROCESSING_SLA_SECONDS: dict[str, int] = {    # worker died mid-settlement
+        "instant": 120, "wire": 300, "same_day_ach": 900, "standard_ach": 1800,
+    }
+    STUCK_SWEEP_INTERVAL_SECONDS: float = 60.0
+    STUCK_SWEEP_BATCH_SIZE: int = 500            # transactions claimed (and re-dispatched) per statement
+    STUCK_MAX_REQUEUES: int = 3                  # after this many requeues a transaction is failed for support
+
+    # Transaction event change feed and exports (GET /api/v1/events)
+    EVENT_FEED_MAX_LIMIT: int = 10000            # events per feed page
+    EVENT_EXPORT_FETCH_SIZE: int = 5000          # rows per server-side cursor fetch, and per chunk written to the client
+
+    # Statement exports (GET /api/v1/exports/...)
+    STATEMENT_EXPORT_FETCH_SIZE: int = 5000      # rows per server-side cursor fetch, and per chunk written to the client
+
+    # Bank reconciliation (incremental, see ReconciliationService)
+    RECONCILIATION_SAFETY_SECONDS: int = 300     # watermark trails now by this much: rows still being committed are picked up next run
+    RECONCILIATION_BATCH_SIZE: int = 1000        # transaction references checked per query / commit
+
+    # Landlord payouts: completed rent netted per payee account, one ACH credit each (see PayoutService)
+    PAYOUT_WINDOW_HOURS: int = 24                # settlement window; a run covers payments completed before its end
+    PAYOUT_SETTLE_LAG_SECONDS: int = 300         # window end trails now by this much: completions still committing land next run
+    PAYOUT_LOOKBACK_DAYS: int = 90               # unpaid payments older than this (e.g. netted to <= 0 for months) need manual handling
+    PAYOUT_ENTRIES_PER_BATCH: int = 5000         # entries per NACHA batch within a file
+    PAYOUT_FETCH_SIZE: int = 2000                # payouts per server-side cursor fetch while writing the file
+    PAYOUT_ACH_DIR: str = "ach_files"
+    PAYOUT_ODFI_ROUTING: str = "091000019"       # our bank (originating DFI)
+    PAYOUT_ODFI_NAME: str = "ORIGINATING BANK"
+    PAYOUT_COMPANY_ID: str = "1234567890"
+    PAYOUT_COMPANY_NAME: str = "DIRECTPAY"
+
+    # Nightly lease lifecycle (LeaseLifecycleService): expiry, schedule completion, delinquency snapshot
+    LATE_FEE_GRACE_DAYS: int = 5                 # an installment this many days overdue starts accruing a late fee
+    LATE_FEE_FLAT: Decimal = Decimal("50.00")    # per late installment
+    LATE_FEE_PERCENT: Decimal = Decimal("0")     # plus this percentage of its unpaid amount
+
+    # Rent roll (GET /api/v1/properties/landlord/{id}/rent-roll, see RentRollService)
+    RENT_ROLL_CACHE_TTL_SECONDS: int = 300       # open months; dropped early when a transaction of the month settles
+    RENT_ROLL_FROZEN_CACHE_TTL_SECONDS: int = 86400
+    RENT_ROLL_FREEZE_LAG_DAYS: int = 5           # a month is frozen into rent_roll_months this long after it ends
+
+    # Bulk portfolio import
+    IMPORT_CHUNK_SIZE: int = 2000            # rows per INSERT / per commit
+    IMPORT_MAX_ERRORS_REPORTED: int = 100
+
+    # Double-entry ledger
+    LEDGER_CHECKPOINT_INTERVAL_SECONDS: float = 3600.0
+    LEDGER_CHECKPOINT_SAFETY_SECONDS: int = 60   # only checkpoint entries older than this (see LedgerService)
+    LEDGER_VERIFY_CHUNKS: int = 16               # parallel verification tasks, one per account id range
+
+    # Pre-authorization velocity checks (PaymentService.initiate_payment)
+    VELOCITY_CHECKS_ENABLED: bool = True
+    VELOCITY_BACKEND: str = "redis"              # "redis" (shared by all API instances) or "memory" (per process)
+    VELOCITY_BUDGET_MS: float = 1.0              # checks slower than this are counted in /metrics
+    VELOCITY_REDIS_TIMEOUT_SECONDS: float = 0.01 # fail open past this
+    VELOCITY_PAYER_MAX_PAYMENTS_PER_HOUR: int = 5
+    VELOCITY_PAYER_MAX_AMOUNT_PER_DAY: Decimal = Decimal("25000.00")
+    VELOCITY_LEASE_MAX_PAYMENTS_PER_DAY: int = 3
+
+    # API rate limits and load shedding (app/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_CLIENT_HEADER: str = "X-Client-Id"  # API client identity; the remote address without it
+    RATE_LIMITS: dict[str, list[int]] = {        # route class -> [requests, window seconds], per client, sliding window
+        "payment_write": [60, 60],
+        "write": [120, 60],
+        "read": [600, 60],
+        "bulk": [10, 60],                        # imports / exports
+        "stream": [30, 60],                      # SSE connections opened
+    }
+    RATE_LIMIT_REDIS_TIMEOUT_SECONDS: float = 0.05  # fail open past this
+    LOAD_SHED_MAX_IN_FLIGHT: dict[str, int] = {  # route class -> concurrent requests per API process, then 503
+        "payment_write": 32,
+        "write": 32,
+        "read": 64,
+        "bulk": 4,
+    }
+    LOAD_SHED_POOL_UTILIZATION: float = 0.9      # share of the primary's connections checked out before new DB requests get 503
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 2
+
+    # Distributed tracing: API -> Celery -> SQL spans (app/tracing.py)
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.01             # share of new traces recorded; decided at the root, kept downstream
+    TRACE_EXPORTER: str = "file"                # "file" (OTLP/JSON lines), "otlp" (OTLP/HTTP collector) or "none"
+    TRACE_FILE_PATH: str = "traces.jsonl"
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACE_SERVICE_NAME: str = "rental-payment"
+
+    # On-demand sampling profiler for API requests and Celery tasks (app/profiling.py)
+    PROFILING_TOKEN: str = ""                  # X-Profile / ?profile= value that profiles a request; empty: off
+    PROFILE_DIR: str = "profiles"              # folded stacks + metadata per profile
+    PROFILE_MAX_FILES: int = 200                 # newest profiles kept
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_MODE: str = "cpu"                   # "cpu" (only samples of threads on a CPU, Linux) or "wall"
+    PROFILE_MAX_SECONDS: float = 60.0            # a sampler stops by itself after this
+    PROFILE_ARM_POLL_SECONDS: float = 5.0        # how often workers look for newly armed tasks
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,6 +1,13 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
 from app.config import settings
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 # This file sets up the database connection and session management for SQLAlchemy. 
 # It defines the Base class for models to inherit from, and a get_db function that can be used in FastAPI endpoints to get a database session. 
@@ -28,10 +35,98 @@ def get_db():
     finally:
         db.close()
 
+# Read replica: GET endpoints take get_read_db instead of get_db so ~90% of the traffic
+# stays off the primary. Not configured (REPLICA_DB_HOST unset) = everything on the primary.
+REPLICA_DATABASE_URL = (
+    f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASSWORD}"
+    f"@{settings.REPLICA_DB_HOST}:{settings.REPLICA_DB_PORT}/{settings.DB_NAME}"
+) if settings.REPLICA_DB_HOST else None
+
+replica_engine = create_engine(
+    REPLICA_DATABASE_URL,
+    connect_args={"connect_timeout": settings.REPLICA_CONNECT_TIMEOUT_SECONDS}  # fail over fast, don't hang the request
+) if REPLICA_DATABASE_URL else None
+
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
+# Read-your-writes token: the primary's WAL position (LSN) right after a request committed.
+# Handed back as a header + cookie (app/read_routing.py); a later read carrying it only
+# goes to the replica once the replica has replayed at least that far.
+LSN_HEADER = "X-DirectPay-LSN"
+LSN_COOKIE = "directpay_lsn"
+
+
+def parse_lsn(value: str | None) -> int | None:
+    """'16/B374D848' -> comparable integer; None for missing or malformed tokens"""
+    if not value:
+        return None
+    try:
+        high, low = value.split("/")
+        return (int(high, 16) << 32) | int(low, 16)
+    except ValueError:
+        return None
+
+
+class ReplicaState:
+    """Per-process view of the replica: marked down after a failed connect, last replay position seen"""
+
+    def __init__(self):
+        self.down_until = 0.0
+        self.replayed_lsn = 0  # only ever moves forward, so a cached value is always safe to trust
+        self._lock = threading.Lock()
+
+    def is_down(self) -> bool:
+        return time.monotonic() < self.down_until
+
+    def mark_down(self, error: Exception) -> None:
+        logger.warning(f"Read replica unavailable, using the primary for {settings.REPLICA_RETRY_SECONDS}s: {error}")
+        self.down_until = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+    def has_replayed(self, required_lsn: int, db) -> bool:
+        if self.replayed_lsn >= required_lsn:
+            return True  # no query needed
+        replayed = parse_lsn(db.execute(text("SELECT pg_last_wal_replay_lsn()::text")).scalar())
+        if replayed is None:
+            return False  # not a streaming standby, can't prove it has the write
+        with self._lock:
+            self.replayed_lsn = max(self.replayed_lsn, replayed)
+        return replayed >= required_lsn
+
+
+replica_state = ReplicaState()
+
+
+def open_read_session(request: Request):
+    if ReplicaSessionLocal is None or replica_state.is_down():
+        return SessionLocal()
+
+    required_lsn = parse_lsn(request.headers.get(LSN_HEADER) or request.cookies.get(LSN_COOKIE))
+    db = ReplicaSessionLocal()
+    try:
+        if required_lsn is not None and not replica_state.has_replayed(required_lsn, db):
+            db.close()
+            return SessionLocal()  # replica is behind this client's last write
+        db.connection()  # check out now, so a dead replica fails over here rather than mid-endpoint
+        return db
+    except OperationalError as e:
+        db.close()
+        replica_state.mark_down(e)
+        return SessionLocal()
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: the replica when it is up and caught up, otherwise the primary"""
+    db = open_read_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
 """
 This file does 4 things:
     Builds database connection string
     Creates engine (bridge to DB)
     Creates session factory (working connection per request)
     Provides Base for models
+    Routes read-only endpoints to the read replica (get_read_db)
 """
\ No newline at end of file
@@ -0,0 +1,47 @@
+import os
+import threading
+import time
+import uuid
+
+# Time-ordered primary keys for the insert-heavy tables (transactions, transaction events, ledger
+# entries). A random uuid4 lands anywhere in the primary key's B-tree, so every insert touches a
+# random leaf page: page splits all over the index, full-page writes in the WAL, and a working set
+# as large as the whole index. A UUIDv7 (RFC 9562) starts with the creation time in milliseconds,
+# so new keys go to the right-hand edge of the index like a sequence would - but are still
+# generated anywhere (API, workers, any shard) without coordination, and fit the same uuid columns.
+#
+# Layout: 48 bits unix ms | version 7 | 12 bits rand_a | variant | 62 bits rand_b
+# rand_a is used as a per-process counter within a millisecond (RFC 9562 method 1), so ids from
+# one process are strictly increasing even when many are generated in the same millisecond.
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF  # random start, half the range left to count
+        else:
+            _counter += 1
+            if _counter > 0xFFF:  # 4096 ids in one millisecond: borrow the next one
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    return uuid7_from(ms, counter, int.from_bytes(os.urandom(8), "big"))
+
+
+def uuid7_from(ms: int, rand_a: int, rand_b: int) -> uuid.UUID:
+    """A UUIDv7 with the layout above from its parts (rand_a / rand_b are cut to 12 / 62 bits)"""
+    value = (ms << 80) | (0x7 << 76) | ((rand_a & 0xFFF) << 64) | (0b10 << 62) | (rand_b & ((1 << 62) - 1))
+    return uuid.UUID(int=value)
+
+
+def uuid7_time(value: uuid.UUID) -> float:
+    """Creation time (unix seconds) of a UUIDv7"""
+    return (value.int >> 80) / 1000
@@ -1,10 +1,22 @@
 from fastapi import FastAPI
-from app.database import engine, Base
-from app.api.v1 import users, bank_accounts, properties, leases, payments
+from fastapi.responses import PlainTextResponse
+from app.database import engine, Base, SessionLocal
+from app.api.v1 import users, bank_accounts, properties, leases, payments, webhooks, imports, reconciliation, events, exports, payouts
 from app import models
+from app.metrics import render_metrics
+from app.read_routing import ReadYourWritesMiddleware
+from app.rate_limit import RateLimitMiddleware
+from app.tracing import TracingMiddleware
+from app.profiling import ProfilingMiddleware
+from app.sharding import create_shard_schemas
+from app.services.idempotency_service import IdempotencyService
+from datetime import datetime
 
 # Create tables
 Base.metadata.create_all(bind=engine) # tells sqlalchemy to look at all models that inherit from Base, create corresponding tables in db
+create_shard_schemas()  # same schema (minus main-only tables) on every extra shard
+with SessionLocal() as db:
+    IdempotencyService.maintain_partitions(db, datetime.utcnow())  # idempotency_keys is partitioned: today's partition must exist
 
 app = FastAPI(
     title="DirectPay Rental Platform",
@@ -12,12 +24,30 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Innermost: profiles requests sent with the PROFILING_TOKEN (X-Profile-Id on the response)
+app.add_middleware(ProfilingMiddleware)
+
+# Read-your-writes token for replica-routed GET endpoints (see get_read_db)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Overloaded or over-limit requests are refused before doing any work (429 / 503 + Retry-After)
+app.add_middleware(RateLimitMiddleware)
+
+# Outermost: root span of every request's trace, continuing an incoming traceparent (X-Trace-Id on sampled responses)
+app.add_middleware(TracingMiddleware)
+
 # Include routers with proper prefixes
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(bank_accounts.router, prefix="/api/v1/bank-accounts", tags=["Bank Accounts"])
 app.include_router(properties.router, prefix="/api/v1/properties", tags=["Properties"])
 app.include_router(leases.router, prefix="/api/v1/leases", tags=["Leases"])
 app.include_router(payments.router, prefix="/api/v1/payments", tags=["Payments"])
+app.include_router(webhooks.router, prefix="/api/v1/webhooks", tags=["Webhooks"])
+app.include_router(imports.router, prefix="/api/v1/imports", tags=["Imports"])
+app.include_router(reconciliation.router, prefix="/api/v1/reconciliation", tags=["Reconciliation"])
+app.include_router(events.router, prefix="/api/v1/events", tags=["Events"])
+app.include_router(exports.router, prefix="/api/v1/exports", tags=["Exports"])
+app.include_router(payouts.router, prefix="/api/v1/payouts", tags=["Payouts"])
 
 @app.get("/")
 def root():
@@ -26,3 +56,8 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format, values for this process only
+    return render_metrics()
@@ -3,3 +3,16 @@ from .property import Property
 from .lease import Lease
 from .bank_account import BankAccount
 from .payment_schedule import PaymentSchedule
+from .transaction import Transaction
+from .transaction_event import TransactionEvent
+from .audit_log import AuditLog
+from .webhook import WebhookSubscription, WebhookDelivery
+from .installment import Installment, InstallmentAllocation
+from .ledger import LedgerEntry, AccountBalance, BalanceCheckpoint
+from .shard_directory import LandlordShard, LeaseDirectory, TransactionDirectory
+from .payment_retry import PaymentRetry
+from .reconciliation import BankStatement, ReconciliationResult, ReconciliationRun
+from .payout import AchFile, Payout, PayoutItem
+from .delinquency import DelinquencySnapshot
+from .rent_roll import RentRollMonth
+from .idempotency_key import IdempotencyKey
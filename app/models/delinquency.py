@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, Numeric, ForeignKey, DateTime, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+import uuid
+from datetime import datetime
+
+class DelinquencySnapshot(Base):
+    # One row per lease with overdue installments, per nightly run (LeaseLifecycleService).
+    # Lives on the lease's shard; a re-run on the same day replaces that day's rows.
+    __tablename__ = "delinquency_snapshots"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    snapshot_date = Column(DateTime, nullable=False)  # midnight UTC of the day it was taken
+    lease_id = Column(UUID(as_uuid=True), ForeignKey("leases.id"), nullable=False)
+
+    overdue_installments = Column(Integer, nullable=False)
+    amount_overdue = Column(Numeric(12, 2), nullable=False)   # unpaid part of installments due before snapshot_date
+    oldest_due_date = Column(DateTime, nullable=False)
+    days_past_due = Column(Integer, nullable=False)           # since oldest_due_date
+    late_fee = Column(Numeric(12, 2), nullable=False)         # for installments past the grace period
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # One snapshot per lease and day; also "the whole portfolio on a day"
+        UniqueConstraint('snapshot_date', 'lease_id', name='uq_delinquency_snapshot_lease'),
+        # A lease's delinquency history
+        Index('idx_delinquency_lease_date', 'lease_id', 'snapshot_date'),
+    )
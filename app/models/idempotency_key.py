@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+class IdempotencyKey(Base):
+    # Idempotency-Key -> transaction, for IDEMPOTENCY_KEY_TTL_HOURS (see IdempotencyService).
+    # Main database only. Fixed-width hashes instead of the client's key and body, and partitioned
+    # by day on created_at: the live index stays small, and expiry is a DROP of whole partitions
+    # (IdempotencyService.maintain_partitions) instead of row-by-row deletes.
+    __tablename__ = "idempotency_keys"
+
+    key_hash = Column(LargeBinary, primary_key=True)    # sha256 of the key
+    created_at = Column(DateTime, primary_key=True)     # partition key (part of every unique index)
+    expires_at = Column(DateTime, nullable=False)
+    fingerprint = Column(LargeBinary, nullable=True)    # sha256 of the request body; NULL: migrated key, body not checked
+    transaction_id = Column(UUID(as_uuid=True), nullable=False)  # its landlord / shard: transaction_directory
+
+    __table_args__ = (
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
@@ -0,0 +1,60 @@
+from sqlalchemy import Column, Integer, Numeric, ForeignKey, DateTime, Enum, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from app.database import Base
+import uuid
+from datetime import datetime
+import enum
+
+class InstallmentStatus(str, enum.Enum):
+    DUE = "due"          # nothing paid yet
+    PARTIAL = "partial"  # some money allocated, not the full amount
+    PAID = "paid"
+
+class Installment(Base):
+    # One row per due period of a lease, generated for the whole term when the lease is created.
+    # Replaces date arithmetic on PaymentSchedule.next_due_date for "what is owed / overdue" questions.
+    __tablename__ = "installments"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    lease_id = Column(UUID(as_uuid=True), ForeignKey("leases.id"), nullable=False)
+    sequence_number = Column(Integer, nullable=False)  # 1, 2, 3 ... within the lease
+    
+    due_date = Column(DateTime, nullable=False)
+    amount_due = Column(Numeric(10, 2), nullable=False)
+    amount_paid = Column(Numeric(10, 2), default=0, nullable=False)
+    status = Column(Enum(InstallmentStatus), default=InstallmentStatus.DUE, nullable=False)
+    paid_at = Column(DateTime, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    lease = relationship("Lease", back_populates="installments")
+    allocations = relationship("InstallmentAllocation", back_populates="installment")
+    
+    __table_args__ = (
+        # A lease's installments in order (also stops double generation)
+        UniqueConstraint('lease_id', 'sequence_number', name='uq_installment_lease_sequence'),
+        # "What is overdue across the portfolio": status IN (due, partial) AND due_date < today
+        Index('idx_installment_status_due', 'status', 'due_date'),
+    )
+
+class InstallmentAllocation(Base):
+    # Which transaction paid how much of which installment.
+    # Unique per (transaction, installment): re-running allocation for a transaction is a no-op.
+    __tablename__ = "installment_allocations"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    installment_id = Column(UUID(as_uuid=True), ForeignKey("installments.id"), nullable=False)
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=False, index=True)
+    amount = Column(Numeric(10, 2), nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    installment = relationship("Installment", back_populates="allocations")
+    
+    __table_args__ = (
+        UniqueConstraint('transaction_id', 'installment_id', name='uq_allocation_transaction_installment'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, ForeignKey, DateTime, Integer, Enum
+from sqlalchemy import Column, String, Numeric, ForeignKey, DateTime, Integer, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -38,3 +38,9 @@ class Lease(Base):
         uselist=False # One-to-one relationship
     )
     transactions = relationship("Transaction", back_populates="lease")
+    installments = relationship("Installment", back_populates="lease", order_by="Installment.sequence_number")
+    
+    __table_args__ = (
+        # Vacancy: does this property have an ACTIVE lease (property search)
+        Index('idx_lease_property_status', 'property_id', 'status'),
+    )
@@ -0,0 +1,70 @@
+from sqlalchemy import Column, BigInteger, Numeric, ForeignKey, DateTime, Enum, Index, Identity, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+from app.ids import uuid7
+import uuid
+from datetime import datetime
+import enum
+
+class EntryDirection(str, enum.Enum):
+    DEBIT = "debit"    # money leaving the bank account
+    CREDIT = "credit"  # money arriving in the bank account
+
+class LedgerEntryType(str, enum.Enum):
+    PAYMENT = "payment"  # transaction completed: debit payer, credit payee
+    REFUND = "refund"    # transaction refunded: debit payee, credit payer
+
+class LedgerEntry(Base):
+    # Append-only. Every posting writes one DEBIT and one CREDIT of the same amount,
+    # so summing all entries of any posting always nets to zero.
+    __tablename__ = "ledger_entries"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered (app/ids.py)
+    sequence = Column(BigInteger, Identity(), nullable=False, unique=True)  # global posting order, used by checkpoints
+    
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=False)
+    account_id = Column(UUID(as_uuid=True), ForeignKey("bank_accounts.id"), nullable=False)
+    
+    direction = Column(Enum(EntryDirection), nullable=False)
+    entry_type = Column(Enum(LedgerEntryType), nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        # Statements: an account's entries after its last checkpoint
+        Index('idx_ledger_account_sequence', 'account_id', 'sequence'),
+        # Posting the same transaction twice (task retry, duplicate status update) is a no-op
+        UniqueConstraint('transaction_id', 'account_id', 'direction', 'entry_type', name='uq_ledger_posting'),
+    )
+
+class AccountBalance(Base):
+    # Running totals per bank account, updated in the same DB transaction as the entries.
+    # Reading a balance is a primary-key lookup instead of a SUM over transactions.
+    __tablename__ = "account_balances"
+    
+    account_id = Column(UUID(as_uuid=True), ForeignKey("bank_accounts.id"), primary_key=True)
+    total_debits = Column(Numeric(14, 2), default=0, nullable=False)
+    total_credits = Column(Numeric(14, 2), default=0, nullable=False)
+    entry_count = Column(BigInteger, default=0, nullable=False)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class BalanceCheckpoint(Base):
+    # Totals of an account re-derived from its entries up to through_sequence.
+    # Statement = latest checkpoint (opening balance) + entries after it.
+    __tablename__ = "balance_checkpoints"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    account_id = Column(UUID(as_uuid=True), ForeignKey("bank_accounts.id"), nullable=False)
+    through_sequence = Column(BigInteger, nullable=False)  # includes every entry with sequence <= this
+    
+    total_debits = Column(Numeric(14, 2), nullable=False)
+    total_credits = Column(Numeric(14, 2), nullable=False)
+    entry_count = Column(BigInteger, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_checkpoint_account_sequence', 'account_id', 'through_sequence'),
+    )
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+import uuid
+from datetime import datetime
+import enum
+
+class RetryStatus(str, enum.Enum):
+    SCHEDULED = "scheduled"    # waiting for due_at
+    DISPATCHED = "dispatched"  # transaction reset to PENDING and sent to a worker
+    CANCELLED = "cancelled"    # transaction was no longer FAILED when the retry came due
+
+class PaymentRetry(Base):
+    # Durable delayed retry of a failed payment (RetryService). Lives next to its transaction,
+    # so unlike a broker countdown it survives a Redis flush or a worker restart.
+    __tablename__ = "payment_retries"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=False)
+    attempt = Column(Integer, nullable=False)  # becomes the transaction's retry_count when dispatched
+    
+    reason = Column(String, nullable=True)     # failure being retried ("manual" for POST /payments/{id}/retry)
+    due_at = Column(DateTime, nullable=False)
+    status = Column(Enum(RetryStatus), default=RetryStatus.SCHEDULED, nullable=False)
+    dispatched_at = Column(DateTime, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # One retry per attempt number: scheduling the same attempt twice is a no-op
+        UniqueConstraint('transaction_id', 'attempt', name='uq_payment_retry_attempt'),
+        # The poller only ever asks "what is scheduled and due now?"
+        Index('idx_payment_retry_due', 'status', 'due_at'),
+    )
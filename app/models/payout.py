@@ -0,0 +1,71 @@
+from sqlalchemy import Column, String, Integer, Numeric, ForeignKey, DateTime, Enum, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+from app.models.ledger import LedgerEntryType
+import uuid
+from datetime import datetime
+import enum
+
+class PayoutStatus(str, enum.Enum):
+    PENDING = "pending"  # netted and linked to its transactions, waiting for its ACH file
+    FILED = "filed"      # written to its ACH file
+
+class AchFileStatus(str, enum.Enum):
+    GENERATING = "generating"
+    READY = "ready"      # complete on disk, ready to send to the bank
+
+class AchFile(Base):
+    # One NACHA file per payout run, covering the payouts of every shard. Main database only.
+    __tablename__ = "ach_files"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False, index=True)  # payments completed before this are included
+
+    path = Column(String, nullable=True)
+    status = Column(Enum(AchFileStatus), default=AchFileStatus.GENERATING, nullable=False)
+    entry_count = Column(Integer, default=0, nullable=False)
+    total_credit = Column(Numeric(14, 2), default=0, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    generated_at = Column(DateTime, nullable=True)
+
+class Payout(Base):
+    # Completed rent for one payee bank account, netted of refunds, paid out as a single ACH credit
+    # instead of one rail operation per transaction. Lives on the landlord's shard.
+    __tablename__ = "payouts"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    ach_file_id = Column(UUID(as_uuid=True), nullable=False, index=True)  # no FK: ach_files is on the main database
+    payee_account_id = Column(UUID(as_uuid=True), ForeignKey("bank_accounts.id"), nullable=False)
+
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    amount = Column(Numeric(14, 2), nullable=False)      # payments - refunds, always > 0
+    item_count = Column(Integer, nullable=False)
+
+    trace_number = Column(String(15), nullable=False)    # the entry's trace number in the ACH file
+    status = Column(Enum(PayoutStatus), default=PayoutStatus.PENDING, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Payout history of an account
+        Index('idx_payout_payee_created', 'payee_account_id', 'created_at'),
+    )
+
+class PayoutItem(Base):
+    # Which transactions make up a payout: a PAYMENT (+amount), or a later REFUND (-amount)
+    # of a payment that was already paid out
+    __tablename__ = "payout_items"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    payout_id = Column(UUID(as_uuid=True), ForeignKey("payouts.id"), nullable=False, index=True)
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=False)
+    item_type = Column(Enum(LedgerEntryType), nullable=False)
+    amount = Column(Numeric(10, 2), nullable=False)  # signed
+
+    __table_args__ = (
+        # A payment (and its refund) is netted into exactly one payout; also "which payout paid this?"
+        UniqueConstraint('transaction_id', 'item_type', name='uq_payout_item_transaction'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, ForeignKey, DateTime
+from sqlalchemy import Column, String, Numeric, ForeignKey, DateTime, Index, DDL, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -23,3 +23,18 @@ class Property(Base):
     # Relationships
     landlord = relationship("User", back_populates="properties")
     leases = relationship("Lease", back_populates="property")
+    
+    __table_args__ = (
+        # Fuzzy address / city search (ILIKE '%...%' and similarity %), see PropertySearchService
+        Index('idx_property_address_trgm', 'address', postgresql_using='gin', postgresql_ops={'address': 'gin_trgm_ops'}),
+        Index('idx_property_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        # Exact filters + rent range, already in keyset order (monthly_rent, id)
+        Index('idx_property_state_zip_rent', 'state', 'zip_code', 'monthly_rent', 'id'),
+        Index('idx_property_zip_rent', 'zip_code', 'monthly_rent', 'id'),
+        Index('idx_property_rent', 'monthly_rent', 'id'),
+        # A landlord's units (rent roll)
+        Index('idx_property_landlord', 'landlord_id'),
+    )
+
+# The trigram operator class must exist before the indexes above are created
+event.listen(Property.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
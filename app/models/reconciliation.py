@@ -0,0 +1,77 @@
+from sqlalchemy import Column, String, Integer, Numeric, ForeignKey, DateTime, Enum, Index
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+import uuid
+from datetime import datetime
+import enum
+
+# Main database only (not created on the extra shards, see app/sharding.py)
+
+class Discrepancy(str, enum.Enum):
+    UNEXPECTED_BANK_CHARGE = "unexpected_bank_charge"  # on the bank statement, no transaction of ours
+    MISSING_IN_BANK = "missing_in_bank"                # completed on our side, bank hasn't reported it (float)
+    AMOUNT_MISMATCH = "amount_mismatch"
+    STATUS_MISMATCH = "status_mismatch"
+
+class ReconciliationState(str, enum.Enum):
+    OPEN = "open"          # re-checked on every run until it matches
+    RESOLVED = "resolved"
+
+class BankStatement(Base):
+    # Lines imported from the bank (see scripts/reconciliation_setup.sql). Append-only.
+    __tablename__ = "bank_statements"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    transaction_ref = Column(String, unique=True, nullable=False)  # our transaction id
+    amount = Column(Numeric(10, 2), nullable=False)
+    status = Column(String, nullable=False)
+    processed_at = Column(DateTime, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_bank_stmt_processed', 'processed_at'),
+        # Incremental reconciliation: statements received since the last watermark, in keyset order
+        Index('idx_bank_stmt_created', 'created_at', 'id'),
+    )
+
+class ReconciliationResult(Base):
+    # One row per transaction reference that was ever out of line with the bank
+    __tablename__ = "reconciliation_results"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    transaction_ref = Column(String, unique=True, nullable=False)
+
+    transaction_id = Column(UUID(as_uuid=True), nullable=True)  # no FK: the transaction may live on another shard
+    bank_statement_id = Column(UUID(as_uuid=True), ForeignKey("bank_statements.id"), nullable=True)
+
+    internal_amount = Column(Numeric(10, 2), nullable=True)
+    bank_amount = Column(Numeric(10, 2), nullable=True)
+    internal_status = Column(String, nullable=True)
+    bank_status = Column(String, nullable=True)
+
+    discrepancy = Column(Enum(Discrepancy), nullable=False)  # latest one seen
+    state = Column(Enum(ReconciliationState), default=ReconciliationState.OPEN, nullable=False)
+
+    first_detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_checked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    resolved_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Re-checking open items, and the summary (open items grouped by discrepancy)
+        Index('idx_reconciliation_state_discrepancy', 'state', 'discrepancy'),
+    )
+
+class ReconciliationRun(Base):
+    __tablename__ = "reconciliation_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Watermark: everything changed up to here has been checked; the next run starts after it
+    through = Column(DateTime, nullable=False, index=True)
+
+    checked = Column(Integer, default=0, nullable=False)   # transaction references examined
+    opened = Column(Integer, default=0, nullable=False)    # found (or still) out of line
+    resolved = Column(Integer, default=0, nullable=False)  # open items that now match
+
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=False)
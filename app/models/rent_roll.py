@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, Numeric, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+import uuid
+from datetime import datetime
+
+class RentRollMonth(Base):
+    # Frozen rent roll: one row per property and closed month, written once the month is past
+    # RENT_ROLL_FREEZE_LAG_DAYS (see RentRollService). Lives on the landlord's shard.
+    __tablename__ = "rent_roll_months"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    landlord_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    month = Column(DateTime, nullable=False)  # first day of the month, midnight UTC
+    property_id = Column(UUID(as_uuid=True), ForeignKey("properties.id"), nullable=False)
+
+    lease_count = Column(Integer, nullable=False)
+    expected_rent = Column(Numeric(12, 2), nullable=False)  # rent_amount of every lease in effect during the month
+    payment_count = Column(Integer, nullable=False)
+    received = Column(Numeric(12, 2), nullable=False)       # COMPLETED transactions, by completed_at
+
+    frozen_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # A landlord's month, in one index range scan; also makes freezing idempotent
+        UniqueConstraint('landlord_id', 'month', 'property_id', name='uq_rent_roll_month_property'),
+    )
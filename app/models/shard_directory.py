@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+from datetime import datetime
+import enum
+
+# Directory tables: live on shard 0 (the main database) only, see app/sharding.py.
+# Leases and transactions point at their landlord, not at a shard, so moving
+# a landlord to another shard is a single-row update in landlord_shards.
+
+class ShardStatus(str, enum.Enum):
+    ACTIVE = "active"
+    MOVING = "moving"  # being resharded: reads still served, writes rejected until the move finishes
+
+class LandlordShard(Base):
+    __tablename__ = "landlord_shards"
+    
+    landlord_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    shard_id = Column(Integer, nullable=False)
+    status = Column(Enum(ShardStatus), default=ShardStatus.ACTIVE, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class LeaseDirectory(Base):
+    __tablename__ = "lease_directory"
+    
+    lease_id = Column(UUID(as_uuid=True), primary_key=True)  # no FK: the lease itself lives on a shard
+    landlord_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+
+class TransactionDirectory(Base):
+    # Registered together with the transaction's idempotency key (idempotency_keys), before the
+    # transaction is written on its shard, so the same key can never create two transactions on two shards
+    __tablename__ = "transaction_directory"
+    
+    transaction_id = Column(UUID(as_uuid=True), primary_key=True)
+    landlord_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -2,7 +2,7 @@ from sqlalchemy import Column, String, Numeric, Integer, ForeignKey, DateTime, E
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
-import uuid
+from app.ids import uuid7
 from datetime import datetime
 import enum
 
@@ -13,6 +13,22 @@ class TransactionStatus(str, enum.Enum):
     FAILED = "failed"
     REFUNDED = "refunded"
 
+# The only status changes PaymentService.compare_and_set_status will make
+ALLOWED_TRANSITIONS = {
+    TransactionStatus.PENDING: {TransactionStatus.PROCESSING, TransactionStatus.FAILED},
+    TransactionStatus.PROCESSING: {TransactionStatus.COMPLETED, TransactionStatus.FAILED},
+    TransactionStatus.FAILED: {TransactionStatus.PENDING},  # retry
+    TransactionStatus.COMPLETED: {TransactionStatus.REFUNDED},
+    TransactionStatus.REFUNDED: set(),
+}
+
+# failure_reason prefix of a payment declined by the velocity (fraud) checks at initiation.
+# A declined payment is final: neither a manual nor a scheduled retry may send it to a rail.
+FRAUD_DECLINED_REASON = "Payment blocked by fraud detection"
+
+def is_fraud_declined(failure_reason: str | None) -> bool:
+    return failure_reason is not None and failure_reason.startswith(FRAUD_DECLINED_REASON)
+
 class PaymentRailType(str, enum.Enum): # payment rails refer to the infrastruture that moves money between banks
     INSTANT = "instant"  # Like RTP(Real TIME payment network)/FedNow US FED Reserve's instant payment service  
     #URGRENT RENT PAYMENTS
@@ -24,10 +40,12 @@ class PaymentRailType(str, enum.Enum): # payment rails refer to the infrastrutur
 class Transaction(Base):
     __tablename__ = "transactions"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered: inserts append to the index (app/ids.py)
     
     # IDEMPOTENCY KEY - Critical for preventing duplicates
-    idempotency_key = Column(String, unique=True, nullable=False, index=True)
+    # Enforced by idempotency_keys (IdempotencyService) for its TTL only; nothing looks transactions up
+    # by key, so no index on the hottest table. Not the bank reference: that is the id (reconciliation)
+    idempotency_key = Column(String, nullable=False)
     
     lease_id = Column(UUID(as_uuid=True), ForeignKey("leases.id"), nullable=False)
     
@@ -36,6 +54,8 @@ class Transaction(Base):
     
     amount = Column(Numeric(10, 2), nullable=False)
     status = Column(Enum(TransactionStatus), default=TransactionStatus.PENDING, nullable=False)
+    # Bumped by every status change; a transition only applies to the version it was decided on
+    version = Column(Integer, default=1, server_default="1", nullable=False)
     payment_rail_type = Column(Enum(PaymentRailType), default=PaymentRailType.STANDARD_ACH)
     
     # Timestamps for state tracking
@@ -65,6 +85,10 @@ class Transaction(Base):
     __table_args__ = (
         Index('idx_transaction_status_created', 'status', 'created_at'),
         Index('idx_transaction_lease', 'lease_id', 'created_at'),
+        # Incremental reconciliation: transactions changed since the last watermark, in keyset order
+        Index('idx_transaction_updated', 'updated_at', 'id'),
+        # Money received in a month (rent roll)
+        Index('idx_transaction_completed', 'completed_at'),
     )
     #What is __table_args__?
 #__table_args__ is where you define extra table-level configuration.
@@ -1,14 +1,14 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime, JSON, Enum
+from sqlalchemy import Column, String, BigInteger, ForeignKey, DateTime, JSON, Enum, Index, Identity, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
-import uuid
+from app.ids import uuid7
 from datetime import datetime
 
 class TransactionEvent(Base):
     __tablename__ = "transaction_events"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)  # time-ordered (app/ids.py)
     transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=False)
     
     event_type = Column(String, nullable=False)  # "status_change", "retry_attempted", etc.
@@ -18,5 +18,17 @@ class TransactionEvent(Base):
     details = Column(JSON, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
     
+    # Change feed position (GET /api/v1/events): the id of the DB transaction that wrote the event,
+    # and the insert order within it. Assigned by each shard, so not carried over when a landlord moves.
+    txid = Column(BigInteger, server_default=text("txid_current()"), nullable=False, info={"shard_local": True})
+    sequence = Column(BigInteger, Identity(), nullable=False, unique=True, info={"shard_local": True})
+    
     # Relationships
-    transaction = relationship("Transaction", back_populates="events")
\ No newline at end of file
+    transaction = relationship("Transaction", back_populates="events")
+    
+    __table_args__ = (
+        # Change feed: keyset on (txid, sequence)
+        Index('idx_transaction_event_feed', 'txid', 'sequence'),
+        # Time-range exports
+        Index('idx_transaction_event_timestamp', 'timestamp'),
+    )
\ No newline at end of file
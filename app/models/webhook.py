@@ -0,0 +1,55 @@
+from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, DateTime, Enum, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from app.database import Base
+import uuid
+from datetime import datetime
+import enum
+
+class DeliveryStatus(str, enum.Enum):
+    PENDING = "pending"      # waiting for the delivery worker (first attempt or retry)
+    DELIVERED = "delivered"  # subscriber answered with a 2xx
+    FAILED = "failed"        # gave up after WEBHOOK_MAX_ATTEMPTS
+
+class WebhookSubscription(Base):
+    __tablename__ = "webhook_subscriptions"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Events are delivered for every transaction where one of this user's bank accounts is payer or payee
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    
+    url = Column(String, nullable=False)
+    secret = Column(String, nullable=False)  # HMAC key used to sign every batch we POST to url
+    is_active = Column(Boolean, default=True, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    deliveries = relationship("WebhookDelivery", back_populates="subscription")
+
+class WebhookDelivery(Base):
+    # Outbox row: written in the same DB transaction as the TransactionEvent it announces,
+    # so an event is never lost even if the worker or Redis is down when it happens
+    __tablename__ = "webhook_deliveries"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    subscription_id = Column(UUID(as_uuid=True), ForeignKey("webhook_subscriptions.id"), nullable=False)
+    transaction_event_id = Column(UUID(as_uuid=True), ForeignKey("transaction_events.id"), nullable=False)
+    
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(DeliveryStatus), default=DeliveryStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    subscription = relationship("WebhookSubscription", back_populates="deliveries")
+    
+    # The delivery worker only ever asks "what is pending and due now?"
+    __table_args__ = (
+        Index('idx_webhook_delivery_due', 'status', 'next_attempt_at'),
+    )
@@ -0,0 +1,323 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from urllib.parse import parse_qs
+from redis.exceptions import RedisError
+from app.redis_client import get_redis
+from app.config import settings
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# On-demand sampling profiler, for finding CPU hot spots (serialization, Pydantic validation, ORM
+# hydration ...) in production-like runs without an instrumented build:
+#   - API: a request carrying X-Profile: <PROFILING_TOKEN> (or ?profile=<token>) is profiled;
+#     the response gets X-Profile-Id
+#   - Celery: `python -m app.cli.profiles arm process_payment_async --count 5` profiles the next
+#     5 runs of the task on any worker; a message sent with headers={"profile": True} is profiled too
+# A sampler thread reads the target threads' Python stacks every PROFILE_INTERVAL_MS. In "cpu" mode
+# (Linux) a sample only counts if the thread actually ran since the last one, so waiting on the
+# database, Redis or the rail doesn't drown the hot spots. Profiles are stored in PROFILE_DIR as
+# folded stacks ("frame;frame;frame count", for flamegraph.pl / speedscope), newest PROFILE_MAX_FILES kept.
+
+PROFILE_HEADER = "x-profile"
+ARMED_KEY = "profile:armed"  # hash: task name -> runs left to profile, shared by every worker
+
+# Decrement a task's armed count if it is positive; returns 1 if this run is profiled
+_CLAIM = """
+local left = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+if left <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    return 0
+end
+if left == 1 then redis.call('HDEL', KEYS[1], ARGV[1]) else redis.call('HINCRBY', KEYS[1], ARGV[1], -1) end
+return 1
+"""
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    parts = path.replace("\\", "/").split("/")
+    if "site-packages" in parts:  # library frames by package, not by virtualenv path
+        parts = parts[parts.index("site-packages") + 1:]
+    elif "app" in parts:
+        parts = parts[parts.index("app"):]
+    else:
+        parts = parts[-2:]
+    return f"{code.co_qualname} ({'/'.join(parts)}:{code.co_firstlineno})"
+
+
+def fold(frame) -> str:
+    """A stack as one folded line, outermost frame first"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _cpu_ns(native_id: int) -> int | None:
+    """Time a thread has spent on a CPU (Linux schedstat), None where that isn't available"""
+    try:
+        with open(f"/proc/self/task/{native_id}/schedstat") as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class Profile:
+    id: str
+    kind: str  # "request" or "task"
+    name: str
+    started_at: datetime
+    mode: str
+    interval_ms: float
+    duration_ms: float = 0.0
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    details: dict = field(default_factory=dict)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def meta(self) -> dict:
+        return {
+            "id": self.id, "kind": self.kind, "name": self.name, "started_at": self.started_at.isoformat(),
+            "mode": self.mode, "interval_ms": self.interval_ms, "duration_ms": round(self.duration_ms, 1),
+            "samples": self.samples, **self.details,
+        }
+
+
+class Sampler:
+    """
+    Samples the Python stacks of some threads (None: every thread but its own) on a background
+    thread until stop(). Stops sampling by itself after PROFILE_MAX_SECONDS.
+    """
+
+    def __init__(self, profile: Profile, thread_ids: set[int] | None = None):
+        self.profile = profile
+        self.thread_ids = thread_ids
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._started = 0.0
+
+    def start(self) -> "Sampler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        self._thread.join()
+        self.profile.duration_ms = (time.perf_counter() - self._started) * 1000
+        return self.profile
+
+    def _native_ids(self) -> dict[int, int]:
+        return {thread.ident: thread.native_id for thread in threading.enumerate() if thread.ident}
+
+    def _run(self) -> None:
+        interval = self.profile.interval_ms / 1000
+        deadline = time.perf_counter() + settings.PROFILE_MAX_SECONDS
+        own = threading.get_ident()
+        cpu_mode = self.profile.mode == "cpu"
+        native_ids = self._native_ids() if cpu_mode else {}
+        last_cpu = {}
+
+        while not self._stop.wait(interval) and time.perf_counter() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                if cpu_mode:
+                    if ident not in native_ids:
+                        native_ids = self._native_ids()
+                    cpu = _cpu_ns(native_ids.get(ident, 0))
+                    previous, last_cpu[ident] = last_cpu.get(ident), cpu
+                    if cpu is not None and (previous is None or cpu == previous):
+                        continue  # off-CPU since the last sample (or nothing to compare with yet)
+                self.profile.stacks[fold(frame)] += 1
+                self.profile.samples += 1
+
+
+def new_profile(kind: str, name: str, **details) -> Profile:
+    mode = settings.PROFILE_MODE
+    if mode == "cpu" and _cpu_ns(threading.get_native_id()) is None:
+        mode = "wall"  # no per-thread CPU clock here (not Linux)
+    return Profile(
+        id=uuid.uuid4().hex[:16], kind=kind, name=name, started_at=datetime.utcnow(),
+        mode=mode, interval_ms=settings.PROFILE_INTERVAL_MS, details=details,
+    )
+
+
+# ---- Store -----------------------------------------------------------------------------------
+
+def save(profile: Profile) -> str:
+    """Write <dir>/<id>.folded + <id>.json, then drop the oldest beyond PROFILE_MAX_FILES"""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    base = os.path.join(settings.PROFILE_DIR, profile.id)
+    with open(base + ".folded", "w") as f:
+        f.write(profile.folded())
+    with open(base + ".json", "w") as f:  # written last: list_profiles() only sees complete profiles
+        json.dump(profile.meta(), f)
+    prune()
+    return base + ".folded"
+
+
+def list_profiles() -> list[dict]:
+    """Stored profiles, newest first"""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # being pruned by another process
+    return sorted(profiles, key=lambda meta: meta["started_at"], reverse=True)
+
+
+def load_folded(profile_id: str) -> str:
+    with open(os.path.join(settings.PROFILE_DIR, f"{os.path.basename(profile_id)}.folded")) as f:
+        return f.read()
+
+
+def prune() -> None:
+    for meta in list_profiles()[settings.PROFILE_MAX_FILES:]:
+        for suffix in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(settings.PROFILE_DIR, meta["id"] + suffix))
+            except FileNotFoundError:
+                pass
+
+
+# ---- API -------------------------------------------------------------------------------------
+
+def _requested(scope) -> bool:
+    """Privileged: only with the configured token (no token configured, no API profiling)"""
+    token = settings.PROFILING_TOKEN
+    if not token:
+        return False
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER.encode():
+            return hmac.compare_digest(value.decode("latin-1"), token)
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile")
+    return bool(query) and hmac.compare_digest(query[0], token)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that ask for it (see the top of this module). A sync endpoint runs on a
+    threadpool thread, so every thread of the process is sampled: profile on a quiet instance.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = new_profile("request", f"{scope['method']} {scope['path']}")
+        sampler = Sampler(profile).start()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.details["status_code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            try:
+                save(profile)
+            except OSError as e:
+                logger.warning(f"Could not store profile {profile.id}: {e}")
+
+
+# ---- Celery ----------------------------------------------------------------------------------
+
+def arm(task_name: str, count: int) -> None:
+    """Profile the next `count` runs of a task (by function name, e.g. process_payment_async) fleet-wide"""
+    get_redis().hset(ARMED_KEY, task_name, count)
+
+
+def disarm(task_name: str) -> None:
+    get_redis().hdel(ARMED_KEY, task_name)
+
+
+def armed() -> dict[str, int]:
+    return {name.decode(): int(left) for name, left in get_redis().hgetall(ARMED_KEY).items()}
+
+
+class ArmedTasks:
+    """
+    Which tasks are armed, refreshed at most every PROFILE_ARM_POLL_SECONDS per worker process,
+    so a task run normally costs no Redis round trip; claiming an armed run is atomic.
+    """
+
+    def __init__(self):
+        self._names: set[str] = set()
+        self._checked = 0.0
+        self._claim = None
+
+    def claim(self, task_name: str) -> bool:
+        now = time.monotonic()
+        try:
+            if now - self._checked >= settings.PROFILE_ARM_POLL_SECONDS:
+                self._names = set(armed())
+                self._checked = now
+            if task_name not in self._names:
+                return False
+            if self._claim is None:
+                self._claim = get_redis().register_script(_CLAIM)
+            if self._claim(keys=[ARMED_KEY], args=[task_name]):
+                return True
+            self._names.discard(task_name)
+            return False
+        except RedisError as e:
+            self._checked = now  # don't retry a dead Redis on every task
+            logger.warning(f"Could not check armed profiles: {e}")
+            return False
+
+
+armed_tasks = ArmedTasks()
+_task_samplers: dict = {}  # task id -> Sampler of the running task
+
+
+def install_celery_profiling() -> None:
+    """Connect the Celery signals (called once from app/celery_app.py)"""
+    from celery import signals
+
+    @signals.task_prerun.connect(weak=False)
+    def _start(task_id=None, task=None, **kwargs):
+        short_name = task.name.rsplit(".", 1)[-1]
+        if not (getattr(task.request, "profile", False) or armed_tasks.claim(short_name)):
+            return
+        profile = new_profile("task", short_name, task_id=task_id, retries=task.request.retries or 0)
+        _task_samplers[task_id] = Sampler(profile, thread_ids={threading.get_ident()}).start()
+
+    @signals.task_postrun.connect(weak=False)
+    def _finish(task_id=None, state=None, **kwargs):
+        sampler = _task_samplers.pop(task_id, None)
+        if sampler is None:
+            return
+        profile = sampler.stop()
+        profile.details["state"] = state or ""
+        try:
+            path = save(profile)
+            logger.info(f"Profiled {profile.name} ({task_id}): {profile.samples} samples -> {path}")
+        except OSError as e:
+            logger.warning(f"Could not store profile {profile.id}: {e}")
@@ -0,0 +1,157 @@
+from collections import defaultdict
+from redis.exceptions import RedisError
+from starlette.responses import JSONResponse
+from app.database import engine
+from app.redis_client import get_async_redis
+from app.metrics import counter
+from app.config import settings
+import asyncio
+import math
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Overload protection in front of every route, cheapest check first:
+#   1. load shedding (per API process): too many requests of a route class in flight, or the
+#      primary's connection pool nearly exhausted -> 503 + Retry-After, before the request can
+#      queue for a connection and drag every other tenant into timeouts with it
+#   2. rate limits (fleet-wide, Redis sliding window) per API client and route class -> 429 + Retry-After
+# Rejections are cheap and immediate, so overload degrades into fast refusals instead of cascading.
+
+RATE_LIMITED = counter("rate_limited_requests_total", "Requests rejected with 429, by route class")
+SHED = counter("shed_requests_total", "Requests rejected with 503, by route class and reason (in_flight, pool)")
+RATE_LIMIT_ERRORS = counter("rate_limit_errors_total", "Rate limit checks that failed open (Redis slow or down)")
+
+EXEMPT_PATHS = {"/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json"}
+BULK_PREFIXES = ("/api/v1/imports", "/api/v1/exports", "/api/v1/events/export")
+
+# One sorted set per (route class, client): score = request time in ms.
+# Rejected requests are not recorded, so a client hammering away doesn't extend its own wait.
+# KEYS[1]: the set; ARGV: now_ms, window_ms, limit, member. Returns ms until a slot frees up (0 = allowed).
+_SLIDING_WINDOW = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return 0
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return math.max(tonumber(oldest[2]) + window - now, 1)
+"""
+
+
+def route_class(method: str, path: str) -> str | None:
+    """Which limits apply to a request (None: none, e.g. health checks)"""
+    if path in EXEMPT_PATHS:
+        return None
+    if path.endswith("/stream"):
+        return "stream"
+    if path.startswith(BULK_PREFIXES):
+        return "bulk"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    if path.startswith("/api/v1/payments"):
+        return "payment_write"
+    return "write"
+
+
+def client_id(scope) -> str:
+    header = settings.RATE_LIMIT_CLIENT_HEADER.lower().encode()
+    for name, value in scope.get("headers", []):
+        if name == header and value:
+            return value.decode("latin-1")[:128]
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "anonymous"
+
+
+def pool_utilization() -> float:
+    """Share of the primary's connections checked out (1.0 = the next request waits for one)"""
+    pool = engine.pool
+    if not hasattr(pool, "size"):
+        return 0.0  # pools without a fixed size (NullPool, StaticPool) never make requests wait
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    return pool.checkedout() / capacity if capacity else 0.0
+
+
+class SlidingWindowLimiter:
+    """Shared by every API instance through Redis, so a client's limit holds across the fleet"""
+
+    def __init__(self):
+        self._script = None
+
+    async def retry_after_ms(self, client: str, route: str, limit: int, window_seconds: int, now: float) -> int:
+        if self._script is None:
+            self._script = get_async_redis().register_script(_SLIDING_WINDOW)
+        wait = self._script(
+            keys=[f"ratelimit:{route}:{client}"],
+            args=[int(now * 1000), window_seconds * 1000, limit, uuid.uuid4().hex],
+        )
+        return int(await asyncio.wait_for(wait, timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS))
+
+
+def _reject(status_code: int, detail: str, retry_after: int) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code, headers={"Retry-After": str(retry_after)})
+
+
+class RateLimitMiddleware:
+    """Load shedding and per-client rate limits (see the top of this module)"""
+
+    def __init__(self, app, limiter: SlidingWindowLimiter | None = None):
+        self.app = app
+        self.limiter = limiter or SlidingWindowLimiter()
+        self.in_flight = defaultdict(int)  # route class -> requests being handled by this process
+
+    def _shed_reason(self, route: str) -> str | None:
+        max_in_flight = settings.LOAD_SHED_MAX_IN_FLIGHT.get(route)
+        if max_in_flight is None:
+            return None  # e.g. SSE streams: long-lived, but they don't hold a DB connection
+        if self.in_flight[route] >= max_in_flight:
+            return "in_flight"
+        if pool_utilization() >= settings.LOAD_SHED_POOL_UTILIZATION:
+            return "pool"
+        return None
+
+    async def _retry_after(self, scope, route: str) -> int:
+        """Seconds the client has to wait, 0 if it is within its limit"""
+        limit = settings.RATE_LIMITS.get(route)
+        if not limit:
+            return 0
+        requests, window_seconds = limit
+        try:
+            wait_ms = await self.limiter.retry_after_ms(client_id(scope), route, requests, window_seconds, time.time())
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            # Fail open: losing the limiter must not take the API down with it (shedding still applies)
+            RATE_LIMIT_ERRORS.inc()
+            logger.warning(f"Rate limit check failed, allowing the request: {e!r}")
+            return 0
+        return math.ceil(wait_ms / 1000)
+
+    async def __call__(self, scope, receive, send):
+        route = route_class(scope.get("method", ""), scope.get("path", "")) if scope["type"] == "http" else None
+        if route is None or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._shed_reason(route)
+        if reason:
+            SHED.inc(route_class=route, reason=reason)
+            response = _reject(503, "Server busy, retry later", settings.LOAD_SHED_RETRY_AFTER_SECONDS)
+            await response(scope, receive, send)
+            return
+
+        retry_after = await self._retry_after(scope, route)
+        if retry_after:
+            RATE_LIMITED.inc(route_class=route)
+            response = _reject(429, f"Rate limit exceeded for {route} requests", retry_after)
+            await response(scope, receive, send)
+            return
+
+        self.in_flight[route] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[route] -= 1
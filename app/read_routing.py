@@ -0,0 +1,80 @@
+from contextvars import ContextVar
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.datastructures import MutableHeaders
+from app.database import SessionLocal, engine, replica_engine, LSN_HEADER, LSN_COOKIE
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Read-your-writes for replica routing (see get_read_db in app/database.py):
+# when a request commits a write, remember the primary's WAL position and hand it
+# back to the client, which sends it on its next reads.
+
+# Per-request holder, set by the middleware. A dict (not a plain value) because
+# sync endpoints run in a threadpool with a COPY of the context: the copy still
+# points at the same dict, so the endpoint's commit is visible to the middleware.
+_request_writes: ContextVar[dict | None] = ContextVar("request_writes", default=None)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _executed(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements don't go through flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("wrote", None)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _committed(session):
+    writes = _request_writes.get()
+    if not session.info.pop("wrote", False) or writes is None or replica_engine is None:
+        return  # read-only commit, not an API request (e.g. a Celery task), or no replica to protect against
+
+    try:
+        with engine.connect() as conn:
+            writes["lsn"] = conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+    except SQLAlchemyError as e:
+        # Without a token the next read may briefly see the replica's older state; don't fail the write for it
+        logger.warning(f"Could not read the primary WAL position: {e}")
+
+
+class ReadYourWritesMiddleware:
+    """Adds the LSN token (header + cookie) to responses of requests that committed a write"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes: dict = {}
+        token = _request_writes.set(writes)
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start" and writes.get("lsn"):
+                headers = MutableHeaders(scope=message)
+                headers.append(LSN_HEADER, writes["lsn"])
+                headers.append(
+                    "set-cookie",
+                    f"{LSN_COOKIE}={writes['lsn']}; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                    f"Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_token)
+        finally:
+            _request_writes.reset(token)
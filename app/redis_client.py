@@ -0,0 +1,42 @@
+import redis
+import redis.asyncio as aioredis
+from app.config import settings
+
+# Shared Redis clients (each one owns a connection pool), created lazily on first use.
+# Short socket timeouts: Redis is an accelerator here, never the source of truth,
+# so a slow or dead Redis must fail fast instead of stalling API requests and workers.
+_redis = None
+_async_redis = None
+_velocity_redis = None
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        )
+    return _redis
+
+def get_async_redis() -> aioredis.Redis:
+    # For async endpoints (e.g. SSE streams) so waiting on Redis never blocks the event loop
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        )
+    return _async_redis
+
+def get_velocity_redis() -> redis.Redis:
+    # Separate pool with a much tighter timeout: velocity checks sit on the payment
+    # request path with a ~1ms budget and fail open rather than wait
+    global _velocity_redis
+    if _velocity_redis is None:
+        _velocity_redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.VELOCITY_REDIS_TIMEOUT_SECONDS,
+            socket_timeout=settings.VELOCITY_REDIS_TIMEOUT_SECONDS,
+        )
+    return _velocity_redis
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, UUID4, ConfigDict
+from decimal import Decimal
+from datetime import datetime
+from app.models.installment import InstallmentStatus
+
+class InstallmentResponse(BaseModel):
+    id: UUID4
+    lease_id: UUID4
+    sequence_number: int
+    due_date: datetime
+    amount_due: Decimal
+    amount_paid: Decimal
+    status: InstallmentStatus
+    paid_at: datetime | None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class RenterBalanceResponse(BaseModel):
+    renter_id: UUID4
+    as_of: datetime
+    amount_overdue: Decimal  # unpaid installments already due
+    amount_remaining_on_leases: Decimal  # everything still unpaid, including future months
@@ -34,4 +34,15 @@ class LeaseResponse(LeaseBase):
     status: LeaseStatus
     created_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class DelinquencySnapshotResponse(BaseModel):
+    snapshot_date: datetime
+    lease_id: UUID4
+    overdue_installments: int
+    amount_overdue: Decimal
+    oldest_due_date: datetime
+    days_past_due: int
+    late_fee: Decimal
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, UUID4, ConfigDict
+from uuid import UUID
+from decimal import Decimal
+from datetime import datetime
+from typing import Dict, List
+from app.models.ledger import EntryDirection, LedgerEntryType
+
+class AccountBalanceResponse(BaseModel):
+    account_id: UUID4
+    total_debits: Decimal
+    total_credits: Decimal
+    balance: Decimal  # credits - debits: money received minus money sent
+    entry_count: int
+    updated_at: datetime | None
+
+class LedgerEntryResponse(BaseModel):
+    id: UUID  # UUIDv7 (app/ids.py)
+    sequence: int
+    transaction_id: UUID
+    direction: EntryDirection
+    entry_type: LedgerEntryType
+    amount: Decimal
+    created_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class AccountStatementResponse(BaseModel):
+    account_id: UUID4
+    checkpoint_sequences: Dict[int, int]  # per shard: entries up to this sequence are summarized in opening_balance
+    opening_balance: Decimal
+    entries: List[LedgerEntryResponse]
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, UUID4, ConfigDict
+from uuid import UUID
+from decimal import Decimal
+from datetime import datetime
+from typing import List
+from app.models.ledger import LedgerEntryType
+from app.models.payout import PayoutStatus
+
+class PayoutItemResponse(BaseModel):
+    transaction_id: UUID
+    item_type: LedgerEntryType  # PAYMENT (+amount) or REFUND (-amount)
+    amount: Decimal
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PayoutResponse(BaseModel):
+    id: UUID4
+    ach_file_id: UUID4
+    payee_account_id: UUID4
+    window_start: datetime
+    window_end: datetime
+    amount: Decimal
+    item_count: int
+    trace_number: str
+    status: PayoutStatus
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PayoutDetailResponse(PayoutResponse):
+    items: List[PayoutItemResponse]
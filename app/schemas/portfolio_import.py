@@ -0,0 +1,69 @@
+from pydantic import BaseModel, UUID4, EmailStr, field_validator, model_validator
+from decimal import Decimal
+from typing import Optional, List
+from datetime import datetime
+
+# One schema per record_type in a portfolio import file (CSV or NDJSON).
+# CSV files use the union of these columns plus "record_type"; unused cells stay empty.
+
+class PropertyImportRow(BaseModel):
+    ref: str  # client-side key, lets lease rows point at properties created by the same file
+    address: str
+    city: str
+    state: str
+    zip_code: str
+    monthly_rent: Decimal
+
+class BankAccountImportRow(BaseModel):
+    owner_email: Optional[EmailStr] = None  # empty = the landlord being onboarded
+    account_number_token: str  # Last 4 digits only
+    routing_number: str
+    bank_name: str
+    is_primary: bool = False
+
+class LeaseImportRow(BaseModel):
+    property_ref: Optional[str] = None  # a property from this file...
+    property_id: Optional[UUID4] = None  # ...or one the landlord already has
+    renter_email: EmailStr
+    renter_full_name: Optional[str] = None  # required only if the renter doesn't exist yet
+    start_date: datetime
+    end_date: datetime
+    rent_amount: Decimal
+    due_day_of_month: int
+
+    @field_validator('due_day_of_month')
+    @classmethod
+    def validate_due_day(cls, v):
+        if v < 1 or v > 28:  # same rule as LeaseBase
+            raise ValueError('Due day must be between 1 and 28')
+        return v
+
+    @field_validator('rent_amount')
+    @classmethod
+    def validate_rent(cls, v):
+        if v <= 0:
+            raise ValueError('Rent amount must be positive')
+        return v
+
+    @model_validator(mode='after')
+    def validate_lease(self):
+        if (self.property_ref is None) == (self.property_id is None):
+            raise ValueError('Exactly one of property_ref or property_id is required')
+        if self.end_date <= self.start_date:
+            raise ValueError('end_date must be after start_date')
+        return self
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class PortfolioImportResult(BaseModel):
+    landlord_id: UUID4
+    renters_created: int
+    properties_created: int
+    bank_accounts_created: int
+    leases_created: int
+    payment_schedules_created: int
+    installments_created: int
+    already_imported: int  # properties, bank accounts and leases written by an earlier run of the file, skipped
+    chunks_committed: int
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, UUID4, ConfigDict
+from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime
 
@@ -21,4 +22,11 @@ class PropertyResponse(PropertyBase): # schema for outgoing response
 
     #normally pydantic expcts a dictionary 
     # but when you fetch from database using sqlalchemy, you dont get a dictionary
-    # you get an object
\ No newline at end of file
+    # you get an object
+
+class PropertySearchResult(PropertyResponse):
+    vacant: bool  # no ACTIVE lease on the property
+
+class PropertySearchPage(BaseModel):
+    items: List[PropertySearchResult]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page; null = no more results
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, UUID4, ConfigDict
+from uuid import UUID
+from decimal import Decimal
+from datetime import datetime
+from typing import List, Optional
+from app.models.reconciliation import Discrepancy, ReconciliationState
+
+class DiscrepancyCount(BaseModel):
+    discrepancy: Discrepancy
+    count: int
+    total_amount: Decimal
+
+class ReconciliationRunResponse(BaseModel):
+    through: datetime  # watermark: changes up to here are reconciled
+    checked: int
+    opened: int
+    resolved: int
+    started_at: datetime
+    finished_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class ReconciliationSummaryResponse(BaseModel):
+    open: List[DiscrepancyCount]
+    open_total: int
+    last_run: Optional[ReconciliationRunResponse] = None
+
+class ReconciliationResultResponse(BaseModel):
+    id: UUID4
+    transaction_ref: str
+    transaction_id: Optional[UUID] = None
+    bank_statement_id: Optional[UUID4] = None
+    internal_amount: Optional[Decimal] = None
+    bank_amount: Optional[Decimal] = None
+    internal_status: Optional[str] = None
+    bank_status: Optional[str] = None
+    discrepancy: Discrepancy
+    state: ReconciliationState
+    first_detected_at: datetime
+    last_checked_at: datetime
+    resolved_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, UUID4, field_validator, ConfigDict
+from uuid import UUID
 from decimal import Decimal
 from typing import Optional
 from datetime import datetime
@@ -20,7 +21,7 @@ class TransactionCreate(BaseModel):
         return v
 
 class TransactionResponse(BaseModel):
-    id: UUID4
+    id: UUID  # UUIDv7 for new transactions (app/ids.py), v4 for older ones
     idempotency_key: str
     lease_id: UUID4
     payer_account_id: UUID4
@@ -34,5 +35,6 @@ class TransactionResponse(BaseModel):
     failed_at: datetime | None
     failure_reason: str | None
     retry_count: int
+    version: int  # bumped by every status change
     
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
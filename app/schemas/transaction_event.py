@@ -0,0 +1,20 @@
+from pydantic import BaseModel, ConfigDict
+from uuid import UUID
+from datetime import datetime
+from typing import Any, List, Optional
+
+class TransactionEventResponse(BaseModel):
+    id: UUID  # UUIDv7 (app/ids.py)
+    transaction_id: UUID
+    event_type: str
+    previous_status: Optional[str] = None
+    new_status: Optional[str] = None
+    details: Optional[dict[str, Any]] = None
+    timestamp: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class EventFeedPage(BaseModel):
+    events: List[TransactionEventResponse]
+    next_cursor: str  # pass back as ?after= ; returned even when the page is empty
+    has_more: bool    # False: caught up, poll again later
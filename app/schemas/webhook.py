@@ -0,0 +1,19 @@
+from pydantic import BaseModel, UUID4, HttpUrl, ConfigDict
+from datetime import datetime
+
+class WebhookSubscriptionCreate(BaseModel): # what a landlord/integrator sends to register an endpoint
+    user_id: UUID4
+    url: HttpUrl
+
+class WebhookSubscriptionResponse(BaseModel):
+    id: UUID4
+    user_id: UUID4
+    url: str
+    is_active: bool
+    created_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class WebhookSubscriptionCreated(WebhookSubscriptionResponse):
+    # The signing secret is only ever returned once, at creation time
+    secret: str
@@ -0,0 +1,114 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, tuple_
+from app.models.transaction_event import TransactionEvent
+from app.schemas.transaction_event import TransactionEventResponse
+from app.sharding import SHARD_SESSIONS, each_shard
+from datetime import datetime
+from operator import attrgetter
+import base64
+import binascii
+import heapq
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns served to consumers (txid / sequence are shard-local positions, only used for the cursor)
+EVENT_COLUMNS = (
+    TransactionEvent.id, TransactionEvent.transaction_id, TransactionEvent.event_type,
+    TransactionEvent.previous_status, TransactionEvent.new_status, TransactionEvent.details,
+    TransactionEvent.timestamp,
+)
+
+
+def encode_cursor(positions: dict[int, tuple[int, int]]) -> str:
+    """{shard id: (txid, sequence) of the last event served} -> opaque token"""
+    raw = json.dumps({str(shard_id): list(position) for shard_id, position in sorted(positions.items())})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> dict[int, tuple[int, int]]:
+    if not cursor:
+        return {}  # from the beginning
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        positions = {int(shard_id): (int(txid), int(sequence)) for shard_id, (txid, sequence) in raw.items()}
+    except (binascii.Error, UnicodeDecodeError, AttributeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    return {shard_id: position for shard_id, position in positions.items() if 0 <= shard_id < len(SHARD_SESSIONS)}
+
+
+class EventFeedService:
+    # Bulk access to transaction_events for downstream systems (accounting, warehouse),
+    # instead of one GET /payments/{id}/history call per transaction.
+    #
+    # Feed order on each shard is (txid, sequence): the writing DB transaction, then insert order.
+    # A page only includes events whose txid is below the snapshot's xmin, i.e. every DB transaction
+    # that could still add an event before them has finished. So once the cursor has passed a point,
+    # nothing can ever commit behind it: consumers never miss an event, without a time-based lag.
+    # Events of a landlord moved to another shard are served again from the new shard (same ids).
+
+    @staticmethod
+    def feed_query(position: tuple[int, int] | None, limit: int):
+        """Next events after a shard's position, on idx_transaction_event_feed"""
+        query = select(*EVENT_COLUMNS, TransactionEvent.txid, TransactionEvent.sequence).where(
+            TransactionEvent.txid < func.txid_snapshot_xmin(func.txid_current_snapshot())
+        )
+        if position is not None:
+            query = query.where(tuple_(TransactionEvent.txid, TransactionEvent.sequence) > tuple_(*position))
+        return query.order_by(TransactionEvent.txid, TransactionEvent.sequence).limit(limit)
+
+    @staticmethod
+    def page(cursor: str | None, limit: int, db: Session) -> dict:
+        """
+        Up to `limit` events after the cursor, from every shard. Raises ValueError for a bad cursor.
+        Shards are merged by timestamp; each shard's own order is kept, so its position stays exact.
+        """
+        positions = decode_cursor(cursor)
+        fetched = []
+        for shard_id, session in each_shard(db):
+            rows = session.execute(EventFeedService.feed_query(positions.get(shard_id), limit)).all()
+            fetched.append([(shard_id, row) for row in rows])
+
+        merged = list(heapq.merge(*fetched, key=lambda item: item[1].timestamp))
+        served = merged[:limit]
+        for shard_id, row in served:
+            positions[shard_id] = (row.txid, row.sequence)
+
+        return {
+            "events": [TransactionEventResponse.model_validate(row) for _, row in served],
+            "next_cursor": encode_cursor(positions),
+            "has_more": len(merged) > limit or any(len(rows) == limit for rows in fetched),
+        }
+
+    @staticmethod
+    def _range(session: Session, start: datetime, end: datetime, fetch_size: int):
+        """Events in [start, end) in timestamp order, streamed through a server-side cursor"""
+        return session.execute(
+            select(*EVENT_COLUMNS)
+            .where(TransactionEvent.timestamp >= start, TransactionEvent.timestamp < end)
+            .order_by(TransactionEvent.timestamp, TransactionEvent.id)
+            .execution_options(stream_results=True, yield_per=fetch_size)
+        )
+
+    @staticmethod
+    def export(start: datetime, end: datetime, db: Session, fetch_size: int):
+        """
+        NDJSON (one event per line) of every event in [start, end), all shards merged by timestamp.
+        Memory stays at about fetch_size rows per shard whatever the range. Closes db when done
+        (it runs after the endpoint has returned, so it can't use a request-scoped session).
+        """
+        sessions = [db] + [session_factory() for session_factory in SHARD_SESSIONS[1:]]
+        try:
+            streams = [EventFeedService._range(session, start, end, fetch_size) for session in sessions]
+            chunk = []
+            for row in heapq.merge(*streams, key=attrgetter("timestamp")):
+                chunk.append(TransactionEventResponse.model_validate(row).model_dump_json())
+                if len(chunk) >= fetch_size:
+                    yield ("\n".join(chunk) + "\n").encode()
+                    chunk = []
+            if chunk:
+                yield ("\n".join(chunk) + "\n").encode()
+        finally:
+            for session in sessions:
+                session.close()
@@ -0,0 +1,220 @@
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from redis.exceptions import RedisError
+from app.database import SessionLocal
+from app.models.transaction import Transaction, TransactionStatus, is_fraud_declined
+from app.models.transaction_event import TransactionEvent
+from app.redis_client import get_redis, get_async_redis
+from app.sharding import ShardRouter, shard_session
+from app.config import settings
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Once a transaction reaches one of these, its stream has nothing more to say.
+# FAILED is not one of them: a failure can still be retried (FAILED -> PENDING), see is_final.
+TERMINAL_STATUSES = {
+    TransactionStatus.COMPLETED.value,
+    TransactionStatus.REFUNDED.value,
+}
+
+# Events buffered per connected client before we start dropping (slow reader)
+CLIENT_QUEUE_SIZE = 100
+
+
+def is_final(update: dict) -> bool:
+    """True once no further status change can follow: terminal, or FAILED for good (retries used up, or declined)"""
+    if update["status"] in TERMINAL_STATUSES:
+        return True
+    return update["status"] == TransactionStatus.FAILED.value and (
+        (update.get("retry_count") or 0) >= settings.PAYMENT_MAX_RETRIES
+        or is_fraud_declined(update.get("failure_reason"))
+    )
+
+
+def transaction_channel(transaction_id) -> str:
+    return f"payments:txn:{transaction_id}"
+
+
+def lease_channel(lease_id) -> str:
+    return f"payments:lease:{lease_id}"
+
+
+class TransactionEventBroadcaster:
+    """
+    One Redis pub/sub connection per API process, fanned out in memory to every SSE client.
+
+    Redis channels are subscribed when their first local client connects and
+    unsubscribed when the last one leaves, so a process only receives the
+    updates somebody on it is actually waiting for. Each idle client costs one
+    asyncio.Queue - no thread, no DB connection, no Redis connection.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._listener = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+        try:
+            # Registered inside the try: if SUBSCRIBE fails, the finally takes the queue out again,
+            # otherwise the channel would look subscribed to every later client
+            async with self._lock:
+                queues = self._subscribers.setdefault(channel, set())
+                queues.add(queue)
+                if self._pubsub is None:
+                    self._pubsub = get_async_redis().pubsub()
+                if len(queues) == 1:
+                    await self._pubsub.subscribe(channel)
+                if self._listener is None or self._listener.done():
+                    self._listener = asyncio.create_task(self._listen())
+
+            yield queue
+        finally:
+            async with self._lock:
+                queues = self._subscribers.get(channel, set())
+                queues.discard(queue)
+                if not queues:
+                    self._subscribers.pop(channel, None)
+                    try:
+                        if self._pubsub is not None:
+                            await self._pubsub.unsubscribe(channel)
+                    except (RedisError, OSError):
+                        pass  # connection is gone anyway; _reconnect won't resubscribe it
+
+    async def _listen(self):
+        while True:
+            if self._pubsub.connection is None:
+                await asyncio.sleep(0.5)  # nothing subscribed yet on this connection
+                continue
+
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except (RedisError, OSError) as e:
+                logger.warning(f"Event stream lost Redis connection: {e}")
+                await self._reconnect()
+                continue
+
+            if message is None:
+                continue
+
+            channel = message["channel"].decode()
+            for queue in list(self._subscribers.get(channel, ())):
+                try:
+                    queue.put_nowait(message["data"])
+                except asyncio.QueueFull:
+                    # Client isn't reading; it still gets the latest state on the next event or reconnect
+                    pass
+
+    async def _reconnect(self):
+        await asyncio.sleep(1)
+        async with self._lock:
+            try:
+                await self._pubsub.aclose()
+            except (RedisError, OSError):
+                pass
+            self._pubsub = get_async_redis().pubsub()
+            if self._subscribers:
+                try:
+                    await self._pubsub.subscribe(*self._subscribers)
+                except (RedisError, OSError) as e:
+                    logger.warning(f"Event stream resubscribe failed, will retry: {e}")
+
+
+broadcaster = TransactionEventBroadcaster()
+
+
+class EventStreamService:
+    # Live status updates without polling:
+    # workers PUBLISH each status change to Redis, API processes relay it to SSE clients
+
+    @staticmethod
+    def publish_status_change(transaction: Transaction, event: TransactionEvent) -> None:
+        """
+        Publish a committed status change to the transaction and lease channels.
+        Best effort: a Redis outage must never fail the payment itself
+        (clients fall back to GET /payments/{id} on reconnect).
+        """
+        message = json.dumps({
+            "event_id": str(event.id),
+            "transaction_id": str(transaction.id),
+            "lease_id": str(transaction.lease_id),
+            "previous_status": event.previous_status,
+            "status": event.new_status,
+            "failure_reason": transaction.failure_reason,
+            "retry_count": transaction.retry_count,
+            "timestamp": event.timestamp.isoformat(),
+        })
+
+        try:
+            pipe = get_redis().pipeline(transaction=False)  # both publishes in one round trip
+            pipe.publish(transaction_channel(transaction.id), message)
+            pipe.publish(lease_channel(transaction.lease_id), message)
+            pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to publish status change for {transaction.id}: {e}")
+
+    @staticmethod
+    def load_transaction_snapshot(transaction_id) -> dict | None:
+        """Current state of a transaction, read once when a client connects"""
+        with SessionLocal() as db:
+            with shard_session(ShardRouter.transaction_shard(transaction_id, db), db) as shard_db:
+                transaction = shard_db.query(Transaction).filter(Transaction.id == transaction_id).first()
+                if not transaction:
+                    return None
+                return {
+                    "transaction_id": str(transaction.id),
+                    "lease_id": str(transaction.lease_id),
+                    "status": transaction.status.value,
+                    "failure_reason": transaction.failure_reason,
+                    "retry_count": transaction.retry_count,
+                }
+
+    @staticmethod
+    def format_sse(data: str | bytes, event: str, event_id: str | None = None) -> str:
+        if isinstance(data, bytes):
+            data = data.decode()
+        lines = [f"event: {event}"]
+        if event_id:
+            lines.append(f"id: {event_id}")
+        lines.append(f"data: {data}")
+        return "\n".join(lines) + "\n\n"
+
+    @staticmethod
+    async def stream(request: Request, channel: str, transaction_id=None):
+        """
+        SSE body generator. For a single transaction it first sends a snapshot
+        (read AFTER subscribing, so no update can slip between the two) and
+        stops once the status is final (see is_final); lease streams run until the client leaves.
+        """
+        async with broadcaster.subscribe(channel) as queue:
+            if transaction_id is not None:
+                snapshot = await run_in_threadpool(EventStreamService.load_transaction_snapshot, transaction_id)
+                if snapshot is None:
+                    yield EventStreamService.format_sse(json.dumps({"detail": "Transaction not found"}), "error")
+                    return
+                yield EventStreamService.format_sse(json.dumps(snapshot), "snapshot")
+                if is_final(snapshot):
+                    return
+
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"  # SSE comment line, ignored by EventSource
+                    continue
+
+                update = json.loads(data)
+                yield EventStreamService.format_sse(data, "status_change", update["event_id"])
+
+                if transaction_id is not None and is_final(update):
+                    return
@@ -0,0 +1,146 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, text
+from sqlalchemy.exc import DBAPIError
+from app.models.idempotency_key import IdempotencyKey
+from app.schemas.transaction import TransactionCreate
+from app.sharding import ShardRouter
+from app.ids import uuid7
+from app.config import settings
+from datetime import datetime, timedelta
+import hashlib
+import json
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "idempotency_keys_p"
+
+
+class IdempotencyKeyReused(ValueError):
+    """The key was already used, within its TTL, for a request with a different body"""
+
+
+def key_hash(idempotency_key: str) -> bytes:
+    return hashlib.sha256(idempotency_key.encode()).digest()
+
+
+def fingerprint(transaction_data: TransactionCreate) -> bytes:
+    """sha256 of the request body minus the key, canonical (field order, 100 vs 100.00 don't matter)"""
+    body = transaction_data.model_dump(mode="json", exclude={"idempotency_key"})
+    body["amount"] = format(transaction_data.amount.normalize(), "f")
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":")).encode()).digest()
+
+
+def partition_name(day: datetime) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+class IdempotencyService:
+    # Idempotency-Key -> transaction, held for IDEMPOTENCY_KEY_TTL_HOURS: long enough for any
+    # client retry, short enough that the index stays small. A reused key must come with the same
+    # body (fingerprint), otherwise it is rejected instead of silently returning another payment.
+    # Keys live in daily partitions of idempotency_keys; maintain_partitions (celery beat + API
+    # startup) creates the coming days and drops days past the TTL.
+
+    @staticmethod
+    def find(key: bytes, db: Session, now: datetime):
+        """(transaction_id, fingerprint) of a live key, or None. created_at bound: only live partitions are searched."""
+        ttl = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        return db.execute(
+            select(IdempotencyKey.transaction_id, IdempotencyKey.fingerprint).where(
+                IdempotencyKey.key_hash == key,
+                IdempotencyKey.created_at > now - ttl,
+                IdempotencyKey.expires_at > now,
+            )
+        ).first()
+
+    @staticmethod
+    def check_fingerprint(reserved, body_fingerprint: bytes) -> None:
+        if reserved.fingerprint is not None and reserved.fingerprint != body_fingerprint:
+            raise IdempotencyKeyReused("Idempotency key was already used for a different request")
+
+    @staticmethod
+    def reserve(key: bytes, body_fingerprint: bytes, landlord_id, db: Session, now: datetime) -> uuid.UUID:
+        """
+        Claim the key and return the transaction id it maps to (registered in the directory). Commits.
+        If another request got there first, its transaction id is returned instead.
+        Uniqueness can't be a constraint (it would have to include created_at), so claims of one key
+        are serialized with a transaction-scoped advisory lock on the key's hash.
+        """
+        try:
+            return IdempotencyService._reserve(key, body_fingerprint, landlord_id, db, now)
+        except DBAPIError as e:
+            if "no partition of relation" not in str(e.orig):
+                raise
+            # Partition maintenance is behind (beat down for days): catch up, then try again
+            db.rollback()
+            IdempotencyService.maintain_partitions(db, now)
+            return IdempotencyService._reserve(key, body_fingerprint, landlord_id, db, now)
+
+    @staticmethod
+    def _reserve(key: bytes, body_fingerprint: bytes, landlord_id, db: Session, now: datetime) -> uuid.UUID:
+        db.execute(select(func.pg_advisory_xact_lock(int.from_bytes(key[:8], "big", signed=True))))
+        reserved = IdempotencyService.find(key, db, now)
+        if reserved:
+            db.commit()
+            IdempotencyService.check_fingerprint(reserved, body_fingerprint)
+            return reserved.transaction_id
+
+        transaction_id = uuid7()
+        db.add(IdempotencyKey(
+            key_hash=key,
+            created_at=now,
+            expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+            fingerprint=body_fingerprint,
+            transaction_id=transaction_id,
+        ))
+        ShardRouter.register_transaction(transaction_id, landlord_id, db)
+        db.commit()
+        return transaction_id
+
+    @staticmethod
+    def partitions(db: Session) -> list[str]:
+        return db.scalars(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ), {"parent": IdempotencyKey.__tablename__}).all()
+
+    @staticmethod
+    def maintain_partitions(db: Session, now: datetime) -> dict:
+        """
+        Create the partitions for every day that can still hold live keys through
+        IDEMPOTENCY_PARTITIONS_AHEAD days ahead, and drop every partition whose newest key has
+        expired: dropping a day is a catalog change, no row is deleted or vacuumed. Safe to re-run. Commits.
+        """
+        ttl = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        existing = set(IdempotencyService.partitions(db))
+
+        created = []
+        for offset in range(-(ttl.days + 1), settings.IDEMPOTENCY_PARTITIONS_AHEAD + 1):
+            day = today + timedelta(days=offset)
+            if day + timedelta(days=1) + ttl <= now or partition_name(day) in existing:
+                continue
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {IdempotencyKey.__tablename__} "
+                f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+            ))
+            created.append(partition_name(day))
+
+        dropped = []
+        for name in sorted(existing):
+            try:
+                day = datetime.strptime(name.removeprefix(PARTITION_PREFIX), "%Y%m%d")
+            except ValueError:
+                continue  # not one of ours
+            if day + timedelta(days=1) + ttl <= now:
+                db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+
+        db.commit()
+        if created or dropped:
+            logger.info(f"Idempotency key partitions: created {created}, dropped {dropped}")
+        return {"created": created, "dropped": dropped}
@@ -0,0 +1,341 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from pydantic import ValidationError
+from app.models.user import User, UserRole
+from app.models.property import Property
+from app.models.bank_account import BankAccount
+from app.models.lease import Lease, LeaseStatus
+from app.models.payment_schedule import PaymentSchedule
+from app.models.installment import Installment
+from app.schemas.portfolio_import import PropertyImportRow, BankAccountImportRow, LeaseImportRow
+from app.services.lease_service import LeaseService
+from app.services.property_search_service import PropertySearchService
+from app.sharding import ShardRouter, shard_session
+from app.config import settings
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+import csv
+import json
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROW_SCHEMAS = {
+    "property": PropertyImportRow,
+    "bank_account": BankAccountImportRow,
+    "lease": LeaseImportRow,
+}
+
+
+class PortfolioImportError(ValueError):
+    """The file failed validation; nothing was written"""
+
+    def __init__(self, errors: list[dict]):
+        self.errors = errors
+        super().__init__(f"Portfolio import rejected: {len(errors)} invalid row(s)")
+
+
+class PortfolioImportIncomplete(RuntimeError):
+    """Writing stopped part way: the chunks in `progress` are committed, re-sending the file resumes"""
+
+    def __init__(self, progress: dict):
+        self.progress = progress
+        super().__init__(
+            f"Portfolio import stopped after {progress['chunks_committed']} chunk(s); rows written so far are kept. "
+            "Send the same file again to finish it: rows already imported are skipped"
+        )
+
+
+@dataclass
+class ImportPlan:
+    """Fully validated rows, with ids assigned client-side so rows can reference each other"""
+    landlord_id: uuid.UUID
+    users: list = field(default_factory=list)
+    properties: list = field(default_factory=list)
+    bank_accounts: list = field(default_factory=list)
+    leases: list = field(default_factory=list)
+    schedules: list = field(default_factory=list)
+    installments: list = field(default_factory=list)  # per lease, same order as leases
+
+
+def _import_id(landlord_id: uuid.UUID, *key) -> uuid.UUID:
+    """Same landlord and row, same id: a re-run of a file finds what an interrupted run already wrote"""
+    return uuid.uuid5(landlord_id, ":".join(map(str, key)))
+
+
+def _chunks(rows: list, size: int) -> Iterator[list]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class PortfolioImportService:
+    # Onboards a whole landlord portfolio in one call instead of one HTTP request per entity:
+    # 1. Validate everything up front (schemas per row, DB lookups set-based: one query per table)
+    # 2. Write with multi-row INSERTs, one DB transaction per chunk,
+    #    leases, their payment schedules and installments always in the same chunk
+    # Row ids are derived from the landlord and the row's natural key (_import_id), so when a
+    # write fails part way the committed chunks stay and re-sending the file skips them.
+
+    @staticmethod
+    def parse_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict]]:
+        """Yield (line number, raw record) from CSV (header row required) or NDJSON"""
+        if fmt == "csv":
+            reader = csv.DictReader(lines)
+            for record in reader:
+                # Empty CSV cells mean "not provided", same as a missing NDJSON key
+                yield reader.line_num, {k: v for k, v in record.items() if v not in ("", None)}
+        elif fmt == "ndjson":
+            for line_number, line in enumerate(lines, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_number, {"record_type": None, "_parse_error": str(e)}
+        else:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+    @staticmethod
+    def validate(landlord_id: uuid.UUID, records: Iterable[tuple[int, dict]], db: Session) -> ImportPlan:
+        errors: list[dict] = []
+        rows: dict[str, list] = {record_type: [] for record_type in ROW_SCHEMAS}
+
+        def error(line, message):
+            if len(errors) < settings.IMPORT_MAX_ERRORS_REPORTED:
+                errors.append({"line": line, "error": message})
+
+        landlord = db.query(User.id).filter(User.id == landlord_id, User.role == UserRole.LANDLORD).first()
+        if not landlord:
+            raise PortfolioImportError([{"line": 0, "error": "Landlord not found"}])
+
+        # 1. Row-level validation, no DB access
+        for line, record in records:
+            if "_parse_error" in record:
+                error(line, f"Invalid JSON: {record['_parse_error']}")
+                continue
+            record_type = record.pop("record_type", None)
+            schema = ROW_SCHEMAS.get(record_type)
+            if schema is None:
+                error(line, f"Unknown record_type: {record_type!r}")
+                continue
+            try:
+                rows[record_type].append((line, schema.model_validate(record)))
+            except ValidationError as e:
+                error(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+
+        # 2. References inside the file
+        property_ids: dict[str, uuid.UUID] = {}
+        for line, row in rows["property"]:
+            if row.ref in property_ids:
+                error(line, f"Duplicate property ref: {row.ref}")
+            property_ids[row.ref] = _import_id(landlord_id, "property", row.ref)
+
+        for line, row in rows["lease"]:
+            if row.property_ref is not None and row.property_ref not in property_ids:
+                error(line, f"Unknown property_ref: {row.property_ref}")
+
+        # 3. References to existing rows: one query per table, whatever the file size
+        existing_property_ids = {row.property_id for _, row in rows["lease"] if row.property_id is not None}
+        if existing_property_ids:
+            owned = {
+                property_id for (property_id,) in db.query(Property.id).filter(
+                    Property.id.in_(existing_property_ids),
+                    Property.landlord_id == landlord_id,
+                )
+            }
+            for line, row in rows["lease"]:
+                if row.property_id is not None and row.property_id not in owned:
+                    error(line, f"Property {row.property_id} not found for this landlord")
+
+        emails = {row.renter_email for _, row in rows["lease"]}
+        emails |= {row.owner_email for _, row in rows["bank_account"] if row.owner_email is not None}
+        existing_users = {
+            email: (user_id, role) for email, user_id, role in db.query(User.email, User.id, User.role).filter(
+                User.email.in_(emails)
+            )
+        } if emails else {}
+
+        plan = ImportPlan(landlord_id=landlord_id)
+        user_ids: dict[str, uuid.UUID] = {email: user_id for email, (user_id, _) in existing_users.items()}
+
+        for line, row in rows["lease"]:
+            existing = existing_users.get(row.renter_email)
+            if existing is not None:
+                if existing[1] != UserRole.RENTER:
+                    error(line, f"{row.renter_email} exists but is not a renter")
+            elif row.renter_email not in user_ids:
+                if not row.renter_full_name:
+                    error(line, f"renter_full_name is required to create renter {row.renter_email}")
+                    continue
+                user_ids[row.renter_email] = uuid.uuid4()
+                plan.users.append({
+                    "id": user_ids[row.renter_email],
+                    "email": row.renter_email,
+                    "full_name": row.renter_full_name,
+                    "role": UserRole.RENTER,
+                })
+
+        for line, row in rows["bank_account"]:
+            if row.owner_email is not None and row.owner_email not in user_ids:
+                error(line, f"Unknown bank account owner: {row.owner_email}")
+
+        if errors:
+            raise PortfolioImportError(errors)
+
+        # 4. Everything checks out - build the rows to insert
+        for _, row in rows["property"]:
+            plan.properties.append({
+                "id": property_ids[row.ref],
+                "landlord_id": landlord_id,
+                **row.model_dump(exclude={"ref"}),
+            })
+
+        # Identical rows are legitimate (same last 4 digits); the occurrence number keeps their ids apart
+        occurrences = Counter()
+        for _, row in rows["bank_account"]:
+            key = ("bank_account", row.owner_email or "", row.routing_number, row.account_number_token, row.bank_name)
+            occurrences[key] += 1
+            plan.bank_accounts.append({
+                "id": _import_id(landlord_id, *key, occurrences[key]),
+                "user_id": user_ids[row.owner_email] if row.owner_email else landlord_id,
+                **row.model_dump(exclude={"owner_email"}),
+            })
+
+        for _, row in rows["lease"]:
+            property_id = row.property_id or property_ids[row.property_ref]
+            key = ("lease", property_id, row.renter_email, row.start_date.isoformat())
+            occurrences[key] += 1
+            lease_id = _import_id(landlord_id, *key, occurrences[key])
+            plan.leases.append({
+                "id": lease_id,
+                "property_id": property_id,
+                "renter_id": user_ids[row.renter_email],
+                "start_date": row.start_date,
+                "end_date": row.end_date,
+                "rent_amount": row.rent_amount,
+                "due_day_of_month": row.due_day_of_month,
+                "status": LeaseStatus.ACTIVE,
+            })
+            plan.schedules.append(
+                LeaseService.build_payment_schedule(lease_id, row.start_date, row.due_day_of_month, row.rent_amount)
+            )
+            plan.installments.append(
+                LeaseService.build_installments(
+                    lease_id, row.start_date, row.end_date, row.due_day_of_month, row.rent_amount
+                )
+            )
+
+        return plan
+
+    @staticmethod
+    def write(plan: ImportPlan, db: Session, chunk_size: int) -> dict:
+        """
+        Insert in dependency order (users -> properties -> bank accounts -> leases).
+        Each chunk is one multi-row INSERT per table and one commit; a lease chunk
+        carries its payment schedules and installments so a lease is never committed without them.
+        Rows that already exist (an earlier run of the same file) are skipped.
+        Raises PortfolioImportIncomplete, with what was committed, if a chunk fails.
+        """
+        progress = PortfolioImportService._progress(plan)
+        try:
+            # Renters that already exist were resolved by validate, so plan.users are all new
+            for chunk in _chunks(plan.users, chunk_size):
+                db.execute(insert(User), chunk)
+                db.commit()
+                ShardRouter.replicate(User, [row["id"] for row in chunk], db)
+                progress["renters_created"] += len(chunk)
+                progress["chunks_committed"] += 1
+
+            # Reference data: main database, then copied to the other shards
+            for model, rows, created in (
+                (Property, plan.properties, "properties_created"),
+                (BankAccount, plan.bank_accounts, "bank_accounts_created"),
+            ):
+                for chunk in _chunks(rows, chunk_size):
+                    new = PortfolioImportService._not_imported(model, chunk, db)
+                    if new:
+                        db.execute(insert(model), new)
+                        db.commit()
+                    # Every row, not just the new ones: an interrupted run may have stopped before copying them
+                    ShardRouter.replicate(model, [row["id"] for row in chunk], db)
+                    progress[created] += len(new)
+                    progress["already_imported"] += len(chunk) - len(new)
+                    progress["chunks_committed"] += 1
+
+            # Leases and everything hanging off them: the landlord's shard
+            if plan.leases:
+                PortfolioImportService._write_leases(plan, db, chunk_size, progress)
+        except Exception as e:
+            db.rollback()
+            logger.exception(f"Portfolio import for landlord {plan.landlord_id} stopped: {progress}")
+            raise PortfolioImportIncomplete(progress) from e
+        finally:
+            if progress["chunks_committed"]:
+                PropertySearchService.invalidate()
+
+        logger.info(
+            f"Portfolio import for landlord {plan.landlord_id}: "
+            f"{progress['properties_created']} properties, {progress['leases_created']} leases "
+            f"({progress['already_imported']} rows already imported) in {progress['chunks_committed']} chunks"
+        )
+        return progress
+
+    @staticmethod
+    def _not_imported(model, chunk: list[dict], db: Session) -> list[dict]:
+        """The rows of a chunk whose id isn't in the table yet"""
+        existing = set(db.scalars(select(model.id).where(model.id.in_([row["id"] for row in chunk]))))
+        return [row for row in chunk if row["id"] not in existing]
+
+    @staticmethod
+    def _write_leases(plan: ImportPlan, db: Session, chunk_size: int, progress: dict) -> None:
+        shard_id = ShardRouter.assign_landlord(plan.landlord_id, db)
+        with shard_session(shard_id, db) as shard_db:
+            for start in range(0, len(plan.leases), chunk_size):
+                leases = plan.leases[start:start + chunk_size]
+                ShardRouter.register_leases([lease["id"] for lease in leases], plan.landlord_id, db)
+                if shard_db is not db:
+                    db.commit()  # directory first, see create_lease
+
+                # A lease is committed together with its schedule and installments: if it exists, so do they
+                new = {lease["id"] for lease in PortfolioImportService._not_imported(Lease, leases, shard_db)}
+                batch = [
+                    (lease, schedule, installments)
+                    for lease, schedule, installments in zip(
+                        leases, plan.schedules[start:start + chunk_size], plan.installments[start:start + chunk_size]
+                    )
+                    if lease["id"] in new
+                ]
+                installments = [row for _, _, rows in batch for row in rows]
+                if batch:
+                    shard_db.execute(insert(Lease), [lease for lease, _, _ in batch])
+                    shard_db.execute(insert(PaymentSchedule), [schedule for _, schedule, _ in batch])
+                    if installments:
+                        shard_db.execute(insert(Installment), installments)
+                shard_db.commit()
+
+                progress["leases_created"] += len(batch)
+                progress["payment_schedules_created"] += len(batch)
+                progress["installments_created"] += len(installments)
+                progress["already_imported"] += len(leases) - len(batch)
+                progress["chunks_committed"] += 1
+
+    @staticmethod
+    def _progress(plan: ImportPlan) -> dict:
+        return {
+            "landlord_id": plan.landlord_id,
+            "renters_created": 0,
+            "properties_created": 0,
+            "bank_accounts_created": 0,
+            "leases_created": 0,
+            "payment_schedules_created": 0,
+            "installments_created": 0,
+            "already_imported": 0,
+            "chunks_committed": 0,
+        }
+
+    @staticmethod
+    def import_portfolio(landlord_id: uuid.UUID, lines: Iterable[str], fmt: str, db: Session) -> dict:
+        records = PortfolioImportService.parse_records(lines, fmt)
+        plan = PortfolioImportService.validate(landlord_id, records, db)
+        return PortfolioImportService.write(plan, db, settings.IMPORT_CHUNK_SIZE)
@@ -0,0 +1,219 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from app.models.installment import Installment, InstallmentAllocation, InstallmentStatus
+from app.models.lease import Lease
+from app.models.property import Property
+from app.models.payment_schedule import PaymentSchedule, ScheduleStatus
+from app.models.transaction import Transaction, TransactionStatus
+from datetime import datetime
+from decimal import Decimal
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNPAID = (InstallmentStatus.DUE, InstallmentStatus.PARTIAL)
+
+
+class InstallmentService:
+    # Installments answer "what is owed" directly:
+    # payments are allocated to the oldest unpaid installments, and the
+    # PaymentSchedule's next_due_date simply follows the first unpaid one.
+    # A refund takes its allocations back out (reverse_allocations).
+
+    @staticmethod
+    def _lock_transaction(transaction_id, db: Session) -> None:
+        """
+        Serialize allocate_payment / reverse_allocations runs for one payment (duplicate task
+        deliveries, a refund racing the allocation) with a transaction-scoped advisory lock.
+        """
+        db.execute(select(func.pg_advisory_xact_lock(int.from_bytes(transaction_id.bytes[8:], "big", signed=True))))
+
+    @staticmethod
+    def allocate_payment(transaction: Transaction, db: Session) -> list[InstallmentAllocation]:
+        """
+        Spread a completed payment over the lease's unpaid installments, oldest first.
+        Idempotent: a transaction that already has allocations is left alone,
+        so a duplicate task run can't count the same money twice.
+        Only COMPLETED payments count: one refunded before this task ran is skipped.
+        Does NOT commit (the lock is held until the caller does).
+        """
+        if transaction.status != TransactionStatus.COMPLETED:
+            return []
+
+        # Checked under the lock: a concurrent duplicate run waits here, then sees the first run's
+        # allocations (or the refund that committed meanwhile) instead of allocating again
+        InstallmentService._lock_transaction(transaction.id, db)
+        status = db.query(Transaction.status).filter(Transaction.id == transaction.id).scalar()
+        if status != TransactionStatus.COMPLETED:
+            return []
+        already_allocated = db.query(InstallmentAllocation.id).filter(
+            InstallmentAllocation.transaction_id == transaction.id
+        ).first()
+        if already_allocated:
+            return []
+
+        unpaid = db.query(Installment).filter(
+            Installment.lease_id == transaction.lease_id,
+            Installment.status.in_(UNPAID)
+        ).order_by(Installment.sequence_number).with_for_update().all()
+
+        remaining = Decimal(transaction.amount)
+        allocations = []
+        now = datetime.utcnow()
+
+        for installment in unpaid:
+            if remaining <= 0:
+                break
+            outstanding = installment.amount_due - installment.amount_paid
+            applied = min(outstanding, remaining)
+
+            installment.amount_paid += applied
+            if installment.amount_paid >= installment.amount_due:
+                installment.status = InstallmentStatus.PAID
+                installment.paid_at = now
+            else:
+                installment.status = InstallmentStatus.PARTIAL
+            remaining -= applied
+
+            allocation = InstallmentAllocation(
+                installment_id=installment.id,
+                transaction_id=transaction.id,
+                amount=applied,
+            )
+            db.add(allocation)
+            allocations.append(allocation)
+
+        db.flush()
+
+        if remaining > 0:
+            # Paid more than the whole remaining term - leave it visible for manual handling
+            logger.warning(f"Transaction {transaction.id} left {remaining} unallocated on lease {transaction.lease_id}")
+
+        return allocations
+
+    @staticmethod
+    def reverse_allocations(transaction: Transaction, db: Session) -> list[InstallmentAllocation]:
+        """
+        Undo allocate_payment for a refunded payment: take each allocated amount back off its
+        installment (PAID -> PARTIAL / DUE) and delete the allocations.
+        Call in the same DB transaction as the refund, then sync_payment_schedule. Does NOT commit.
+        """
+        InstallmentService._lock_transaction(transaction.id, db)  # waits for an allocation in flight
+        rows = db.query(InstallmentAllocation, Installment).join(
+            Installment, InstallmentAllocation.installment_id == Installment.id
+        ).filter(
+            InstallmentAllocation.transaction_id == transaction.id
+        ).with_for_update(of=Installment).all()
+
+        for allocation, installment in rows:
+            installment.amount_paid -= allocation.amount
+            if installment.amount_paid >= installment.amount_due:
+                continue  # still covered by other payments
+            installment.status = InstallmentStatus.PARTIAL if installment.amount_paid > 0 else InstallmentStatus.DUE
+            installment.paid_at = None
+
+        for allocation, _ in rows:
+            db.delete(allocation)
+        db.flush()
+        return [allocation for allocation, _ in rows]
+
+    @staticmethod
+    def allocate_in_memory(installments: list[dict], payments: list[tuple]) -> list[dict]:
+        """
+        Same oldest-first allocation as allocate_payment, on freshly built installment rows
+        (see LeaseService.build_installments) instead of DB rows - used by the backfill,
+        which replays a lease's whole payment history without a query per transaction.
+
+        payments: (transaction_id, amount, completed_at) tuples, oldest first.
+        Mutates the installment dicts and returns the allocation rows to insert.
+        """
+        allocations = []
+        for transaction_id, amount, completed_at in payments:
+            remaining = Decimal(amount)
+            for installment in installments:
+                if remaining <= 0:
+                    break
+                outstanding = Decimal(installment["amount_due"]) - Decimal(installment["amount_paid"])
+                if outstanding <= 0:
+                    continue
+                applied = min(outstanding, remaining)
+
+                installment["amount_paid"] = Decimal(installment["amount_paid"]) + applied
+                if installment["amount_paid"] >= Decimal(installment["amount_due"]):
+                    installment["status"] = InstallmentStatus.PAID
+                    installment["paid_at"] = completed_at
+                else:
+                    installment["status"] = InstallmentStatus.PARTIAL
+                remaining -= applied
+
+                allocations.append({
+                    "id": uuid.uuid4(),
+                    "installment_id": installment["id"],
+                    "transaction_id": transaction_id,
+                    "amount": applied,
+                })
+        return allocations
+
+    @staticmethod
+    def sync_payment_schedule(lease_id, db: Session) -> PaymentSchedule | None:
+        """
+        Point the schedule at the first unpaid installment (complete it when nothing is left).
+        Unlike "+1 month per completed payment", partial or duplicate payments can't skip a month.
+        A completed schedule becomes active again if a refund reopened an installment.
+        Does NOT commit.
+        """
+        schedule = db.query(PaymentSchedule).filter(PaymentSchedule.lease_id == lease_id).first()
+        if not schedule:
+            return None
+
+        next_due = db.query(func.min(Installment.due_date)).filter(
+            Installment.lease_id == lease_id,
+            Installment.status.in_(UNPAID)
+        ).scalar()
+
+        if next_due is None:
+            schedule.status = ScheduleStatus.COMPLETED
+        else:
+            schedule.next_due_date = next_due
+            if schedule.status == ScheduleStatus.COMPLETED:
+                schedule.status = ScheduleStatus.ACTIVE
+        return schedule
+
+    @staticmethod
+    def list_overdue(db: Session, as_of: datetime, landlord_id=None, skip: int = 0, limit: int = 100):
+        """
+        Unpaid installments due before as_of, oldest first.
+        Served by idx_installment_status_due (status, due_date): a range scan per unpaid status.
+        """
+        query = db.query(Installment).filter(
+            Installment.status.in_(UNPAID),
+            Installment.due_date < as_of
+        )
+        if landlord_id is not None:
+            query = query.join(Lease, Installment.lease_id == Lease.id).join(
+                Property, Lease.property_id == Property.id
+            ).filter(Property.landlord_id == landlord_id)
+
+        return query.order_by(Installment.due_date, Installment.id).offset(skip).limit(limit).all()
+
+    @staticmethod
+    def renter_balance(db: Session, renter_id, as_of: datetime) -> dict:
+        """What a renter owes right now (due before as_of) and in total for the rest of their leases"""
+        outstanding = Installment.amount_due - Installment.amount_paid
+        overdue_amount, total_amount = db.query(
+            func.coalesce(func.sum(outstanding).filter(Installment.due_date < as_of), 0),
+            func.coalesce(func.sum(outstanding), 0),
+        ).join(
+            Lease, Installment.lease_id == Lease.id
+        ).filter(
+            Lease.renter_id == renter_id,
+            Installment.status.in_(UNPAID)
+        ).one()
+
+        return {
+            "renter_id": renter_id,
+            "as_of": as_of,
+            "amount_overdue": overdue_amount,
+            "amount_remaining_on_leases": total_amount,
+        }
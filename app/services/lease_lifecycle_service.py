@@ -0,0 +1,94 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, insert, func, case, literal, cast, Integer
+from app.models.lease import Lease, LeaseStatus
+from app.models.payment_schedule import PaymentSchedule, ScheduleStatus
+from app.models.installment import Installment
+from app.models.delinquency import DelinquencySnapshot
+from app.services.installment_service import UNPAID
+from app.sharding import skip_moving
+from app.config import settings
+from datetime import datetime, timedelta
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLifecycleService:
+    # Nightly lease maintenance, one shard at a time, a handful of set-based statements each
+    # (no per-lease ORM loop): expire leases past end_date, complete the schedules of leases that
+    # are over, and snapshot what every lease owes (days past due, late fees).
+    # Leases of landlords being resharded (`moving`) are left for the next night.
+
+    @staticmethod
+    def expire_leases(db: Session, today: datetime, moving=()) -> int:
+        """ACTIVE leases whose end_date is before today -> EXPIRED"""
+        expiring = update(Lease).where(Lease.status == LeaseStatus.ACTIVE, Lease.end_date < today)
+        return db.execute(
+            skip_moving(expiring, moving, lease_id=Lease.id).values(status=LeaseStatus.EXPIRED, updated_at=datetime.utcnow()).execution_options(synchronize_session=False)
+        ).rowcount
+
+    @staticmethod
+    def complete_schedules(db: Session, moving=()) -> int:
+        """Schedules still ACTIVE / PAUSED on expired or terminated leases -> COMPLETED (nothing more to bill)"""
+        completing = update(PaymentSchedule).where(
+            PaymentSchedule.status.in_([ScheduleStatus.ACTIVE, ScheduleStatus.PAUSED]),
+            PaymentSchedule.lease_id == Lease.id,
+            Lease.status.in_([LeaseStatus.EXPIRED, LeaseStatus.TERMINATED]),
+        )
+        return db.execute(
+            skip_moving(completing, moving, lease_id=PaymentSchedule.lease_id).values(status=ScheduleStatus.COMPLETED, updated_at=datetime.utcnow()).execution_options(synchronize_session=False)
+        ).rowcount
+
+    @staticmethod
+    def delinquency_query(today: datetime, grace_days: int, flat_fee: Decimal, percent_fee: Decimal):
+        """
+        One row per lease with unpaid installments due before today (idx_installment_status_due).
+        Late fee per installment past the grace period: flat + percent of its unpaid part.
+        """
+        outstanding = Installment.amount_due - Installment.amount_paid
+        late = Installment.due_date < today - timedelta(days=grace_days)
+        fee = case((late, flat_fee + outstanding * percent_fee / 100), else_=0)
+        return select(
+            func.gen_random_uuid().label("id"),
+            literal(today).label("snapshot_date"),
+            Installment.lease_id,
+            func.count().label("overdue_installments"),
+            func.sum(outstanding).label("amount_overdue"),
+            func.min(Installment.due_date).label("oldest_due_date"),
+            cast(func.date_part("day", literal(today) - func.min(Installment.due_date)), Integer).label("days_past_due"),
+            func.round(func.sum(fee), 2).label("late_fee"),
+            literal(datetime.utcnow()).label("created_at"),
+        ).where(
+            Installment.status.in_(UNPAID),
+            Installment.due_date < today,
+        ).group_by(Installment.lease_id)
+
+    @staticmethod
+    def snapshot_delinquency(db: Session, today: datetime, moving=()) -> int:
+        """Replace today's snapshot rows with a fresh INSERT ... SELECT"""
+        query = skip_moving(LeaseLifecycleService.delinquency_query(
+            today, settings.LATE_FEE_GRACE_DAYS, settings.LATE_FEE_FLAT, settings.LATE_FEE_PERCENT
+        ), moving, lease_id=Installment.lease_id)
+        db.execute(skip_moving(
+            delete(DelinquencySnapshot).where(DelinquencySnapshot.snapshot_date == today),
+            moving, lease_id=DelinquencySnapshot.lease_id,
+        ))
+        return db.execute(
+            insert(DelinquencySnapshot).from_select(
+                ["id", "snapshot_date", "lease_id", "overdue_installments", "amount_overdue", "oldest_due_date",
+                 "days_past_due", "late_fee", "created_at"],
+                query,
+            )
+        ).rowcount
+
+    @staticmethod
+    def run(db: Session, today: datetime | None = None, moving=()) -> dict:
+        """Everything for one shard, in one transaction. Commits."""
+        today = (today or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+        expired = LeaseLifecycleService.expire_leases(db, today, moving)
+        completed = LeaseLifecycleService.complete_schedules(db, moving)
+        delinquent = LeaseLifecycleService.snapshot_delinquency(db, today, moving)
+        db.commit()
+        logger.info(f"Lease lifecycle {today:%Y-%m-%d}: {expired} expired, {completed} schedules completed, {delinquent} delinquent")
+        return {"expired": expired, "schedules_completed": completed, "delinquent": delinquent}
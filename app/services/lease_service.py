@@ -0,0 +1,55 @@
+from app.models.payment_schedule import PaymentSchedule
+from app.models.installment import InstallmentStatus
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+import uuid
+
+
+def calculate_first_payment_date(start_date: datetime, due_day: int) -> datetime:
+    if start_date.day <= due_day:
+        return start_date.replace(day=due_day)
+    else:
+        next_month = start_date + relativedelta(months=1)
+        return next_month.replace(day=due_day)
+
+
+class LeaseService:
+    # Shared by the single-lease API and the bulk portfolio import,
+    # so both produce exactly the same payment schedule for a lease
+
+    @staticmethod
+    def build_payment_schedule(lease_id, start_date: datetime, due_day: int, rent_amount) -> dict:
+        """Row values for a lease's PaymentSchedule (plain dict, usable for bulk inserts)"""
+        return {
+            "id": uuid.uuid4(),
+            "lease_id": lease_id,
+            "next_due_date": calculate_first_payment_date(start_date, due_day),
+            "amount": rent_amount,
+        }
+
+    @staticmethod
+    def new_payment_schedule(lease_id, start_date: datetime, due_day: int, rent_amount) -> PaymentSchedule:
+        return PaymentSchedule(**LeaseService.build_payment_schedule(lease_id, start_date, due_day, rent_amount))
+
+    @staticmethod
+    def build_installments(lease_id, start_date: datetime, end_date: datetime, due_day: int, rent_amount) -> list[dict]:
+        """
+        One installment per due date from the first payment date until the lease ends
+        (end_date exclusive: a lease from Jan 1 to Jan 1 next year has 12 installments).
+        """
+        first_due = calculate_first_payment_date(start_date, due_day)
+        installments = []
+        due_date = first_due
+        while due_date < end_date:
+            installments.append({
+                "id": uuid.uuid4(),
+                "lease_id": lease_id,
+                "sequence_number": len(installments) + 1,
+                "due_date": due_date,
+                "amount_due": rent_amount,
+                "amount_paid": 0,
+                "status": InstallmentStatus.DUE,
+            })
+            # Always step from first_due, so the day never drifts (due days are capped at 28)
+            due_date = first_due + relativedelta(months=len(installments))
+        return installments
@@ -0,0 +1,282 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, func, case, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.transaction import Transaction
+from app.models.ledger import LedgerEntry, AccountBalance, BalanceCheckpoint, EntryDirection, LedgerEntryType
+from app.ids import uuid7
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerService:
+    # Double-entry bookkeeping on top of transactions:
+    # 1. post_transaction: two balanced entries + incremental balance update, inside the caller's DB transaction
+    # 2. create_checkpoints: periodic re-derivation of totals from the entries, so statements stay short
+    # 3. verify_account_range: full re-derivation from entries, compared with the running balances
+
+    @staticmethod
+    def build_postings(transaction: Transaction, entry_type: LedgerEntryType) -> list[dict]:
+        """The DEBIT and CREDIT legs for a transaction (a refund reverses the payment)"""
+        if entry_type == LedgerEntryType.PAYMENT:
+            debit_account, credit_account = transaction.payer_account_id, transaction.payee_account_id
+        else:
+            debit_account, credit_account = transaction.payee_account_id, transaction.payer_account_id
+
+        return [
+            {"account_id": debit_account, "direction": EntryDirection.DEBIT},
+            {"account_id": credit_account, "direction": EntryDirection.CREDIT},
+        ]
+
+    @staticmethod
+    def post_transaction(transaction: Transaction, entry_type: LedgerEntryType, db: Session) -> int:
+        """
+        Record the ledger entries for a completed or refunded transaction and bump the
+        account balances. Does NOT commit: entries, balances and the status change
+        become visible together or not at all.
+        Returns the number of entries written (0 if this posting already existed).
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": uuid7(),
+                "transaction_id": transaction.id,
+                "entry_type": entry_type,
+                "amount": transaction.amount,
+                "created_at": now,
+                **leg,
+            }
+            for leg in LedgerService.build_postings(transaction, entry_type)
+        ]
+
+        # ON CONFLICT DO NOTHING + RETURNING: only legs actually inserted move the balances
+        inserted = db.execute(
+            pg_insert(LedgerEntry).values(rows).on_conflict_do_nothing(
+                constraint="uq_ledger_posting"
+            ).returning(LedgerEntry.account_id, LedgerEntry.direction, LedgerEntry.amount)
+        ).all()
+
+        if not inserted:
+            return 0
+
+        LedgerService.apply_balance_deltas(inserted, db, now)
+        return len(inserted)
+
+    @staticmethod
+    def apply_balance_deltas(entries, db: Session, now: datetime) -> None:
+        """Add (account_id, direction, amount) entries to the running account balances. Does NOT commit."""
+        # Aggregate per account first (payer == payee would otherwise hit the same row twice)
+        deltas = defaultdict(lambda: {"debits": Decimal(0), "credits": Decimal(0), "count": 0})
+        for account_id, direction, amount in entries:
+            key = "debits" if direction == EntryDirection.DEBIT else "credits"
+            deltas[account_id][key] += amount
+            deltas[account_id]["count"] += 1
+
+        # Sorted by account id so concurrent postings always lock balance rows in the same order (no deadlocks)
+        values = [
+            {
+                "account_id": account_id,
+                "total_debits": delta["debits"],
+                "total_credits": delta["credits"],
+                "entry_count": delta["count"],
+                "updated_at": now,
+            }
+            for account_id, delta in sorted(deltas.items(), key=lambda item: str(item[0]))
+        ]
+
+        upsert = pg_insert(AccountBalance).values(values)
+        db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[AccountBalance.account_id],
+                set_={
+                    "total_debits": AccountBalance.total_debits + upsert.excluded.total_debits,
+                    "total_credits": AccountBalance.total_credits + upsert.excluded.total_credits,
+                    "entry_count": AccountBalance.entry_count + upsert.excluded.entry_count,
+                    "updated_at": upsert.excluded.updated_at,
+                },
+            )
+        )
+
+    @staticmethod
+    def _entry_totals():
+        """SUM(debits), SUM(credits), COUNT(*) columns over LedgerEntry, for grouped queries"""
+        return (
+            func.coalesce(func.sum(case((LedgerEntry.direction == EntryDirection.DEBIT, LedgerEntry.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((LedgerEntry.direction == EntryDirection.CREDIT, LedgerEntry.amount), else_=0)), 0),
+            func.count(LedgerEntry.id),
+        )
+
+    @staticmethod
+    def create_checkpoints(db: Session, safety_seconds: int) -> dict:
+        """
+        Write a new checkpoint for every account that has entries since the last run.
+        Set-based: one INSERT ... SELECT = previous checkpoint + entries in (last horizon, new horizon].
+
+        The new horizon only covers entries older than safety_seconds. Sequence numbers are
+        handed out before commit, so a young entry with a lower sequence might still be
+        uncommitted; waiting until it is old guarantees no entry falls between checkpoints.
+        """
+        low = db.query(func.coalesce(func.max(BalanceCheckpoint.through_sequence), 0)).scalar()
+        high = db.query(func.max(LedgerEntry.sequence)).filter(
+            LedgerEntry.sequence > low,
+            LedgerEntry.created_at < datetime.utcnow() - timedelta(seconds=safety_seconds)
+        ).scalar()
+
+        if high is None:
+            return {"accounts": 0, "through_sequence": low}
+
+        debits, credits, count = LedgerService._entry_totals()
+        new_entries = select(
+            LedgerEntry.account_id,
+            debits.label("debits"),
+            credits.label("credits"),
+            count.label("entry_count"),
+        ).where(
+            LedgerEntry.sequence > low,
+            LedgerEntry.sequence <= high
+        ).group_by(LedgerEntry.account_id).cte("new_entries")
+
+        latest = select(
+            BalanceCheckpoint.account_id,
+            BalanceCheckpoint.total_debits,
+            BalanceCheckpoint.total_credits,
+            BalanceCheckpoint.entry_count,
+        ).distinct(BalanceCheckpoint.account_id).where(
+            BalanceCheckpoint.account_id.in_(select(new_entries.c.account_id))
+        ).order_by(
+            BalanceCheckpoint.account_id, BalanceCheckpoint.through_sequence.desc()
+        ).cte("latest")
+
+        rows = select(
+            func.gen_random_uuid(),
+            new_entries.c.account_id,
+            literal(high),
+            func.coalesce(latest.c.total_debits, 0) + new_entries.c.debits,
+            func.coalesce(latest.c.total_credits, 0) + new_entries.c.credits,
+            func.coalesce(latest.c.entry_count, 0) + new_entries.c.entry_count,
+            func.now(),
+        ).select_from(
+            new_entries.outerjoin(latest, latest.c.account_id == new_entries.c.account_id)
+        )
+
+        result = db.execute(
+            insert(BalanceCheckpoint).from_select(
+                [
+                    BalanceCheckpoint.id,
+                    BalanceCheckpoint.account_id,
+                    BalanceCheckpoint.through_sequence,
+                    BalanceCheckpoint.total_debits,
+                    BalanceCheckpoint.total_credits,
+                    BalanceCheckpoint.entry_count,
+                    BalanceCheckpoint.created_at,
+                ],
+                rows,
+                include_defaults=False,
+            )
+        )
+        db.commit()
+
+        logger.info(f"Ledger checkpoint through sequence {high}: {result.rowcount} accounts")
+        return {"accounts": result.rowcount, "through_sequence": high}
+
+    @staticmethod
+    def account_id_ranges(chunks: int) -> list[tuple[str, str | None]]:
+        """
+        Split the UUID space into contiguous [low, high) ranges so verification chunks
+        read disjoint slices of idx_ledger_account_sequence in parallel.
+        """
+        step = 2 ** 32 // chunks
+        bounds = [f"{i * step:08x}-0000-0000-0000-000000000000" for i in range(chunks)]
+        return [(bounds[i], bounds[i + 1] if i + 1 < chunks else None) for i in range(chunks)]
+
+    @staticmethod
+    def _derived_and_stored(db: Session, low, high):
+        debits, credits, count = LedgerService._entry_totals()
+        query = db.query(LedgerEntry.account_id, debits, credits, count).filter(LedgerEntry.account_id >= low)
+        if high is not None:
+            query = query.filter(LedgerEntry.account_id < high)
+        derived = {account_id: (d, c, n) for account_id, d, c, n in query.group_by(LedgerEntry.account_id)}
+
+        # Plain values, not ORM objects: those would be expired (and reloaded) once the snapshot ends
+        balance_query = db.query(
+            AccountBalance.account_id, AccountBalance.total_debits, AccountBalance.total_credits, AccountBalance.entry_count
+        ).filter(AccountBalance.account_id >= low)
+        if high is not None:
+            balance_query = balance_query.filter(AccountBalance.account_id < high)
+        stored = {account_id: (d, c, n) for account_id, d, c, n in balance_query}
+        return derived, stored
+
+    @staticmethod
+    def verify_account_range(db: Session, low: str, high: str | None) -> list[dict]:
+        """
+        Re-derive totals from every entry of the accounts in [low, high) and diff them with account_balances.
+        Both reads run in one REPEATABLE READ transaction (one snapshot): a posting committing in between
+        would otherwise show up as a mismatch. Read only; starts and ends its own transaction.
+        """
+        low = uuid.UUID(low)
+        high = uuid.UUID(high) if high is not None else None
+
+        db.rollback()  # the isolation level can only be set before the transaction's first query
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        try:
+            derived, stored = LedgerService._derived_and_stored(db, low, high)
+        finally:
+            db.rollback()  # releases the snapshot; the pool resets the isolation level
+
+        mismatches = []
+        for account_id in derived.keys() | stored.keys():
+            expected = derived.get(account_id, (0, 0, 0))
+            actual = stored.get(account_id, (0, 0, 0))
+            if tuple(map(Decimal, expected)) != tuple(map(Decimal, actual)):
+                mismatches.append({
+                    "account_id": str(account_id),
+                    "derived": [str(v) for v in expected],
+                    "stored": [str(v) for v in actual],
+                })
+        return mismatches
+
+    @staticmethod
+    def get_statement(db: Session, account_id, limit: int) -> dict:
+        """
+        Opening totals from the latest checkpoint + entries after it.
+        Cost is one index lookup + O(entries since the checkpoint), not O(account history).
+        """
+        checkpoint = db.query(BalanceCheckpoint).filter(
+            BalanceCheckpoint.account_id == account_id
+        ).order_by(BalanceCheckpoint.through_sequence.desc()).first()
+
+        through = checkpoint.through_sequence if checkpoint else 0
+        entries = db.query(LedgerEntry).filter(
+            LedgerEntry.account_id == account_id,
+            LedgerEntry.sequence > through
+        ).order_by(LedgerEntry.sequence).limit(limit).all()
+
+        opening_debits = checkpoint.total_debits if checkpoint else Decimal(0)
+        opening_credits = checkpoint.total_credits if checkpoint else Decimal(0)
+
+        return {
+            "account_id": account_id,
+            "opening_through_sequence": through,
+            "opening_balance": opening_credits - opening_debits,
+            "entries": entries,
+        }
+
+    @staticmethod
+    def merge_statements(account_id, statements: dict[int, dict], limit: int) -> dict:
+        """Combine per-shard statements: opening balances add up, entries interleave by time"""
+        entries = sorted(
+            (entry for statement in statements.values() for entry in statement["entries"]),
+            key=lambda entry: entry.created_at,
+        )
+        return {
+            "account_id": account_id,
+            "checkpoint_sequences": {
+                shard_id: statement["opening_through_sequence"] for shard_id, statement in statements.items()
+            },
+            "opening_balance": sum((statement["opening_balance"] for statement in statements.values()), Decimal(0)),
+            "entries": entries[:limit],
+        }
@@ -0,0 +1,160 @@
+from datetime import datetime
+from decimal import Decimal
+
+# NACHA ACH file format: fixed-width 94-character records, grouped in blocks of 10
+#   1 file header
+#   5 batch header / 6 entry detail ... / 8 batch control   (repeated per batch)
+#   9 file control, then lines of 9s to fill the last block
+RECORD_LENGTH = 94
+BLOCKING_FACTOR = 10
+CREDIT_SERVICE_CLASS = "220"  # credits only
+CHECKING_CREDIT = "22"
+
+
+def _alpha(value, length: int) -> str:
+    """Left-justified, space-filled, upper case ASCII (the bank's character set)"""
+    text = str(value or "").upper().encode("ascii", "replace").decode()
+    return text[:length].ljust(length)
+
+
+def _numeric(value, length: int) -> str:
+    """Right-justified, zero-filled"""
+    text = str(value)
+    if len(text) > length:
+        raise ValueError(f"{text} does not fit in {length} digits")
+    return text.rjust(length, "0")
+
+
+def _cents(amount: Decimal) -> int:
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+class NachaWriter:
+    """
+    Streaming NACHA writer: records go straight to the file object as entries are added, and only
+    running totals are kept in memory, so a file of any size costs the same memory.
+
+        writer = NachaWriter(f, destination_routing=..., ...)
+        writer.begin_batch(effective_date)
+        writer.add_credit(routing_number, account_number, amount, name, individual_id, trace_number)
+        writer.end_batch()
+        writer.close()
+    """
+
+    def __init__(
+        self, out, destination_routing: str, destination_name: str, origin_id: str, origin_name: str,
+        company_name: str, company_id: str, odfi_routing: str, entry_description: str, created_at: datetime,
+        file_id_modifier: str = "A",
+    ):
+        self.out = out
+        self.company_name = company_name
+        self.company_id = company_id
+        self.odfi = odfi_routing[:8]
+        self.entry_description = entry_description
+        self.created_at = created_at
+        self.lines = 0
+        self.batch_count = 0
+        self.entry_count = 0
+        self.entry_hash = 0
+        self.total_credit = 0
+        self._batch = None
+
+        self._write(
+            "1"                                     # record type
+            + "01"                                  # priority code
+            + " " + _numeric(destination_routing, 9)  # immediate destination
+            + _alpha(origin_id, 10)                 # immediate origin
+            + created_at.strftime("%y%m%d%H%M")     # creation date + time
+            + _alpha(file_id_modifier, 1)
+            + "094" + "10" + "1"                    # record size, blocking factor, format code
+            + _alpha(destination_name, 23)
+            + _alpha(origin_name, 23)
+            + _alpha("", 8)                         # reference code
+        )
+
+    def _write(self, record: str) -> None:
+        if len(record) != RECORD_LENGTH:
+            raise ValueError(f"ACH record is {len(record)} characters, not {RECORD_LENGTH}: {record!r}")
+        self.out.write(record + "\n")
+        self.lines += 1
+
+    def begin_batch(self, effective_date: datetime) -> None:
+        if self._batch is not None:
+            raise ValueError("end_batch() the current batch first")
+        self.batch_count += 1
+        self._batch = {"entries": 0, "hash": 0, "credit": 0}
+        self._write(
+            "5"
+            + CREDIT_SERVICE_CLASS
+            + _alpha(self.company_name, 16)
+            + _alpha("", 20)                        # company discretionary data
+            + _alpha(self.company_id, 10)
+            + "PPD"                                 # standard entry class
+            + _alpha(self.entry_description, 10)
+            + self.created_at.strftime("%y%m%d")    # descriptive date
+            + effective_date.strftime("%y%m%d")     # effective entry date
+            + "   "                                 # settlement date (filled in by the ACH operator)
+            + "1"                                   # originator status code
+            + _numeric(self.odfi, 8)
+            + _numeric(self.batch_count, 7)
+        )
+
+    def add_credit(
+        self, routing_number: str, account_number: str, amount: Decimal, name: str, individual_id: str, trace_number: str
+    ) -> None:
+        if self._batch is None:
+            raise ValueError("begin_batch() first")
+        cents = _cents(amount)
+        if cents <= 0:
+            raise ValueError(f"ACH credit must be positive, got {amount}")
+        self._write(
+            "6"
+            + CHECKING_CREDIT
+            + _numeric(routing_number, 9)           # receiving DFI (8) + check digit (1)
+            + _alpha(account_number, 17)
+            + _numeric(cents, 10)
+            + _alpha(individual_id, 15)
+            + _alpha(name, 22)
+            + "  "                                  # discretionary data
+            + "0"                                   # no addenda
+            + _numeric(trace_number, 15)
+        )
+        self._batch["entries"] += 1
+        self._batch["hash"] += int(routing_number[:8])
+        self._batch["credit"] += cents
+
+    def end_batch(self) -> None:
+        batch, self._batch = self._batch, None
+        self._write(
+            "8"
+            + CREDIT_SERVICE_CLASS
+            + _numeric(batch["entries"], 6)
+            + _numeric(batch["hash"] % 10 ** 10, 10)
+            + _numeric(0, 12)                       # total debits
+            + _numeric(batch["credit"], 12)
+            + _alpha(self.company_id, 10)
+            + _alpha("", 19)                        # message authentication code
+            + _alpha("", 6)                         # reserved
+            + _numeric(self.odfi, 8)
+            + _numeric(self.batch_count, 7)
+        )
+        self.entry_count += batch["entries"]
+        self.entry_hash += batch["hash"]
+        self.total_credit += batch["credit"]
+
+    def close(self) -> None:
+        if self._batch is not None:
+            self.end_batch()
+        blocks = -(-(self.lines + 1) // BLOCKING_FACTOR)  # including the file control record
+        self._write(
+            "9"
+            + _numeric(self.batch_count, 6)
+            + _numeric(blocks, 6)
+            + _numeric(self.entry_count, 8)
+            + _numeric(self.entry_hash % 10 ** 10, 10)
+            + _numeric(0, 12)
+            + _numeric(self.total_credit, 12)
+            + _alpha("", 39)
+        )
+        while self.lines % BLOCKING_FACTOR:
+            self._write("9" * RECORD_LENGTH)
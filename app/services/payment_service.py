@@ -1,14 +1,51 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
-from app.models.transaction import Transaction, TransactionStatus, PaymentRailType
+from app.models.transaction import Transaction, TransactionStatus, PaymentRailType, ALLOWED_TRANSITIONS, FRAUD_DECLINED_REASON
 from app.models.transaction_event import TransactionEvent
 from app.models.bank_account import BankAccount
 from app.schemas.transaction import TransactionCreate
+from app.services.webhook_service import WebhookService
+from app.services.event_stream_service import EventStreamService
+from app.services.ledger_service import LedgerService
+from app.services.installment_service import InstallmentService
+from app.services.rent_roll_service import RentRollService
+from app.services.transaction_cache_service import TransactionCacheService
+from app.models.ledger import LedgerEntryType
+from app.services.velocity_service import VelocityService
+from app.services.idempotency_service import IdempotencyService, key_hash, fingerprint
+from app.metrics import counter
+from app.tracing import traced, start_span, set_attributes
+from app.config import settings
+from app.sharding import ShardRouter, shard_session
 from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+TRANSITION_CONFLICTS = counter(
+    "transaction_transition_conflicts_total", "Status changes lost to a concurrent change of the same transaction"
+)
+
+
+class InvalidTransition(ValueError):
+    """The status change is not in ALLOWED_TRANSITIONS"""
+
+
+class TransitionConflict(Exception):
+    """The transaction was changed by someone else since the caller read it; nothing was written"""
+
+    def __init__(self, transaction_id, from_status, version, to_status, actual):
+        self.transaction_id = transaction_id
+        self.current_status = actual.status if actual else None
+        self.current_version = actual.version if actual else None
+        super().__init__(
+            f"Transaction {transaction_id} is no longer {from_status.value} (version {version}), "
+            f"can't move it to {to_status.value}: it is now "
+            + (f"{self.current_status.value} (version {self.current_version})" if actual else "gone")
+        )
+
+
 class PaymentService:
     # focus on two important concepts:
     # 1. Idempotency: Ensure that if the same payment request is made multiple times (e.g., due to network retries), only one transaction is created and processed.
@@ -19,23 +56,33 @@ class PaymentService:
         return datetime.now(timezone.utc)
 
     @staticmethod
+    @traced("payment.initiate")
     def initiate_payment(transaction_data: TransactionCreate, db: Session) -> Transaction:
         """
         Initiate a payment with idempotency handling.
-        If idempotency_key already exists, return existing transaction.
+        If idempotency_key already exists (within IDEMPOTENCY_KEY_TTL_HOURS), return existing transaction;
+        raises IdempotencyKeyReused if it was used for a different request body.
         Otherwise, create new transaction, log event, and trigger async processing.
+
+        db is a session on the main database (directory + reference data);
+        the transaction itself is written on the lease's shard.
         """
 
         # 1. Check for existing transaction with this idempotency key
-        existing_txn = db.query(Transaction).filter(
-            Transaction.idempotency_key == transaction_data.idempotency_key
-        ).first()
-         
-        if existing_txn:  # user may click multiple times, return the same key every time they click
-            logger.info(
-                f"Idempotency key {transaction_data.idempotency_key} already exists. Returning existing transaction."
-            )
-            return existing_txn
+        #    The key store is global, so a retry finds the transaction whatever shard it is on
+        now = datetime.utcnow()
+        key = key_hash(transaction_data.idempotency_key)
+        body_fingerprint = fingerprint(transaction_data)
+        reserved = IdempotencyService.find(key, db, now)
+        if reserved:
+            IdempotencyService.check_fingerprint(reserved, body_fingerprint)
+            existing_txn = PaymentService._load_transaction(reserved.transaction_id, db)
+            if existing_txn:  # user may click multiple times, return the same key every time they click
+                logger.info(
+                    f"Idempotency key {transaction_data.idempotency_key} already exists. Returning existing transaction."
+                )
+                return existing_txn
+            # Key reserved by a request that died before writing the transaction: finish the job below
         
         # 2. Validate bank accounts exist
         payer_account = db.query(BankAccount).filter(
@@ -49,15 +96,58 @@ class PaymentService:
         if not payer_account or not payee_account:
             raise ValueError("Invalid bank account(s)")
 
+        landlord_id = ShardRouter.lease_landlord(transaction_data.lease_id, db)
+        if landlord_id is None:
+            raise ValueError("Lease not found")
+        shard_id = ShardRouter.landlord_shard(landlord_id, db, for_write=True)
+
+        # 2b. Pre-authorization velocity checks: a declined payment is recorded as FAILED
+        #     right here and never dispatched (no worker time, no rail fee, nothing to reverse)
+        violations = []
+        if settings.VELOCITY_CHECKS_ENABLED:
+            with start_span("payment.velocity_check"):
+                violations = VelocityService.check(
+                    transaction_data.payer_account_id,
+                    transaction_data.lease_id,
+                    transaction_data.amount,
+                    transaction_data.idempotency_key
+                ).violations
+
+        transaction_id = reserved.transaction_id if reserved else IdempotencyService.reserve(
+            key, body_fingerprint, landlord_id, db, now
+        )
+        set_attributes(transaction_id=str(transaction_id), shard_id=shard_id)
+
+        with shard_session(shard_id, db) as shard_db:
+            return PaymentService._create_transaction(transaction_data, transaction_id, violations, shard_id, shard_db)
+
+    @staticmethod
+    def _load_transaction(transaction_id, db: Session) -> Transaction | None:
+        with shard_session(ShardRouter.transaction_shard(transaction_id, db), db) as shard_db:
+            return shard_db.query(Transaction).filter(Transaction.id == transaction_id).first()
+
+    @staticmethod
+    def _create_transaction(
+        transaction_data: TransactionCreate,
+        transaction_id,
+        violations: list[str],
+        shard_id: int,
+        db: Session
+    ) -> Transaction:
         # 3. Create transaction and log event
         # Transaction protection layer, either saved perfectly with full audit trail or not at all (rollback on failure)
         # Most important is that it never happens twice
         try:
+            now = PaymentService._utc_now()
             db_transaction = Transaction(
                 **transaction_data.model_dump(),  # converts validated Pydantic model to dict and then to SQLAlchemy model
-                status=TransactionStatus.PENDING,
-                initiated_at=PaymentService._utc_now()
+                id=transaction_id,  # reserved with the idempotency key
+                status=TransactionStatus.FAILED if violations else TransactionStatus.PENDING,
+                initiated_at=now
             )
+            if violations:
+                db_transaction.failed_at = now
+                db_transaction.failure_reason = f"{FRAUD_DECLINED_REASON}: {', '.join(violations)}"
 
             db.add(db_transaction)  # This tells SQLAlchemy, "I want to save this, but don't tell the database to make it permanent yet."
             db.flush()  # sends data to the database but doesn't commit, so we get an ID for the transaction without finalizing it
@@ -65,27 +155,33 @@ class PaymentService:
             # Audit trail phase 
             event = TransactionEvent(
                 transaction_id=db_transaction.id,
-                event_type="payment_initiated",
+                event_type="payment_declined" if violations else "payment_initiated",
                 previous_status=None,
-                new_status=TransactionStatus.PENDING.value,
-                metadata={  # fixed values at the time of initiation, even if related records change later
+                new_status=db_transaction.status.value,
+                details={  # fixed values at the time of initiation, even if related records change later
                     "payer_account": str(transaction_data.payer_account_id),
                     "payee_account": str(transaction_data.payee_account_id),
                     "amount": str(transaction_data.amount),
-                    "rail": transaction_data.payment_rail_type.value
+                    "rail": transaction_data.payment_rail_type.value,
+                    "velocity_violations": violations
                 }
             )
 
             db.add(event)
+            WebhookService.enqueue_event(event, db_transaction, db)  # outbox rows, committed together with the event
             db.commit()
             db.refresh(db_transaction)
             
+            if violations:
+                logger.warning(f"Payment {db_transaction.id} declined by velocity rules: {violations}")
+                return db_transaction
+
             logger.info(f"Payment initiated: {db_transaction.id}")
 
             # 5. Trigger async processing (Celery)
             try:
                 from app.tasks.payment_tasks import process_payment_async
-                process_payment_async.delay(str(db_transaction.id))
+                process_payment_async.apply_async(args=[str(db_transaction.id)], queue=ShardRouter.queue(shard_id))
             except Exception as dispatch_error:
                 # If Celery broker is down, we log it but DO NOT break the API call
                 logger.error(f"Failed to dispatch async task: {dispatch_error}")
@@ -94,14 +190,12 @@ class PaymentService:
 
         except IntegrityError as e:
             # handles race conditions where two requests with the same idempotency key hit at the same time
-            # loser of the race gets integrity error due to unique constraint on idempotency key
+            # both got the key's reserved transaction id: the loser of the race gets an integrity error on the primary key
             db.rollback()
             logger.error(f"IntegrityError during payment initiation: {e}")
 
             # Return existing transaction in case of race condition
-            existing_txn = db.query(Transaction).filter(
-                Transaction.idempotency_key == transaction_data.idempotency_key
-            ).first()
+            existing_txn = db.query(Transaction).filter(Transaction.id == transaction_id).first()
 
             if existing_txn:
                 return existing_txn
@@ -109,38 +203,93 @@ class PaymentService:
             raise
 
     @staticmethod
+    def compare_and_set_status(
+        transaction_id,
+        from_status: TransactionStatus,
+        version: int,
+        new_status: TransactionStatus,
+        db: Session,
+        **values
+    ) -> int | None:
+        """
+        The one way a transaction's status changes: a single
+        UPDATE ... WHERE id = ? AND status = ? AND version = ?, bumping the version.
+        Returns the new version, or None if the row is no longer (from_status, version):
+        someone else moved it first, and nothing was written.
+        values: other columns to set in the same statement. Does NOT commit.
+        """
+        if new_status not in ALLOWED_TRANSITIONS[from_status]:
+            raise InvalidTransition(f"Cannot move a transaction from {from_status.value} to {new_status.value}")
+
+        return db.execute(
+            update(Transaction).where(
+                Transaction.id == transaction_id,
+                Transaction.status == from_status,
+                Transaction.version == version,
+            ).values(
+                status=new_status, version=Transaction.version + 1, **values
+            ).returning(Transaction.version).execution_options(synchronize_session="fetch")
+        ).scalar()
+
+    @staticmethod
+    @traced("transaction.transition")
     def update_transaction_status(
         transaction_id: str,
         new_status: TransactionStatus,
         db: Session,
-        failure_reason: str | None = None
+        failure_reason: str | None = None,
+        expected_version: int | None = None
     ) -> Transaction:
         """
-        Update transaction status with event logging
+        Update transaction status with event logging.
+        expected_version: the version the caller decided on; without it, the version read here.
+        Raises TransitionConflict (after rolling back the caller's uncommitted changes)
+        if the transaction changed in between, InvalidTransition if the move isn't allowed.
+        No row lock: concurrent workers don't wait on each other, the loser gets a conflict.
         """
 
-        transaction = db.query(Transaction).filter(
+        current = db.query(Transaction.status, Transaction.version).filter(
             Transaction.id == transaction_id
         ).first()
 
-        if not transaction:
+        if not current:
             raise ValueError("Transaction not found")
 
-        old_status = transaction.status
-        transaction.status = new_status
+        old_status = current.status
+        version = current.version if expected_version is None else expected_version
+        set_attributes(transaction_id=str(transaction_id), from_status=old_status.value, to_status=new_status.value, version=version)
 
         # Update timestamp based on status, State machine logic to ensure correct timestamps are set for each status
         now = PaymentService._utc_now()
+        values = {}
 
         if new_status == TransactionStatus.PROCESSING:
-            transaction.processing_at = now
+            values["processing_at"] = now
 
         elif new_status == TransactionStatus.COMPLETED:
-            transaction.completed_at = now
+            values["completed_at"] = now
 
         elif new_status == TransactionStatus.FAILED:
-            transaction.failed_at = now
-            transaction.failure_reason = failure_reason
+            values["failed_at"] = now
+            values["failure_reason"] = failure_reason
+
+        new_version = PaymentService.compare_and_set_status(transaction_id, old_status, version, new_status, db, **values)
+        if new_version is None:
+            db.rollback()  # e.g. a retry scheduled for a failure that never happened
+            actual = db.query(Transaction.status, Transaction.version).filter(Transaction.id == transaction_id).first()
+            TRANSITION_CONFLICTS.inc(from_status=old_status.value, to_status=new_status.value)
+            raise TransitionConflict(transaction_id, old_status, version, new_status, actual)
+
+        transaction = db.query(Transaction).filter(Transaction.id == transaction_id).populate_existing().one()
+
+        # Money actually moved (or moved back): post it to the double-entry ledger in this same DB transaction
+        if new_status == TransactionStatus.COMPLETED:
+            LedgerService.post_transaction(transaction, LedgerEntryType.PAYMENT, db)
+        elif new_status == TransactionStatus.REFUNDED:
+            LedgerService.post_transaction(transaction, LedgerEntryType.REFUND, db)
+            # The rent it paid is owed again: reopen its installments and move next_due_date back
+            if InstallmentService.reverse_allocations(transaction, db):
+                InstallmentService.sync_payment_schedule(transaction.lease_id, db)
 
         # Log event
         """
@@ -158,13 +307,27 @@ class PaymentService:
             event_type="status_change",
             previous_status=old_status.value,
             new_status=new_status.value,
-            metadata={"failure_reason": failure_reason} if failure_reason else None
+            details={"failure_reason": failure_reason} if failure_reason else None
         )
 
         db.add(event)
+
+        # Push the change to webhook subscribers instead of making them poll GET /payments/{id}
+        WebhookService.enqueue_event(event, transaction, db)
+
         db.commit()
         db.refresh(transaction)
 
+        # Cached GET /payments/{id} and history: dropped before the SSE publish, so a client reacting to it reads the new state
+        TransactionCacheService.invalidate(transaction.id)
+
+        # Live SSE clients (published only after commit, so a client that re-reads sees the new state)
+        EventStreamService.publish_status_change(transaction, event)
+
+        # Money received changed for the month it settled in
+        if new_status in (TransactionStatus.COMPLETED, TransactionStatus.REFUNDED):
+            RentRollService.invalidate_for_transaction(transaction, db)
+
         logger.info(
             f"Transaction {transaction_id} status updated: {old_status} → {new_status}"
         )
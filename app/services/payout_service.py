@@ -0,0 +1,246 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, func, exists, literal, cast, or_, union_all, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.bank_account import BankAccount
+from app.models.user import User
+from app.models.ledger import LedgerEntryType
+from app.models.payout import AchFile, AchFileStatus, Payout, PayoutItem, PayoutStatus
+from app.services.nacha_writer import NachaWriter
+from app.sharding import ShardRouter, each_shard, skip_moving
+from app.config import settings
+from datetime import datetime, timedelta
+from decimal import Decimal
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class PayoutService:
+    # Payout batching: instead of one payee-side rail operation per rent payment, each run nets
+    # everything completed for a payee bank account (minus refunds of what was already paid out)
+    # into one Payout, and writes all of the run's payouts as credits in one NACHA ACH file.
+    #   1. create_payouts, per shard, set-based: payouts + payout_items (which transactions each one pays)
+    #   2. write_file: stream the payouts into the ACH file, then mark them FILED
+    # The file is derived from the DB, so a run that failed half way is simply written again.
+
+    @staticmethod
+    def window(now: datetime) -> tuple[datetime, datetime]:
+        """The last complete settlement window before now - PAYOUT_SETTLE_LAG_SECONDS"""
+        size = timedelta(hours=settings.PAYOUT_WINDOW_HOURS)
+        settled = now - timedelta(seconds=settings.PAYOUT_SETTLE_LAG_SECONDS)
+        end = EPOCH + (settled - EPOCH) // size * size
+        return end - size, end
+
+    @staticmethod
+    def eligible_items(window_end: datetime, lookback_start: datetime, moving=()):
+        """
+        (payee_account_id, transaction_id, item_type, signed amount) not in any payout yet:
+        payments completed before window_end, and refunds (a payment refunded before it was
+        paid out gets both items, netting to zero). Payments come off idx_transaction_status_created.
+        Landlords in `moving` (being resharded) are paid out by the next run.
+        """
+        def linked(item_type):
+            return exists().where(PayoutItem.transaction_id == Transaction.id, PayoutItem.item_type == item_type)
+
+        item_type = PayoutItem.__table__.c.item_type.type  # cast: a bare literal in a UNION would come out as text
+        payments = select(
+            Transaction.payee_account_id, Transaction.id.label("transaction_id"),
+            cast(literal(LedgerEntryType.PAYMENT, item_type), item_type).label("item_type"), Transaction.amount.label("amount"),
+        ).where(
+            Transaction.status.in_([TransactionStatus.COMPLETED, TransactionStatus.REFUNDED]),
+            Transaction.created_at >= lookback_start,
+            Transaction.completed_at < window_end,
+            ~linked(LedgerEntryType.PAYMENT),
+        )
+        payments = skip_moving(payments, moving, lease_id=Transaction.lease_id)
+        refunds = select(
+            Transaction.payee_account_id, Transaction.id, cast(literal(LedgerEntryType.REFUND, item_type), item_type), -Transaction.amount,
+        ).where(
+            Transaction.status == TransactionStatus.REFUNDED,  # rare: the status prefix of the index is selective
+            Transaction.updated_at < window_end,
+            ~linked(LedgerEntryType.REFUND),
+        )
+        refunds = skip_moving(refunds, moving, lease_id=Transaction.lease_id)
+        return union_all(payments, refunds).subquery("items")
+
+    @staticmethod
+    def create_payouts(
+        session: Session, ach_file_id, window_start: datetime, window_end: datetime, trace_offset: int, now: datetime,
+        moving=(),
+    ) -> int:
+        """
+        Net one shard's unpaid items into payouts for the file, in three set-based statements. Commits.
+        Payees whose net is not positive get nothing this run; their items carry over to the next.
+        Returns how many trace numbers were used (trace numbers continue from trace_offset).
+        """
+        lookback_start = window_end - timedelta(days=settings.PAYOUT_LOOKBACK_DAYS)
+
+        items = PayoutService.eligible_items(window_end, lookback_start, moving)
+        totals = select(
+            items.c.payee_account_id,
+            func.sum(items.c.amount).label("amount"),
+            func.count().label("item_count"),
+        ).group_by(items.c.payee_account_id).having(func.sum(items.c.amount) > 0).subquery("totals")
+        sequence = trace_offset + func.row_number().over(order_by=totals.c.payee_account_id)
+        created = session.execute(
+            pg_insert(Payout).from_select(
+                ["id", "ach_file_id", "payee_account_id", "window_start", "window_end", "amount", "item_count",
+                 "trace_number", "status", "created_at"],
+                select(
+                    func.gen_random_uuid(), literal(ach_file_id), totals.c.payee_account_id,
+                    literal(window_start), literal(window_end), totals.c.amount, totals.c.item_count,
+                    func.concat(settings.PAYOUT_ODFI_ROUTING[:8], func.lpad(cast(sequence, String), 7, "0")),
+                    literal(PayoutStatus.PENDING, Payout.__table__.c.status.type), literal(now),
+                )
+            ).returning(Payout.id)
+        ).all()
+        if not created:
+            session.commit()
+            return 0
+
+        # Link every item to its payee's payout (re-evaluated: a concurrent run keeps whatever it linked first)
+        items = PayoutService.eligible_items(window_end, lookback_start, moving)
+        session.execute(
+            pg_insert(PayoutItem).from_select(
+                ["id", "payout_id", "transaction_id", "item_type", "amount"],
+                select(
+                    func.gen_random_uuid(), Payout.id, items.c.transaction_id, items.c.item_type, items.c.amount
+                ).join(
+                    Payout, Payout.payee_account_id == items.c.payee_account_id
+                ).where(Payout.ach_file_id == ach_file_id)
+            ).on_conflict_do_nothing(constraint="uq_payout_item_transaction")
+        )
+
+        # Amounts come from the links, so a payout always pays exactly its items
+        linked = select(
+            PayoutItem.payout_id, func.sum(PayoutItem.amount).label("amount"), func.count().label("item_count")
+        ).join(Payout, Payout.id == PayoutItem.payout_id).where(
+            Payout.ach_file_id == ach_file_id
+        ).group_by(PayoutItem.payout_id).subquery("linked")
+        session.execute(
+            update(Payout).where(Payout.id == linked.c.payout_id).values(
+                amount=linked.c.amount, item_count=linked.c.item_count
+            ).execution_options(synchronize_session=False)
+        )
+        # Lost the race for its items, or netted to nothing after all: no ACH entry
+        empty = select(Payout.id).where(
+            Payout.ach_file_id == ach_file_id,
+            or_(Payout.amount <= 0, ~exists().where(PayoutItem.payout_id == Payout.id)),
+        )
+        session.execute(delete(PayoutItem).where(PayoutItem.payout_id.in_(empty)).execution_options(synchronize_session=False))
+        session.execute(delete(Payout).where(Payout.id.in_(empty)).execution_options(synchronize_session=False))
+
+        session.commit()
+        return len(created)
+
+    @staticmethod
+    def write_file(ach_file_id, db: Session) -> AchFile:
+        """
+        Stream the file's payouts from every shard into a NACHA file (written to a temp file, then
+        renamed, so a READY path is always complete), then mark the payouts FILED. Commits.
+        """
+        ach_file = db.get(AchFile, ach_file_id)
+        now = datetime.utcnow()
+        os.makedirs(settings.PAYOUT_ACH_DIR, exist_ok=True)
+        path = os.path.join(settings.PAYOUT_ACH_DIR, f"payouts-{ach_file.window_end:%Y%m%d%H%M}-{ach_file.id}.ach")
+
+        with open(path + ".tmp", "w", encoding="ascii") as out:
+            writer = NachaWriter(
+                out,
+                destination_routing=settings.PAYOUT_ODFI_ROUTING,
+                destination_name=settings.PAYOUT_ODFI_NAME,
+                origin_id=settings.PAYOUT_COMPANY_ID,
+                origin_name=settings.PAYOUT_COMPANY_NAME,
+                company_name=settings.PAYOUT_COMPANY_NAME,
+                company_id=settings.PAYOUT_COMPANY_ID,
+                odfi_routing=settings.PAYOUT_ODFI_ROUTING,
+                entry_description="RENT",
+                created_at=now,
+            )
+            effective_date = now + timedelta(days=1)
+            in_batch = 0
+            for _, session in each_shard(db):
+                rows = session.execute(
+                    select(
+                        Payout.id, Payout.amount, Payout.trace_number,
+                        BankAccount.routing_number, BankAccount.account_number_token, User.full_name,
+                    ).join(
+                        BankAccount, BankAccount.id == Payout.payee_account_id
+                    ).join(
+                        User, User.id == BankAccount.user_id
+                    ).where(
+                        Payout.ach_file_id == ach_file_id
+                    ).order_by(Payout.trace_number).execution_options(
+                        stream_results=True, yield_per=settings.PAYOUT_FETCH_SIZE
+                    )
+                )
+                for row in rows:
+                    if in_batch == 0:
+                        writer.begin_batch(effective_date)
+                    writer.add_credit(
+                        row.routing_number, row.account_number_token, row.amount, row.full_name,
+                        row.id.hex[:15], row.trace_number,
+                    )
+                    in_batch += 1
+                    if in_batch == settings.PAYOUT_ENTRIES_PER_BATCH:
+                        writer.end_batch()
+                        in_batch = 0
+                session.rollback()  # end the read transaction (server-side cursor) before the next shard
+            writer.close()
+        if writer.entry_count:
+            os.replace(path + ".tmp", path)
+        else:
+            os.remove(path + ".tmp")  # nothing to pay out this run: no file to send
+            path = None
+
+        for _, session in each_shard(db):
+            session.execute(
+                update(Payout).where(
+                    Payout.ach_file_id == ach_file_id, Payout.status == PayoutStatus.PENDING
+                ).values(status=PayoutStatus.FILED).execution_options(synchronize_session=False)
+            )
+            session.commit()
+
+        ach_file = db.get(AchFile, ach_file_id)
+        ach_file.path = path
+        ach_file.status = AchFileStatus.READY
+        ach_file.entry_count = writer.entry_count
+        ach_file.total_credit = Decimal(writer.total_credit) / 100
+        ach_file.generated_at = datetime.utcnow()
+        db.commit()
+        return ach_file
+
+    @staticmethod
+    def run(db: Session) -> dict:
+        """One payout run for the last complete settlement window (celery beat)"""
+        # A run that failed after creating payouts left its file GENERATING: write it first
+        for unfinished in db.scalars(select(AchFile.id).where(AchFile.status == AchFileStatus.GENERATING)).all():
+            PayoutService.write_file(unfinished, db)
+
+        now = datetime.utcnow()
+        window_start, window_end = PayoutService.window(now)
+        ach_file = AchFile(window_start=window_start, window_end=window_end, status=AchFileStatus.GENERATING)
+        db.add(ach_file)
+        db.commit()
+        ach_file_id = ach_file.id
+
+        traces = 0
+        for shard_id, session in each_shard(db):
+            moving = ShardRouter.moving_landlords(db)
+            traces += PayoutService.create_payouts(session, ach_file_id, window_start, window_end, traces, now, moving)
+
+        ach_file = PayoutService.write_file(ach_file_id, db)
+        logger.info(
+            f"Payout run through {window_end}: {ach_file.entry_count} payouts, {ach_file.total_credit} total, {ach_file.path}"
+        )
+        return {
+            "ach_file_id": str(ach_file.id),
+            "window_end": window_end.isoformat(),
+            "payouts": ach_file.entry_count,
+            "total_credit": str(ach_file.total_credit),
+            "path": ach_file.path,
+        }
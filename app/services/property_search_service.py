@@ -0,0 +1,175 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, exists, or_, tuple_
+from redis.exceptions import RedisError
+from app.models.property import Property
+from app.models.lease import Lease, LeaseStatus
+from app.schemas.property import PropertySearchPage
+from app.redis_client import get_redis
+from app.sharding import ShardRouter, each_shard
+from app.config import settings
+from decimal import Decimal
+import base64
+import hashlib
+import json
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cache keys embed a generation number: any property or lease write bumps it, which
+# orphans every cached page at once (they expire on their own TTL) - no key scans
+CACHE_GENERATION_KEY = "property_search:generation"
+
+# Sharded vacancy filter: candidate rows examined per round, and rounds per page
+CANDIDATE_BATCH_FACTOR = 4
+MAX_CANDIDATE_ROUNDS = 5
+
+
+def encode_cursor(monthly_rent, property_id) -> str:
+    raw = json.dumps([str(monthly_rent), str(property_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Decimal, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        monthly_rent, property_id = json.loads(raw)
+        return Decimal(monthly_rent), uuid.UUID(property_id)
+    except (ValueError, TypeError, ArithmeticError):
+        raise ValueError("Invalid cursor")
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fuzzy(column, text: str):
+    # Substring match or trigram similarity (typos); both served by the column's gin_trgm_ops index
+    return or_(column.ilike(f"%{_escape_like(text)}%", escape="\\"), column.op("%")(text))
+
+
+def cache_key(params: dict, generation: int) -> str:
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"property_search:{generation}:{digest}"
+
+
+class PropertySearchService:
+
+    @staticmethod
+    def build_query(filters: dict, after: tuple | None):
+        """Filtered properties in keyset order (monthly_rent, id), starting after the cursor position"""
+        query = select(Property.__table__)
+        if filters.get("q"):
+            query = query.where(_fuzzy(Property.address, filters["q"]))
+        if filters.get("city"):
+            query = query.where(_fuzzy(Property.city, filters["city"]))
+        if filters.get("state"):
+            query = query.where(Property.state == filters["state"])
+        if filters.get("zip_code"):
+            query = query.where(Property.zip_code == filters["zip_code"])
+        if filters.get("min_rent") is not None:
+            query = query.where(Property.monthly_rent >= filters["min_rent"])
+        if filters.get("max_rent") is not None:
+            query = query.where(Property.monthly_rent <= filters["max_rent"])
+        if after is not None:
+            # Row comparison: one index range scan, no OFFSET
+            query = query.where(tuple_(Property.monthly_rent, Property.id) > tuple_(*after))
+        return query.order_by(Property.monthly_rent, Property.id)
+
+    @staticmethod
+    def search(db: Session, filters: dict, limit: int, cursor: str | None = None) -> dict:
+        """
+        One page of results. Cached for PROPERTY_SEARCH_CACHE_TTL_SECONDS; a Redis outage only
+        means the query runs every time.
+        """
+        after = decode_cursor(cursor) if cursor else None  # invalid cursors fail before touching the cache
+
+        key = None
+        try:
+            redis = get_redis()
+            generation = int(redis.get(CACHE_GENERATION_KEY) or 0)
+            key = cache_key({**filters, "limit": limit, "cursor": cursor}, generation)
+            cached = redis.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        except RedisError as e:
+            logger.warning(f"Property search cache unavailable: {e}")
+
+        if ShardRouter.count() == 1:
+            page = PropertySearchService._search_single(db, filters, limit, after)
+        else:
+            page = PropertySearchService._search_sharded(db, filters, limit, after)
+        page = PropertySearchPage.model_validate(page).model_dump(mode="json")
+
+        if key is not None:
+            try:
+                get_redis().set(key, json.dumps(page), ex=settings.PROPERTY_SEARCH_CACHE_TTL_SECONDS)
+            except RedisError as e:
+                logger.warning(f"Property search cache unavailable: {e}")
+        return page
+
+    @staticmethod
+    def _search_single(db: Session, filters: dict, limit: int, after) -> dict:
+        # Leases are next to the properties: vacancy is an EXISTS on idx_lease_property_status
+        occupied = exists().where(Lease.property_id == Property.id, Lease.status == LeaseStatus.ACTIVE)
+        query = PropertySearchService.build_query(filters, after).add_columns(occupied.label("occupied"))
+        if filters.get("vacant") is True:
+            query = query.where(~occupied)
+        elif filters.get("vacant") is False:
+            query = query.where(occupied)
+
+        # limit + 1 tells whether there is a next page without a COUNT
+        rows = db.execute(query.limit(limit + 1)).all()
+        items = [{**row._mapping, "vacant": not row.occupied} for row in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1].monthly_rent, rows[limit - 1].id) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _occupied(property_ids: list, db: Session) -> set:
+        """Properties among property_ids with an ACTIVE lease, on whichever shard their landlord is"""
+        occupied = set()
+        for _, session in each_shard(db):
+            occupied.update(session.scalars(
+                select(Lease.property_id).where(
+                    Lease.property_id.in_(property_ids), Lease.status == LeaseStatus.ACTIVE
+                ).distinct()
+            ))
+        return occupied
+
+    @staticmethod
+    def _search_sharded(db: Session, filters: dict, limit: int, after) -> dict:
+        """
+        Properties are on every shard but leases only on their landlord's: filter candidate
+        pages from the main database, then look their occupancy up on the shards.
+        A vacancy-filtered page can come back short; only next_cursor = null means the end.
+        """
+        vacant_filter = filters.get("vacant")
+        batch = limit * CANDIDATE_BATCH_FACTOR if vacant_filter is not None else limit
+        items, last = [], None
+
+        for _ in range(MAX_CANDIDATE_ROUNDS):
+            candidates = db.execute(PropertySearchService.build_query(filters, after).limit(batch)).all()
+            occupied = PropertySearchService._occupied([row.id for row in candidates], db) if candidates else set()
+
+            for row in candidates:
+                last = row
+                vacant = row.id not in occupied
+                if vacant_filter is None or vacant == vacant_filter:
+                    items.append({**row._mapping, "vacant": vacant})
+                    if len(items) == limit:
+                        return {"items": items, "next_cursor": encode_cursor(row.monthly_rent, row.id)}
+
+            if len(candidates) < batch:
+                return {"items": items, "next_cursor": None}
+            after = (last.monthly_rent, last.id)
+
+        return {"items": items, "next_cursor": encode_cursor(last.monthly_rent, last.id)}
+
+    @staticmethod
+    def invalidate() -> None:
+        """Drop every cached search page - call after committing property or lease changes"""
+        try:
+            get_redis().incr(CACHE_GENERATION_KEY)
+        except RedisError as e:
+            # Worst case results stay stale for one TTL
+            logger.warning(f"Could not invalidate the property search cache: {e}")
@@ -0,0 +1,199 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func, tuple_, cast, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.reconciliation import (
+    BankStatement, ReconciliationResult, ReconciliationRun, Discrepancy, ReconciliationState,
+)
+from app.sharding import each_shard
+from datetime import datetime, timedelta
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# The bank reference of a transaction is its id: unique for good, unlike the client's
+# idempotency key, which can come back once IDEMPOTENCY_KEY_TTL_HOURS has passed
+BANK_REFERENCE = cast(Transaction.id, String)
+
+
+def _transaction_ids(references) -> list:
+    """References that can be ours at all (anything else is an unexpected bank charge)"""
+    ids = []
+    for reference in references:
+        try:
+            ids.append(uuid.UUID(reference))
+        except ValueError:
+            pass
+    return ids
+
+
+def classify(transaction, statement) -> Discrepancy | None:
+    """Same rules as scripts/reconciliation_query.sql; None = nothing to reconcile (yet)"""
+    if transaction is None:
+        return Discrepancy.UNEXPECTED_BANK_CHARGE if statement is not None else None
+    if statement is None:
+        # Only money we say has moved is expected on the statement
+        return Discrepancy.MISSING_IN_BANK if transaction.status == TransactionStatus.COMPLETED else None
+    if transaction.amount != statement.amount:
+        return Discrepancy.AMOUNT_MISMATCH
+    if transaction.status.value != statement.status.lower():
+        return Discrepancy.STATUS_MISMATCH
+    return None
+
+
+class ReconciliationService:
+    # Incremental replacement for the FULL OUTER JOIN in scripts/reconciliation_query.sql.
+    # Each run only looks at transaction references that can have changed outcome:
+    #   1. bank statements received since the last watermark
+    #   2. transactions updated since the last watermark (every shard)
+    #   3. items still open from earlier runs
+    # and records the outcome in reconciliation_results, so cost follows the day's activity, not history.
+
+    @staticmethod
+    def _changed_keys(session: Session, key_column, changed_at, id_column, low, high, batch_size: int):
+        """Keyset pages of references whose row changed in (low, high], on the (changed_at, id) index"""
+        after = None
+        while True:
+            query = select(key_column, changed_at, id_column).where(changed_at <= high)
+            if low is not None:
+                query = query.where(changed_at > low)
+            if after is not None:
+                query = query.where(tuple_(changed_at, id_column) > tuple_(*after))
+            rows = session.execute(query.order_by(changed_at, id_column).limit(batch_size)).all()
+            if not rows:
+                return
+            yield [row[0] for row in rows]
+            after = (rows[-1][1], rows[-1][2])
+
+    @staticmethod
+    def check_references(references: list[str], db: Session, now: datetime) -> dict:
+        """Re-evaluate a batch of references and record the outcome. Commits."""
+        statements = {
+            row.transaction_ref: row for row in db.execute(
+                select(BankStatement.id, BankStatement.transaction_ref, BankStatement.amount, BankStatement.status)
+                .where(BankStatement.transaction_ref.in_(references))
+            )
+        }
+        transactions = {}
+        transaction_ids = _transaction_ids(references)
+        for _, session in each_shard(db) if transaction_ids else ():
+            transactions.update({
+                str(row.id): row for row in session.execute(
+                    select(Transaction.id, Transaction.amount, Transaction.status)
+                    .where(Transaction.id.in_(transaction_ids))
+                )
+            })
+
+        out_of_line, matched = [], []
+        for reference in references:
+            transaction, statement = transactions.get(reference), statements.get(reference)
+            discrepancy = classify(transaction, statement)
+            if discrepancy is None:
+                matched.append(reference)
+                continue
+            out_of_line.append({
+                "transaction_ref": reference,
+                "transaction_id": transaction.id if transaction else None,
+                "bank_statement_id": statement.id if statement else None,
+                "internal_amount": transaction.amount if transaction else None,
+                "bank_amount": statement.amount if statement else None,
+                "internal_status": transaction.status.value if transaction else None,
+                "bank_status": statement.status if statement else None,
+                "discrepancy": discrepancy,
+                "state": ReconciliationState.OPEN,
+                "first_detected_at": now,
+                "last_checked_at": now,
+                "resolved_at": None,
+            })
+
+        if out_of_line:
+            upsert = pg_insert(ReconciliationResult).values(out_of_line)
+            db.execute(upsert.on_conflict_do_update(
+                index_elements=[ReconciliationResult.transaction_ref],
+                # first_detected_at is kept from the first time it went out of line
+                set_={
+                    name: upsert.excluded[name] for name in (
+                        "transaction_id", "bank_statement_id", "internal_amount", "bank_amount",
+                        "internal_status", "bank_status", "discrepancy", "state", "last_checked_at", "resolved_at",
+                    )
+                },
+            ))
+
+        resolved = 0
+        if matched:
+            # Matches are only written when they close an open item: the table holds exceptions, not every payment
+            resolved = db.execute(
+                update(ReconciliationResult).where(
+                    ReconciliationResult.transaction_ref.in_(matched),
+                    ReconciliationResult.state == ReconciliationState.OPEN,
+                ).values(state=ReconciliationState.RESOLVED, resolved_at=now, last_checked_at=now)
+            ).rowcount
+
+        db.commit()
+        return {"checked": len(references), "opened": len(out_of_line), "resolved": resolved}
+
+    @staticmethod
+    def run(db: Session, safety_seconds: int, batch_size: int) -> dict:
+        """
+        One incremental pass, from the previous run's watermark up to now - safety_seconds
+        (rows are timestamped before they commit; the lag lets stragglers land in the next window).
+        """
+        started_at = datetime.utcnow()
+        low = db.query(func.max(ReconciliationRun.through)).scalar()
+        high = started_at - timedelta(seconds=safety_seconds)
+        totals = {"checked": 0, "opened": 0, "resolved": 0}
+
+        def check(references):
+            for name, value in ReconciliationService.check_references(references, db, started_at).items():
+                totals[name] += value
+
+        for references in ReconciliationService._changed_keys(
+            db, BankStatement.transaction_ref, BankStatement.created_at, BankStatement.id, low, high, batch_size
+        ):
+            check(references)
+
+        for shard_id, session in each_shard(db):
+            for references in ReconciliationService._changed_keys(
+                session, BANK_REFERENCE, Transaction.updated_at, Transaction.id, low, high, batch_size
+            ):
+                check(references)
+
+        # Open items nothing touched this run (a late bank statement is what usually closes them)
+        while True:
+            references = db.scalars(
+                select(ReconciliationResult.transaction_ref).where(
+                    ReconciliationResult.state == ReconciliationState.OPEN,
+                    ReconciliationResult.last_checked_at < started_at,
+                ).limit(batch_size)
+            ).all()
+            if not references:
+                break
+            check(references)
+
+        db.add(ReconciliationRun(through=high, started_at=started_at, finished_at=datetime.utcnow(), **totals))
+        db.commit()
+
+        logger.info(f"Reconciliation through {high}: {totals}")
+        return {"through": high.isoformat(), **totals}
+
+    @staticmethod
+    def summary(db: Session) -> dict:
+        """Open discrepancies by type, straight from reconciliation_results (no join against history)"""
+        rows = db.query(
+            ReconciliationResult.discrepancy,
+            func.count(ReconciliationResult.id),
+            func.coalesce(func.sum(func.coalesce(ReconciliationResult.internal_amount, ReconciliationResult.bank_amount)), 0),
+        ).filter(
+            ReconciliationResult.state == ReconciliationState.OPEN
+        ).group_by(ReconciliationResult.discrepancy).all()
+
+        last_run = db.query(ReconciliationRun).order_by(ReconciliationRun.through.desc()).first()
+        return {
+            "open": [
+                {"discrepancy": discrepancy, "count": count, "total_amount": total}
+                for discrepancy, count, total in sorted(rows, key=lambda row: -row[1])
+            ],
+            "open_total": sum(row[1] for row in rows),
+            "last_run": last_run,
+        }
@@ -0,0 +1,202 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, literal, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from redis.exceptions import RedisError
+from app.models.property import Property
+from app.models.lease import Lease
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.rent_roll import RentRollMonth
+from app.redis_client import get_redis
+from app.sharding import skip_moving
+from app.config import settings
+from datetime import datetime, timedelta
+from decimal import Decimal
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNIT_COLUMNS = ("property_id", "address", "city", "state", "zip_code", "lease_count", "expected_rent", "payment_count", "received")
+
+
+def parse_month(text: str) -> datetime:
+    """'2025-03' -> 2025-03-01 00:00"""
+    try:
+        return datetime.strptime(text, "%Y-%m")
+    except ValueError:
+        raise ValueError("month must be YYYY-MM")
+
+
+def next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def cache_key(landlord_id, month: datetime) -> str:
+    return f"rent_roll:{landlord_id}:{month:%Y-%m}"
+
+
+class RentRollService:
+    # Rent roll: per unit (property) and month, the rent expected from its leases against the money
+    # actually received. One grouped statement per landlord and month; rendered reports are cached
+    # in Redis per (landlord, month), and months closed for RENT_ROLL_FREEZE_LAG_DAYS are frozen
+    # into rent_roll_months so they are never recomputed.
+
+    @staticmethod
+    def is_frozen_month(month: datetime, now: datetime) -> bool:
+        """Late settlements can still land in a month for a few days after it ends"""
+        return next_month(month) + timedelta(days=settings.RENT_ROLL_FREEZE_LAG_DAYS) <= now
+
+    @staticmethod
+    def unit_totals(month: datetime, landlord_id=None):
+        """
+        (landlord_id, property_id, lease_count, expected_rent, payment_count, received) per property,
+        for one landlord or (landlord_id=None) every landlord on the shard.
+        Expected: rent_amount of every lease in effect at some point of the month.
+        Received: COMPLETED transactions by completed_at (idx_transaction_completed).
+        """
+        start, end = month, next_month(month)
+        owned = [Property.landlord_id == landlord_id] if landlord_id is not None else []
+
+        expected = select(
+            Lease.property_id,
+            func.count().label("lease_count"),
+            func.sum(Lease.rent_amount).label("expected_rent"),
+        ).join(Property, Property.id == Lease.property_id).where(
+            *owned, Lease.start_date < end, Lease.end_date >= start,
+        ).group_by(Lease.property_id).subquery("expected")
+
+        received = select(
+            Lease.property_id,
+            func.count().label("payment_count"),
+            func.sum(Transaction.amount).label("received"),
+        ).join(Lease, Lease.id == Transaction.lease_id).join(Property, Property.id == Lease.property_id).where(
+            *owned,
+            Transaction.status == TransactionStatus.COMPLETED,
+            Transaction.completed_at >= start,
+            Transaction.completed_at < end,
+        ).group_by(Lease.property_id).subquery("received")
+
+        return select(
+            Property.landlord_id,
+            Property.id.label("property_id"),
+            func.coalesce(expected.c.lease_count, 0).label("lease_count"),
+            func.coalesce(expected.c.expected_rent, 0).label("expected_rent"),
+            func.coalesce(received.c.payment_count, 0).label("payment_count"),
+            func.coalesce(received.c.received, 0).label("received"),
+        ).outerjoin(
+            expected, expected.c.property_id == Property.id
+        ).outerjoin(
+            received, received.c.property_id == Property.id
+        ).where(*owned)
+
+    @staticmethod
+    def live_query(landlord_id, month: datetime):
+        totals = RentRollService.unit_totals(month, landlord_id).subquery("totals")
+        return select(
+            totals.c.property_id, Property.address, Property.city, Property.state, Property.zip_code,
+            totals.c.lease_count, totals.c.expected_rent, totals.c.payment_count, totals.c.received,
+        ).join(Property, Property.id == totals.c.property_id).order_by(Property.address, Property.id)
+
+    @staticmethod
+    def frozen_query(landlord_id, month: datetime):
+        return select(
+            RentRollMonth.property_id, Property.address, Property.city, Property.state, Property.zip_code,
+            RentRollMonth.lease_count, RentRollMonth.expected_rent, RentRollMonth.payment_count, RentRollMonth.received,
+        ).join(Property, Property.id == RentRollMonth.property_id).where(
+            RentRollMonth.landlord_id == landlord_id, RentRollMonth.month == month,
+        ).order_by(Property.address, Property.id)
+
+    @staticmethod
+    def freeze(db: Session, month: datetime, landlord_id=None, moving=()) -> int:
+        """
+        Write a closed month into rent_roll_months (one landlord, or every landlord on the shard). Commits.
+        Landlords in `moving` (being resharded) are skipped; freeze them once the move is done.
+        """
+        totals = skip_moving(
+            RentRollService.unit_totals(month, landlord_id), moving, landlord_id=Property.landlord_id
+        ).subquery("totals")
+        inserted = db.execute(
+            pg_insert(RentRollMonth).from_select(
+                ["id", "landlord_id", "month", "property_id", "lease_count", "expected_rent", "payment_count",
+                 "received", "frozen_at"],
+                select(
+                    func.gen_random_uuid(), totals.c.landlord_id, literal(month), totals.c.property_id,
+                    totals.c.lease_count, totals.c.expected_rent, totals.c.payment_count, totals.c.received,
+                    literal(datetime.utcnow()),
+                )
+            ).on_conflict_do_nothing(constraint="uq_rent_roll_month_property")
+        ).rowcount
+        db.commit()
+        return inserted
+
+    @staticmethod
+    def render(landlord_id, month: datetime, frozen: bool, rows) -> str:
+        """The report as JSON text (what is cached and sent as-is)"""
+        units = []
+        expected_total = received_total = Decimal(0)
+        for row in rows:
+            unit = dict(zip(UNIT_COLUMNS, row))
+            expected_total += unit["expected_rent"]
+            received_total += unit["received"]
+            unit["property_id"] = str(unit["property_id"])
+            unit["expected_rent"] = str(unit["expected_rent"])
+            unit["received"] = str(unit["received"])
+            units.append(unit)
+        return json.dumps({
+            "landlord_id": str(landlord_id),
+            "month": f"{month:%Y-%m}",
+            "frozen": frozen,
+            "unit_count": len(units),
+            "expected_rent": str(expected_total),
+            "received": str(received_total),
+            "outstanding": str(expected_total - received_total),
+            "units": units,
+        })
+
+    @staticmethod
+    def get(db: Session, landlord_id, month: datetime) -> str:
+        """The rent roll of a landlord's shard for a month, as JSON text. A Redis outage only costs the query."""
+        key = cache_key(landlord_id, month)
+        try:
+            cached = get_redis().get(key)
+            if cached is not None:
+                return cached.decode()
+        except RedisError as e:
+            logger.warning(f"Rent roll cache unavailable: {e}")
+
+        frozen = RentRollService.is_frozen_month(month, datetime.utcnow())
+        if frozen:
+            rows = db.execute(RentRollService.frozen_query(landlord_id, month)).all()
+            if not rows and RentRollService.freeze(db, month, landlord_id):
+                rows = db.execute(RentRollService.frozen_query(landlord_id, month)).all()
+        else:
+            rows = db.execute(RentRollService.live_query(landlord_id, month)).all()
+        report = RentRollService.render(landlord_id, month, frozen, rows)
+
+        ttl = settings.RENT_ROLL_FROZEN_CACHE_TTL_SECONDS if frozen else settings.RENT_ROLL_CACHE_TTL_SECONDS
+        try:
+            get_redis().set(key, report, ex=ttl)
+        except RedisError as e:
+            logger.warning(f"Rent roll cache unavailable: {e}")
+        return report
+
+    @staticmethod
+    def invalidate_for_transaction(transaction: Transaction, db: Session) -> None:
+        """
+        Drop the cached report of the month a transaction's money counts in - call after committing
+        a settlement or refund. Frozen months are left alone: a refund long after the fact doesn't
+        rewrite history.
+        """
+        if transaction.completed_at is None:
+            return
+        month = transaction.completed_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if RentRollService.is_frozen_month(month, datetime.utcnow()):
+            return
+        landlord_id = db.execute(
+            select(Property.landlord_id).join(Lease, and_(Lease.property_id == Property.id, Lease.id == transaction.lease_id))
+        ).scalar()
+        try:
+            get_redis().delete(cache_key(landlord_id, month))
+        except RedisError as e:
+            # Worst case the report stays stale for one TTL
+            logger.warning(f"Could not invalidate the rent roll cache: {e}")
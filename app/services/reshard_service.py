@@ -0,0 +1,301 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, func, and_, literal, cast, tuple_, Text, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.database import SessionLocal
+from app.sharding import ShardRouter, REFERENCE_MODELS, shard_session, upsert_rows
+from app.models.property import Property
+from app.models.bank_account import BankAccount
+from app.models.lease import Lease
+from app.models.payment_schedule import PaymentSchedule
+from app.models.installment import Installment, InstallmentAllocation
+from app.models.transaction import Transaction
+from app.models.transaction_event import TransactionEvent
+from app.models.webhook import WebhookDelivery
+from app.models.payment_retry import PaymentRetry
+from app.models.payout import Payout, PayoutItem
+from app.models.delinquency import DelinquencySnapshot
+from app.models.rent_roll import RentRollMonth
+from app.models.ledger import LedgerEntry, AccountBalance, BalanceCheckpoint
+from app.models.shard_directory import LandlordShard, LeaseDirectory, TransactionDirectory, ShardStatus
+from app.services.ledger_service import LedgerService
+from app.config import settings
+from datetime import datetime
+from itertools import zip_longest
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _landlord_tables(landlord_id):
+    """
+    (table, WHERE clause) for every row a landlord owns on its shard, parents first,
+    plus the WHERE clause for its ledger entries (moved separately, see _move_ledger)
+    """
+    lease_ids = select(Lease.id).where(
+        Lease.property_id.in_(select(Property.id).where(Property.landlord_id == landlord_id))
+    )
+    transaction_ids = select(Transaction.id).where(Transaction.lease_id.in_(lease_ids))
+    installment_ids = select(Installment.id).where(Installment.lease_id.in_(lease_ids))
+    event_ids = select(TransactionEvent.id).where(TransactionEvent.transaction_id.in_(transaction_ids))
+    # Payouts go by the landlord's own payee accounts (not through payout_items, which are deleted first)
+    payout_ids = select(Payout.id).where(
+        Payout.payee_account_id.in_(select(BankAccount.id).where(BankAccount.user_id == landlord_id))
+    )
+
+    return [
+        (Lease.__table__, Lease.id.in_(lease_ids)),
+        (PaymentSchedule.__table__, PaymentSchedule.lease_id.in_(lease_ids)),
+        (Installment.__table__, Installment.lease_id.in_(lease_ids)),
+        (DelinquencySnapshot.__table__, DelinquencySnapshot.lease_id.in_(lease_ids)),
+        (RentRollMonth.__table__, RentRollMonth.landlord_id == landlord_id),
+        (Transaction.__table__, Transaction.id.in_(transaction_ids)),
+        (TransactionEvent.__table__, TransactionEvent.transaction_id.in_(transaction_ids)),
+        (PaymentRetry.__table__, PaymentRetry.transaction_id.in_(transaction_ids)),
+        (InstallmentAllocation.__table__, InstallmentAllocation.installment_id.in_(installment_ids)),
+        (WebhookDelivery.__table__, WebhookDelivery.transaction_event_id.in_(event_ids)),
+        (Payout.__table__, Payout.id.in_(payout_ids)),
+        (PayoutItem.__table__, PayoutItem.payout_id.in_(payout_ids)),
+    ], LedgerEntry.transaction_id.in_(transaction_ids)
+
+
+class ReshardService:
+    # Directory maintenance and online moves of a landlord between shards (python -m app.cli.shards)
+
+    @staticmethod
+    def backfill_directory(db: Session) -> dict:
+        """
+        Register everything created before sharding existed as living on shard 0.
+        Set-based INSERT ... SELECT, safe to re-run (existing entries are left alone).
+        """
+        now = datetime.utcnow()
+        landlords = db.execute(
+            pg_insert(LandlordShard).from_select(
+                ["landlord_id", "shard_id", "status", "created_at", "updated_at"],
+                select(
+                    Property.landlord_id, literal(0), literal(ShardStatus.ACTIVE, LandlordShard.status.type),
+                    literal(now), literal(now)
+                ).distinct()
+            ).on_conflict_do_nothing()
+        ).rowcount
+        leases = db.execute(
+            pg_insert(LeaseDirectory).from_select(
+                ["lease_id", "landlord_id"],
+                select(Lease.id, Property.landlord_id).join(Property, Property.id == Lease.property_id)
+            ).on_conflict_do_nothing()
+        ).rowcount
+        transactions = db.execute(
+            pg_insert(TransactionDirectory).from_select(
+                ["transaction_id", "landlord_id", "created_at"],
+                select(Transaction.id, Property.landlord_id, Transaction.created_at)
+                .join(Lease, Lease.id == Transaction.lease_id)
+                .join(Property, Property.id == Lease.property_id)
+            ).on_conflict_do_nothing()
+        ).rowcount
+        db.commit()
+        return {"landlords": landlords, "leases": leases, "transactions": transactions}
+
+    @staticmethod
+    def sync_reference(batch_size: int) -> dict:
+        """Copy all reference rows from shard 0 to every other shard (new shard, or repair after a failed replicate)"""
+        copied = {}
+        with SessionLocal() as source:
+            for model in REFERENCE_MODELS:
+                table = model.__table__
+                copied[table.name] = 0
+                for rows in ReshardService._batches(source, table, None, batch_size):
+                    for shard_id in range(1, ShardRouter.count()):
+                        with shard_session(shard_id) as target:
+                            upsert_rows(target, table, rows)
+                            target.commit()
+                    copied[table.name] += len(rows)
+        return copied
+
+    @staticmethod
+    def _batches(session: Session, table, where, batch_size: int):
+        """Keyset pages of rows (as dicts) ordered by primary key"""
+        last_id = None
+        while True:
+            query = select(table)
+            if where is not None:
+                query = query.where(where)
+            if last_id is not None:
+                query = query.where(table.c.id > last_id)
+            rows = [dict(row._mapping) for row in session.execute(query.order_by(table.c.id).limit(batch_size))]
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    @staticmethod
+    def _copy(tables, source: Session, target: Session, batch_size: int) -> dict:
+        copied = {}
+        for table, where in tables:
+            copied[table.name] = 0
+            for rows in ReshardService._batches(source, table, where, batch_size):
+                upsert_rows(target, table, rows)
+                target.commit()
+                copied[table.name] += len(rows)
+        return copied
+
+    @staticmethod
+    def _fingerprints(session: Session, table, where, batch_size: int):
+        """
+        (id, md5 of the row) for every row, ordered by id, in keyset pages.
+        Shard-local columns are left out; JSON goes through jsonb so both sides print it the same way.
+        """
+        columns = [
+            cast(column, JSONB) if isinstance(column.type, JSON) else column
+            for column in table.columns if not column.info.get("shard_local")
+        ]
+        fingerprint = select(table.c.id, func.md5(cast(tuple_(*columns), Text))).where(where)
+        last_id = None
+        while True:
+            query = fingerprint if last_id is None else fingerprint.where(table.c.id > last_id)
+            rows = session.execute(query.order_by(table.c.id).limit(batch_size)).all()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def _verify(tables, source: Session, target: Session, batch_size: int) -> None:
+        """Both shards must hold the same rows with the same contents (ids and versions alike)"""
+        for table, where in tables:
+            pairs = zip_longest(
+                ReshardService._fingerprints(source, table, where, batch_size),
+                ReshardService._fingerprints(target, table, where, batch_size),
+            )
+            for on_source, on_target in pairs:
+                if on_source is None or on_target is None or tuple(on_source) != tuple(on_target):
+                    row_id = (on_source or on_target)[0]
+                    raise RuntimeError(f"{table.name}: row {row_id} differs between the shards after the final copy")
+
+    @staticmethod
+    def _move_ledger(moved, source: Session, target: Session, batch_size: int) -> int:
+        """
+        Move ledger entries and carry their amounts over: added to the target's running balances,
+        taken out of the source's balances and of every source checkpoint that included them.
+        Sequences are per shard, so entries get a new sequence on the target.
+        """
+        columns = [column.name for column in LedgerEntry.__table__.columns if column.name != "sequence"]
+        count = 0
+        for rows in ReshardService._batches(source, LedgerEntry.__table__, moved, batch_size):
+            inserted = target.execute(
+                pg_insert(LedgerEntry).values([{name: row[name] for name in columns} for row in rows])
+                .on_conflict_do_nothing(index_elements=[LedgerEntry.id])
+                .returning(LedgerEntry.account_id, LedgerEntry.direction, LedgerEntry.amount)
+            ).all()
+            if inserted:
+                LedgerService.apply_balance_deltas(inserted, target, datetime.utcnow())
+            target.commit()
+            count += len(inserted)
+
+        debits, credits, entries = LedgerService._entry_totals()
+        per_account = select(
+            LedgerEntry.account_id, debits.label("debits"), credits.label("credits"), entries.label("entries")
+        ).where(moved).group_by(LedgerEntry.account_id).subquery()
+        source.execute(
+            update(AccountBalance).where(AccountBalance.account_id == per_account.c.account_id).values(
+                total_debits=AccountBalance.total_debits - per_account.c.debits,
+                total_credits=AccountBalance.total_credits - per_account.c.credits,
+                entry_count=AccountBalance.entry_count - per_account.c.entries,
+                updated_at=datetime.utcnow(),
+            )
+        )
+
+        per_checkpoint = select(
+            BalanceCheckpoint.id, debits.label("debits"), credits.label("credits"), entries.label("entries")
+        ).join(
+            LedgerEntry, and_(
+                LedgerEntry.account_id == BalanceCheckpoint.account_id,
+                LedgerEntry.sequence <= BalanceCheckpoint.through_sequence,
+            )
+        ).where(moved).group_by(BalanceCheckpoint.id).subquery()
+        source.execute(
+            update(BalanceCheckpoint).where(BalanceCheckpoint.id == per_checkpoint.c.id).values(
+                total_debits=BalanceCheckpoint.total_debits - per_checkpoint.c.debits,
+                total_credits=BalanceCheckpoint.total_credits - per_checkpoint.c.credits,
+                entry_count=BalanceCheckpoint.entry_count - per_checkpoint.c.entries,
+            )
+        )
+
+        # Entries, balances and checkpoints change together on the source
+        source.execute(delete(LedgerEntry).where(moved))
+        source.commit()
+        return count
+
+    @staticmethod
+    def _set_status(landlord_id, db: Session, **values) -> None:
+        db.execute(
+            update(LandlordShard).where(LandlordShard.landlord_id == landlord_id).values(
+                updated_at=datetime.utcnow(), **values
+            )
+        )
+        db.commit()
+
+    @staticmethod
+    def move_landlord(landlord_id, to_shard: int, db: Session, batch_size: int | None = None,
+                      freeze_seconds: float | None = None) -> dict:
+        """
+        Move every row a landlord owns to another shard while the API keeps serving it.
+
+        1. Bulk copy while writes continue (upserts: re-running is harmless).
+        2. Freeze: status MOVING makes writes answer 503 + Retry-After, payment tasks retry and
+           the per-shard beat jobs skip the landlord (skip_moving). Wait out the grace period so
+           in-flight writes commit, then copy again - this pass only picks up what changed since
+           step 1, so the freeze lasts seconds. Then compare both sides row by row: anything that
+           still slipped in after the copy aborts the move.
+        3. Move the ledger entries with their balance adjustments.
+        4. Flip the directory, unfreeze, then delete the rows left on the source.
+
+        If it stops half way, run it again: every step picks up where the previous run left off.
+        """
+        batch_size = batch_size or settings.RESHARD_BATCH_SIZE
+        freeze_seconds = settings.RESHARD_FREEZE_GRACE_SECONDS if freeze_seconds is None else freeze_seconds
+        if not 0 <= to_shard < ShardRouter.count():
+            raise ValueError(f"No shard {to_shard} (configured: {ShardRouter.count()})")
+
+        from_shard = ShardRouter.assign_landlord(landlord_id, db)
+        if from_shard == to_shard:
+            return {"landlord_id": str(landlord_id), "from_shard": from_shard, "to_shard": to_shard, "moved": False}
+
+        tables, moved_ledger = _landlord_tables(landlord_id)
+        with shard_session(from_shard, db) as source, shard_session(to_shard, db) as target:
+            started = time.monotonic()
+            copied = ReshardService._copy(tables, source, target, batch_size)
+            logger.info(f"Landlord {landlord_id}: bulk copy {copied} in {time.monotonic() - started:.1f}s")
+
+            ReshardService._set_status(landlord_id, db, status=ShardStatus.MOVING)
+            frozen_at = time.monotonic()
+            try:
+                time.sleep(freeze_seconds)
+                ReshardService._copy(tables, source, target, batch_size)
+
+                ReshardService._verify(tables, source, target, batch_size)
+
+                ledger_entries = ReshardService._move_ledger(moved_ledger, source, target, batch_size)
+                ReshardService._set_status(landlord_id, db, shard_id=to_shard, status=ShardStatus.ACTIVE)
+            except Exception:
+                db.rollback()
+                # Nothing was flipped: unfreeze on the source, the copies on the target are just ignored
+                ReshardService._set_status(landlord_id, db, status=ShardStatus.ACTIVE)
+                raise
+            frozen = time.monotonic() - frozen_at
+
+            # No longer reachable through the directory; children first
+            for table, where in reversed(tables):
+                source.execute(delete(table).where(where))
+            source.commit()
+
+        logger.info(f"Landlord {landlord_id} moved from shard {from_shard} to {to_shard}, writes frozen {frozen:.1f}s")
+        return {
+            "landlord_id": str(landlord_id),
+            "from_shard": from_shard,
+            "to_shard": to_shard,
+            "moved": True,
+            "rows": copied,
+            "ledger_entries": ledger_entries,
+            "frozen_seconds": round(frozen, 2),
+        }
@@ -0,0 +1,148 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.transaction import Transaction, TransactionStatus, is_fraud_declined
+from app.models.transaction_event import TransactionEvent
+from app.models.payment_retry import PaymentRetry, RetryStatus
+from app.services.webhook_service import WebhookService
+from app.services.payment_service import PaymentService
+from app.services.transaction_cache_service import TransactionCacheService
+from app.sharding import skip_moving
+from app.config import settings
+from datetime import datetime, timedelta
+import random
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANUAL_REASON = "manual"
+
+
+class RetryService:
+    # Delayed retries of failed payments, stored in payment_retries and polled in batches
+    # (dispatch_due_retries task) instead of living in the broker as countdown tasks:
+    # 1. schedule: one row per attempt, written in the same DB transaction as the failure
+    # 2. claim_due: due rows -> transaction back to PENDING, then dispatched to a worker
+    # Payments declined by the velocity checks are never retried (is_fraud_declined).
+
+    @staticmethod
+    def compute_backoff(reason: str | None, attempt: int) -> timedelta | None:
+        """
+        Exponential backoff for this failure reason, or None if it is not retried automatically.
+        Half fixed, half random: payments that failed together (a bank outage) don't all come due together.
+        """
+        base = settings.RETRY_BACKOFF_BASE_SECONDS.get(reason)
+        if base is None:
+            return None
+        delay = min(base * (2 ** max(attempt - 1, 0)), settings.RETRY_BACKOFF_MAX_SECONDS)
+        return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+    @staticmethod
+    def schedule(transaction_id, retry_count: int, reason: str | None, db: Session, manual: bool = False):
+        """
+        Schedule the next attempt. Does NOT commit.
+        Returns the (attempt, due_at) row written, or None if there is nothing to schedule
+        (MAX_RETRIES reached, a failure reason that needs a manual retry, or that attempt
+        was already dispatched).
+        A manual retry of an attempt already scheduled brings it forward to now.
+        """
+        if retry_count >= settings.PAYMENT_MAX_RETRIES:
+            return None
+
+        attempt = retry_count + 1
+        now = datetime.utcnow()
+        if manual:
+            due_at = now
+        else:
+            backoff = RetryService.compute_backoff(reason, attempt)
+            if backoff is None:
+                return None
+            due_at = now + backoff
+
+        upsert = pg_insert(PaymentRetry).values(
+            id=uuid.uuid4(),
+            transaction_id=transaction_id,
+            attempt=attempt,
+            reason=MANUAL_REASON if manual else reason,
+            due_at=due_at,
+            status=RetryStatus.SCHEDULED,
+            created_at=now,
+        )
+        return db.execute(
+            upsert.on_conflict_do_update(
+                constraint="uq_payment_retry_attempt",
+                set_={
+                    "due_at": case(
+                        (PaymentRetry.status == RetryStatus.SCHEDULED, func.least(PaymentRetry.due_at, upsert.excluded.due_at)),
+                        else_=upsert.excluded.due_at,
+                    ),
+                    "reason": upsert.excluded.reason,
+                    "status": RetryStatus.SCHEDULED,
+                },
+                where=PaymentRetry.status != RetryStatus.DISPATCHED,  # a dispatched attempt is never re-run
+            ).returning(PaymentRetry.attempt, PaymentRetry.due_at)
+        ).first()
+
+    @staticmethod
+    def claim_due(db: Session, limit: int, moving=()) -> list[str]:
+        """
+        Lock due retries (SKIP LOCKED: parallel pollers split the work), put their transactions
+        back to PENDING with a retry_attempted event, commit, and return the ids to dispatch.
+        Retries of landlords in `moving` (being resharded) wait for the next poll.
+        """
+        now = datetime.utcnow()
+        due = db.query(PaymentRetry).filter(
+            PaymentRetry.status == RetryStatus.SCHEDULED,
+            PaymentRetry.due_at <= now,
+        )
+        retries = skip_moving(due, moving, transaction_id=PaymentRetry.transaction_id).order_by(PaymentRetry.due_at).limit(limit).with_for_update(skip_locked=True).all()
+        if not retries:
+            return []
+
+        transactions = {
+            transaction.id: transaction
+            for transaction in db.query(Transaction).filter(Transaction.id.in_([retry.transaction_id for retry in retries]))
+        }
+
+        dispatch = []
+        for retry in retries:
+            transaction = transactions.get(retry.transaction_id)
+            if transaction is None or transaction.status != TransactionStatus.FAILED:
+                retry.status = RetryStatus.CANCELLED  # e.g. already retried by hand
+                continue
+            if is_fraud_declined(transaction.failure_reason):
+                retry.status = RetryStatus.CANCELLED  # declined up front: never goes to a rail
+                continue
+
+            failure_reason = transaction.failure_reason
+            reset = PaymentService.compare_and_set_status(
+                transaction.id, TransactionStatus.FAILED, transaction.version, TransactionStatus.PENDING, db,
+                retry_count=retry.attempt, failed_at=None, failure_reason=None,
+            )
+            if reset is None:
+                retry.status = RetryStatus.CANCELLED  # changed since it was read, e.g. retried by hand
+                continue
+
+            event = TransactionEvent(
+                transaction_id=transaction.id,
+                event_type="retry_attempted",
+                previous_status=TransactionStatus.FAILED.value,
+                new_status=TransactionStatus.PENDING.value,
+                details={
+                    "retry_count": retry.attempt,
+                    "reason": retry.reason,
+                    "failure_reason": failure_reason,
+                    "scheduled_for": retry.due_at.isoformat(),
+                },
+            )
+            retry.status = RetryStatus.DISPATCHED
+            retry.dispatched_at = now
+
+            db.add(event)
+            WebhookService.enqueue_event(event, transaction, db)
+            dispatch.append(str(transaction.id))
+
+        db.commit()
+        TransactionCacheService.invalidate(*dispatch)  # back to PENDING, with a retry_attempted event
+        return dispatch
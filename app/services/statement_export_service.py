@@ -0,0 +1,145 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from app.models.transaction import Transaction
+from app.models.lease import Lease
+from app.models.property import Property
+from datetime import datetime
+from decimal import Decimal
+from operator import attrgetter
+import csv
+import enum
+import heapq
+import io
+import json
+import uuid
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StatementScope(str, enum.Enum):
+    LANDLORD = "landlord"
+    PROPERTY = "property"
+    LEASE = "lease"
+    RENTER = "renter"
+
+class ExportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+MEDIA_TYPES = {ExportFormat.CSV: "text/csv", ExportFormat.NDJSON: "application/x-ndjson"}
+
+# One statement line per transaction, with the lease / property it belongs to
+STATEMENT_COLUMNS = (
+    Transaction.id.label("transaction_id"),
+    Transaction.created_at,
+    Transaction.completed_at,
+    Transaction.status,
+    Transaction.amount,
+    Transaction.payment_rail_type,
+    Transaction.failure_reason,
+    Transaction.lease_id,
+    Lease.renter_id,
+    Lease.property_id,
+    Property.address,
+    Property.city,
+    Property.state,
+    Property.zip_code,
+)
+HEADER = [column.key for column in STATEMENT_COLUMNS]
+
+
+def scope_filter(scope: StatementScope, scope_id):
+    return {
+        StatementScope.LANDLORD: Property.landlord_id == scope_id,
+        StatementScope.PROPERTY: Lease.property_id == scope_id,
+        StatementScope.LEASE: Transaction.lease_id == scope_id,
+        StatementScope.RENTER: Lease.renter_id == scope_id,
+    }[scope]
+
+
+def plain(value):
+    """Column value -> str / None, the same text in CSV and NDJSON"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def render(rows, export_format: ExportFormat, chunk_rows: int):
+    """Rows -> text chunks of about chunk_rows lines each (CSV starts with a header line)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == ExportFormat.CSV else None
+    if writer:
+        writer.writerow(HEADER)
+
+    pending = 0
+    for row in rows:
+        values = [plain(value) for value in row]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(HEADER, values))))
+            buffer.write("\n")
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    """Compress a stream of bytes chunks into one gzip file, without holding it in memory"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # +16: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class StatementExportService:
+    # Year-end statements: every transaction of a landlord / property / lease / renter over a date range,
+    # streamed from a server-side cursor (yield_per) so memory doesn't grow with the number of rows
+
+    @staticmethod
+    def statement_query(scope: StatementScope, scope_id, start: datetime, end: datetime):
+        """Transactions created in [start, end) for the scope, oldest first"""
+        return select(*STATEMENT_COLUMNS).join(
+            Lease, Lease.id == Transaction.lease_id
+        ).join(
+            Property, Property.id == Lease.property_id
+        ).where(
+            scope_filter(scope, scope_id),
+            Transaction.created_at >= start,
+            Transaction.created_at < end,
+        ).order_by(Transaction.created_at, Transaction.id)
+
+    @staticmethod
+    def export(
+        sessions: list[Session], scope: StatementScope, scope_id, start: datetime, end: datetime,
+        export_format: ExportFormat, compress: bool, fetch_size: int,
+    ):
+        """
+        Stream the statement as bytes. sessions: one per shard holding the scope's data
+        (several for a renter), merged by created_at. Closes the sessions when done
+        (it runs after the endpoint has returned, so it can't use request-scoped sessions).
+        """
+        try:
+            query = StatementExportService.statement_query(scope, scope_id, start, end).execution_options(
+                stream_results=True, yield_per=fetch_size
+            )
+            streams = [session.execute(query) for session in sessions]
+            rows = streams[0] if len(streams) == 1 else heapq.merge(*streams, key=attrgetter("created_at"))
+            chunks = (text.encode() for text in render(rows, export_format, fetch_size))
+            yield from gzipped(chunks) if compress else chunks
+        finally:
+            for session in sessions:
+                session.close()
@@ -0,0 +1,123 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, func
+from app.models.transaction import Transaction, TransactionStatus, PaymentRailType
+from app.models.transaction_event import TransactionEvent
+from app.services.payment_service import PaymentService, TransitionConflict
+from app.services.transaction_cache_service import TransactionCacheService
+from app.sharding import skip_moving
+from app.ids import uuid7
+from app.metrics import counter
+from app.config import settings
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+SWEEP_EVENT = "sweep_requeued"
+
+STUCK_TRANSACTIONS = counter(
+    "stuck_transactions_total", "Transactions found past their rail's SLA, by status, rail and action (requeued, failed)"
+)
+
+# States a transaction should only pass through; anything sitting in them too long was lost
+SWEPT_STATUSES = (TransactionStatus.PENDING, TransactionStatus.PROCESSING)
+
+
+class StuckTransactionService:
+    # Safety net for payments nobody is working on any more: a dispatch that failed after
+    # commit, or a worker that died while waiting on the rail. Runs every STUCK_SWEEP_INTERVAL_SECONDS.
+
+    @staticmethod
+    def sla_seconds(status: TransactionStatus, rail: PaymentRailType) -> int:
+        slas = settings.STUCK_PENDING_SLA_SECONDS if status == TransactionStatus.PENDING else settings.STUCK_PROCESSING_SLA_SECONDS
+        return slas[rail.value]
+
+    @staticmethod
+    def stuck_query(status: TransactionStatus, rail: PaymentRailType, cutoff: datetime, limit: int, moving=()):
+        """
+        Oldest transactions past the cutoff in one (status, rail), locked for this sweeper.
+        status + created_at is a range scan on idx_transaction_status_created; SKIP LOCKED
+        means a concurrent sweeper takes the next rows instead of the same ones.
+        updated_at: a transaction touched recently (or just requeued) is not stuck.
+        Landlords in `moving` (being resharded) are left for a later sweep.
+        """
+        stuck = select(Transaction).where(
+            Transaction.status == status,
+            Transaction.created_at < cutoff,
+            Transaction.payment_rail_type == rail,
+            Transaction.updated_at < cutoff,
+        )
+        return skip_moving(stuck, moving, lease_id=Transaction.lease_id).order_by(Transaction.created_at).limit(limit).with_for_update(skip_locked=True)
+
+    @staticmethod
+    def sweep(db: Session, batch_size: int, moving=()) -> list[str]:
+        """
+        Claim at most one batch per (status, rail) and return the ids to re-dispatch.
+        Transactions already requeued STUCK_MAX_REQUEUES times are failed instead.
+        One batch per run keeps a large backlog (e.g. after a broker outage) draining at a steady rate.
+        """
+        requeue: list[str] = []
+        for status in SWEPT_STATUSES:
+            for rail in PaymentRailType:
+                sla = StuckTransactionService.sla_seconds(status, rail)
+                now = datetime.utcnow()
+                transactions = db.scalars(
+                    StuckTransactionService.stuck_query(status, rail, now - timedelta(seconds=sla), batch_size, moving)
+                ).all()
+                if not transactions:
+                    continue
+
+                previous = dict(db.query(TransactionEvent.transaction_id, func.count(TransactionEvent.id)).filter(
+                    TransactionEvent.transaction_id.in_([t.id for t in transactions]),
+                    TransactionEvent.event_type == SWEEP_EVENT,
+                ).group_by(TransactionEvent.transaction_id).all())
+                give_up = [t for t in transactions if previous.get(t.id, 0) >= settings.STUCK_MAX_REQUEUES]
+                retry = [t for t in transactions if previous.get(t.id, 0) < settings.STUCK_MAX_REQUEUES]
+
+                # The claim: bumping updated_at takes every claimed row out of other sweepers' window
+                # until a full SLA has passed again
+                for transaction in transactions:
+                    transaction.updated_at = now
+                if retry:
+                    db.execute(insert(TransactionEvent), [
+                        {
+                            "id": uuid7(),
+                            "transaction_id": transaction.id,
+                            "event_type": SWEEP_EVENT,
+                            "previous_status": status.value,
+                            "new_status": status.value,
+                            "details": {
+                                "rail": rail.value,
+                                "sla_seconds": sla,
+                                "stuck_seconds": int((now - transaction.created_at).total_seconds()),
+                                "requeue": previous.get(transaction.id, 0) + 1,
+                            },
+                            "timestamp": now,
+                        }
+                        for transaction in retry
+                    ])
+                retry_ids = [str(transaction.id) for transaction in retry]  # read before commit expires the objects
+                give_up_ids = [(transaction.id, transaction.version) for transaction in give_up]
+                db.commit()
+                TransactionCacheService.invalidate(*retry_ids)  # their history has a new sweep event
+
+                for transaction_id, version in give_up_ids:
+                    try:
+                        PaymentService.update_transaction_status(
+                            transaction_id, TransactionStatus.FAILED, db,
+                            failure_reason=f"Stuck in {status.value} past the {rail.value} SLA after "
+                                           f"{settings.STUCK_MAX_REQUEUES} requeues",
+                            expected_version=version,
+                        )
+                    except TransitionConflict as e:
+                        logger.info(f"Not failing stuck transaction: {e}")  # a worker finished it after all
+
+                requeue += retry_ids
+                for action, swept in (("requeued", retry), ("failed", give_up)):
+                    if swept:
+                        STUCK_TRANSACTIONS.inc(len(swept), status=status.value, rail=rail.value, action=action)
+                logger.warning(
+                    f"{len(transactions)} transactions stuck in {status.value} on {rail.value} (SLA {sla}s): "
+                    f"{len(retry)} requeued, {len(give_up)} failed"
+                )
+        return requeue
@@ -0,0 +1,122 @@
+from redis.exceptions import RedisError
+from app.models.transaction import Transaction
+from app.models.transaction_event import TransactionEvent
+from app.schemas.transaction import TransactionResponse
+from app.redis_client import get_redis
+from app.metrics import counter
+from app.config import settings
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = counter("transaction_cache_lookups_total", "Transaction read cache lookups by kind and outcome (hit, miss, error)")
+
+
+def transaction_key(transaction_id) -> str:
+    return f"txn:{transaction_id}"
+
+
+def history_key(transaction_id) -> str:
+    return f"txn:{transaction_id}:history"
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match: a list of (possibly weak) tags, or *"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+class TransactionCacheService:
+    # Read-through Redis cache for GET /payments/{id} and /payments/{id}/history, rendered JSON +
+    # ETag per entry: a poll that finds nothing changed is one Redis GET and a 304, no database.
+    # Every write path that changes a transaction or adds events to it calls invalidate() after
+    # committing. A reader that loaded the old row just before an invalidation can put it back;
+    # that is bounded by TRANSACTION_CACHE_TTL_SECONDS.
+
+    @staticmethod
+    def render_transaction(transaction: Transaction) -> dict:
+        """Entry: the response body, ETag from the version every status change bumps"""
+        return {
+            "etag": f'"{transaction.id}-{transaction.version}"',
+            "body": TransactionResponse.model_validate(transaction).model_dump_json(),
+        }
+
+    @staticmethod
+    def render_history(transaction_id, events: list[TransactionEvent]) -> dict:
+        """Entry: the response body, ETag from its content (events are added without a version bump)"""
+        body = json.dumps({
+            "transaction_id": str(transaction_id),
+            "event_count": len(events),
+            "events": [
+                {
+                    "id": str(event.id),
+                    "event_type": event.event_type,
+                    "previous_status": event.previous_status,
+                    "new_status": event.new_status,
+                    "timestamp": event.timestamp.isoformat(),
+                    "details": event.details
+                }
+                for event in events
+            ]
+        })
+        return {"etag": f'"{hashlib.sha1(body.encode()).hexdigest()[:20]}"', "body": body}
+
+    @staticmethod
+    def read_through(key: str, kind: str, load) -> dict | None:
+        """
+        The cached entry, or load() -> entry (None: not found, not cached) stored for next time.
+        A Redis outage only means every read goes to the database.
+        """
+        try:
+            cached = get_redis().get(key)
+            if cached is not None:
+                CACHE_LOOKUPS.inc(kind=kind, outcome="hit")
+                return json.loads(cached)
+            CACHE_LOOKUPS.inc(kind=kind, outcome="miss")
+        except RedisError as e:
+            CACHE_LOOKUPS.inc(kind=kind, outcome="error")
+            logger.warning(f"Transaction cache unavailable: {e}")
+            return load()
+
+        entry = load()
+        if entry is not None:
+            try:
+                get_redis().set(key, json.dumps(entry), ex=settings.TRANSACTION_CACHE_TTL_SECONDS)
+            except RedisError as e:
+                logger.warning(f"Transaction cache unavailable: {e}")
+        return entry
+
+    @staticmethod
+    def get_transaction(transaction_id, load_db) -> dict | None:
+        """load_db() -> session on the transaction's shard, only opened on a cache miss"""
+        def load():
+            with load_db() as db:
+                transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+                return TransactionCacheService.render_transaction(transaction) if transaction else None
+        return TransactionCacheService.read_through(transaction_key(transaction_id), "transaction", load)
+
+    @staticmethod
+    def get_history(transaction_id, load_db) -> dict:
+        def load():
+            with load_db() as db:
+                events = db.query(TransactionEvent).filter(
+                    TransactionEvent.transaction_id == transaction_id
+                ).order_by(TransactionEvent.timestamp.asc()).all()
+                return TransactionCacheService.render_history(transaction_id, events)
+        return TransactionCacheService.read_through(history_key(transaction_id), "history", load)
+
+    @staticmethod
+    def invalidate(*transaction_ids) -> None:
+        """Drop the cached transaction and history - call after committing a change to them"""
+        if not transaction_ids:
+            return
+        try:
+            get_redis().delete(*(key for transaction_id in transaction_ids
+                                 for key in (transaction_key(transaction_id), history_key(transaction_id))))
+        except RedisError as e:
+            # Worst case a poller sees the old state for one TTL
+            logger.warning(f"Could not invalidate the transaction cache: {e}")
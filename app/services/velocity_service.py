@@ -0,0 +1,216 @@
+from redis.exceptions import RedisError
+from app.redis_client import get_velocity_redis
+from app.metrics import counter, histogram
+from app.config import settings
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+VELOCITY_CHECK_MS = histogram(
+    "velocity_check_duration_ms",
+    "Time spent evaluating pre-authorization velocity rules",
+    (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 50.0),
+)
+VELOCITY_CHECKS = counter("velocity_checks_total", "Velocity checks by outcome (allowed, declined, error)")
+VELOCITY_OVER_BUDGET = counter("velocity_checks_over_budget_total", "Velocity checks slower than VELOCITY_BUDGET_MS")
+
+
+@dataclass(frozen=True)
+class VelocityRule:
+    name: str
+    scope: str                     # "payer" (payer bank account) or "lease"
+    window_seconds: int
+    max_count: int | None = None   # payments allowed in the window, including this one
+    max_amount: Decimal | None = None  # total amount allowed in the window, including this one
+
+
+@dataclass
+class VelocityDecision:
+    violations: list[str] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+    error: str | None = None
+
+    @property
+    def allowed(self) -> bool:
+        return not self.violations
+
+
+def default_rules() -> list[VelocityRule]:
+    return [
+        VelocityRule("payer_hourly_count", "payer", 3600, max_count=settings.VELOCITY_PAYER_MAX_PAYMENTS_PER_HOUR),
+        VelocityRule("payer_daily_amount", "payer", 86400, max_amount=settings.VELOCITY_PAYER_MAX_AMOUNT_PER_DAY),
+        VelocityRule("lease_daily_count", "lease", 86400, max_count=settings.VELOCITY_LEASE_MAX_PAYMENTS_PER_DAY),
+    ]
+
+
+def _cents(amount: Decimal) -> int:
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+# Check-and-record for every rule in ONE round trip, atomically (no race between
+# two concurrent payments that would each pass alone but not together).
+# Each subject (payer account, lease) has one sorted set: score = time in ms,
+# member = "<idempotency key>|<amount in cents>". Re-adding the same member
+# (an idempotent replay) just refreshes it instead of counting twice.
+#
+# KEYS: one sorted set per subject
+# ARGV: now_ms, member, amount_cents, keep_ms, then per rule: key index, window_ms, max_count, max_cents (-1 = no limit)
+_CHECK_AND_RECORD = """
+local now = tonumber(ARGV[1])
+local amount = tonumber(ARGV[3])
+local keep = tonumber(ARGV[4])
+
+for i = 1, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - keep)
+end
+
+local violations = {}
+for r = 5, #ARGV, 4 do
+    local key = KEYS[tonumber(ARGV[r])]
+    local since = now - tonumber(ARGV[r + 1])
+    local max_count = tonumber(ARGV[r + 2])
+    local max_cents = tonumber(ARGV[r + 3])
+
+    -- A replayed member is not counted against itself
+    local count = redis.call('ZCOUNT', key, '(' .. since, '+inf')
+    local previous = redis.call('ZSCORE', key, ARGV[2])
+    if previous and tonumber(previous) > since then
+        count = count - 1
+    end
+
+    if max_count >= 0 and count + 1 > max_count then
+        table.insert(violations, (r - 5) / 4)
+    elseif max_cents >= 0 then
+        local total = amount
+        for _, member in ipairs(redis.call('ZRANGEBYSCORE', key, '(' .. since, '+inf')) do
+            if member ~= ARGV[2] then
+                total = total + tonumber(string.match(member, '|(%d+)$'))
+            end
+        end
+        if total > max_cents then
+            table.insert(violations, (r - 5) / 4)
+        end
+    end
+end
+
+if #violations == 0 then
+    for i = 1, #KEYS do
+        redis.call('ZADD', KEYS[i], now, ARGV[2])
+        redis.call('PEXPIRE', KEYS[i], keep)
+    end
+end
+return violations
+"""
+
+
+class RedisVelocityStore:
+    """Shared by every API instance, so limits hold across the whole fleet"""
+
+    def __init__(self):
+        self._script = None
+
+    def check_and_record(self, subjects: dict, rules: list[VelocityRule], member: str, cents: int, now: float) -> list[str]:
+        if self._script is None:
+            self._script = get_velocity_redis().register_script(_CHECK_AND_RECORD)  # EVALSHA, falls back to EVAL once
+
+        scopes = list(subjects)
+        keys = [f"velocity:{scope}:{subjects[scope]}" for scope in scopes]
+        args = [int(now * 1000), member, cents, max(rule.window_seconds for rule in rules) * 1000]
+        for rule in rules:
+            args += [
+                scopes.index(rule.scope) + 1,
+                rule.window_seconds * 1000,
+                rule.max_count if rule.max_count is not None else -1,
+                _cents(rule.max_amount) if rule.max_amount is not None else -1,
+            ]
+
+        violated = self._script(keys=keys, args=args)
+        return [rules[int(index)].name for index in violated]
+
+
+class InMemoryVelocityStore:
+    """
+    Same semantics inside one process (no network hop at all).
+    Only correct with a single API process - meant for development and tests.
+    """
+
+    def __init__(self):
+        self._windows: dict[str, deque] = defaultdict(deque)  # key -> (time, member, cents), oldest first
+        self._lock = threading.Lock()
+
+    def check_and_record(self, subjects: dict, rules: list[VelocityRule], member: str, cents: int, now: float) -> list[str]:
+        keep = max(rule.window_seconds for rule in rules)
+
+        with self._lock:
+            windows = {scope: self._windows[f"velocity:{scope}:{subject}"] for scope, subject in subjects.items()}
+            for window in windows.values():
+                while window and window[0][0] <= now - keep:
+                    window.popleft()
+
+            violations = []
+            for rule in rules:
+                since = now - rule.window_seconds
+                recent = [entry for entry in windows[rule.scope] if entry[0] > since and entry[1] != member]
+                if rule.max_count is not None and len(recent) + 1 > rule.max_count:
+                    violations.append(rule.name)
+                elif rule.max_amount is not None and sum(entry[2] for entry in recent) + cents > _cents(rule.max_amount):
+                    violations.append(rule.name)
+
+            if not violations:
+                for window in windows.values():
+                    # A replayed member replaces its earlier entry, like ZADD does
+                    for entry in [entry for entry in window if entry[1] == member]:
+                        window.remove(entry)
+                    window.append((now, member, cents))
+
+            return violations
+
+
+_stores = {"redis": RedisVelocityStore, "memory": InMemoryVelocityStore}
+_store = None
+
+
+def get_velocity_store():
+    global _store
+    if _store is None:
+        _store = _stores[settings.VELOCITY_BACKEND]()
+    return _store
+
+
+class VelocityService:
+    # Pre-authorization fraud check: per-payer and per-lease velocity limits over sliding windows,
+    # evaluated before a transaction is dispatched so a blocked payment never reaches a worker or a rail
+
+    @staticmethod
+    def check(payer_account_id, lease_id, amount: Decimal, idempotency_key: str, store=None) -> VelocityDecision:
+        """
+        Evaluate every rule and, if all pass, count this payment in the windows.
+        Fails open: if the store is unavailable the payment goes through (and is counted
+        as an error) - velocity limits must never take payments down with them.
+        """
+        store = store or get_velocity_store()
+        rules = default_rules()
+        subjects = {"payer": payer_account_id, "lease": lease_id}
+        member = f"{idempotency_key}|{_cents(amount)}"
+
+        decision = VelocityDecision()
+        started = time.perf_counter()
+        try:
+            decision.violations = store.check_and_record(subjects, rules, member, _cents(amount), time.time())
+        except RedisError as e:
+            decision.error = str(e)
+            logger.warning(f"Velocity check skipped (store unavailable): {e}")
+        decision.elapsed_ms = (time.perf_counter() - started) * 1000
+
+        VELOCITY_CHECK_MS.observe(decision.elapsed_ms)
+        outcome = "error" if decision.error else ("allowed" if decision.allowed else "declined")
+        VELOCITY_CHECKS.inc(outcome=outcome)
+        if decision.elapsed_ms > settings.VELOCITY_BUDGET_MS:
+            VELOCITY_OVER_BUDGET.inc()
+
+        return decision
@@ -0,0 +1,256 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, literal, cast, func, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.transaction import Transaction
+from app.models.transaction_event import TransactionEvent
+from app.models.bank_account import BankAccount
+from app.models.webhook import WebhookSubscription, WebhookDelivery, DeliveryStatus
+from app.sharding import skip_moving
+from app.config import settings
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import time
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# A claimed delivery is hidden from other workers for this long.
+# If the worker dies mid-run, the rows simply become due again afterwards.
+CLAIM_LEASE = timedelta(minutes=5)
+
+SIGNATURE_HEADER = "X-DirectPay-Signature"
+
+
+@dataclass
+class WebhookBatch:
+    """All due events for one subscriber endpoint, sent as a single POST"""
+    subscription_id: str
+    url: str
+    secret: str
+    delivery_ids: list = field(default_factory=list)
+    attempts: list = field(default_factory=list)  # attempts so far, per delivery (same order as delivery_ids)
+    events: list = field(default_factory=list)
+
+
+class WebhookService:
+    # Push-based replacement for integrators polling GET /payments/{id}:
+    # 1. Outbox: every TransactionEvent fans out into webhook_deliveries rows inside the same DB transaction
+    # 2. Delivery worker: claims due rows, batches them per endpoint, signs and POSTs them concurrently
+
+    @staticmethod
+    def build_payload(event: TransactionEvent, transaction: Transaction) -> dict:
+        return {
+            "id": str(event.id),
+            "type": f"transaction.{event.event_type}",
+            "created_at": event.timestamp.isoformat(),
+            "data": {
+                "transaction_id": str(transaction.id),
+                "lease_id": str(transaction.lease_id),
+                "amount": str(transaction.amount),
+                "previous_status": event.previous_status,
+                "new_status": event.new_status,
+                "failure_reason": transaction.failure_reason,
+            },
+        }
+
+    @staticmethod
+    def enqueue_event(event: TransactionEvent, transaction: Transaction, db: Session) -> None:
+        """
+        Queue one delivery per active subscription interested in this transaction.
+        Does NOT commit - the caller's commit makes the event and its deliveries visible together.
+
+        Uses a single INSERT ... SELECT, so a status change costs one extra statement
+        no matter how many subscribers there are (and nothing when there are none).
+        """
+        if event.id is None or event.timestamp is None:
+            db.flush()  # assigns the event id / timestamp defaults
+
+        payload = WebhookService.build_payload(event, transaction)
+        now = datetime.utcnow()
+
+        # Subscribers = owners of the payer or payee bank account
+        interested_users = select(BankAccount.user_id).where(
+            BankAccount.id.in_([transaction.payer_account_id, transaction.payee_account_id])
+        )
+
+        status_type = WebhookDelivery.__table__.c.status.type
+        rows = select(
+            func.gen_random_uuid(),
+            WebhookSubscription.id,
+            literal(event.id, UUID(as_uuid=True)),
+            literal(payload, JSON),
+            cast(literal(DeliveryStatus.PENDING, status_type), status_type),
+            literal(0),
+            literal(now),
+            literal(now),
+        ).where(
+            WebhookSubscription.user_id.in_(interested_users),
+            WebhookSubscription.is_active.is_(True),
+        )
+
+        db.execute(
+            insert(WebhookDelivery).from_select(
+                [
+                    WebhookDelivery.id,
+                    WebhookDelivery.subscription_id,
+                    WebhookDelivery.transaction_event_id,
+                    WebhookDelivery.payload,
+                    WebhookDelivery.status,
+                    WebhookDelivery.attempts,
+                    WebhookDelivery.next_attempt_at,
+                    WebhookDelivery.created_at,
+                ],
+                rows,
+                include_defaults=False,
+            )
+        )
+
+    @staticmethod
+    def sign_payload(secret: str, body: bytes, timestamp: int) -> str:
+        """
+        Stripe-style signature: HMAC-SHA256 over "<timestamp>.<raw body>".
+        Subscribers recompute it with their secret and reject stale timestamps to stop replays.
+        """
+        mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+        return f"t={timestamp},v1={mac}"
+
+    @staticmethod
+    def compute_backoff(attempts: int) -> timedelta:
+        """
+        Exponential backoff with jitter: base * 2^(attempts - 1), capped.
+        Half of the delay is fixed and half random, so a failing endpoint
+        doesn't get every queued retry at the same instant when it comes back.
+        """
+        delay = min(
+            settings.WEBHOOK_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)),
+            settings.WEBHOOK_BACKOFF_MAX_SECONDS,
+        )
+        return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+    @staticmethod
+    def claim_due_deliveries(db: Session, limit: int, moving=()) -> list[WebhookBatch]:
+        """
+        Lock due deliveries (SKIP LOCKED so parallel workers never fight over rows),
+        push their next_attempt_at past the claim lease, commit, and group them per endpoint.
+        Deliveries of landlords in `moving` (being resharded) wait for a later run.
+        """
+        now = datetime.utcnow()
+
+        due = db.query(WebhookDelivery, WebhookSubscription).join(
+            WebhookSubscription, WebhookDelivery.subscription_id == WebhookSubscription.id
+        ).filter(
+            WebhookDelivery.status == DeliveryStatus.PENDING,
+            WebhookDelivery.next_attempt_at <= now,
+            WebhookSubscription.is_active.is_(True),
+        )
+        rows = skip_moving(due, moving, event_id=WebhookDelivery.transaction_event_id).order_by(
+            WebhookDelivery.next_attempt_at
+        ).limit(limit).with_for_update(skip_locked=True, of=WebhookDelivery).all()
+
+        batches: list[WebhookBatch] = []
+        open_batch: dict = {}  # subscription id -> batch still accepting events
+        for delivery, subscription in rows:
+            delivery.next_attempt_at = now + CLAIM_LEASE
+
+            # One subscriber may get several POSTs if it has a large backlog
+            batch = open_batch.get(subscription.id)
+            if batch is None or len(batch.events) >= settings.WEBHOOK_MAX_EVENTS_PER_REQUEST:
+                batch = WebhookBatch(
+                    subscription_id=str(subscription.id),
+                    url=subscription.url,
+                    secret=subscription.secret,
+                )
+                open_batch[subscription.id] = batch
+                batches.append(batch)
+
+            batch.delivery_ids.append(delivery.id)
+            batch.attempts.append(delivery.attempts)
+            batch.events.append(delivery.payload)
+
+        db.commit()
+        return batches
+
+    @staticmethod
+    async def send_batches(batches: list[WebhookBatch]) -> list[tuple[WebhookBatch, str | None]]:
+        """
+        POST every batch concurrently through one shared AsyncClient,
+        so requests to the same host reuse pooled keep-alive connections.
+        Returns (batch, error) pairs; error is None on a 2xx response.
+        """
+        concurrency = settings.WEBHOOK_CONCURRENCY
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async with httpx.AsyncClient(timeout=settings.WEBHOOK_TIMEOUT_SECONDS, limits=limits) as client:
+
+            async def send(batch: WebhookBatch):
+                body = json.dumps({"events": batch.events}, separators=(",", ":")).encode()
+                headers = {
+                    "Content-Type": "application/json",
+                    SIGNATURE_HEADER: WebhookService.sign_payload(batch.secret, body, int(time.time())),
+                }
+                async with semaphore:
+                    try:
+                        response = await client.post(batch.url, content=body, headers=headers)
+                    except httpx.HTTPError as e:
+                        return batch, f"{type(e).__name__}: {e}"
+                if 200 <= response.status_code < 300:
+                    return batch, None
+                return batch, f"HTTP {response.status_code}"
+
+            return await asyncio.gather(*(send(batch) for batch in batches))
+
+    @staticmethod
+    def record_results(db: Session, results: list[tuple[WebhookBatch, str | None]], moving=()) -> dict:
+        """
+        Mark delivered batches, reschedule failed ones with backoff (or give up).
+        Deliveries whose landlord started moving since the claim are left as claimed:
+        once the claim lease runs out they are sent again from their new shard.
+        """
+        now = datetime.utcnow()
+        updates = []
+        stats = {"delivered": 0, "retrying": 0, "failed": 0}
+
+        for batch, error in results:
+            for delivery_id, attempts in zip(batch.delivery_ids, batch.attempts):
+                attempts += 1
+                if error is None:
+                    updates.append({
+                        "id": delivery_id, "status": DeliveryStatus.DELIVERED, "attempts": attempts,
+                        "delivered_at": now, "last_error": None,
+                    })
+                    stats["delivered"] += 1
+                elif attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                    updates.append({
+                        "id": delivery_id, "status": DeliveryStatus.FAILED, "attempts": attempts,
+                        "last_error": error,
+                    })
+                    stats["failed"] += 1
+                else:
+                    updates.append({
+                        "id": delivery_id, "attempts": attempts, "last_error": error,
+                        "next_attempt_at": now + WebhookService.compute_backoff(attempts),
+                    })
+                    stats["retrying"] += 1
+
+            if error is not None:
+                logger.warning(f"Webhook batch to {batch.url} failed: {error}")
+
+        if updates and moving:
+            writable = set(db.scalars(skip_moving(
+                select(WebhookDelivery.id).where(WebhookDelivery.id.in_([row["id"] for row in updates])),
+                moving, event_id=WebhookDelivery.transaction_event_id,
+            )))
+            updates = [row for row in updates if row["id"] in writable]
+        if updates:
+            # ORM bulk UPDATE by primary key (executemany), not one round trip per row
+            db.execute(update(WebhookDelivery), updates)
+        db.commit()
+        return stats
@@ -0,0 +1,308 @@
+from contextlib import contextmanager
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, sessionmaker
+from app.database import Base, SessionLocal, get_db, open_read_session
+from app.models.user import User
+from app.models.property import Property
+from app.models.bank_account import BankAccount
+from app.models.lease import Lease
+from app.models.transaction import Transaction
+from app.models.transaction_event import TransactionEvent
+from app.models.webhook import WebhookSubscription
+from app.models.shard_directory import LandlordShard, LeaseDirectory, TransactionDirectory, ShardStatus
+from app.models.idempotency_key import IdempotencyKey
+from app.models.reconciliation import BankStatement, ReconciliationResult, ReconciliationRun
+from app.models.payout import AchFile
+from app.config import settings
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Horizontal sharding by landlord.
+#
+# Shard 0 is the main database (app/database.py). On top of its own share of landlords it holds:
+#   - the directory: landlord -> shard, lease -> landlord, transaction -> landlord, plus the
+#     idempotency keys (idempotency key -> transaction, see IdempotencyService)
+#   - the authoritative copy of the reference data (users, properties, bank accounts, webhook
+#     subscriptions), copied to every other shard after each write so foreign keys hold there too
+# Everything a landlord's leases generate (schedules, installments, transactions, events, ledger
+# entries, webhook deliveries) lives on that landlord's shard only.
+#
+# With SHARD_DATABASE_URLS empty there is one shard and every lookup short-circuits to shard 0.
+
+SHARD_SESSIONS = [SessionLocal] + [
+    sessionmaker(autocommit=False, autoflush=False, bind=create_engine(url))
+    for url in settings.SHARD_DATABASE_URLS
+]
+
+DIRECTORY_TABLES = {
+    LandlordShard.__tablename__, LeaseDirectory.__tablename__, TransactionDirectory.__tablename__,
+    IdempotencyKey.__tablename__,
+}
+
+# Tables that only exist on shard 0: the directory, plus global bookkeeping that spans all shards
+MAIN_ONLY_TABLES = DIRECTORY_TABLES | {
+    BankStatement.__tablename__, ReconciliationResult.__tablename__, ReconciliationRun.__tablename__,
+    AchFile.__tablename__,
+}
+
+# Copied from shard 0 to every shard, parents first
+REFERENCE_MODELS = (User, Property, BankAccount, WebhookSubscription)
+
+
+class ShardMovingError(Exception):
+    """The landlord is being moved to another shard; retry the write shortly"""
+
+
+def create_shard_schemas() -> None:
+    """Create the schema on every extra shard (shard 0 is created by app/main.py)"""
+    tables = [table for table in Base.metadata.sorted_tables if table.name not in MAIN_ONLY_TABLES]
+    for shard_sessions in SHARD_SESSIONS[1:]:
+        Base.metadata.create_all(bind=shard_sessions.kw["bind"], tables=tables)
+
+
+@contextmanager
+def shard_session(shard_id: int, db: Session | None = None):
+    """Session on a shard. For shard 0 the caller's session on the main database is reused."""
+    if shard_id == 0 and db is not None:
+        yield db
+        return
+    session = SHARD_SESSIONS[shard_id]()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def skip_moving(statement, landlord_ids, landlord_id=None, lease_id=None, transaction_id=None, event_id=None):
+    """
+    For per-shard jobs (beat tasks that write without going through the directory):
+    leave out the rows of the landlords in landlord_ids (ShardRouter.moving_landlords), matched
+    through whichever of these columns the statement's table has. While a landlord is MOVING
+    its rows are being copied to another shard and anything written on the source is lost.
+    """
+    if sum(column is not None for column in (landlord_id, lease_id, transaction_id, event_id)) != 1:
+        raise ValueError("skip_moving needs exactly one of landlord_id, lease_id, transaction_id, event_id")
+    if not landlord_ids:
+        return statement
+    if landlord_id is not None:
+        return statement.where(landlord_id.not_in(landlord_ids))
+    leases = select(Lease.id).join(Property, Property.id == Lease.property_id).where(Property.landlord_id.in_(landlord_ids))
+    if lease_id is not None:
+        return statement.where(lease_id.not_in(leases))
+    transactions = select(Transaction.id).where(Transaction.lease_id.in_(leases))
+    if transaction_id is not None:
+        return statement.where(transaction_id.not_in(transactions))
+    return statement.where(event_id.not_in(select(TransactionEvent.id).where(TransactionEvent.transaction_id.in_(transactions))))
+
+
+def each_shard(db: Session | None = None):
+    """(shard id, session) for every shard - for scatter-gather reads and per-shard jobs"""
+    for shard_id in range(len(SHARD_SESSIONS)):
+        with shard_session(shard_id, db) as session:
+            yield shard_id, session
+
+
+def upsert_rows(session: Session, table, rows: list[dict]) -> None:
+    """
+    INSERT ... ON CONFLICT (primary key) DO UPDATE every column - copies are idempotent.
+    Columns marked info={"shard_local": True} are assigned by the target shard, never copied.
+    """
+    if not rows:
+        return
+    local = {column.name for column in table.columns if column.info.get("shard_local")}
+    if local:
+        rows = [{name: value for name, value in row.items() if name not in local} for row in rows]
+    statement = pg_insert(table).values(rows)
+    key = [column.name for column in table.primary_key.columns]
+    statement = statement.on_conflict_do_update(
+        index_elements=key,
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns if column.name not in key and column.name not in local
+        },
+    )
+    session.execute(statement)
+
+
+class ShardRouter:
+
+    @staticmethod
+    def count() -> int:
+        return len(SHARD_SESSIONS)
+
+    @staticmethod
+    def initial_shard(landlord_id) -> int:
+        """Where a new landlord is placed. Only used once: after that the directory is the truth."""
+        return zlib.crc32(str(landlord_id).encode()) % ShardRouter.count()
+
+    @staticmethod
+    def queue(shard_id: int) -> str | None:
+        # One queue per shard lets each worker pool hold connections to a single shard
+        return f"shard-{shard_id}" if settings.SHARD_DEDICATED_QUEUES else None
+
+    @staticmethod
+    def _resolve(query, db: Session, for_write: bool) -> int:
+        if ShardRouter.count() == 1:
+            return 0
+        row = db.execute(query).first()
+        if row is None:
+            return 0  # created before sharding (see `python -m app.cli.shards backfill-directory`)
+        if for_write and row.status == ShardStatus.MOVING:
+            raise ShardMovingError("Landlord is being moved to another shard")
+        return row.shard_id
+
+    @staticmethod
+    def landlord_shard(landlord_id, db: Session, for_write: bool = False) -> int:
+        return ShardRouter._resolve(
+            select(LandlordShard.shard_id, LandlordShard.status).where(LandlordShard.landlord_id == landlord_id),
+            db, for_write
+        )
+
+    @staticmethod
+    def lease_shard(lease_id, db: Session, for_write: bool = False) -> int:
+        return ShardRouter._resolve(
+            select(LandlordShard.shard_id, LandlordShard.status).join(
+                LeaseDirectory, LeaseDirectory.landlord_id == LandlordShard.landlord_id
+            ).where(LeaseDirectory.lease_id == lease_id),
+            db, for_write
+        )
+
+    @staticmethod
+    def transaction_shard(transaction_id, db: Session, for_write: bool = False) -> int:
+        return ShardRouter._resolve(
+            select(LandlordShard.shard_id, LandlordShard.status).join(
+                TransactionDirectory, TransactionDirectory.landlord_id == LandlordShard.landlord_id
+            ).where(TransactionDirectory.transaction_id == transaction_id),
+            db, for_write
+        )
+
+    @staticmethod
+    def moving_landlords(db: Session, shard_id: int | None = None) -> list:
+        """
+        Landlords whose directory status isn't ACTIVE (optionally: only those still on shard_id).
+        Per-shard jobs read this before each shard and leave these landlords alone (skip_moving).
+        """
+        if ShardRouter.count() == 1:
+            return []
+        query = select(LandlordShard.landlord_id).where(LandlordShard.status != ShardStatus.ACTIVE)
+        if shard_id is not None:
+            query = query.where(LandlordShard.shard_id == shard_id)
+        return db.scalars(query).all()
+
+    @staticmethod
+    def assign_landlord(landlord_id, db: Session) -> int:
+        """Shard of a landlord about to get sharded data, placing it on first use. Commits."""
+        db.execute(
+            pg_insert(LandlordShard).values(
+                landlord_id=landlord_id,
+                shard_id=ShardRouter.initial_shard(landlord_id),
+                status=ShardStatus.ACTIVE,
+            ).on_conflict_do_nothing(index_elements=[LandlordShard.landlord_id])
+        )
+        db.commit()
+        row = db.query(LandlordShard.shard_id, LandlordShard.status).filter(
+            LandlordShard.landlord_id == landlord_id
+        ).one()
+        if row.status == ShardStatus.MOVING:
+            raise ShardMovingError("Landlord is being moved to another shard")
+        return row.shard_id
+
+    @staticmethod
+    def register_leases(lease_ids, landlord_id, db: Session) -> None:
+        """Directory entries for new leases (one multi-row INSERT). Does NOT commit."""
+        db.execute(
+            pg_insert(LeaseDirectory).values(
+                [{"lease_id": lease_id, "landlord_id": landlord_id} for lease_id in lease_ids]
+            ).on_conflict_do_nothing()
+        )
+
+    @staticmethod
+    def lease_landlord(lease_id, db: Session):
+        """Landlord of a lease, or None if there is no such lease"""
+        landlord_id = db.query(LeaseDirectory.landlord_id).filter(LeaseDirectory.lease_id == lease_id).scalar()
+        if landlord_id is None:
+            # Lease from before sharding: it is on shard 0, record it now
+            landlord_id = db.query(Property.landlord_id).join(Lease, Lease.property_id == Property.id).filter(
+                Lease.id == lease_id
+            ).scalar()
+            if landlord_id is not None:
+                ShardRouter.register_leases([lease_id], landlord_id, db)
+                db.commit()
+        return landlord_id
+
+    @staticmethod
+    def register_transaction(transaction_id, landlord_id, db: Session) -> None:
+        """Directory entry for a new transaction, before it is written on its shard. Does NOT commit."""
+        db.execute(
+            pg_insert(TransactionDirectory).values(
+                transaction_id=transaction_id, landlord_id=landlord_id
+            ).on_conflict_do_nothing()
+        )
+
+    @staticmethod
+    def replicate(model, ids, db: Session) -> None:
+        """Copy committed reference rows from shard 0 to every other shard"""
+        if ShardRouter.count() == 1 or not ids:
+            return
+        table = model.__table__
+        rows = [dict(row._mapping) for row in db.execute(select(table).where(table.c.id.in_(list(ids))))]
+        for shard_id in range(1, ShardRouter.count()):
+            with shard_session(shard_id) as session:
+                upsert_rows(session, table, rows)
+                session.commit()
+
+
+def shard_unavailable(error: ShardMovingError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(settings.SHARD_MOVING_RETRY_SECONDS)},
+    )
+
+
+# FastAPI dependencies: the session for the shard that owns the path's lease / transaction.
+# Reads on shard 0 keep going through get_read_db's replica routing.
+
+def get_lease_shard_db(lease_id: str, db: Session = Depends(get_db)):
+    try:
+        shard_id = ShardRouter.lease_shard(lease_id, db, for_write=True)
+    except ShardMovingError as e:
+        raise shard_unavailable(e)
+    with shard_session(shard_id, db) as session:
+        yield session
+
+
+def get_transaction_shard_db(transaction_id: str, db: Session = Depends(get_db)):
+    try:
+        shard_id = ShardRouter.transaction_shard(transaction_id, db, for_write=True)
+    except ShardMovingError as e:
+        raise shard_unavailable(e)
+    with shard_session(shard_id, db) as session:
+        yield session
+
+
+def open_shard_read_session(shard_id: int, request: Request) -> Session:
+    """Read session on a shard, replica-routed for shard 0. The caller closes it."""
+    if shard_id == 0:
+        return open_read_session(request)
+    return SHARD_SESSIONS[shard_id]()
+
+
+def _read_session(shard_id: int, request: Request):
+    session = open_shard_read_session(shard_id, request)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def get_lease_shard_read_db(lease_id: str, request: Request, db: Session = Depends(get_db)):
+    yield from _read_session(ShardRouter.lease_shard(lease_id, db), request)
+
+
+def get_transaction_shard_read_db(transaction_id: str, request: Request, db: Session = Depends(get_db)):
+    yield from _read_session(ShardRouter.transaction_shard(transaction_id, db), request)
@@ -0,0 +1,39 @@
+from celery import Task
+from app.database import SessionLocal
+from app.sharding import SHARD_SESSIONS
+
+
+# Custom celery base task that manages a SQLalchemy db session for each background job
+class Database(Task):
+
+    _db = None # Creates a placeholder for the database session
+               # At the beginning of a task, there is no session and we dont want one immediately
+               #    - Some tasks might not need a db session at all
+               # This is called lazy initialization of the database session
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = SessionLocal()
+        return self._db
+    
+    _shard_dbs = None  # shard id -> session, for shards other than 0 (see app/sharding.py)
+
+    def shard_db(self, shard_id: int):
+        # Shard 0 is the main database: reuse self.db
+        if shard_id == 0:
+            return self.db
+        if self._shard_dbs is None:
+            self._shard_dbs = {}
+        if shard_id not in self._shard_dbs:
+            self._shard_dbs[shard_id] = SHARD_SESSIONS[shard_id]()
+        return self._shard_dbs[shard_id]
+    
+    def after_return(self, *args, **kwargs):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if self._shard_dbs:
+            for session in self._shard_dbs.values():
+                session.close()
+            self._shard_dbs = None
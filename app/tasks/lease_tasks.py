@@ -0,0 +1,30 @@
+from app.celery_app import celery_app
+from app.tasks.base import Database
+from app.services.lease_lifecycle_service import LeaseLifecycleService
+from app.services.property_search_service import PropertySearchService
+from app.services.rent_roll_service import RentRollService
+from app.sharding import ShardRouter
+from datetime import datetime, timedelta
+
+
+@celery_app.task(base=Database, bind=True)
+def run_lease_lifecycle(self):
+    """Expire leases, complete their schedules, snapshot delinquency (celery beat, nightly)"""
+    # Each shard holds its own landlords' leases and installments; landlords being moved wait for the next night
+    results = {
+        shard_id: LeaseLifecycleService.run(self.shard_db(shard_id), moving=ShardRouter.moving_landlords(self.db))
+        for shard_id in range(ShardRouter.count())
+    }
+    if any(result["expired"] for result in results.values()):
+        PropertySearchService.invalidate()  # properties of expired leases are vacant again
+    return results
+
+
+@celery_app.task(base=Database, bind=True)
+def freeze_rent_roll(self):
+    """Freeze last month's rent roll for every landlord (celery beat, monthly once late settlements are in)"""
+    month = (datetime.utcnow().replace(day=1) - timedelta(days=1)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return {
+        shard_id: RentRollService.freeze(self.shard_db(shard_id), month, moving=ShardRouter.moving_landlords(self.db))
+        for shard_id in range(ShardRouter.count())
+    }
@@ -0,0 +1,49 @@
+from celery import group
+from app.celery_app import celery_app
+from app.tasks.base import Database
+from app.services.ledger_service import LedgerService
+from app.sharding import ShardRouter
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(base=Database, bind=True)
+def checkpoint_balances(self):
+    """Roll recent ledger entries into per-account checkpoints (celery beat, hourly)"""
+    # Each shard has its own entries, sequence and checkpoints. A checkpoint covers every
+    # account up to one sequence, so a shard with a landlord being moved off it is skipped
+    # as a whole until the move is done.
+    results = {}
+    for shard_id in range(ShardRouter.count()):
+        if ShardRouter.moving_landlords(self.db, shard_id):
+            logger.info(f"Skipping ledger checkpoints on shard {shard_id}: a landlord is being moved")
+            results[shard_id] = "skipped"
+            continue
+        results[shard_id] = LedgerService.create_checkpoints(self.shard_db(shard_id), settings.LEDGER_CHECKPOINT_SAFETY_SECONDS)
+    return results
+
+
+@celery_app.task(base=Database, bind=True)
+def verify_ledger_chunk(self, low: str, high: str | None, shard_id: int = 0):
+    """Re-derive balances for one account id range (on one shard) from the raw entries"""
+    mismatches = LedgerService.verify_account_range(self.shard_db(shard_id), low, high)
+    for mismatch in mismatches:
+        logger.error(f"Ledger balance mismatch on shard {shard_id}: {mismatch}")
+    return {"shard": shard_id, "range": [low, high], "mismatches": len(mismatches)}
+
+
+@celery_app.task
+def verify_ledger_balances():
+    """
+    Nightly consistency check. Fans out one task per account id range so the
+    full re-derivation runs on every available worker instead of one long scan.
+    """
+    ranges = LedgerService.account_id_ranges(settings.LEDGER_VERIFY_CHUNKS)
+    group(
+        verify_ledger_chunk.s(low, high, shard_id)
+        for shard_id in range(ShardRouter.count())
+        for low, high in ranges
+    ).apply_async()
+    return {"chunks": len(ranges) * ShardRouter.count()}
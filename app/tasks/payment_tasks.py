@@ -1,8 +1,15 @@
-from celery import Task
+from sqlalchemy import update, literal_column
 from app.celery_app import celery_app
+from app.tasks.base import Database
 from app.models.transaction import Transaction, TransactionStatus, PaymentRailType
-from app.services.payment_service import PaymentService
-from app.database import SessionLocal
+from app.services.payment_service import PaymentService, TransitionConflict
+from app.services.stuck_transaction_service import StuckTransactionService
+from app.services.retry_service import RetryService
+from app.services.idempotency_service import IdempotencyService
+from app.sharding import ShardRouter, ShardMovingError
+from app.config import settings
+from datetime import datetime
+from app.tracing import start_span, set_attributes
 import time 
 import random
 import logging
@@ -13,25 +20,6 @@ logger = logging.getLogger(__name__)
 # While FastAPI handles the customer talking to the app, this code handles the app talking to the bank.
 
 
-# Custom celery base task that manages a SQLalchemy db session for each background job
-class Database(Task):
-
-    _db = None # Creates a placeholder for the database session
-               # At the beginning of a task, there is no session and we dont want one immediately
-               #    - Some tasks might not need a db session at all
-               # This is called lazy initialization of the database session
-
-    @property
-    def db(self):
-        if self._db is None:
-            self._db = SessionLocal()
-        return self._db
-    
-    def after_return(self, *args, **kwargs):
-        if self._db is not None:
-            self._db.close()
-            self._db = None
-
 @celery_app.task(base=Database, bind=True) # Celery bgrnd task , base= DatabaseTask means your task inherits the DBT class which gives it self.db, the lazy db session
 def process_payment_async(self, transaction_id: str):
     """
@@ -45,8 +33,9 @@ def process_payment_async(self, transaction_id: str):
     """
 
     logger.info(f"Processing payment: {transaction_id}")
+    set_attributes(transaction_id=transaction_id)
 
-    db = self.db # Get the database session from the task's property
+    db = _transaction_db(self, transaction_id) # Session on the transaction's shard (self.db when unsharded)
 
     # Get transaction from db
     transaction = db.query(Transaction).filter(
@@ -57,12 +46,27 @@ def process_payment_async(self, transaction_id: str):
         logger.error(f"Transaction {transaction_id} not found")
         return
     
-    # Update transaction status to processing
-    PaymentService.update_transaction_status(
-        transaction_id, 
-        TransactionStatus.PROCESSING,
-        db
-    )
+    # Duplicate delivery (e.g. requeued by the stuck-transaction sweeper while the first run was still going).
+    # Retries come back through RetryService, which resets the transaction to PENDING first.
+    if transaction.status not in (TransactionStatus.PENDING, TransactionStatus.PROCESSING):
+        logger.info(f"Transaction {transaction_id} already {transaction.status.value}, nothing to process")
+        return
+    
+    # Every transition below is a compare-and-set on the version we last saw: if two runs race
+    # (sweeper requeue, duplicate delivery), the first to finish wins and the other stops at its conflict
+    version = transaction.version
+    if transaction.status == TransactionStatus.PENDING:
+        # Update transaction status to processing
+        try:
+            version = PaymentService.update_transaction_status(
+                transaction_id, 
+                TransactionStatus.PROCESSING,
+                db,
+                expected_version=version
+            ).version
+        except TransitionConflict as e:
+            logger.info(f"Not processing: {e}")
+            return
 
     # Simulate different processing times based on payment rail
     # Simulate payment rail delays
@@ -76,63 +80,147 @@ def process_payment_async(self, transaction_id: str):
     processing_time = delay_map.get(transaction.payment_rail_type, 5)
     logger.info(f"Simulating {transaction.payment_rail_type.value} processing: {processing_time}s")
     
-    time.sleep(processing_time)
+    with start_span("payment.rail", rail=transaction.payment_rail_type.value):
+        time.sleep(processing_time)
+    
+    # The landlord may have been moved to another shard while we were waiting on the rail
+    db = _transaction_db(self, transaction_id)
     
     # Simulate random failures (5% failure rate)
     if random.random() < 0.05:
         failure_reasons = [
             "Insufficient funds",
             "Account closed",
-            "Invalid routing number",
-            "Payment blocked by fraud detection"
-        ]
+            "Invalid routing number"
+        ]  # fraud is screened up front by the velocity checks in PaymentService.initiate_payment
         reason = random.choice(failure_reasons)
         
-        PaymentService.update_transaction_status(
-            transaction_id,
-            TransactionStatus.FAILED,
-            db,
-            failure_reason=reason
-        )
+        # Auto-retry for retryable reasons (RETRY_BACKOFF_BASE_SECONDS): a payment_retries row,
+        # committed together with the FAILED status below, so the retry can't be lost
+        retry_count = db.query(Transaction.retry_count).filter(Transaction.id == transaction_id).scalar() or 0
+        scheduled = RetryService.schedule(transaction_id, retry_count, reason, db)
         
-        logger.warning(f"Payment {transaction_id} failed: {reason}")
+        try:
+            PaymentService.update_transaction_status(
+                transaction_id,
+                TransactionStatus.FAILED,
+                db,
+                failure_reason=reason,
+                expected_version=version
+            )
+        except TransitionConflict as e:
+            logger.info(f"Failure not recorded: {e}")  # the retry above was rolled back with it
+            return
         
-        # Auto-retry for certain failures
-        if reason == "Insufficient funds":
-            retry_delay = (2 ** self.request.retries) * 60  # 1min, 2min, 4min
-            logger.info(f"Scheduled retry in {retry_delay}s")
-            raise self.retry(countdown=retry_delay)
+        logger.warning(f"Payment {transaction_id} failed: {reason}")
+        if scheduled:
+            logger.info(f"Scheduled retry {scheduled.attempt} at {scheduled.due_at}")
         
         return
     
     # Success!
-    PaymentService.update_transaction_status(
-        transaction_id,
-        TransactionStatus.COMPLETED,
-        db
-    )
+    try:
+        PaymentService.update_transaction_status(
+            transaction_id,
+            TransactionStatus.COMPLETED,
+            db,
+            expected_version=version
+        )
+    except TransitionConflict as e:
+        logger.info(f"Completion not recorded: {e}")
+        return
     
     logger.info(f"Payment {transaction_id} completed successfully")
     
     # Trigger post-payment tasks
-    update_payment_schedule.delay(str(transaction.lease_id))
+    update_payment_schedule.apply_async(
+        args=[str(transaction.lease_id), transaction_id],
+        queue=ShardRouter.queue(ShardRouter.transaction_shard(transaction_id, self.db))
+    )
+
+def _transaction_db(task, transaction_id: str):
+    """Session on the shard that owns the transaction; retries the task while its landlord is being moved"""
+    try:
+        return task.shard_db(ShardRouter.transaction_shard(transaction_id, task.db, for_write=True))
+    except ShardMovingError:
+        raise task.retry(countdown=settings.SHARD_MOVING_RETRY_SECONDS)
 
 @celery_app.task(base=Database, bind=True)
-def update_payment_schedule(self, lease_id: str):
+def update_payment_schedule(self, lease_id: str, transaction_id: str | None = None):
     """
     Update payment schedule after successful payment
-    Move next_due_date forward by one month
+    Allocate the payment to the lease's installments, then move next_due_date
+    to the first installment that is still unpaid
     """
     from app.models.payment_schedule import PaymentSchedule
-    from dateutil.relativedelta import relativedelta
+    from app.models.installment import Installment
+    from app.services.installment_service import InstallmentService
     
-    db = self.db
+    set_attributes(lease_id=lease_id, transaction_id=transaction_id or "")
+    try:
+        db = self.shard_db(ShardRouter.lease_shard(lease_id, self.db, for_write=True))
+    except ShardMovingError:
+        raise self.retry(countdown=settings.SHARD_MOVING_RETRY_SECONDS)
     
-    schedule = db.query(PaymentSchedule).filter(
-        PaymentSchedule.lease_id == lease_id
-    ).with_for_update().first()
+    has_installments = db.query(Installment.id).filter(Installment.lease_id == lease_id).first()
     
-    if schedule:
-        schedule.next_due_date = schedule.next_due_date + relativedelta(months=1)
+    if not has_installments:
+        # Lease created before installments existed (and not backfilled yet): old behaviour.
+        # One relative UPDATE instead of SELECT ... FOR UPDATE + write: concurrent runs can't
+        # lose each other's month, and no lock is held across a round trip
+        updated = db.execute(
+            update(PaymentSchedule).where(
+                PaymentSchedule.lease_id == lease_id
+            ).values(
+                next_due_date=PaymentSchedule.next_due_date + literal_column("interval '1 month'")
+            ).execution_options(synchronize_session=False)
+        ).rowcount
         db.commit()
-        logger.info(f"Updated payment schedule for lease {lease_id}")
\ No newline at end of file
+        
+        if updated:
+            logger.info(f"Updated payment schedule for lease {lease_id}")
+        return
+    
+    if transaction_id:
+        transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+        if transaction:
+            InstallmentService.allocate_payment(transaction, db)
+    
+    InstallmentService.sync_payment_schedule(lease_id, db)
+    db.commit()
+    logger.info(f"Updated payment schedule for lease {lease_id}")
+
+@celery_app.task(base=Database, bind=True)
+def sweep_stuck_transactions(self):
+    """Re-dispatch transactions stuck in PENDING / PROCESSING past their rail's SLA (celery beat)"""
+    requeued = 0
+    for shard_id in range(ShardRouter.count()):
+        moving = ShardRouter.moving_landlords(self.db)  # their rows are being copied to another shard
+        for transaction_id in StuckTransactionService.sweep(self.shard_db(shard_id), settings.STUCK_SWEEP_BATCH_SIZE, moving):
+            try:
+                process_payment_async.apply_async(args=[transaction_id], queue=ShardRouter.queue(shard_id))
+                requeued += 1
+            except Exception as e:
+                # Still claimed for one SLA, then the next sweep finds it again
+                logger.error(f"Failed to requeue stuck transaction {transaction_id}: {e}")
+    return {"requeued": requeued}
+
+@celery_app.task(base=Database, bind=True)
+def dispatch_due_retries(self):
+    """Send due payment retries to the workers, one bounded batch per shard (celery beat)"""
+    dispatched = 0
+    for shard_id in range(ShardRouter.count()):
+        moving = ShardRouter.moving_landlords(self.db)
+        for transaction_id in RetryService.claim_due(self.shard_db(shard_id), settings.RETRY_DISPATCH_BATCH_SIZE, moving):
+            try:
+                process_payment_async.apply_async(args=[transaction_id], queue=ShardRouter.queue(shard_id))
+                dispatched += 1
+            except Exception as e:
+                # Already PENDING: the stuck-transaction sweeper re-dispatches it after the PENDING SLA
+                logger.error(f"Failed to dispatch retry of {transaction_id}: {e}")
+    return {"dispatched": dispatched}
+
+@celery_app.task(base=Database, bind=True)
+def maintain_idempotency_keys(self):
+    """Create the coming days' idempotency key partitions, drop expired ones (celery beat)"""
+    return IdempotencyService.maintain_partitions(self.db, datetime.utcnow())
@@ -0,0 +1,9 @@
+from app.celery_app import celery_app
+from app.tasks.base import Database
+from app.services.payout_service import PayoutService
+
+
+@celery_app.task(base=Database, bind=True)
+def create_payouts(self):
+    """Net the last settlement window into payouts and write their ACH file (celery beat, daily)"""
+    return PayoutService.run(self.db)
@@ -0,0 +1,10 @@
+from app.celery_app import celery_app
+from app.tasks.base import Database
+from app.services.reconciliation_service import ReconciliationService
+from app.config import settings
+
+
+@celery_app.task(base=Database, bind=True)
+def reconcile_bank_statements(self):
+    """Incremental bank reconciliation since the last watermark (celery beat, daily)"""
+    return ReconciliationService.run(self.db, settings.RECONCILIATION_SAFETY_SECONDS, settings.RECONCILIATION_BATCH_SIZE)
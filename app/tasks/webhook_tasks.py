@@ -0,0 +1,40 @@
+from app.celery_app import celery_app
+from app.tasks.base import Database
+from app.services.webhook_service import WebhookService
+from app.sharding import ShardRouter
+from app.config import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(base=Database, bind=True)
+def deliver_webhooks(self):
+    """
+    Delivery worker, run by celery beat every WEBHOOK_FLUSH_INTERVAL_SECONDS.
+
+    DB work stays synchronous (claim, then record results); only the HTTP fan-out
+    runs on an event loop, so one worker process can have WEBHOOK_CONCURRENCY
+    POSTs in flight instead of one.
+    """
+    totals = {"batches": 0}
+
+    # Deliveries are written next to their events, i.e. on every shard
+    for shard_id in range(ShardRouter.count()):
+        db = self.shard_db(shard_id)
+        moving = ShardRouter.moving_landlords(self.db)  # their deliveries wait until the move is done
+
+        batches = WebhookService.claim_due_deliveries(db, settings.WEBHOOK_CLAIM_LIMIT, moving)
+        if not batches:
+            continue
+
+        results = asyncio.run(WebhookService.send_batches(batches))
+        stats = WebhookService.record_results(db, results, ShardRouter.moving_landlords(self.db))
+
+        logger.info(f"Webhook run on shard {shard_id}: {len(batches)} batches, {stats}")
+        totals["batches"] += len(batches)
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+
+    return totals
@@ -0,0 +1,55 @@
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.dialects import postgresql
+import pytest
+
+
+class RecordingSession:
+    """Session stand-in that records the statements it is given instead of running them"""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return type("Result", (), {"rowcount": 0})()
+
+    def commit(self):
+        pass
+
+
+class FakeRedis:
+    """In-memory get / set / delete; down=True makes reads fail like an unreachable server"""
+
+    def __init__(self):
+        self.values = {}
+        self.down = False
+
+    def get(self, key):
+        if self.down:
+            raise RedisConnectionError("down")
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+@pytest.fixture
+def compiled():
+    """SQL of a statement as PostgreSQL would get it (literal_binds=True inlines the parameters)"""
+    def compile_sql(query, literal_binds=False) -> str:
+        return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": literal_binds}))
+    return compile_sql
+
+
+@pytest.fixture
+def recording_session():
+    return RecordingSession()
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
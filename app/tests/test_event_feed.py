@@ -0,0 +1,36 @@
+from app.models.transaction_event import TransactionEvent
+from app.services.event_feed_service import EventFeedService, encode_cursor, decode_cursor
+from app.sharding import upsert_rows
+import pytest
+import uuid
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor({0: (9051, 17)})) == {0: (9051, 17)}
+    assert decode_cursor(None) == {}
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor({0: ("a", 1)})])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_feed_only_serves_events_no_running_transaction_can_precede(compiled):
+    sql = compiled(EventFeedService.feed_query((9051, 17), 1000))
+    assert "transaction_events.txid < txid_snapshot_xmin(txid_current_snapshot())" in sql
+    assert "(transaction_events.txid, transaction_events.sequence) >" in sql
+    assert "ORDER BY transaction_events.txid, transaction_events.sequence" in sql
+
+
+def test_feed_positions_are_not_copied_between_shards(compiled, recording_session):
+    row = {
+        "id": uuid.uuid4(), "transaction_id": uuid.uuid4(), "event_type": "status_change",
+        "previous_status": "pending", "new_status": "processing", "details": None,
+        "timestamp": None, "txid": 9051, "sequence": 17,
+    }
+    upsert_rows(recording_session, TransactionEvent.__table__, [row])
+    (statement,) = recording_session.statements
+    sql = compiled(statement)
+    assert "txid" not in sql
+    assert "sequence" not in sql
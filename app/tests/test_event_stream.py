@@ -0,0 +1,167 @@
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.services import event_stream_service
+from app.services.event_stream_service import (
+    EventStreamService, TransactionEventBroadcaster, transaction_channel, is_final,
+)
+from app.models.transaction import FRAUD_DECLINED_REASON
+from app.config import settings
+import asyncio
+import json
+import uuid
+import pytest
+
+TXN = uuid.uuid4()
+CHANNEL = transaction_channel(TXN)
+
+
+class FakePubSub:
+    """Redis pub/sub stand-in: deliver() plays the part of a PUBLISH from a worker"""
+
+    def __init__(self, fail_subscribes=0):
+        self.connection = object()
+        self.subscribes = []
+        self.unsubscribes = []
+        self.fail_subscribes = fail_subscribes
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        if self.fail_subscribes:
+            self.fail_subscribes -= 1
+            raise RedisConnectionError("connection refused")
+        self.subscribes.extend(channels)
+
+    async def unsubscribe(self, channel):
+        self.unsubscribes.append(channel)
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def deliver(self, channel, **update):
+        update = {"event_id": str(uuid.uuid4()), "transaction_id": str(TXN), **update}
+        self.messages.put_nowait({"channel": channel.encode(), "data": json.dumps(update).encode()})
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def pubsub(monkeypatch):
+    fake = FakePubSub()
+    monkeypatch.setattr(event_stream_service, "get_async_redis", lambda: type("Redis", (), {"pubsub": lambda self: fake})())
+    monkeypatch.setattr(event_stream_service, "broadcaster", TransactionEventBroadcaster())
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 0.05)
+    return fake
+
+
+def snapshot(status, retry_count=0):
+    return lambda transaction_id: {
+        "transaction_id": str(transaction_id), "lease_id": str(uuid.uuid4()),
+        "status": status, "failure_reason": None, "retry_count": retry_count,
+    }
+
+
+async def collect(stream, pubsub, updates):
+    """Run the stream; once the snapshot is out, publish `updates`. Returns (event type, data) pairs."""
+    events = []
+    async for chunk in stream:
+        if chunk.startswith(":"):
+            continue  # keep-alive
+        lines = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+        if lines["event"] == "snapshot":
+            for update in updates:
+                pubsub.deliver(CHANNEL, **update)
+    return events
+
+
+def test_snapshot_comes_first_and_the_stream_closes_on_a_final_status(pubsub, monkeypatch):
+    monkeypatch.setattr(EventStreamService, "load_transaction_snapshot", snapshot("pending"))
+    updates = [
+        {"status": "processing"},
+        {"status": "failed", "retry_count": 0},     # will be retried: keep listening
+        {"status": "pending", "retry_count": 1},
+        {"status": "completed", "retry_count": 1},
+        {"status": "refunded", "retry_count": 1},   # after the end: never sent
+    ]
+
+    events = asyncio.run(asyncio.wait_for(
+        collect(EventStreamService.stream(FakeRequest(), CHANNEL, transaction_id=TXN), pubsub, updates), timeout=5
+    ))
+
+    assert [kind for kind, _ in events] == ["snapshot"] + ["status_change"] * 4
+    assert [data["status"] for _, data in events] == ["pending", "processing", "failed", "pending", "completed"]
+    assert pubsub.unsubscribes == [CHANNEL]
+
+
+def test_already_final_transaction_gets_only_its_snapshot(pubsub, monkeypatch):
+    monkeypatch.setattr(EventStreamService, "load_transaction_snapshot", snapshot("failed", settings.PAYMENT_MAX_RETRIES))
+
+    events = asyncio.run(asyncio.wait_for(
+        collect(EventStreamService.stream(FakeRequest(), CHANNEL, transaction_id=TXN), pubsub, []), timeout=5
+    ))
+
+    assert [kind for kind, _ in events] == ["snapshot"]
+
+
+def test_failed_is_final_once_retries_are_used_up_or_it_was_declined():
+    assert not is_final({"status": "failed", "retry_count": settings.PAYMENT_MAX_RETRIES - 1})
+    assert is_final({"status": "failed", "retry_count": settings.PAYMENT_MAX_RETRIES})
+    assert is_final({"status": "failed", "retry_count": 0, "failure_reason": f"{FRAUD_DECLINED_REASON}: lease_daily_count"})
+    assert is_final({"status": "completed"}) and is_final({"status": "refunded"})
+    assert not is_final({"status": "processing"})
+
+
+def test_slow_client_overflow_drops_events_without_stalling_others(pubsub, monkeypatch):
+    monkeypatch.setattr(event_stream_service, "CLIENT_QUEUE_SIZE", 3)
+    broadcaster = event_stream_service.broadcaster
+
+    async def run():
+        async with broadcaster.subscribe(CHANNEL) as slow, broadcaster.subscribe(CHANNEL) as fast:
+            received = []
+            for n in range(10):
+                pubsub.deliver(CHANNEL, status="processing", n=n)
+                received.append(json.loads(await asyncio.wait_for(fast.get(), timeout=2))["n"])
+            return received, [json.loads(slow.get_nowait())["n"] for _ in range(slow.qsize())]
+
+    fast, slow = asyncio.run(run())
+
+    assert fast == list(range(10))
+    assert slow == [0, 1, 2]  # full after 3; the rest were dropped, not waited for
+
+
+def test_channel_is_unsubscribed_when_its_last_client_leaves(pubsub):
+    broadcaster = event_stream_service.broadcaster
+
+    async def run():
+        async with broadcaster.subscribe(CHANNEL):
+            async with broadcaster.subscribe(CHANNEL):
+                assert pubsub.subscribes == [CHANNEL]  # second client shares the subscription
+            assert pubsub.unsubscribes == []
+        assert pubsub.unsubscribes == [CHANNEL]
+        assert broadcaster._subscribers == {}
+
+    asyncio.run(run())
+
+
+def test_failed_subscribe_does_not_leave_the_client_registered(pubsub):
+    pubsub.fail_subscribes = 1
+    broadcaster = event_stream_service.broadcaster
+
+    async def run():
+        with pytest.raises(RedisConnectionError):
+            async with broadcaster.subscribe(CHANNEL):
+                pass
+        assert broadcaster._subscribers == {}
+
+        # The next client subscribes for real and gets updates
+        async with broadcaster.subscribe(CHANNEL) as queue:
+            assert pubsub.subscribes == [CHANNEL]
+            pubsub.deliver(CHANNEL, status="processing")
+            return json.loads(await asyncio.wait_for(queue.get(), timeout=2))
+
+    assert asyncio.run(run())["status"] == "processing"
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy.dialects.postgresql import psycopg2
+from app.cli.generate_data import (
+    GeneratorConfig, CopyBuffer, parse_rail_mix, payment_history, statement_line,
+)
+from app.ids import uuid7_time
+from app.models.transaction import Transaction, TransactionStatus, PaymentRailType, ALLOWED_TRANSITIONS
+import pytest
+import random
+import uuid
+
+CONFIG = GeneratorConfig(
+    seed=1, now=datetime(2026, 1, 1), months=12, properties_per_landlord=5, occupancy=0.95,
+    rail_mix=parse_rail_mix("standard_ach=3,instant=1"), failure_rate=0.3, discrepancy_rate=0.0,
+)
+IDS = SimpleNamespace(lease_id=uuid.uuid4(), payer_account_id=uuid.uuid4(), payee_account_id=uuid.uuid4())
+
+
+def test_rail_mix_is_normalized():
+    assert parse_rail_mix("standard_ach=3,instant=1") == {PaymentRailType.STANDARD_ACH: 0.75, PaymentRailType.INSTANT: 0.25}
+    with pytest.raises(ValueError):
+        parse_rail_mix("carrier_pigeon=1")
+
+
+def test_copy_rows_are_encoded_like_the_orm_writes_them():
+    buffer = CopyBuffer(Transaction.__table__, psycopg2.dialect())
+    buffer.add({
+        "status": TransactionStatus.COMPLETED, "amount": Decimal("1450.05"),
+        "failure_reason": "tab\there\nnewline", "processing_at": None,
+    })
+    assert buffer.buffer.getvalue() == "COMPLETED\t1450.05\ttab\\there\\nnewline\t\\N\n"
+
+
+def test_payment_histories_follow_the_state_machine():
+    rng = random.Random(7)
+    for month in range(1, 13):
+        payment = payment_history(rng, CONFIG, datetime(2025, month, 5), Decimal("1200"), IDS)
+        events, transaction = payment["events"], payment["transaction"]
+        assert events[0]["previous_status"] is None
+        for event in events[1:]:
+            assert TransactionStatus(event["new_status"]) in ALLOWED_TRANSITIONS[TransactionStatus(event["previous_status"])]
+        assert transaction["status"].value == events[-1]["new_status"]
+        assert transaction["version"] == len(events)
+        assert all(event["timestamp"] <= CONFIG.now for event in events)
+
+
+def test_generation_is_deterministic_for_a_seed():
+    first = payment_history(random.Random(3), CONFIG, datetime(2025, 6, 1), Decimal("900"), IDS)
+    second = payment_history(random.Random(3), CONFIG, datetime(2025, 6, 1), Decimal("900"), IDS)
+    assert first == second
+
+
+def test_only_completed_payments_reach_the_bank_statement():
+    rng = random.Random(5)
+    for _ in range(50):
+        transaction = payment_history(rng, CONFIG, datetime(2025, 3, 1), Decimal("1000"), IDS)["transaction"]
+        line = statement_line(rng, CONFIG, transaction)
+        if transaction["status"] != TransactionStatus.COMPLETED:
+            assert line is None
+        elif line is not None:
+            assert (line["transaction_ref"], line["amount"], line["status"]) == (str(transaction["id"]), Decimal("1000"), "completed")
+
+
+def test_payment_ids_are_time_ordered_like_production():
+    payment = payment_history(random.Random(9), CONFIG, datetime(2025, 6, 1), Decimal("900"), IDS)
+    transaction = payment["transaction"]
+
+    assert transaction["id"].version == 7
+    initiated = transaction["initiated_at"].replace(tzinfo=timezone.utc).timestamp()
+    assert uuid7_time(transaction["id"]) == pytest.approx(initiated, abs=0.001)
+    assert [event["id"].version for event in payment["events"]] == [7] * len(payment["events"])
+    assert [event["id"] for event in payment["events"]] == sorted(event["id"] for event in payment["events"])
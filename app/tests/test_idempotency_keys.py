@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from app.models.idempotency_key import IdempotencyKey
+from app.models.transaction import Transaction
+from app.schemas.transaction import TransactionCreate
+from app.services.idempotency_service import (
+    IdempotencyService, IdempotencyKeyReused, key_hash, fingerprint, partition_name,
+)
+from app.config import settings
+import uuid
+import pytest
+
+LEASE, PAYER, PAYEE = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+NOW = datetime(2026, 3, 10, 12, 0)
+
+
+def payment(amount="1450.00", **changes):
+    fields = {"idempotency_key": "rent-2026-03", "lease_id": LEASE, "payer_account_id": PAYER, "payee_account_id": PAYEE}
+    return TransactionCreate(**{**fields, **changes}, amount=Decimal(amount))
+
+
+class FakeSession:
+    """Records statements; partitions() answers from `partitions`"""
+
+    def __init__(self, partitions=()):
+        self.existing = list(partitions)
+        self.statements = []
+        self.commits = 0
+
+    def scalars(self, statement, params=None):
+        return SimpleNamespace(all=lambda: self.existing)
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_fingerprint_ignores_the_key_and_amount_formatting():
+    assert fingerprint(payment()) == fingerprint(payment("1450.0", idempotency_key="other"))
+    assert fingerprint(payment()) != fingerprint(payment("1450.01"))
+    assert fingerprint(payment()) != fingerprint(payment(payment_rail_type="wire"))
+    assert len(key_hash("rent-2026-03")) == 32
+
+
+def test_reused_key_with_another_body_is_rejected():
+    reserved = SimpleNamespace(transaction_id=uuid.uuid4(), fingerprint=fingerprint(payment()))
+    IdempotencyService.check_fingerprint(reserved, fingerprint(payment()))
+    with pytest.raises(IdempotencyKeyReused):
+        IdempotencyService.check_fingerprint(reserved, fingerprint(payment("1.00")))
+
+    # Migrated keys carry no fingerprint: nothing to compare
+    IdempotencyService.check_fingerprint(SimpleNamespace(fingerprint=None), fingerprint(payment("1.00")))
+
+
+def test_lookup_only_searches_live_partitions():
+    captured = []
+    db = SimpleNamespace(execute=lambda query: captured.append(query) or SimpleNamespace(first=lambda: None))
+
+    assert IdempotencyService.find(key_hash("k"), db, NOW) is None
+    (query,) = captured
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "idempotency_keys.created_at >" in sql and "idempotency_keys.expires_at >" in sql
+    assert query.compile().params["created_at_1"] == NOW - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def test_partitions_are_created_ahead_and_dropped_once_expired(monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 48)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_PARTITIONS_AHEAD", 2)
+    db = FakeSession(partitions=["idempotency_keys_p20260306", "idempotency_keys_p20260307", "idempotency_keys_p20260310"])
+
+    result = IdempotencyService.maintain_partitions(db, NOW)
+
+    # Mar 7 ends Mar 8 00:00, + 48h = Mar 10 00:00 <= now: expired. Mar 8 still holds live keys.
+    assert result["dropped"] == ["idempotency_keys_p20260306", "idempotency_keys_p20260307"]
+    assert result["created"] == [partition_name(datetime(2026, 3, day)) for day in (8, 9, 11, 12)]
+    assert any(
+        "idempotency_keys_p20260311 PARTITION OF idempotency_keys FOR VALUES FROM ('2026-03-11') TO ('2026-03-12')" in sql
+        for sql in db.statements
+    )
+    assert db.commits == 1
+
+    # Re-run: nothing left to do
+    db = FakeSession(partitions=result["created"] + ["idempotency_keys_p20260310"])
+    assert IdempotencyService.maintain_partitions(db, NOW) == {"created": [], "dropped": []}
+
+
+def test_table_is_partitioned_and_transactions_key_is_not_indexed():
+    ddl = str(CreateTable(IdempotencyKey.__table__).compile(dialect=postgresql.dialect()))
+    assert "PARTITION BY RANGE (created_at)" in ddl
+    assert "PRIMARY KEY (key_hash, created_at)" in ddl
+
+    assert not Transaction.__table__.c.idempotency_key.unique
+    assert not [index for index in Transaction.__table__.indexes if "idempotency_key" in index.columns]
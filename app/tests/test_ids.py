@@ -0,0 +1,40 @@
+from app.ids import uuid7, uuid7_time
+from app.schemas.transaction import TransactionResponse
+from app.cli.uuid_benchmark import batch_csv
+from datetime import datetime
+from decimal import Decimal
+import time
+import uuid
+
+
+def test_uuid7_layout():
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert abs(uuid7_time(value) - time.time()) < 1
+
+
+def test_uuid7_is_strictly_increasing_within_a_millisecond():
+    ids = [uuid7() for _ in range(20000)]  # many per millisecond, past the 4096 counter range
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    # ... and sorts the same way as text (B-tree order of the uuid column)
+    assert [str(value) for value in ids] == sorted(str(value) for value in ids)
+
+
+def test_api_schemas_accept_v7_and_older_v4_ids():
+    fields = dict(
+        idempotency_key="rent-2026-03", lease_id=uuid.uuid4(), payer_account_id=uuid.uuid4(),
+        payee_account_id=uuid.uuid4(), amount=Decimal("1450.00"), status="pending", payment_rail_type="wire",
+        initiated_at=datetime(2026, 3, 1), processing_at=None, completed_at=None, failed_at=None,
+        failure_reason=None, retry_count=0, version=1,
+    )
+    for transaction_id in (uuid7(), uuid.uuid4()):
+        assert TransactionResponse(id=transaction_id, **fields).id == transaction_id
+
+
+def test_benchmark_batches_are_copy_rows():
+    rows = batch_csv(uuid7, 3, datetime(2026, 3, 1)).read().splitlines()
+    assert len(rows) == 3
+    assert all(uuid.UUID(row.split("\t")[0]).version == 7 for row in rows)
+    assert all(len(row.split("\t")) == 5 for row in rows)
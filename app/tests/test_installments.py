@@ -0,0 +1,132 @@
+from app.services.lease_service import LeaseService
+from app.services.installment_service import InstallmentService
+from app.models.installment import InstallmentStatus, InstallmentAllocation
+from app.models.payment_schedule import PaymentSchedule, ScheduleStatus
+from app.models.transaction import Transaction, TransactionStatus
+from types import SimpleNamespace
+from datetime import datetime
+from decimal import Decimal
+import uuid
+
+
+def test_one_installment_per_month_of_the_term():
+    installments = LeaseService.build_installments(
+        "lease-1", datetime(2025, 1, 15), datetime(2026, 1, 15), 1, Decimal("2000.00")
+    )
+
+    # Starts after the due day, so the first installment is Feb 1; the term ends Jan 15 next year
+    assert len(installments) == 12
+    assert installments[0]["due_date"] == datetime(2025, 2, 1)
+    assert installments[-1]["due_date"] == datetime(2026, 1, 1)
+    assert [row["sequence_number"] for row in installments] == list(range(1, 13))
+
+
+def test_payments_fill_oldest_installments_first():
+    installments = LeaseService.build_installments(
+        "lease-1", datetime(2025, 1, 1), datetime(2025, 4, 1), 1, Decimal("1000.00")
+    )
+    paid_at = datetime(2025, 1, 2)
+
+    allocations = InstallmentService.allocate_in_memory(
+        installments, [("txn-1", Decimal("1500.00"), paid_at), ("txn-2", Decimal("200.00"), paid_at)]
+    )
+
+    assert [row["status"] for row in installments] == [
+        InstallmentStatus.PAID, InstallmentStatus.PARTIAL, InstallmentStatus.DUE
+    ]
+    assert installments[1]["amount_paid"] == Decimal("700.00")
+    assert [(a["transaction_id"], a["amount"]) for a in allocations] == [
+        ("txn-1", Decimal("1000.00")), ("txn-1", Decimal("500.00")), ("txn-2", Decimal("200.00"))
+    ]
+
+
+def test_partial_payment_does_not_skip_a_month():
+    installments = LeaseService.build_installments(
+        "lease-1", datetime(2025, 1, 1), datetime(2025, 3, 1), 1, Decimal("1000.00")
+    )
+    InstallmentService.allocate_in_memory(installments, [("txn-1", Decimal("999.99"), datetime(2025, 1, 1))])
+
+    assert installments[0]["status"] == InstallmentStatus.PARTIAL
+    assert installments[1]["status"] == InstallmentStatus.DUE
+
+
+class FakeQuery:
+    def __init__(self, result):
+        self.result = result
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self  # join / filter / with_for_update ...
+
+    def all(self):
+        return self.result
+
+    def first(self):
+        return self.result
+
+    def scalar(self):
+        return self.result
+
+
+class FakeSession:
+    """query() answers from `results`, keyed by the first entity asked for; records deletes and locks"""
+
+    def __init__(self, results):
+        self.results = results
+        self.deleted = []
+        self.locks = 0
+
+    def query(self, first, *entities):
+        return FakeQuery(self.results.get(first))
+
+    def execute(self, statement):
+        self.locks += "pg_advisory_xact_lock" in str(statement)
+
+    def delete(self, row):
+        self.deleted.append(row)
+
+    def flush(self):
+        pass
+
+
+def test_refund_reopens_the_installments_it_paid():
+    paid_at = datetime(2025, 3, 1)
+    march = SimpleNamespace(amount_due=Decimal("1000.00"), amount_paid=Decimal("1000.00"), status=InstallmentStatus.PAID, paid_at=paid_at)
+    april = SimpleNamespace(amount_due=Decimal("1000.00"), amount_paid=Decimal("700.00"), status=InstallmentStatus.PARTIAL, paid_at=None)
+    allocations = [
+        (SimpleNamespace(amount=Decimal("1000.00")), march),
+        (SimpleNamespace(amount=Decimal("500.00")), april),  # April keeps 200 from another payment
+    ]
+    schedule = SimpleNamespace(next_due_date=datetime(2025, 6, 1), status=ScheduleStatus.COMPLETED)
+    db = FakeSession({InstallmentAllocation: allocations})
+
+    reversed_ = InstallmentService.reverse_allocations(SimpleNamespace(id=uuid.uuid4()), db)
+
+    assert (march.status, march.amount_paid, march.paid_at) == (InstallmentStatus.DUE, Decimal("0.00"), None)
+    assert (april.status, april.amount_paid) == (InstallmentStatus.PARTIAL, Decimal("200.00"))
+    assert db.deleted == [allocation for allocation, _ in allocations] == reversed_
+
+    # First unpaid installment is March again: the schedule points back at it
+    db.results = {PaymentSchedule: schedule}
+    db.query = lambda first: FakeQuery(db.results.get(first, datetime(2025, 3, 1)))  # else: min(due_date) of unpaid
+    InstallmentService.sync_payment_schedule("lease-1", db)
+
+    assert schedule.next_due_date == datetime(2025, 3, 1)
+    assert schedule.status == ScheduleStatus.ACTIVE
+
+
+def test_refunded_payment_is_never_allocated():
+    refunded = SimpleNamespace(id="txn-1", status=TransactionStatus.REFUNDED)
+    assert InstallmentService.allocate_payment(refunded, db=None) == []
+
+
+def test_duplicate_allocation_run_rechecks_under_the_lock():
+    # The first run committed its allocations while this one waited on the lock
+    transaction = SimpleNamespace(id=uuid.uuid4(), lease_id="lease-1", status=TransactionStatus.COMPLETED, amount=Decimal("1000.00"))
+    db = FakeSession({Transaction.status: TransactionStatus.COMPLETED, InstallmentAllocation.id: "allocation-1"})
+
+    assert InstallmentService.allocate_payment(transaction, db) == []
+    assert db.locks == 1
+
+    # ... or the payment was refunded meanwhile
+    db = FakeSession({Transaction.status: TransactionStatus.REFUNDED})
+    assert InstallmentService.allocate_payment(transaction, db) == []
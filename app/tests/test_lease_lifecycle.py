@@ -0,0 +1,23 @@
+from datetime import datetime
+from decimal import Decimal
+from app.services.lease_lifecycle_service import LeaseLifecycleService
+
+
+def test_delinquency_is_one_grouped_query_over_unpaid_installments(compiled):
+    sql = compiled(LeaseLifecycleService.delinquency_query(datetime(2025, 3, 1), 5, Decimal("50.00"), Decimal("0")), literal_binds=True)
+    assert "FROM installments" in sql
+    assert "installments.status IN ('DUE', 'PARTIAL')" in sql
+    assert "installments.due_date < '2025-03-01 00:00:00'" in sql
+    assert "CASE WHEN (installments.due_date < '2025-02-24 00:00:00')" in sql  # grace period
+    assert sql.endswith("GROUP BY installments.lease_id")
+
+
+def test_run_is_a_few_set_based_statements_per_shard(compiled, recording_session):
+    LeaseLifecycleService.run(recording_session, datetime(2025, 3, 1, 1, 0))
+    sql = [compiled(statement, literal_binds=True) for statement in recording_session.statements]
+    assert len(sql) == 4
+    assert sql[0].startswith("UPDATE leases SET status='EXPIRED'")
+    assert "leases.end_date < '2025-03-01 00:00:00'" in sql[0]
+    assert sql[1].startswith("UPDATE payment_schedules SET status='COMPLETED'") and "FROM leases" in sql[1]
+    assert sql[2].startswith("DELETE FROM delinquency_snapshots")
+    assert sql[3].startswith("INSERT INTO delinquency_snapshots")
@@ -0,0 +1,77 @@
+from app.services.ledger_service import LedgerService
+from app.models.ledger import EntryDirection, LedgerEntryType
+from types import SimpleNamespace
+import uuid
+
+
+def test_refund_reverses_the_payment_legs():
+    transaction = SimpleNamespace(payer_account_id="payer", payee_account_id="payee")
+
+    payment = LedgerService.build_postings(transaction, LedgerEntryType.PAYMENT)
+    refund = LedgerService.build_postings(transaction, LedgerEntryType.REFUND)
+
+    assert {(leg["account_id"], leg["direction"]) for leg in payment} == {
+        ("payer", EntryDirection.DEBIT), ("payee", EntryDirection.CREDIT)
+    }
+    assert {(leg["account_id"], leg["direction"]) for leg in refund} == {
+        ("payee", EntryDirection.DEBIT), ("payer", EntryDirection.CREDIT)
+    }
+
+
+def test_verification_ranges_cover_every_account_id_once():
+    ranges = LedgerService.account_id_ranges(16)
+
+    assert ranges[0][0] == "00000000-0000-0000-0000-000000000000"
+    assert ranges[-1][1] is None
+    # Contiguous: each range starts where the previous one stopped
+    assert all(ranges[i][1] == ranges[i + 1][0] for i in range(len(ranges) - 1))
+
+    account_id = uuid.uuid4()
+    owners = [
+        (low, high) for low, high in ranges
+        if uuid.UUID(low) <= account_id and (high is None or account_id < uuid.UUID(high))
+    ]
+    assert len(owners) == 1
+
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self  # filter / group_by
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class SnapshotSession:
+    """Answers the entry totals, then the balances; records the transaction boundaries around them"""
+
+    def __init__(self, *results):
+        self.results = iter(results)
+        self.calls = []
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def connection(self, execution_options):
+        self.calls.append(execution_options["isolation_level"])
+
+    def query(self, *columns):
+        self.calls.append("query")
+        return FakeQuery(next(self.results))
+
+
+def test_verification_reads_entries_and_balances_in_one_snapshot():
+    account, drifted = uuid.uuid4(), uuid.uuid4()
+    db = SnapshotSession(
+        [(account, 100, 0, 1), (drifted, 50, 0, 1)],  # derived from the entries
+        [(account, 100, 0, 1), (drifted, 40, 0, 1)],  # account_balances
+    )
+
+    mismatches = LedgerService.verify_account_range(db, "00000000-0000-0000-0000-000000000000", None)
+
+    assert db.calls == ["rollback", "REPEATABLE READ", "query", "query", "rollback"]
+    assert [mismatch["account_id"] for mismatch in mismatches] == [str(drifted)]
@@ -0,0 +1,74 @@
+from datetime import datetime
+from decimal import Decimal
+from app.services.nacha_writer import NachaWriter, RECORD_LENGTH, BLOCKING_FACTOR
+from app.services.payout_service import PayoutService
+import io
+import pytest
+
+
+def nacha_file(batches):
+    """batches: list of [(routing_number, amount), ...] -> the file's records"""
+    out = io.StringIO()
+    writer = NachaWriter(
+        out, destination_routing="091000019", destination_name="Originating Bank", origin_id="1234567890",
+        origin_name="DirectPay", company_name="DirectPay", company_id="1234567890", odfi_routing="091000019",
+        entry_description="RENT", created_at=datetime(2025, 3, 2, 0, 30),
+    )
+    trace = 0
+    for entries in batches:
+        writer.begin_batch(datetime(2025, 3, 3))
+        for routing_number, amount in entries:
+            trace += 1
+            writer.add_credit(routing_number, "6789", amount, "Jane Landlord", "PAYOUT1", f"09100001{trace:07d}")
+        writer.end_batch()
+    writer.close()
+    return writer, out.getvalue().splitlines()
+
+
+def test_every_record_is_94_characters_in_blocks_of_10():
+    _, records = nacha_file([[("021000021", Decimal("1450.00"))] * 3])
+    assert all(len(record) == RECORD_LENGTH for record in records)
+    assert len(records) % BLOCKING_FACTOR == 0
+    assert [record[0] for record in records[:7]] == ["1", "5", "6", "6", "6", "8", "9"]
+    assert records[7:] == ["9" * RECORD_LENGTH] * 3
+
+
+def test_controls_match_the_entries():
+    writer, records = nacha_file([
+        [("021000021", Decimal("1450.00")), ("111000025", Decimal("999.99"))],
+        [("021000021", Decimal("0.01"))],
+    ])
+    entries = [record for record in records if record[0] == "6"]
+    batch_controls = [record for record in records if record[0] == "8"]
+    file_control = next(record for record in records if record[0] == "9")
+
+    assert [int(entry[29:39]) for entry in entries] == [145000, 99999, 1]
+    assert int(batch_controls[0][4:10]) == 2
+    assert int(batch_controls[0][10:20]) == 2100002 + 11100002  # entry hash: 8-digit routing numbers
+    assert int(batch_controls[0][32:44]) == 145000 + 99999
+    assert int(file_control[1:7]) == 2                 # batches
+    assert int(file_control[7:13]) == 1                # blocks
+    assert int(file_control[13:21]) == 3               # entries
+    assert int(file_control[31:43]) == 0               # debits
+    assert int(file_control[43:55]) == writer.total_credit == 145000 + 99999 + 1
+    assert [entry[79:94] for entry in entries] == ["091000010000001", "091000010000002", "091000010000003"]
+
+
+def test_credits_must_be_positive():
+    with pytest.raises(ValueError):
+        nacha_file([[("021000021", Decimal("0"))]])
+
+
+def test_window_is_the_last_complete_one_before_the_settle_lag():
+    start, end = PayoutService.window(datetime(2025, 3, 2, 0, 30))
+    assert (start, end) == (datetime(2025, 3, 1), datetime(2025, 3, 2))
+    # Still inside the settle lag of midnight: the window before
+    start, end = PayoutService.window(datetime(2025, 3, 2, 0, 1))
+    assert (start, end) == (datetime(2025, 2, 28), datetime(2025, 3, 1))
+
+
+def test_eligible_items_skip_anything_already_in_a_payout(compiled):
+    sql = compiled(PayoutService.eligible_items(datetime(2025, 3, 2), datetime(2024, 12, 2)).element)
+    assert "UNION ALL" in sql
+    assert sql.count("NOT (EXISTS (SELECT") == 2
+    assert "transactions.completed_at <" in sql and "transactions.created_at >=" in sql
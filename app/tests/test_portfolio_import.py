@@ -0,0 +1,155 @@
+from contextlib import nullcontext
+from sqlalchemy.exc import OperationalError
+from app.api.v1.imports import body_lines
+from app.models.lease import Lease
+from app.services import import_service
+from app.services.import_service import (
+    PortfolioImportService, PortfolioImportIncomplete, ImportPlan, _import_id,
+)
+from app.services.property_search_service import PropertySearchService
+from app.sharding import ShardRouter
+from app.schemas.portfolio_import import LeaseImportRow
+from pydantic import ValidationError
+import anyio
+import uuid
+import pytest
+
+
+def test_csv_and_ndjson_parse_to_the_same_records():
+    csv_lines = [
+        "record_type,ref,address,city,state,zip_code,monthly_rent,bank_name",
+        "property,p1,1 Main St,Austin,TX,73301,1800,",
+    ]
+    ndjson_lines = [
+        '{"record_type": "property", "ref": "p1", "address": "1 Main St", "city": "Austin", '
+        '"state": "TX", "zip_code": "73301", "monthly_rent": "1800"}',
+        "",  # blank lines are skipped
+    ]
+
+    csv_records = [record for _, record in PortfolioImportService.parse_records(csv_lines, "csv")]
+    ndjson_records = [record for _, record in PortfolioImportService.parse_records(ndjson_lines, "ndjson")]
+
+    # Empty CSV cells are dropped, exactly like keys missing from an NDJSON object
+    assert csv_records == ndjson_records
+
+
+def test_ndjson_parse_errors_keep_their_line_number():
+    records = list(PortfolioImportService.parse_records(['{"record_type": "lease"}', "{not json"], "ndjson"))
+    assert records[1][0] == 2
+    assert "_parse_error" in records[1][1]
+
+
+def test_lease_row_needs_exactly_one_property_reference():
+    base = {
+        "renter_email": "renter@example.com",
+        "start_date": "2025-01-01",
+        "end_date": "2026-01-01",
+        "rent_amount": "1500",
+        "due_day_of_month": 1,
+    }
+    with pytest.raises(ValidationError):
+        LeaseImportRow.model_validate(base)
+
+    with pytest.raises(ValidationError):
+        LeaseImportRow.model_validate({
+            **base, "property_ref": "p1", "property_id": "6f1c1a5e-2f4b-4c1e-9a8e-0d3b1f2a4c5d",
+        })
+
+    assert LeaseImportRow.model_validate({**base, "property_ref": "p1"}).property_ref == "p1"
+
+
+class FakeRequest:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_upload_is_parsed_as_it_streams_in():
+    body = "﻿record_type,ref,address,city,state,zip_code,monthly_rent\r\nproperty,p1,1 Rue Étoile,Austin,TX,73301,1800\r\n"
+    data = body.encode("utf-8")
+    split = data.index("É".encode()) + 1  # a chunk boundary inside a multi-byte character
+    request = FakeRequest([data[:10], data[10:split], data[split:]])
+
+    lines = anyio.run(anyio.to_thread.run_sync, lambda: list(body_lines(request)))
+
+    assert lines == ["record_type,ref,address,city,state,zip_code,monthly_rent\r\n", "property,p1,1 Rue Étoile,Austin,TX,73301,1800\r\n"]
+    (_, record), = PortfolioImportService.parse_records(lines, "csv")
+    assert record["address"] == "1 Rue Étoile"
+
+
+class FakeSession:
+    """Tables as {model: set of ids}; INSERTs into `fail_on` raise once `fail_after` of them went through"""
+
+    def __init__(self, fail_on=None, fail_after=0):
+        self.tables = {}
+        self.fail_on = fail_on
+        self.fail_after = fail_after
+        self.pending = []
+        self.commits = 0
+
+    def scalars(self, statement):
+        model = statement.column_descriptions[0]["entity"]
+        return [row_id for row_id in self.tables.get(model, ()) if row_id in statement.whereclause.right.value]
+
+    def execute(self, statement, rows):
+        model = statement.entity_description["entity"]
+        if model is self.fail_on:
+            if not self.fail_after:
+                    raise OperationalError("INSERT", {}, Exception("server closed the connection"))
+            self.fail_after -= 1
+        self.pending.append((model, rows))
+
+    def commit(self):
+        for model, rows in self.pending:
+            self.tables.setdefault(model, set()).update(row["id"] for row in rows)
+        self.pending = []
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = []
+
+
+@pytest.fixture
+def one_shard(monkeypatch):
+    monkeypatch.setattr(ShardRouter, "replicate", lambda model, ids, db: None)
+    monkeypatch.setattr(ShardRouter, "assign_landlord", lambda landlord_id, db: 0)
+    monkeypatch.setattr(ShardRouter, "register_leases", lambda lease_ids, landlord_id, db: None)
+    monkeypatch.setattr(import_service, "shard_session", lambda shard_id, db: nullcontext(db))
+    monkeypatch.setattr(PropertySearchService, "invalidate", lambda: None)
+
+
+def plan(landlord_id, leases=3):
+    property_id = _import_id(landlord_id, "property", "p1")
+    lease_ids = [_import_id(landlord_id, "lease", property_id, "r@example.com", f"2025-0{n + 1}-01", 1) for n in range(leases)]
+    return ImportPlan(
+        landlord_id=landlord_id,
+        properties=[{"id": property_id}],
+        leases=[{"id": lease_id} for lease_id in lease_ids],
+        schedules=[{"id": uuid.uuid4(), "lease_id": lease_id} for lease_id in lease_ids],
+        installments=[[{"id": uuid.uuid4(), "lease_id": lease_id}] * 12 for lease_id in lease_ids],
+    )
+
+
+def test_rerun_after_a_failed_chunk_skips_what_was_committed(one_shard):
+    landlord_id = uuid.uuid4()
+    db = FakeSession(fail_on=Lease, fail_after=1)  # the second lease chunk fails
+
+    with pytest.raises(PortfolioImportIncomplete) as failed:
+        PortfolioImportService.write(plan(landlord_id), db, chunk_size=2)
+    assert failed.value.progress["properties_created"] == 1
+    assert failed.value.progress["leases_created"] == 2
+    assert failed.value.progress["chunks_committed"] == 2
+    assert "Send the same file again" in str(failed.value)
+
+    # Same file, same ids: what the first run committed is skipped
+    db.fail_on = None
+    result = PortfolioImportService.write(plan(landlord_id), db, chunk_size=2)
+
+    assert result["properties_created"] == 0
+    assert result["leases_created"] == result["payment_schedules_created"] == 1
+    assert result["installments_created"] == 12
+    assert result["already_imported"] == 3  # the property and two leases
+    assert len(db.tables[Lease]) == 3
@@ -0,0 +1,147 @@
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app import profiling
+from app.profiling import ProfilingMiddleware, Sampler, ArmedTasks, new_profile
+from app.cli.profiles import top_functions
+from app.config import settings
+import asyncio
+import threading
+import time
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILE_INTERVAL_MS", 1.0)
+    monkeypatch.setattr(settings, "PROFILE_MODE", "cpu")
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "s3cret")
+    return tmp_path
+
+
+def burn_cpu(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def test_sampler_finds_the_hot_function(store):
+    sampler = Sampler(new_profile("task", "burn"), thread_ids={threading.get_ident()}).start()
+    burn_cpu(0.2)
+    profile = sampler.stop()
+
+    assert profile.samples > 0
+    hottest = max(profile.stacks, key=profile.stacks.get)
+    assert "burn_cpu (app/tests/test_profiling.py" in hottest
+
+
+def test_cpu_mode_skips_waiting_threads(store):
+    profile = new_profile("task", "sleep")
+    if profile.mode != "cpu":
+        pytest.skip("no per-thread CPU clock on this platform")
+    sampler = Sampler(profile, thread_ids={threading.get_ident()}).start()
+    time.sleep(0.1)
+    profile = sampler.stop()
+
+    assert profile.samples <= 2  # waiting on the rail / database is not a hot spot
+
+
+def test_profiles_are_stored_and_pruned(store, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 2)
+    ids = []
+    for minute in range(3):
+        profile = new_profile("task", "process_payment_async")
+        profile.started_at = profile.started_at.replace(minute=minute)
+        profile.stacks["a;b"] = 3
+        profiling.save(profile)
+        ids.append(profile.id)
+
+    assert [meta["id"] for meta in profiling.list_profiles()] == [ids[2], ids[1]]
+    assert profiling.load_folded(ids[2]) == "a;b 3\n"
+    assert len(list(store.iterdir())) == 4
+
+
+def call(headers=None, query=b""):
+    async def app(scope, receive, send):
+        burn_cpu(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/v1/payments/abc", "query_string": query,
+        "headers": [(name.encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(ProfilingMiddleware(app)(scope, receive, send))
+    return {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+
+
+def test_requests_with_the_token_are_profiled(store):
+    profile_id = call(headers={"x-profile": "s3cret"})["x-profile-id"]
+
+    (meta,) = profiling.list_profiles()
+    assert meta["id"] == profile_id
+    assert meta["name"] == "GET /api/v1/payments/abc" and meta["status_code"] == 200
+    assert call(query=b"profile=s3cret")["x-profile-id"]
+
+
+def test_requests_without_the_token_are_not_profiled(store, monkeypatch):
+    assert "x-profile-id" not in call(headers={"x-profile": "guess"})
+    assert "x-profile-id" not in call()
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "")
+    assert "x-profile-id" not in call(headers={"x-profile": ""})
+    assert profiling.list_profiles() == []
+
+
+class FakeRedis:
+    def __init__(self, armed=None, error=None):
+        self.hash = dict(armed or {})
+        self.error = error
+        self.calls = 0
+
+    def hgetall(self, key):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {name.encode(): str(left).encode() for name, left in self.hash.items()}
+
+    def register_script(self, script):
+        def claim(keys, args):
+            left = self.hash.get(args[0], 0)
+            if left <= 0:
+                return 0
+            self.hash[args[0]] = left - 1
+            return 1
+        return claim
+
+
+def test_armed_task_is_profiled_exactly_count_times(monkeypatch):
+    redis = FakeRedis({"process_payment_async": 2})
+    monkeypatch.setattr(profiling, "get_redis", lambda: redis)
+    tasks = ArmedTasks()
+
+    claims = [tasks.claim("process_payment_async") for _ in range(4)]
+    assert claims == [True, True, False, False]
+    assert not tasks.claim("update_payment_schedule")
+    assert redis.calls == 1  # the armed list is polled, not fetched per task
+
+
+def test_redis_outage_means_no_profiling(monkeypatch):
+    redis = FakeRedis(error=RedisConnectionError("down"))
+    monkeypatch.setattr(profiling, "get_redis", lambda: redis)
+
+    assert not ArmedTasks().claim("process_payment_async")
+
+
+def test_top_functions():
+    rows = top_functions("main;handler;validate 6\nmain;handler 2\nmain;handler;serialize 2\n")
+    assert rows[0] == ("validate", 6, 6)
+    assert ("handler", 2, 10) in rows
@@ -0,0 +1,42 @@
+from decimal import Decimal
+from sqlalchemy.dialects import postgresql
+from app.services.property_search_service import (
+    PropertySearchService, encode_cursor, decode_cursor, cache_key,
+)
+import pytest
+import uuid
+
+
+def test_cursor_round_trip():
+    property_id = uuid.uuid4()
+    assert decode_cursor(encode_cursor(Decimal("1450.00"), property_id)) == (Decimal("1450.00"), property_id)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor("abc", "def")])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cache_key_ignores_parameter_order_and_changes_with_generation():
+    a = cache_key({"city": "Austin", "vacant": True, "limit": 25}, 3)
+    b = cache_key({"limit": 25, "vacant": True, "city": "Austin"}, 3)
+    assert a == b
+    assert a != cache_key({"city": "Austin", "vacant": True, "limit": 25}, 4)
+
+
+def test_fuzzy_filters_use_trigram_operators_and_escape_wildcards(compiled):
+    sql = compiled(PropertySearchService.build_query({"q": "50%_off", "city": "Austn"}, None))
+    assert "properties.address ILIKE" in sql
+    assert "properties.address %%" in sql
+    assert "properties.city %%" in sql
+
+    params = PropertySearchService.build_query({"q": "50%_off"}, None).compile(dialect=postgresql.dialect()).params
+    assert "%50\\%\\_off%" in params.values()
+
+
+def test_pages_continue_after_the_cursor_in_keyset_order(compiled):
+    sql = compiled(PropertySearchService.build_query({"state": "TX"}, (Decimal("1000"), uuid.uuid4())))
+    assert "(properties.monthly_rent, properties.id) >" in sql
+    assert sql.endswith("ORDER BY properties.monthly_rent, properties.id")
+    assert "OFFSET" not in sql
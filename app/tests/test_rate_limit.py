@@ -0,0 +1,94 @@
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app import rate_limit
+from app.rate_limit import RateLimitMiddleware, route_class, client_id
+from app.config import settings
+import asyncio
+
+
+class FakeLimiter:
+    def __init__(self, wait_ms=0, error=None):
+        self.wait_ms = wait_ms
+        self.error = error
+        self.calls = []
+
+    async def retry_after_ms(self, client, route, limit, window_seconds, now):
+        self.calls.append((client, route, limit, window_seconds))
+        if self.error:
+            raise self.error
+        return self.wait_ms
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def call(middleware, method="POST", path="/api/v1/payments/", headers=None):
+    """(status, headers) of one request through the middleware"""
+    scope = {
+        "type": "http", "method": method, "path": path, "client": ("10.0.0.7", 5000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = messages[0]
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}
+
+
+def test_route_classes():
+    assert route_class("POST", "/api/v1/payments/") == "payment_write"
+    assert route_class("POST", "/api/v1/payments/abc/refund") == "payment_write"
+    assert route_class("GET", "/api/v1/payments/abc") == "read"
+    assert route_class("GET", "/api/v1/payments/abc/stream") == "stream"
+    assert route_class("POST", "/api/v1/leases/") == "write"
+    assert route_class("GET", "/api/v1/exports/leases/abc/transactions") == "bulk"
+    assert route_class("GET", "/health") is None
+
+
+def test_clients_are_identified_by_header_then_address():
+    assert client_id({"headers": [(b"x-client-id", b"acme")], "client": ("10.0.0.7", 1)}) == "acme"
+    assert client_id({"headers": [], "client": ("10.0.0.7", 1)}) == "ip:10.0.0.7"
+
+
+def test_over_the_limit_is_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limit, "pool_utilization", lambda: 0.0)
+    limiter = FakeLimiter(wait_ms=1500)
+    status, headers = call(RateLimitMiddleware(ok_app, limiter), headers={"X-Client-Id": "acme"})
+    assert status == 429
+    assert headers["retry-after"] == "2"
+    assert limiter.calls == [("acme", "payment_write", *settings.RATE_LIMITS["payment_write"])]
+
+
+def test_redis_trouble_fails_open(monkeypatch):
+    monkeypatch.setattr(rate_limit, "pool_utilization", lambda: 0.0)
+    limiter = FakeLimiter(error=RedisConnectionError("down"))
+    assert call(RateLimitMiddleware(ok_app, limiter))[0] == 200
+
+
+def test_too_many_in_flight_is_503_without_asking_redis(monkeypatch):
+    monkeypatch.setattr(rate_limit, "pool_utilization", lambda: 0.0)
+    limiter = FakeLimiter()
+    middleware = RateLimitMiddleware(ok_app, limiter)
+    middleware.in_flight["payment_write"] = settings.LOAD_SHED_MAX_IN_FLIGHT["payment_write"]
+
+    status, headers = call(middleware)
+    assert status == 503
+    assert headers["retry-after"] == str(settings.LOAD_SHED_RETRY_AFTER_SECONDS)
+    assert limiter.calls == []
+    # Other route classes have their own budget
+    assert call(middleware, method="GET", path="/api/v1/payments/abc")[0] == 200
+
+
+def test_a_nearly_exhausted_pool_sheds_new_requests(monkeypatch):
+    monkeypatch.setattr(rate_limit, "pool_utilization", lambda: 0.95)
+    middleware = RateLimitMiddleware(ok_app, FakeLimiter())
+    assert call(middleware)[0] == 503
+    assert call(middleware, method="GET", path="/health")[0] == 200
+    assert middleware.in_flight["payment_write"] == 0
@@ -0,0 +1,60 @@
+from sqlalchemy.exc import OperationalError
+from types import SimpleNamespace
+from app import database
+from app.database import parse_lsn, ReplicaState, LSN_HEADER
+
+
+class FakeReplicaSession:
+    def __init__(self, replayed_lsn="0/0", reachable=True):
+        self.replayed_lsn = replayed_lsn
+        self.reachable = reachable
+        self.closed = False
+
+    def connection(self):
+        if not self.reachable:
+            raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+    def execute(self, statement):
+        self.connection()
+        return SimpleNamespace(scalar=lambda: self.replayed_lsn)
+
+    def close(self):
+        self.closed = True
+
+
+def request_with(headers=None):
+    return SimpleNamespace(headers=headers or {}, cookies={})
+
+
+def use_replica(monkeypatch, session):
+    monkeypatch.setattr(database, "ReplicaSessionLocal", lambda: session)
+    monkeypatch.setattr(database, "replica_state", ReplicaState())
+
+
+def test_lsn_tokens_compare_by_wal_position():
+    assert parse_lsn("0/FFFFFFFF") < parse_lsn("1/0") < parse_lsn("1/10")
+    assert parse_lsn(None) is None
+    assert parse_lsn("garbage") is None
+
+
+def test_reads_use_the_replica_once_it_has_the_clients_write(monkeypatch):
+    replica = FakeReplicaSession(replayed_lsn="0/2000")
+    use_replica(monkeypatch, replica)
+
+    assert database.open_read_session(request_with()) is replica
+    assert database.open_read_session(request_with({LSN_HEADER: "0/1000"})) is replica
+
+    lagging = database.open_read_session(request_with({LSN_HEADER: "0/3000"}))
+    assert lagging is not replica and replica.closed  # read-your-writes: primary instead
+    lagging.close()
+
+
+def test_unreachable_replica_fails_over_to_the_primary(monkeypatch):
+    replica = FakeReplicaSession(reachable=False)
+    use_replica(monkeypatch, replica)
+
+    db = database.open_read_session(request_with())
+
+    assert db is not replica
+    assert database.replica_state.is_down()  # following requests skip the replica for a while
+    db.close()
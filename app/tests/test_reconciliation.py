@@ -0,0 +1,110 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.reconciliation import Discrepancy
+from app.services.reconciliation_service import classify, ReconciliationService
+from datetime import datetime
+import uuid
+import pytest
+
+
+def txn(amount="1200.00", status=TransactionStatus.COMPLETED):
+    return SimpleNamespace(id="t1", amount=Decimal(amount), status=status)
+
+
+def stmt(amount="1200.00", status="completed"):
+    return SimpleNamespace(id="s1", amount=Decimal(amount), status=status)
+
+
+@pytest.mark.parametrize("transaction, statement, expected", [
+    (txn(), stmt(), None),
+    (txn(), stmt(status="COMPLETED"), None),  # bank files are not consistent about case
+    (None, stmt(), Discrepancy.UNEXPECTED_BANK_CHARGE),
+    (txn(), None, Discrepancy.MISSING_IN_BANK),
+    (txn(status=TransactionStatus.PENDING), None, None),  # not expected at the bank yet
+    (txn(), stmt(amount="1199.99"), Discrepancy.AMOUNT_MISMATCH),
+    (txn(status=TransactionStatus.FAILED), stmt(), Discrepancy.STATUS_MISMATCH),
+])
+def test_classification_matches_the_sql_report(transaction, statement, expected):
+    assert classify(transaction, statement) == expected
+
+
+class RecordingSession:
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.queries = []
+
+    def execute(self, query):
+        self.queries.append(str(query.compile(dialect=postgresql.dialect())))
+        page = self.pages.pop(0) if self.pages else []
+        return SimpleNamespace(all=lambda: page)
+
+
+def test_changed_keys_walk_the_window_in_keyset_pages():
+    t = datetime(2026, 3, 1)
+    session = RecordingSession([
+        [("k1", t, 1), ("k2", t, 2)],
+        [("k3", t, 3)],
+    ])
+    pages = list(ReconciliationService._changed_keys(
+        session, Transaction.idempotency_key, Transaction.updated_at, Transaction.id, datetime(2026, 2, 28), t, 2
+    ))
+
+    assert pages == [["k1", "k2"], ["k3"]]
+    assert "transactions.updated_at > " in session.queries[0]
+    assert "(transactions.updated_at, transactions.id) >" in session.queries[1]
+    assert "ORDER BY transactions.updated_at, transactions.id" in session.queries[1]
+
+
+class ReconcilingSession:
+    """Statements on the main database, transactions on the one shard; keeps the upserted results"""
+
+    def __init__(self, statements, transactions):
+        self.statements = statements
+        self.transactions = transactions
+        self.results = {}
+
+    def execute(self, query):
+        if query.is_insert:
+            params = query.compile(dialect=postgresql.dialect()).params
+            for name, value in params.items():
+                if name.startswith("transaction_ref"):
+                    self.results[value] = params[name.replace("transaction_ref", "discrepancy")]
+            return SimpleNamespace(rowcount=len(self.results))
+        if query.is_update:
+            return SimpleNamespace(rowcount=0)
+        wanted = query.whereclause.right.value
+        if query.column_descriptions[0]["entity"] is Transaction:
+            return [row for row in self.transactions if row.id in wanted]
+        return [row for row in self.statements if row.transaction_ref in wanted]
+
+    def commit(self):
+        pass
+
+
+def test_transactions_sharing_an_idempotency_key_reconcile_separately(monkeypatch):
+    from app.services import reconciliation_service
+
+    # The client reused its key after the TTL: two payments, one key, one bank line each
+    first, second = uuid.uuid4(), uuid.uuid4()
+    transactions = [
+        SimpleNamespace(id=first, idempotency_key="rent-2026-03", amount=Decimal("1200.00"), status=TransactionStatus.COMPLETED),
+        SimpleNamespace(id=second, idempotency_key="rent-2026-03", amount=Decimal("950.00"), status=TransactionStatus.COMPLETED),
+    ]
+    statements = [
+        SimpleNamespace(id="s1", transaction_ref=str(first), amount=Decimal("1200.00"), status="completed"),
+        SimpleNamespace(id="s2", transaction_ref=str(second), amount=Decimal("900.00"), status="completed"),
+        SimpleNamespace(id="s3", transaction_ref="GHOST_CHARGE_2026_0301", amount=Decimal("250.75"), status="completed"),
+    ]
+    db = ReconcilingSession(statements, transactions)
+    monkeypatch.setattr(reconciliation_service, "each_shard", lambda db: [(0, db)])
+
+    references = [str(first), str(second), "GHOST_CHARGE_2026_0301"]
+    counts = ReconciliationService.check_references(references, db, datetime(2026, 3, 2))
+
+    assert counts == {"checked": 3, "opened": 2, "resolved": 0}
+    assert db.results == {
+        str(second): Discrepancy.AMOUNT_MISMATCH,  # the first one matches its own bank line
+        "GHOST_CHARGE_2026_0301": Discrepancy.UNEXPECTED_BANK_CHARGE,
+    }
@@ -0,0 +1,58 @@
+from datetime import datetime
+from decimal import Decimal
+from app.services import rent_roll_service
+from app.services.rent_roll_service import RentRollService, parse_month, next_month, cache_key
+from app.config import settings
+import json
+import pytest
+import uuid
+
+
+class NoDatabase:
+    def execute(self, statement):
+        raise AssertionError("should have been served from the cache")
+
+
+def test_months():
+    assert parse_month("2025-03") == datetime(2025, 3, 1)
+    assert next_month(datetime(2025, 12, 1)) == datetime(2026, 1, 1)
+    assert next_month(datetime(2025, 1, 1)) == datetime(2025, 2, 1)
+    with pytest.raises(ValueError):
+        parse_month("March")
+
+
+def test_a_month_is_frozen_after_the_lag(monkeypatch):
+    monkeypatch.setattr(settings, "RENT_ROLL_FREEZE_LAG_DAYS", 5)
+    assert not RentRollService.is_frozen_month(datetime(2025, 3, 1), datetime(2025, 4, 5, 23))
+    assert RentRollService.is_frozen_month(datetime(2025, 3, 1), datetime(2025, 4, 6))
+
+
+def test_one_statement_for_the_whole_portfolio(compiled):
+    sql = compiled(RentRollService.live_query(uuid.uuid4(), datetime(2025, 3, 1)))
+    assert sql.count("SELECT") == 4  # report, per-unit totals, expected, received
+    assert "GROUP BY leases.property_id" in sql
+    assert "transactions.completed_at >=" in sql and "transactions.completed_at <" in sql
+    assert "leases.start_date <" in sql and "leases.end_date >=" in sql
+    assert "LEFT OUTER JOIN" in sql
+
+
+def test_report_totals():
+    property_id = uuid.uuid4()
+    rows = [
+        (property_id, "12 Elm St", "Austin", "TX", "78701", 1, Decimal("1450.00"), 1, Decimal("1450.00")),
+        (uuid.uuid4(), "14 Elm St", "Austin", "TX", "78701", 1, Decimal("1200.00"), 0, Decimal("0")),
+    ]
+    report = json.loads(RentRollService.render("landlord", datetime(2025, 3, 1), False, rows))
+    assert report["month"] == "2025-03"
+    assert report["unit_count"] == 2
+    assert report["expected_rent"] == "2650.00"
+    assert report["received"] == "1450.00"
+    assert report["outstanding"] == "1200.00"
+    assert report["units"][0]["property_id"] == str(property_id)
+
+
+def test_cached_reports_skip_the_database(monkeypatch, fake_redis):
+    monkeypatch.setattr(rent_roll_service, "get_redis", lambda: fake_redis)
+    landlord_id = uuid.uuid4()
+    fake_redis.set(cache_key(landlord_id, datetime(2025, 3, 1)), '{"units": []}')
+    assert RentRollService.get(NoDatabase(), landlord_id, datetime(2025, 3, 1)) == '{"units": []}'
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.models.payment_retry import RetryStatus
+from app.models.transaction import TransactionStatus, FRAUD_DECLINED_REASON
+from app.services.retry_service import RetryService
+from app.services.payment_service import PaymentService
+from app.config import settings
+import uuid
+import pytest
+
+
+def test_only_retryable_reasons_get_an_automatic_retry():
+    assert RetryService.compute_backoff("Account closed", 1) is None
+    assert RetryService.compute_backoff(None, 1) is None
+    assert RetryService.compute_backoff("Insufficient funds", 1) is not None
+
+
+def test_backoff_doubles_per_attempt_with_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "RETRY_BACKOFF_BASE_SECONDS", {"Insufficient funds": 60})
+    monkeypatch.setattr(settings, "RETRY_BACKOFF_MAX_SECONDS", 3600)
+
+    for attempt, full in ((1, 60), (2, 120), (3, 240), (10, 3600)):
+        delays = {RetryService.compute_backoff("Insufficient funds", attempt) for _ in range(50)}
+        assert all(timedelta(seconds=full / 2) <= d <= timedelta(seconds=full) for d in delays)
+        assert len(delays) > 1  # spread out, not one thundering herd
+
+
+def test_nothing_is_scheduled_past_max_retries():
+    # Returns before touching the database
+    assert RetryService.schedule("txn", settings.PAYMENT_MAX_RETRIES, "Insufficient funds", db=None) is None
+    assert RetryService.schedule("txn", settings.PAYMENT_MAX_RETRIES, None, db=None, manual=True) is None
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self  # filter / order_by / limit / with_for_update
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+
+def test_payment_declined_by_fraud_checks_is_never_retried(monkeypatch):
+    declined = SimpleNamespace(
+        id=uuid.uuid4(), status=TransactionStatus.FAILED, version=1,
+        failure_reason=f"{FRAUD_DECLINED_REASON}: payer_hourly_count",
+    )
+    retry = SimpleNamespace(transaction_id=declined.id, status=RetryStatus.SCHEDULED, attempt=1, due_at=datetime.utcnow())
+    queries = iter([FakeQuery([retry]), FakeQuery([declined])])
+    db = SimpleNamespace(query=lambda model: next(queries), commit=lambda: None)
+    monkeypatch.setattr(PaymentService, "compare_and_set_status", lambda *args, **kwargs: pytest.fail("reset to PENDING"))
+
+    assert RetryService.claim_due(db, limit=10) == []
+    assert retry.status == RetryStatus.CANCELLED
+
+
+def test_manual_retry_of_an_already_dispatched_attempt_is_a_conflict():
+    from app.api.v1.payments import retry_failed_payment
+    from fastapi import HTTPException
+
+    transaction = SimpleNamespace(id=uuid.uuid4(), status=TransactionStatus.FAILED, retry_count=1, failure_reason="Insufficient funds")
+    written = []  # the upsert's row: nothing when attempt 2 is already DISPATCHED
+    rollbacks = []
+    db = SimpleNamespace(
+        query=lambda model: SimpleNamespace(filter=lambda *criteria: SimpleNamespace(first=lambda: transaction)),
+        execute=lambda statement: SimpleNamespace(first=lambda: written[0] if written else None),
+        rollback=lambda: rollbacks.append(True),
+        commit=lambda: None,
+    )
+
+    with pytest.raises(HTTPException) as conflict:
+        retry_failed_payment(str(transaction.id), db)
+    assert conflict.value.status_code == 409
+    assert rollbacks
+
+    written.append(SimpleNamespace(attempt=2, due_at=datetime(2026, 1, 1)))
+    response = retry_failed_payment(str(transaction.id), db)
+    assert (response["retry_count"], response["due_at"]) == (2, datetime(2026, 1, 1))
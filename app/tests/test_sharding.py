@@ -0,0 +1,110 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from app import sharding
+from app.sharding import ShardRouter, ShardMovingError
+from app.models.shard_directory import ShardStatus
+from app.services.ledger_service import LedgerService
+import pytest
+import uuid
+
+
+class FakeDirectory:
+    def __init__(self, row=None):
+        self.row = row
+        self.queries = 0
+
+    def execute(self, query):
+        self.queries += 1
+        return SimpleNamespace(first=lambda: self.row)
+
+
+def use_shards(monkeypatch, count):
+    monkeypatch.setattr(sharding, "SHARD_SESSIONS", [object()] * count)
+
+
+def test_initial_placement_is_deterministic_and_in_range(monkeypatch):
+    use_shards(monkeypatch, 4)
+    landlords = [uuid.uuid4() for _ in range(200)]
+    placements = [ShardRouter.initial_shard(landlord) for landlord in landlords]
+
+    assert placements == [ShardRouter.initial_shard(landlord) for landlord in landlords]
+    assert set(placements) == {0, 1, 2, 3}
+
+
+def test_single_shard_never_touches_the_directory(monkeypatch):
+    use_shards(monkeypatch, 1)
+    directory = FakeDirectory()
+
+    assert ShardRouter.lease_shard(uuid.uuid4(), directory, for_write=True) == 0
+    assert directory.queries == 0
+
+
+def test_unknown_entries_resolve_to_shard_zero(monkeypatch):
+    use_shards(monkeypatch, 3)
+    assert ShardRouter.transaction_shard(uuid.uuid4(), FakeDirectory()) == 0
+
+
+def test_moving_landlord_blocks_writes_but_not_reads(monkeypatch):
+    use_shards(monkeypatch, 3)
+    directory = FakeDirectory(SimpleNamespace(shard_id=2, status=ShardStatus.MOVING))
+
+    assert ShardRouter.landlord_shard(uuid.uuid4(), directory) == 2
+    with pytest.raises(ShardMovingError):
+        ShardRouter.landlord_shard(uuid.uuid4(), directory, for_write=True)
+
+
+def test_statements_merge_across_shards():
+    def entry(minute):
+        return SimpleNamespace(created_at=datetime(2026, 1, 1, 12, minute))
+
+    statements = {
+        0: {"opening_through_sequence": 40, "opening_balance": Decimal("100.00"), "entries": [entry(1), entry(5)]},
+        1: {"opening_through_sequence": 7, "opening_balance": Decimal("-25.50"), "entries": [entry(3)]},
+    }
+    merged = LedgerService.merge_statements("acct", statements, limit=2)
+
+    assert merged["opening_balance"] == Decimal("74.50")
+    assert merged["checkpoint_sequences"] == {0: 40, 1: 7}
+    assert [e.created_at.minute for e in merged["entries"]] == [1, 3]
+
+
+def test_per_shard_jobs_leave_moving_landlords_alone(monkeypatch):
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+    from app.models.payment_retry import PaymentRetry
+
+    due = select(PaymentRetry.transaction_id)
+    assert sharding.skip_moving(due, [], transaction_id=PaymentRetry.transaction_id) is due
+    use_shards(monkeypatch, 1)
+    assert ShardRouter.moving_landlords(FakeDirectory()) == []  # never reads the directory
+
+    landlord = uuid.uuid4()
+    sql = str(sharding.skip_moving(due, [landlord], transaction_id=PaymentRetry.transaction_id).compile(dialect=postgresql.dialect()))
+    assert "payment_retries.transaction_id NOT IN (SELECT transactions.id" in sql
+    assert "properties.landlord_id IN" in sql
+
+    with pytest.raises(ValueError):
+        sharding.skip_moving(due, [landlord])
+
+
+def test_move_is_aborted_when_a_row_changed_after_the_final_copy():
+    from app.services.reshard_service import ReshardService
+    from app.models.lease import Lease
+
+    ids = sorted(uuid.uuid4() for _ in range(3))
+
+    class Shard:
+        def __init__(self, hashes):
+            self.rows = list(zip(ids, hashes))
+
+        def execute(self, query):
+            page, self.rows = self.rows[:2], self.rows[2:]  # keyset pages of two
+            return SimpleNamespace(all=lambda: page)
+
+    tables = [(Lease.__table__, Lease.id.in_(ids))]
+    ReshardService._verify(tables, Shard(["a", "b", "c"]), Shard(["a", "b", "c"]), batch_size=2)
+
+    with pytest.raises(RuntimeError, match=str(ids[2])):
+        # same ids (a count would match), but the last row's version moved on on the source
+        ReshardService._verify(tables, Shard(["a", "b", "c"]), Shard(["a", "b", "x"]), batch_size=2)
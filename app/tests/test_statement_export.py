@@ -0,0 +1,58 @@
+from datetime import datetime
+from decimal import Decimal
+from app.models.transaction import TransactionStatus
+from app.services.statement_export_service import (
+    StatementExportService, StatementScope, ExportFormat, HEADER, render, gzipped,
+)
+import csv
+import gzip
+import io
+import json
+import pytest
+import uuid
+
+
+def statement_row(**values):
+    row = dict.fromkeys(HEADER)
+    row.update(
+        transaction_id=uuid.uuid4(), created_at=datetime(2025, 3, 1, 9, 30),
+        status=TransactionStatus.COMPLETED, amount=Decimal("1450.00"), address="12 Elm St, Apt 3",
+    )
+    row.update(values)
+    return tuple(row[name] for name in HEADER)
+
+
+@pytest.mark.parametrize("scope, condition", [
+    (StatementScope.LANDLORD, "properties.landlord_id ="),
+    (StatementScope.PROPERTY, "leases.property_id ="),
+    (StatementScope.LEASE, "transactions.lease_id ="),
+    (StatementScope.RENTER, "leases.renter_id ="),
+])
+def test_statement_query_filters_on_the_scope_in_date_order(scope, condition, compiled):
+    sql = compiled(StatementExportService.statement_query(scope, uuid.uuid4(), datetime(2025, 1, 1), datetime(2026, 1, 1)))
+    assert condition in sql
+    assert "transactions.created_at >=" in sql and "transactions.created_at <" in sql
+    assert sql.endswith("ORDER BY transactions.created_at, transactions.id")
+
+
+def test_csv_has_a_header_and_one_line_per_transaction():
+    rows = [statement_row(), statement_row(completed_at=None)]
+    text = "".join(render(rows, ExportFormat.CSV, chunk_rows=1))
+    lines = list(csv.DictReader(io.StringIO(text)))
+    assert len(lines) == 2
+    assert lines[0]["status"] == "completed"
+    assert lines[0]["amount"] == "1450.00"
+    assert lines[0]["address"] == "12 Elm St, Apt 3"
+    assert lines[1]["completed_at"] == ""
+
+
+def test_ndjson_is_one_object_per_line():
+    chunks = list(render([statement_row(), statement_row(), statement_row()], ExportFormat.NDJSON, chunk_rows=2))
+    assert len(chunks) == 2
+    lines = "".join(chunks).splitlines()
+    assert [json.loads(line)["created_at"] for line in lines] == ["2025-03-01T09:30:00"] * 3
+
+
+def test_gzip_stream_is_a_single_valid_file():
+    chunks = [text.encode() for text in render([statement_row() for _ in range(50)], ExportFormat.CSV, chunk_rows=10)]
+    assert gzip.decompress(b"".join(gzipped(iter(chunks)))) == b"".join(chunks)
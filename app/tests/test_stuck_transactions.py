@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy.dialects import postgresql
+from app.models.transaction import TransactionStatus, PaymentRailType
+from app.services.stuck_transaction_service import StuckTransactionService
+
+
+def test_every_rail_has_an_sla_in_every_swept_state():
+    for rail in PaymentRailType:
+        pending = StuckTransactionService.sla_seconds(TransactionStatus.PENDING, rail)
+        processing = StuckTransactionService.sla_seconds(TransactionStatus.PROCESSING, rail)
+        assert pending > 0 and processing > 0
+
+
+def test_slower_rails_get_longer_settlement_windows():
+    sla = lambda rail: StuckTransactionService.sla_seconds(TransactionStatus.PROCESSING, rail)
+    assert sla(PaymentRailType.INSTANT) < sla(PaymentRailType.SAME_DAY_ACH) < sla(PaymentRailType.STANDARD_ACH)
+
+
+def test_claim_scans_the_status_index_and_skips_rows_held_by_another_sweeper():
+    query = StuckTransactionService.stuck_query(
+        TransactionStatus.PROCESSING, PaymentRailType.WIRE, datetime(2026, 5, 1), 500
+    )
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "transactions.status = " in sql
+    assert "transactions.created_at < " in sql
+    assert "transactions.updated_at < " in sql
+    assert sql.endswith("FOR UPDATE SKIP LOCKED")
@@ -0,0 +1,144 @@
+from sqlalchemy import create_engine, text
+from app import tracing
+from app.tracing import TracingMiddleware, start_span, parse_traceparent, inject, to_otlp
+from app.cli.traces import group_traces, find_traces, render_tree
+from app.config import settings
+import asyncio
+import json
+import pytest
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    """Segments handed to the export thread, captured synchronously instead"""
+    segments = []
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing.exporter, "_submit", segments.append)
+    return segments
+
+
+def test_children_share_the_trace_and_the_segment_is_exported_when_the_root_ends(exported):
+    with start_span("payment.initiate") as root:
+        with start_span("payment.velocity_check") as child:
+            pass
+        assert exported == []
+
+    assert [[span.name for span in segment] for segment in exported] == [["payment.velocity_check", "payment.initiate"]]
+    assert child.trace_id == root.trace_id and child.parent_id == root.span_id
+    assert root.end_ns >= child.end_ns >= child.start_ns >= root.start_ns
+
+
+def test_unsampled_traces_are_propagated_but_not_exported(exported, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+    with start_span("payment.initiate") as root:
+        with start_span("transaction.transition") as child:
+            headers = inject()
+
+    assert exported == []
+    assert not child.sampled
+    assert headers["traceparent"].endswith("-00")  # the worker makes the same decision
+
+
+def test_traceparent_round_trip():
+    parent = parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    assert parent.trace_id == "0af7651916cd43dd8448eb211c80319c" and parent.span_id == "b7ad6b7169203331"
+    assert parent.sampled
+    assert parse_traceparent(parent.traceparent).traceparent == parent.traceparent
+
+    for bad in (None, "", "garbage", "00-xyz-b7ad6b7169203331-01", "00-0af7651916cd43dd8448eb211c80319c-b7ad-01"):
+        assert parse_traceparent(bad) is None
+
+
+def test_remote_parent_continues_the_trace_in_a_new_segment(exported):
+    remote = parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    with start_span("celery.task process_payment_async", parent=remote) as span:
+        pass
+
+    assert span.trace_id == remote.trace_id and span.parent_id == remote.span_id
+    assert exported == [[span]]  # the remote parent itself belongs to the other process
+
+
+def test_errors_are_recorded_on_the_span(exported):
+    with pytest.raises(ValueError):
+        with start_span("transaction.transition"):
+            raise ValueError("Transaction not found")
+
+    otlp = to_otlp(exported[0])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp["status"] == {"code": 2, "message": "ValueError: Transaction not found"}
+
+
+def test_sql_statements_are_child_spans(exported):
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))  # outside a trace: nothing
+        with start_span("update_payment_schedule") as root:
+            conn.execute(text("SELECT 2"))
+
+    (segment,) = exported
+    query = next(span for span in segment if span.name == "db.query")
+    assert query.parent_id == root.span_id
+    assert query.attributes["db.statement"] == "SELECT 2"
+    assert query.attributes["db.operation"] == "SELECT"
+
+
+def test_celery_headers_carry_the_trace(exported):
+    from celery import signals
+    import app.celery_app  # noqa: F401 - connects the signals
+
+    headers = {}
+    with start_span("POST /api/v1/payments/") as root:
+        signals.before_task_publish.send(sender="app.tasks.payment_tasks.process_payment_async", headers=headers)
+
+    assert parse_traceparent(headers["traceparent"]).trace_id == root.trace_id
+    assert headers["trace_published_at"] <= root.end_ns
+
+
+def call(path="/api/v1/payments/", headers=None):
+    async def app(scope, receive, send):
+        with start_span("payment.initiate"):
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+    scope = {
+        "type": "http", "method": "POST", "path": path,
+        "headers": [(name.encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(TracingMiddleware(app)(scope, receive, send))
+    return dict((name.decode(), value.decode()) for name, value in messages[0]["headers"])
+
+
+def test_api_requests_are_traced_and_continue_the_callers_trace(exported):
+    headers = call(headers={"traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"})
+
+    assert headers["x-trace-id"] == "0af7651916cd43dd8448eb211c80319c"
+    (segment,) = exported
+    assert [span.name for span in segment] == ["payment.initiate", "POST /api/v1/payments/"]
+    assert segment[1].attributes["http.status_code"] == 201
+
+
+def test_trace_report_tree(exported):
+    with start_span("POST /api/v1/payments/") as root:
+        with start_span("payment.initiate"):
+            tracing.set_attributes(transaction_id="t-1")
+
+    # What the exporter writes, read back the way the CLI does
+    payload = json.loads(json.dumps(to_otlp(exported[0])))
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    for span in spans:
+        span["attributes"] = {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+        span["start"], span["end"] = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+
+    traces = group_traces(spans)
+    assert find_traces(traces, "t-1") == [root.trace_id]
+    lines = render_tree(traces[root.trace_id])
+    assert lines[0].endswith("POST /api/v1/payments/")
+    assert lines[1].endswith("  payment.initiate")
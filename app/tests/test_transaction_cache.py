@@ -0,0 +1,84 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from app.api.v1 import payments
+from app.models.transaction import TransactionStatus, PaymentRailType
+from app.services import transaction_cache_service
+from app.services.transaction_cache_service import TransactionCacheService, etag_matches, transaction_key
+import json
+import uuid
+
+
+def a_transaction(version=1):
+    return SimpleNamespace(
+        id=uuid.uuid4(), idempotency_key="rent-2025-03", lease_id=uuid.uuid4(),
+        payer_account_id=uuid.uuid4(), payee_account_id=uuid.uuid4(), amount=Decimal("1450.00"),
+        status=TransactionStatus.COMPLETED, payment_rail_type=PaymentRailType.STANDARD_ACH,
+        initiated_at=datetime(2025, 3, 1), processing_at=None, completed_at=datetime(2025, 3, 3),
+        failed_at=None, failure_reason=None, retry_count=0, version=version,
+    )
+
+
+def use_redis(monkeypatch, redis):
+    monkeypatch.setattr(transaction_cache_service, "get_redis", lambda: redis)
+
+
+def test_if_none_match():
+    assert etag_matches('"abc-2"', '"abc-2"')
+    assert etag_matches('W/"abc-2", "x"', '"abc-2"')
+    assert etag_matches("*", '"abc-2"')
+    assert not etag_matches('"abc-1"', '"abc-2"')
+    assert not etag_matches(None, '"abc-2"')
+
+
+def test_etag_follows_the_version():
+    transaction = a_transaction()
+    first = TransactionCacheService.render_transaction(transaction)
+    transaction.version = 2
+    assert TransactionCacheService.render_transaction(transaction)["etag"] != first["etag"]
+    assert json.loads(first["body"])["amount"] == "1450.00"
+
+
+def test_read_through_loads_once_then_serves_from_redis(monkeypatch, fake_redis):
+    use_redis(monkeypatch, fake_redis)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {"etag": '"t-1"', "body": "{}"}
+
+    for _ in range(3):
+        assert TransactionCacheService.read_through("txn:t", "transaction", load) == {"etag": '"t-1"', "body": "{}"}
+    assert len(loads) == 1
+
+    TransactionCacheService.invalidate("t")
+    TransactionCacheService.read_through("txn:t", "transaction", load)
+    assert len(loads) == 2
+
+
+def test_not_found_is_not_cached(monkeypatch, fake_redis):
+    use_redis(monkeypatch, fake_redis)
+    assert TransactionCacheService.read_through("txn:t", "transaction", lambda: None) is None
+    assert fake_redis.values == {}
+
+
+def test_redis_down_reads_the_database(monkeypatch, fake_redis):
+    fake_redis.down = True
+    use_redis(monkeypatch, fake_redis)
+    assert TransactionCacheService.read_through("txn:t", "transaction", lambda: {"etag": '"t-1"', "body": "{}"})
+
+
+def test_unchanged_transaction_is_304_without_the_database(monkeypatch, fake_redis):
+    use_redis(monkeypatch, fake_redis)
+    transaction = a_transaction(version=3)
+    entry = TransactionCacheService.render_transaction(transaction)
+    fake_redis.set(transaction_key(transaction.id), json.dumps(entry))
+    monkeypatch.setattr(payments, "_transaction_shard_db", lambda transaction_id: 1 / 0)
+
+    response = payments.get_transaction(str(transaction.id), if_none_match=entry["etag"])
+    assert response.status_code == 304
+    assert response.headers["etag"] == entry["etag"]
+
+    response = payments.get_transaction(str(transaction.id), if_none_match='"stale"')
+    assert response.status_code == 200
+    assert json.loads(response.body)["version"] == 3
@@ -0,0 +1,49 @@
+from sqlalchemy.dialects import postgresql
+from app.models.transaction import TransactionStatus, ALLOWED_TRANSITIONS
+from app.services.payment_service import PaymentService, InvalidTransition
+import pytest
+import uuid
+
+
+class RecordingSession:
+    """Captures the statement instead of running it; the UPDATE matched no row"""
+
+    def execute(self, statement):
+        self.statement = statement
+        return self
+
+    def scalar(self):
+        return None
+
+
+def test_every_status_has_an_entry_and_terminal_states_stay_terminal():
+    assert set(ALLOWED_TRANSITIONS) == set(TransactionStatus)
+    assert ALLOWED_TRANSITIONS[TransactionStatus.REFUNDED] == set()
+    assert TransactionStatus.PENDING not in ALLOWED_TRANSITIONS[TransactionStatus.COMPLETED]
+
+
+@pytest.mark.parametrize("from_status, to_status", [
+    (TransactionStatus.PENDING, TransactionStatus.COMPLETED),   # skipped processing
+    (TransactionStatus.FAILED, TransactionStatus.COMPLETED),
+    (TransactionStatus.REFUNDED, TransactionStatus.PENDING),
+])
+def test_impossible_transitions_are_rejected_before_touching_the_database(from_status, to_status):
+    with pytest.raises(InvalidTransition):
+        PaymentService.compare_and_set_status(uuid.uuid4(), from_status, 1, to_status, db=None)
+
+
+def test_transition_is_one_compare_and_set_update():
+    db = RecordingSession()
+    new_version = PaymentService.compare_and_set_status(
+        uuid.uuid4(), TransactionStatus.PROCESSING, 3, TransactionStatus.COMPLETED, db, completed_at=None
+    )
+    assert new_version is None  # lost the race: reported, nothing written
+
+    sql = str(db.statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE transactions SET")
+    assert "version=(transactions.version +" in sql
+    where = sql[sql.index(" WHERE "):]
+    assert "transactions.id =" in where
+    assert "transactions.status =" in where
+    assert "transactions.version =" in where
+    assert "RETURNING transactions.version" in sql
@@ -0,0 +1,40 @@
+from app.services.velocity_service import VelocityService, InMemoryVelocityStore
+from app.metrics import render_metrics
+from app.config import settings
+from decimal import Decimal
+import uuid
+
+
+def test_payer_is_blocked_after_hourly_count():
+    store = InMemoryVelocityStore()
+    payer = uuid.uuid4()
+
+    decisions = [
+        VelocityService.check(payer, uuid.uuid4(), Decimal("10.00"), f"key-{i}", store=store)
+        for i in range(settings.VELOCITY_PAYER_MAX_PAYMENTS_PER_HOUR + 1)
+    ]
+
+    assert all(decision.allowed for decision in decisions[:-1])
+    assert decisions[-1].violations == ["payer_hourly_count"]
+
+
+def test_daily_amount_limit_and_replays():
+    store = InMemoryVelocityStore()
+    payer, lease = uuid.uuid4(), uuid.uuid4()
+    limit = settings.VELOCITY_PAYER_MAX_AMOUNT_PER_DAY
+
+    first = VelocityService.check(payer, lease, limit - Decimal("1.00"), "key-1", store=store)
+    # Same idempotency key again (lost race / client retry) is not counted against itself
+    replay = VelocityService.check(payer, lease, limit - Decimal("1.00"), "key-1", store=store)
+    over = VelocityService.check(payer, uuid.uuid4(), Decimal("2.00"), "key-2", store=store)
+
+    assert first.allowed and replay.allowed
+    assert over.violations == ["payer_daily_amount"]
+
+
+def test_evaluation_time_is_reported():
+    VelocityService.check(uuid.uuid4(), uuid.uuid4(), Decimal("10.00"), "key-1", store=InMemoryVelocityStore())
+
+    output = render_metrics()
+    assert "velocity_check_duration_ms_count" in output
+    assert 'velocity_checks_total{outcome="allowed"}' in output
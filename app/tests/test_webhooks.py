@@ -0,0 +1,141 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from app.services.webhook_service import WebhookService, WebhookBatch, CLAIM_LEASE
+from app.models.webhook import DeliveryStatus
+from app.config import settings
+import hashlib
+import hmac
+import uuid
+
+
+def test_signature_can_be_verified_by_subscriber():
+    """A subscriber holding the secret must be able to recompute our signature"""
+    body = b'{"events":[{"id":"evt_1"}]}'
+    header = WebhookService.sign_payload("s3cret", body, 1700000000)
+
+    parts = dict(item.split("=", 1) for item in header.split(","))
+    expected = hmac.new(b"s3cret", b"1700000000." + body, hashlib.sha256).hexdigest()
+
+    assert parts["t"] == "1700000000"
+    assert hmac.compare_digest(parts["v1"], expected)
+
+
+def test_signature_changes_with_body():
+    first = WebhookService.sign_payload("s3cret", b"{}", 1700000000)
+    second = WebhookService.sign_payload("s3cret", b"{ }", 1700000000)
+    assert first != second
+
+
+def test_backoff_grows_and_is_capped():
+    base = settings.WEBHOOK_BACKOFF_BASE_SECONDS
+    cap = settings.WEBHOOK_BACKOFF_MAX_SECONDS
+
+    for attempts in range(1, 6):
+        delay = WebhookService.compute_backoff(attempts).total_seconds()
+        full = min(base * 2 ** (attempts - 1), cap)
+        # Equal jitter: never less than half of the full delay, never more than all of it
+        assert full / 2 <= delay <= full
+
+    assert WebhookService.compute_backoff(50).total_seconds() <= cap
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self  # join / filter / order_by / limit / with_for_update
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+        self.flushes = 0
+        self.commits = 0
+
+    def query(self, *entities):
+        return FakeQuery(self.rows)
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+    def flush(self):
+        self.flushes += 1
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_event_fans_out_to_the_subscriptions_of_both_parties_in_one_statement():
+    transaction = SimpleNamespace(
+        id=uuid.uuid4(), lease_id=uuid.uuid4(), amount=Decimal("1450.00"), failure_reason=None,
+        payer_account_id=uuid.uuid4(), payee_account_id=uuid.uuid4(),
+    )
+    event = SimpleNamespace(
+        id=uuid.uuid4(), event_type="status_change", timestamp=datetime(2026, 3, 1),
+        previous_status="processing", new_status="completed",
+    )
+    db = FakeSession()
+
+    WebhookService.enqueue_event(event, transaction, db)
+
+    ((statement, _),) = db.executed
+    compiled = statement.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert sql.startswith("INSERT INTO webhook_deliveries")
+    assert "FROM webhook_subscriptions" in sql
+    assert "webhook_subscriptions.user_id IN (SELECT bank_accounts.user_id" in sql
+    assert "webhook_subscriptions.is_active IS true" in sql
+    (account_ids,) = [value for value in compiled.params.values() if isinstance(value, list)]
+    assert set(account_ids) == {transaction.payer_account_id, transaction.payee_account_id}
+    assert WebhookService.build_payload(event, transaction) in compiled.params.values()
+    assert db.flushes == 0  # id and timestamp already set: no flush needed
+
+
+def delivery(n, attempts=0):
+    return SimpleNamespace(id=f"d{n}", attempts=attempts, payload={"id": f"evt_{n}"}, next_attempt_at=None)
+
+
+def test_due_deliveries_are_batched_per_subscription_and_split_at_the_request_limit(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_EVENTS_PER_REQUEST", 2)
+    first = SimpleNamespace(id="sub-1", url="https://a.example.com/hooks", secret="a")
+    second = SimpleNamespace(id="sub-2", url="https://b.example.com/hooks", secret="b")
+    rows = [(delivery(1), first), (delivery(2), second), (delivery(3), first), (delivery(4, attempts=2), first)]
+    db = FakeSession(rows)
+    before = datetime.utcnow()
+
+    batches = WebhookService.claim_due_deliveries(db, limit=10)
+
+    assert [(batch.subscription_id, batch.delivery_ids) for batch in batches] == [
+        ("sub-1", ["d1", "d3"]), ("sub-2", ["d2"]), ("sub-1", ["d4"]),
+    ]
+    assert batches[2].attempts == [2]
+    assert batches[0].events == [{"id": "evt_1"}, {"id": "evt_3"}]
+    # Claimed: hidden from other workers for the claim lease, committed before any POST goes out
+    assert all(d.next_attempt_at >= before + CLAIM_LEASE for d, _ in rows)
+    assert db.commits == 1
+
+
+def test_results_deliver_retry_with_backoff_or_give_up(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 3)
+    delivered = WebhookBatch("sub-1", "https://a.example.com/hooks", "a", ["d1"], [0])
+    failing = WebhookBatch("sub-2", "https://b.example.com/hooks", "b", ["d2", "d3"], [0, 2])
+    db = FakeSession()
+    before = datetime.utcnow()
+
+    stats = WebhookService.record_results(db, [(delivered, None), (failing, "HTTP 503")])
+
+    assert stats == {"delivered": 1, "retrying": 1, "failed": 1}
+    ((_, updates),) = db.executed
+    rows = {row["id"]: row for row in updates}
+    assert rows["d1"]["status"] == DeliveryStatus.DELIVERED and rows["d1"]["attempts"] == 1
+    assert "status" not in rows["d2"]  # stays PENDING, due again after the backoff
+    assert rows["d2"]["next_attempt_at"] > before and rows["d2"]["last_error"] == "HTTP 503"
+    assert (rows["d3"]["status"], rows["d3"]["attempts"]) == (DeliveryStatus.FAILED, 3)
+    assert db.commits == 1
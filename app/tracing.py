@@ -0,0 +1,351 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+import enum
+import json
+import os
+import queue
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Distributed tracing without an SDK dependency: spans follow a request from the API through the
+# Celery message (W3C traceparent header) into the workers, down to every SQL statement.
+#
+#   API request  ── TracingMiddleware root span, honours an incoming traceparent
+#     ├─ payment.initiate, transaction.transition ...   (@traced / start_span)
+#     ├─ db.query ...                                    (SQLAlchemy cursor events)
+#     └─ apply_async ── traceparent + publish time in the message headers
+#   worker: celery.queue_wait (publish -> start), celery.task <name>, payment.rail, db.query ...
+#
+# The sampling decision is made once per trace at its root (TRACE_SAMPLE_RATE) and travels with it.
+# Finished spans are exported in OTLP/JSON by a background thread, to a JSON-lines file or to an
+# OTLP/HTTP collector; `python -m app.cli.traces` prints the per-stage breakdown of one trace.
+
+TRACEPARENT_HEADER = "traceparent"
+PUBLISHED_AT_HEADER = "trace_published_at"
+MAX_STATEMENT_LENGTH = 500
+
+
+class SpanKind(int, enum.Enum):
+    # OTLP span kinds
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+    PRODUCER = 4
+    CONSUMER = 5
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    name: str
+    sampled: bool = True
+    kind: SpanKind = SpanKind.INTERNAL
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    error: str | None = None
+    local_root: bool = False  # first span of the trace in this process: ending it flushes the batch
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+_current: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def parse_traceparent(value: str | None) -> Span | None:
+    """W3C traceparent -> a remote parent (not exported itself), None if absent or malformed"""
+    try:
+        version, trace_id, span_id, flags = (value or "").strip().split("-")
+        int(trace_id, 16), int(span_id, 16), int(flags, 16)
+    except ValueError:
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16 or version == "ff":
+        return None
+    return Span(trace_id, span_id, None, "remote", sampled=bool(int(flags, 16) & 1))
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def inject() -> dict:
+    """Headers that continue the current trace in another process ({} outside a trace)"""
+    span = _current.get()
+    return {TRACEPARENT_HEADER: span.traceparent} if span else {}
+
+
+def set_attributes(**attributes) -> None:
+    """Annotate the current span (e.g. with the transaction id once it is known)"""
+    span = _current.get()
+    if span is not None and span.sampled:
+        span.attributes.update(attributes)
+
+
+@contextmanager
+def start_span(name: str, parent: Span | None = None, kind: SpanKind = SpanKind.INTERNAL,
+               start_ns: int | None = None, **attributes):
+    """
+    Child of parent (default: the current span), or the root of a new trace, sampled at
+    TRACE_SAMPLE_RATE. Unsampled spans are still propagated, so a trace is sampled all or nothing.
+    """
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+    parent = parent if parent is not None else _current.get()
+    if parent is None:
+        span = Span(_new_id(16), _new_id(8), None, name, sampled=random.random() < settings.TRACE_SAMPLE_RATE)
+    else:
+        span = Span(parent.trace_id, _new_id(8), parent.span_id, name, sampled=parent.sampled)
+    span.kind = kind
+    span.local_root = parent is None or parent.name == "remote"
+    span.start_ns = start_ns or time.time_ns()
+    if span.sampled:
+        span.attributes.update(attributes)
+
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        span.end_ns = time.time_ns()
+        if span.sampled:
+            exporter.add(span)
+
+
+def traced(name: str):
+    """Decorator: run the function in a span"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ---- Export ----------------------------------------------------------------------------------
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    if isinstance(value, enum.Enum):
+        value = value.value
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def to_otlp(spans: list[Span]) -> dict:
+    """One OTLP/JSON ExportTraceServiceRequest"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            _attribute("service.name", settings.TRACE_SERVICE_NAME),
+            _attribute("process.pid", os.getpid()),
+        ]},
+        "scopeSpans": [{
+            "scope": {"name": "app.tracing"},
+            "spans": [
+                {
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    "name": span.name,
+                    "kind": int(span.kind),
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                }
+                for span in spans
+            ],
+        }],
+    }]}
+
+
+class SpanExporter:
+    """
+    Collects finished spans per local trace segment and hands each segment to a background thread,
+    so requests and tasks never wait on the file or the collector. A full queue drops spans.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, list[Span]] = {}
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._pid = None
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            spans = self._pending.setdefault(span.trace_id, [])
+            spans.append(span)
+            if not span.local_root:
+                return
+            del self._pending[span.trace_id]
+        self._submit(spans)
+
+    def _submit(self, spans: list[Span]) -> None:
+        if self._thread is None or self._pid != os.getpid():  # (re)start after a Celery prefork
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning(f"Span export queue full, dropped {len(spans)} spans")
+
+    def _run(self) -> None:
+        while True:
+            spans = self._queue.get()
+            try:
+                export(to_otlp(spans))
+            except Exception as e:
+                logger.warning(f"Span export failed: {e}")
+
+
+def export(payload: dict) -> None:
+    if settings.TRACE_EXPORTER == "file":
+        with open(settings.TRACE_FILE_PATH, "a") as f:
+            f.write(json.dumps(payload) + "\n")
+    elif settings.TRACE_EXPORTER == "otlp":
+        import httpx
+        httpx.post(settings.TRACE_OTLP_ENDPOINT, json=payload, timeout=5.0).raise_for_status()
+
+
+exporter = SpanExporter()
+
+
+# ---- SQL statements ----------------------------------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        return
+    span = Span(parent.trace_id, _new_id(8), parent.span_id, "db.query", kind=SpanKind.CLIENT, start_ns=time.time_ns())
+    span.attributes.update({
+        "db.system": "postgresql",
+        "db.operation": statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "",
+        "db.statement": statement[:MAX_STATEMENT_LENGTH],
+        "db.name": conn.engine.url.database or "",
+    })
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        span = spans.pop()
+        span.end_ns = time.time_ns()
+        span.attributes["db.rows"] = cursor.rowcount
+        exporter.add(span)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("trace_spans") if conn is not None else None
+    if spans:
+        span = spans.pop()
+        span.end_ns = time.time_ns()
+        span.error = str(exception_context.original_exception)[:MAX_STATEMENT_LENGTH]
+        exporter.add(span)
+
+
+# ---- API -------------------------------------------------------------------------------------
+
+class TracingMiddleware:
+    """Root span per API request (continuing the caller's traceparent); sampled ones get X-Trace-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        remote = parse_traceparent(headers.get(TRACEPARENT_HEADER.encode(), b"").decode("latin-1"))
+        name = f"{scope['method']} {scope['path']}"
+        with start_span(name, parent=remote, kind=SpanKind.SERVER,
+                        **{"http.method": scope["method"], "http.target": scope["path"]}) as span:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    if span.sampled:
+                        span.attributes["http.status_code"] = message["status"]
+                        message.setdefault("headers", [])
+                        message["headers"] = list(message["headers"]) + [(b"x-trace-id", span.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+
+# ---- Celery ----------------------------------------------------------------------------------
+
+_task_spans: dict = {}  # task id -> the open start_span() context manager of the running task
+
+
+def install_celery_tracing() -> None:
+    """Connect the Celery signals (called once from app/celery_app.py)"""
+    from celery import signals
+
+    @signals.before_task_publish.connect(weak=False)
+    def _inject(headers=None, **kwargs):
+        if settings.TRACING_ENABLED and headers is not None:
+            headers.update(inject())
+            headers[PUBLISHED_AT_HEADER] = time.time_ns()
+
+    @signals.task_prerun.connect(weak=False)
+    def _start(task_id=None, task=None, **kwargs):
+        if not settings.TRACING_ENABLED:
+            return
+        remote = parse_traceparent(getattr(task.request, TRACEPARENT_HEADER, None))
+        published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+        cm = start_span(f"celery.task {task.name}", parent=remote, kind=SpanKind.CONSUMER,
+                        **{"celery.task_id": task_id, "celery.retries": task.request.retries or 0})
+        span = cm.__enter__()
+        if published_at and span.sampled:
+            # Broker + queue time, between apply_async in the caller and this worker picking it up
+            wait = Span(span.trace_id, _new_id(8), span.span_id, f"celery.queue_wait {task.name}",
+                        start_ns=int(published_at), end_ns=span.start_ns)
+            span.attributes["celery.queue_wait_ms"] = round((span.start_ns - int(published_at)) / 1e6, 1)
+            exporter.add(wait)
+        _task_spans[task_id] = cm
+
+    @signals.task_postrun.connect(weak=False)
+    def _finish(task_id=None, state=None, **kwargs):
+        cm = _task_spans.pop(task_id, None)
+        if cm is not None:
+            set_attributes(**{"celery.state": state or ""})
+            cm.__exit__(None, None, None)
+
+    @signals.task_failure.connect(weak=False)
+    def _failed(task_id=None, exception=None, **kwargs):
+        span = _current.get()
+        if span is not None and exception is not None:
+            span.error = f"{type(exception).__name__}: {exception}"
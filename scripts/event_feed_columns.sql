@@ -0,0 +1,14 @@
+-- ============================================================================
+-- TRANSACTION EVENT CHANGE FEED
+-- For databases created before GET /api/v1/events existed (create_all does not
+-- add columns to existing tables). Run on every shard.
+-- Adding the columns rewrites transaction_events: run in a maintenance window.
+-- Existing events all get the txid of this script, i.e. they are served first.
+-- ============================================================================
+
+ALTER TABLE transaction_events
+    ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL DEFAULT txid_current(),
+    ADD COLUMN IF NOT EXISTS sequence BIGINT GENERATED BY DEFAULT AS IDENTITY UNIQUE;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transaction_event_feed ON transaction_events (txid, sequence);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transaction_event_timestamp ON transaction_events (timestamp);
@@ -0,0 +1,32 @@
+-- ============================================================================
+-- IDEMPOTENCY KEY STORE
+-- For databases created before idempotency_keys existed. Start the API once first:
+-- create_all creates the partitioned idempotency_keys table and startup creates its partitions.
+-- Run outside a transaction:  psql -f scripts/idempotency_keys.sql
+-- ============================================================================
+
+-- 1. MAIN DATABASE: carry over the keys still inside their retry window (72h = IDEMPOTENCY_KEY_TTL_HOURS).
+--    No fingerprint: the original request bodies aren't known, so these keys aren't checked against the body.
+INSERT INTO idempotency_keys (key_hash, created_at, expires_at, fingerprint, transaction_id)
+SELECT sha256(convert_to(idempotency_key, 'UTF8')), created_at, created_at + interval '72 hours', NULL, transaction_id
+FROM transaction_directory
+WHERE created_at > (now() AT TIME ZONE 'utc') - interval '72 hours'
+ON CONFLICT DO NOTHING;
+
+--    Transactions written before the directory existed all live on the main database (shard 0)
+--    and have no directory entry: take their keys from the transactions themselves.
+INSERT INTO idempotency_keys (key_hash, created_at, expires_at, fingerprint, transaction_id)
+SELECT sha256(convert_to(idempotency_key, 'UTF8')), created_at, created_at + interval '72 hours', NULL, id
+FROM transactions t
+WHERE created_at > (now() AT TIME ZONE 'utc') - interval '72 hours'
+  AND NOT EXISTS (SELECT 1 FROM transaction_directory d WHERE d.transaction_id = t.id)
+ON CONFLICT DO NOTHING;
+
+-- The directory only maps transactions to landlords now
+ALTER TABLE transaction_directory DROP COLUMN IF EXISTS idempotency_key;
+
+-- 2. EVERY SHARD: drop the permanent unique btree on transactions.idempotency_key (and the hash index
+--    earlier versions of this script built): nothing looks transactions up by key any more.
+--    CONCURRENTLY: no write lock while dropping.
+DROP INDEX CONCURRENTLY IF EXISTS ix_transactions_idempotency_key;
+DROP INDEX CONCURRENTLY IF EXISTS idx_transaction_idempotency_key;
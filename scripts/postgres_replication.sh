@@ -0,0 +1,6 @@
+#!/bin/bash
+# Run once by the postgres image when the primary's data directory is first created
+# (/docker-entrypoint-initdb.d). Lets postgres_replica stream WAL from the primary.
+# An existing postgres_data volume skips init scripts: `docker compose down -v` to re-init.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
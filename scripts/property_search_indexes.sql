@@ -0,0 +1,21 @@
+-- ============================================================================
+-- PROPERTY SEARCH INDEXES
+-- For databases created before GET /api/v1/properties/search existed
+-- (create_all only creates indexes together with new tables).
+-- CONCURRENTLY: no write lock on properties / leases while building.
+-- Run outside a transaction:  psql -f scripts/property_search_indexes.sql
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Fuzzy address / city matching (ILIKE '%...%' and the similarity operator %)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_property_address_trgm ON properties USING gin (address gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_property_city_trgm ON properties USING gin (city gin_trgm_ops);
+
+-- Exact filters + rent range, in keyset order (monthly_rent, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_property_state_zip_rent ON properties (state, zip_code, monthly_rent, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_property_zip_rent ON properties (zip_code, monthly_rent, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_property_rent ON properties (monthly_rent, id);
+
+-- Vacancy (active lease per property)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_lease_property_status ON leases (property_id, status);
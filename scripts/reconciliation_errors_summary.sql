@@ -5,7 +5,7 @@
 
 WITH reconciliation AS (
     SELECT 
-        COALESCE(t.idempotency_key, bs.transaction_ref) as transaction_ref,
+        COALESCE(t.id::text, bs.transaction_ref) as transaction_ref,
         t.id as internal_txn_id,
         bs.id as bank_stmt_id,
         COALESCE(t.amount, 0.00) as internal_amount,
@@ -14,7 +14,7 @@ WITH reconciliation AS (
         COALESCE(bs.status, 'MISSING') as bank_status,
         
         CASE 
-            WHEN t.idempotency_key IS NULL THEN 'UNEXPECTED_BANK_CHARGE'
+            WHEN t.id IS NULL THEN 'UNEXPECTED_BANK_CHARGE'
             WHEN bs.transaction_ref IS NULL THEN 'MISSING_IN_BANK'
             WHEN t.amount != bs.amount THEN 'AMOUNT_MISMATCH'
             WHEN t.status::varchar != bs.status THEN 'STATUS_MISMATCH'
@@ -27,7 +27,7 @@ WITH reconciliation AS (
     
     FROM transactions t
     FULL OUTER JOIN bank_statements bs 
-        ON t.idempotency_key = bs.transaction_ref
+        ON t.id::text = bs.transaction_ref
 )
 SELECT 
     transaction_ref,
@@ -61,7 +61,7 @@ ORDER BY recon_status DESC, amount_difference DESC;
 WITH error_breakdown AS (
     SELECT 
         CASE 
-            WHEN t.idempotency_key IS NULL THEN 'UNEXPECTED_BANK_CHARGE (Ghost Charge)'
+            WHEN t.id IS NULL THEN 'UNEXPECTED_BANK_CHARGE (Ghost Charge)'
             WHEN bs.transaction_ref IS NULL THEN 'MISSING_IN_BANK (Float - Pending Bank Confirmation)'
             WHEN t.amount != bs.amount THEN 'AMOUNT_MISMATCH (Penny Pinching / Rounding Errors)'
             WHEN t.status::varchar != bs.status THEN 'STATUS_MISMATCH (Processing State Difference)'
@@ -71,7 +71,7 @@ WITH error_breakdown AS (
         ROUND(SUM(COALESCE(t.amount, bs.amount))::numeric, 2) as total_amount_affected
     FROM transactions t
     FULL OUTER JOIN bank_statements bs 
-        ON t.idempotency_key = bs.transaction_ref
+        ON t.id::text = bs.transaction_ref
     GROUP BY error_type
 )
 SELECT 
@@ -1,11 +1,13 @@
 -- ============================================================================
 -- RECONCILIATION QUERY
 -- Finds discrepancies between internal transactions and external bank statements
+-- Full recompute, for ad-hoc investigation. The daily job is incremental and
+-- persists its results: app/services/reconciliation_service.py
 -- ============================================================================
 
 WITH reconciliation AS (
     SELECT 
-        COALESCE(t.idempotency_key, bs.transaction_ref) as transaction_ref,
+        COALESCE(t.id::text, bs.transaction_ref) as transaction_ref,
         t.id as internal_txn_id,
         bs.id as bank_stmt_id,
         COALESCE(t.amount, 0.00) as internal_amount,
@@ -16,7 +18,7 @@ WITH reconciliation AS (
         
         -- Determine reconciliation status
         CASE 
-            WHEN t.idempotency_key IS NULL THEN 'UNEXPECTED_BANK_CHARGE'
+            WHEN t.id IS NULL THEN 'UNEXPECTED_BANK_CHARGE'
             WHEN bs.transaction_ref IS NULL THEN 'MISSING_IN_BANK'
             WHEN t.amount != bs.amount THEN 'AMOUNT_MISMATCH'
             WHEN t.status::varchar != bs.status THEN 'STATUS_MISMATCH'
@@ -32,7 +34,7 @@ WITH reconciliation AS (
     
     FROM transactions t
     FULL OUTER JOIN bank_statements bs 
-        ON t.idempotency_key = bs.transaction_ref
+        ON t.id::text = bs.transaction_ref
 )
 SELECT 
     transaction_ref,
@@ -91,9 +93,9 @@ SELECT
     'Perfect Matches' as metric,
     COUNT(*)::text as value
 FROM (
-    SELECT t.idempotency_key
+    SELECT t.id
     FROM transactions t
-    INNER JOIN bank_statements bs ON t.idempotency_key = bs.transaction_ref
+    INNER JOIN bank_statements bs ON t.id::text = bs.transaction_ref
     WHERE t.amount = bs.amount AND t.status::varchar = bs.status
 ) matches
 UNION ALL
@@ -104,7 +106,7 @@ FROM (
     WITH reconciliation AS (
         SELECT 
             CASE 
-                WHEN t.idempotency_key IS NULL THEN 'UNEXPECTED_BANK_CHARGE'
+                WHEN t.id IS NULL THEN 'UNEXPECTED_BANK_CHARGE'
                 WHEN bs.transaction_ref IS NULL THEN 'MISSING_IN_BANK'
                 WHEN t.amount != bs.amount THEN 'AMOUNT_MISMATCH'
                 WHEN t.status::varchar != bs.status THEN 'STATUS_MISMATCH'
@@ -112,7 +114,7 @@ FROM (
             END as recon_status
         FROM transactions t
         FULL OUTER JOIN bank_statements bs 
-            ON t.idempotency_key = bs.transaction_ref
+            ON t.id::text = bs.transaction_ref
     )
     SELECT * FROM reconciliation WHERE recon_status != 'MATCH'
 ) discrepancies
@@ -121,12 +123,12 @@ SELECT
     'Unmatched (In Bank, Not in System)' as metric,
     COUNT(*)::text as value
 FROM bank_statements bs
-WHERE bs.transaction_ref NOT IN (SELECT idempotency_key FROM transactions)
+WHERE bs.transaction_ref NOT IN (SELECT id::text FROM transactions)
 UNION ALL
 SELECT 
     'Float (In System, Not yet in Bank)' as metric,
     COUNT(*)::text as value
 FROM transactions t
-WHERE t.idempotency_key NOT IN (SELECT transaction_ref FROM bank_statements)
+WHERE t.id::text NOT IN (SELECT transaction_ref FROM bank_statements)
   AND t.status::varchar = 'COMPLETED'
 ORDER BY metric;
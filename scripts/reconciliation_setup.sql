@@ -13,7 +13,7 @@ DROP TABLE IF EXISTS bank_statements CASCADE;
 
 CREATE TABLE bank_statements (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    transaction_ref VARCHAR NOT NULL UNIQUE,  -- Matches our idempotency_key
+    transaction_ref VARCHAR NOT NULL UNIQUE,  -- Our transaction id (the bank reference)
     amount NUMERIC(10, 2) NOT NULL,
     status VARCHAR NOT NULL,  -- 'completed', 'pending', 'failed'
     processed_at TIMESTAMP NOT NULL,
@@ -22,6 +22,7 @@ CREATE TABLE bank_statements (
 
 CREATE INDEX idx_bank_stmt_ref ON bank_statements(transaction_ref);
 CREATE INDEX idx_bank_stmt_processed ON bank_statements(processed_at);
+CREATE INDEX idx_bank_stmt_created ON bank_statements(created_at, id);  -- incremental reconciliation watermark
 
 -- ============================================================================
 -- 2. SEED BANK_STATEMENTS WITH CLEAN DATA + INTENTIONAL ERRORS
@@ -30,7 +31,7 @@ CREATE INDEX idx_bank_stmt_processed ON bank_statements(processed_at);
 -- Get the 500 most "stable" completed transactions (not the most recent 100)
 WITH clean_transactions AS (
     SELECT 
-        idempotency_key,
+        id::text AS transaction_ref,
         amount,
         status,
         completed_at,
@@ -48,7 +49,7 @@ filtered_clean AS (
 )
 INSERT INTO bank_statements (transaction_ref, amount, status, processed_at)
 SELECT 
-    idempotency_key,
+    transaction_ref,
     amount,
     status,
     completed_at
@@ -61,18 +62,18 @@ FROM filtered_clean;
 
 WITH mismatch_transaction AS (
     SELECT 
-        idempotency_key,
+        id::text AS transaction_ref,
         amount,
         status,
         completed_at
     FROM transactions 
     WHERE status = 'COMPLETED'
-      AND idempotency_key NOT IN (SELECT transaction_ref FROM bank_statements)
+      AND id::text NOT IN (SELECT transaction_ref FROM bank_statements)
     LIMIT 1
 )
 INSERT INTO bank_statements (transaction_ref, amount, status, processed_at)
 SELECT 
-    idempotency_key,
+    transaction_ref,
     amount - 0.01,  -- Bank shows $0.01 less
     status,
     completed_at
@@ -99,5 +100,5 @@ COMMIT;
 
 SELECT COUNT(*) as total_bank_statements FROM bank_statements;
 SELECT COUNT(*) as total_clean_matches FROM bank_statements 
-  WHERE transaction_ref IN (SELECT idempotency_key FROM transactions);
+  WHERE transaction_ref IN (SELECT id::text FROM transactions);
 
@@ -0,0 +1,13 @@
+-- ============================================================================
+-- RENT ROLL INDEXES
+-- For databases created before GET /api/v1/properties/rent-roll existed
+-- (create_all only creates indexes together with new tables). Run on every shard.
+-- CONCURRENTLY: no write lock on properties / transactions while building.
+-- Run outside a transaction:  psql -f scripts/rent_roll_indexes.sql
+-- ============================================================================
+
+-- A landlord's units
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_property_landlord ON properties (landlord_id);
+
+-- Money received in a month
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transaction_completed ON transactions (completed_at);
@@ -1,5 +1,6 @@
 -- Phase 1: Seed dummy data for rental payment system
 -- 1,000 users, 700 properties, 2,500 leases, 10,000 transactions
+-- For data at production scale (millions of transactions) use: python -m app.cli.generate_data --help
 
 BEGIN;
 
@@ -0,0 +1,8 @@
+-- ============================================================================
+-- TRANSACTION VERSION COLUMN
+-- For databases created before status changes became versioned compare-and-set
+-- updates (create_all does not add columns to existing tables). Run on every shard.
+-- A constant default is a catalog-only change since PostgreSQL 11: no table rewrite.
+-- ============================================================================
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;